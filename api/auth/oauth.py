@@ -61,6 +61,8 @@ async def get_current_user(
     user = result.scalar_one_or_none()
     if user is None:
         raise unauthorized_exception
+    # Автор изменений для change_log (сессия общая с эндпоинтом в рамках запроса)
+    db.info["actor_id"] = user.id
     return user
 
 
@@ -102,4 +104,5 @@ async def get_admin_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
+    db.info["actor_id"] = user.id
     return user
\ No newline at end of file
@@ -8,15 +8,16 @@ warnings.filterwarnings("ignore", category=DeprecationWarning, module="starlette
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from api.routers import auth, payments, settings as settings_router, currencies, admin, users
-from api.routers import assignments, employment, balances, websocket
-from api.middleware.security import SecurityHeadersMiddleware
-from api.middleware.logging import SecurityLoggingMiddleware
+from api.routers import assignments, employment, balances, websocket, sync, metrics, reports, telegram_webhook
+from api.middleware.security import SecurityMiddleware
+from api.middleware.metrics import MetricsMiddleware
+from api.middleware.rate_limit import RateLimitMiddleware
 from config.settings import settings
 import os
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
@@ -33,11 +34,16 @@ app = FastAPI(
 if settings.FORCE_HTTPS:
     app.add_middleware(HTTPSRedirectMiddleware)
 
-if settings.SECURITY_HEADERS_ENABLED:
-    app.add_middleware(SecurityHeadersMiddleware)
+# Per-route rate limits: cheap 429 before routing and DB access (pure ASGI)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
-# Security logging middleware
-app.add_middleware(SecurityLoggingMiddleware)
+# Security headers, X-Process-Time and audit logging (pure ASGI)
+app.add_middleware(SecurityMiddleware, headers_enabled=settings.SECURITY_HEADERS_ENABLED)
+
+# Per-route latency and SQL accounting for /api/metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -48,6 +54,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Триггеры закрытых периодов (database/models.py) -> 409 вместо 500
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request: Request, exc: IntegrityError):
+    from database.models import PERIOD_CLOSED_ERROR
+    if PERIOD_CLOSED_ERROR in str(exc.orig):
+        return JSONResponse(status_code=409, content={
+            "detail": "Период закрыт: платежи и задачи с датой в закрытом месяце менять нельзя"
+        })
+    raise exc
+
 # API роуты с префиксом /api
 app.include_router(auth.router, prefix="/api")
 app.include_router(payments.router, prefix="/api")
@@ -60,30 +76,50 @@ app.include_router(assignments.router, prefix="/api")
 app.include_router(employment.router, prefix="/api")
 app.include_router(balances.router, prefix="/api")
 app.include_router(websocket.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(reports.router, prefix="/api")
+# Вебхук Telegram-бота (активен при BOT_MODE=api)
+app.include_router(telegram_webhook.router, prefix="/api")
 
 
 # Startup/shutdown events for background tasks
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on app startup."""
+    import asyncio
     from api.routers.websocket import start_timer_broadcast
+    from database.change_log import run_compaction
+    from utils.event_outbox import event_dispatcher
+    from utils.report_jobs import report_queue
+    from utils.static_assets import static_assets
+    static_assets.load()
     start_timer_broadcast()
+    asyncio.create_task(run_compaction())
+    await event_dispatcher.start()
+    await report_queue.start()
+    if settings.BOT_MODE == "api":
+        from bot.webhook import claim_webhook_lock, start_webhook
+        # Один бот на все воркеры uvicorn: второй воркер не стартует
+        claim_webhook_lock()
+        await start_webhook()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop background tasks on app shutdown."""
     from api.routers.websocket import stop_timer_broadcast
+    from utils.archive import dispose_history_engines
+    from utils.event_outbox import event_dispatcher
+    from utils.report_jobs import report_queue
     stop_timer_broadcast()
-
-# React статические файлы
-if os.path.exists("frontend/build/static"):
-    app.mount("/static", StaticFiles(directory="frontend/build/static"), name="static")
-
-# Favicon
-@app.get("/favicon.svg")
-async def favicon():
-    return FileResponse("frontend/build/favicon.svg", media_type="image/svg+xml")
+    if settings.BOT_MODE == "api":
+        from bot.webhook import release_webhook_lock, stop_webhook
+        await stop_webhook()
+        release_webhook_lock()
+    await report_queue.stop()
+    await event_dispatcher.stop()
+    await dispose_history_engines()
 
 @app.get("/api")
 async def api_root():
@@ -110,10 +146,16 @@ async def swagger_ui_html():
 async def redoc_ui_html():
     return get_redoc_html(openapi_url="/openapi.json", title=app.title + " - ReDoc")
 
-@app.get("/{full_path:path}")
-async def serve_react_app(full_path: str):
-    if os.path.exists("frontend/build/index.html"):
-        return FileResponse("frontend/build/index.html")
+# React SPA: файлы сборки (static/*, favicon.svg, ...) и index.html из памяти
+@app.get("/{full_path:path}", include_in_schema=False)
+async def serve_react_app(full_path: str, request: Request):
+    from utils.static_assets import static_assets
+
+    if static_assets.built:
+        asset = static_assets.asset(full_path) if full_path else None
+        if asset is None and full_path.startswith("static/"):
+            return JSONResponse(status_code=404, content={"detail": "Not Found"})
+        return await static_assets.response(asset or static_assets.index, request.headers)
     
     # Если это не API и не статика, и приложения нет - возвращаем сообщение
     return {"message": "React app not built. Run 'npm run build' in frontend directory."}
@@ -1,7 +1,5 @@
 import logging
-import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
 from config.settings import settings
 
 # Configure logging
@@ -13,30 +11,25 @@ logging.basicConfig(
 logger = logging.getLogger("nursia.security")
 
 
-class SecurityLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log security-relevant requests
-        if request.url.path.startswith("/api/auth/"):
-            client_ip = request.client.host if request.client else "unknown"
-            logger.info(f"Auth request: {request.method} {request.url.path} from {client_ip}")
-        
-        response = await call_next(request)
-        
-        # Log failed authentication attempts
-        if request.url.path.startswith("/api/auth/login") and response.status_code == 401:
-            client_ip = request.client.host if request.client else "unknown"
-            logger.warning(f"Failed login attempt from {client_ip}")
-        
-        # Log admin actions
-        if (request.url.path.startswith("/api/admin/") or 
-            request.url.path.startswith("/api/payments/categories") and request.method in ["POST", "PUT", "DELETE"]):
-            if response.status_code < 400:
-                client_ip = request.client.host if request.client else "unknown"
-                logger.info(f"Admin action: {request.method} {request.url.path} from {client_ip}")
-        
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        return response
\ No newline at end of file
+def log_request(method: str, path: str, client_ip: str) -> None:
+    """Log security-relevant requests (before the endpoint runs)"""
+    if path.startswith("/api/auth/"):
+        logger.info(f"Auth request: {method} {path} from {client_ip}")
+
+
+def log_response(method: str, path: str, client_ip: str, status_code: int) -> None:
+    """Audit log once the response status is known"""
+    # Log failed authentication attempts
+    if path.startswith("/api/auth/login") and status_code == 401:
+        logger.warning(f"Failed login attempt from {client_ip}")
+    
+    # Log admin actions
+    if (path.startswith("/api/admin/") or
+        path.startswith("/api/payments/categories") and method in ["POST", "PUT", "DELETE"]):
+        if status_code < 400:
+            logger.info(f"Admin action: {method} {path} from {client_ip}")
+
+
+def client_ip_from_scope(scope) -> str:
+    client: Optional[tuple] = scope.get("client")
+    return client[0] if client else "unknown"
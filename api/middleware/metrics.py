@@ -0,0 +1,61 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import (
+    RequestStats, current_request_stats,
+    http_requests_total, http_request_duration_seconds,
+    db_statements_per_request, db_time_per_request_seconds,
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Full path template of the matched route.
+
+    FastAPI keeps routers included with a prefix as they are, so route.path lacks
+    the prefix; the full template is on the effective route context.
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None)
+    if path:
+        return path
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency, request counts and SQL accounting.
+
+    The route label is the matched path template including the include_router
+    prefix (e.g. /api/payments/{payment_id}), so label cardinality stays bounded;
+    unmatched requests are labelled "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            current_request_stats.reset(token)
+            route_label = route_template(scope)
+            method = scope["method"]
+            http_requests_total.inc(method, route_label, str(status_code))
+            http_request_duration_seconds.observe(elapsed, method, route_label)
+            db_statements_per_request.observe(stats.statements, method, route_label)
+            db_time_per_request_seconds.observe(stats.db_seconds, method, route_label)
@@ -1,17 +1,49 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["X-Permitted-Cross-Domain-Policies"] = "none"
-        
-        return response
\ No newline at end of file
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.middleware.logging import log_request, log_response, client_ip_from_scope
+
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "X-Permitted-Cross-Domain-Policies": "none",
+}
+
+
+class SecurityMiddleware:
+    """Pure ASGI middleware: security headers, X-Process-Time and audit logging.
+
+    Headers are injected by intercepting http.response.start, so the response
+    body (including streaming responses) passes through untouched, without the
+    extra task and memory stream of BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app: ASGIApp, headers_enabled: bool = True):
+        self.app = app
+        self.headers_enabled = headers_enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.time()
+        method = scope["method"]
+        path = scope["path"]
+        client_ip = client_ip_from_scope(scope)
+        log_request(method, path, client_ip)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if self.headers_enabled:
+                    for name, value in SECURITY_HEADERS.items():
+                        headers[name] = value
+                headers["X-Process-Time"] = str(time.time() - start_time)
+                log_response(method, path, client_ip, message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -5,7 +5,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel, ConfigDict
 from database.core import get_db
@@ -526,6 +526,16 @@ async def get_registration_requests(
     return result.scalars().all()
 
 
+@router.get("/registration-requests/count")
+async def get_registration_requests_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Число ожидающих заявок (счётчик в памяти, см. utils/registration_requests.py)"""
+    from utils.registration_requests import pending_requests
+    return {"pending": await pending_requests.get(db)}
+
+
 @router.post("/registration-requests/{request_id}/approve")
 async def approve_registration(
     request_id: int,
@@ -559,14 +569,16 @@ async def approve_registration(
     
     db.add(user)
     
-    # Обновляем статус заявки
-    await db.execute(
-        update(RegistrationRequest)
-        .where(RegistrationRequest.id == request_id)
-        .values(status="approved", reviewed_by=current_user.id)
-    )
+    # Обновляем статус заявки (через ORM, чтобы изменение попало в change_log)
+    was_pending = request.status == "pending"
+    request.status = "approved"
+    request.reviewed_by = current_user.id
     
+    from utils.registration_requests import pending_requests, stage_registration_event
+    stage_registration_event(db, "approved", request)
     await db.commit()
+    if was_pending:
+        pending_requests.adjust(-1)
     return {"message": "User approved and created"}
 
 
@@ -585,8 +597,14 @@ async def reject_registration(
         raise HTTPException(status_code=404, detail="Request not found")
     
     # Удаляем отклоненную заявку из базы
+    was_pending = request.status == "pending"
     await db.delete(request)
+    
+    from utils.registration_requests import pending_requests, stage_registration_event
+    stage_registration_event(db, "rejected", request)
     await db.commit()
+    if was_pending:
+        pending_requests.adjust(-1)
     return {"message": "Registration request rejected and deleted"}
 
 
@@ -603,6 +621,34 @@ async def delete_registration_request(
     if not request:
         raise HTTPException(status_code=404, detail="Request not found")
     
+    was_pending = request.status == "pending"
     await db.delete(request)
+    
+    from utils.registration_requests import pending_requests, stage_registration_event
+    stage_registration_event(db, "deleted", request)
     await db.commit()
-    return {"message": "Registration request deleted"}
\ No newline at end of file
+    if was_pending:
+        pending_requests.adjust(-1)
+    return {"message": "Registration request deleted"}
+
+# ================================
+# Change log
+# ================================
+
+@router.post("/change-log/compact")
+async def compact_change_log_endpoint(
+    retention_days: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Компакция change_log (по умолчанию CHANGE_LOG_RETENTION_DAYS)"""
+    from database.change_log import compact_change_log, get_latest_seq, get_horizon
+    
+    if retention_days is not None and retention_days < 0:
+        raise HTTPException(status_code=400, detail="retention_days must be >= 0")
+    removed = await compact_change_log(db, retention_days)
+    return {
+        "removed": removed,
+        "latest_seq": await get_latest_seq(db),
+        "horizon": await get_horizon(db)
+    }
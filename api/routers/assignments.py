@@ -6,18 +6,22 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+import csv
+import io
 from datetime import datetime, date, time, timedelta, timezone
 from decimal import Decimal
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, literal
 from sqlalchemy.orm import joinedload
 from pydantic import BaseModel
 
 from database.core import get_db
 from database.models import User, Assignment, Task, EmploymentRelation, Payment, PaymentCategory, AssignmentType, TaskType
 from api.auth.oauth import get_current_user
+from utils.intervals import IntervalIndex, as_utc, sweep_overlaps
+from utils.event_outbox import register_entity_loader
 
 router = APIRouter(prefix="/assignments", tags=["assignments"])
 
@@ -184,6 +188,162 @@ def _task_to_response(task: Task, assignment: Assignment,
         total_pause_seconds=total_pause_seconds
     )
 
+def _assignment_to_response(assignment: Assignment, employment: Optional[EmploymentRelation],
+                            now: datetime) -> AssignmentResponse:
+    """Преобразование Assignment (с загруженными tasks, worker, payment) в AssignmentResponse"""
+    tasks = sorted(assignment.tasks, key=lambda t: (t.start_time, t.id))
+    
+    # Get employment relation for hourly rate
+    hourly_rate = float(employment.hourly_rate) if employment else 0.0
+    currency = employment.currency if employment else "UAH"
+    
+    # Calculate totals
+    total_work_seconds = 0
+    total_pause_seconds = 0
+    total_amount = 0.0
+    is_active = assignment.is_active
+    
+    for task in tasks:
+        if task.end_time:
+            seg_seconds = task.duration_seconds
+        elif task.end_time is None:
+            # Active task - Task.start_time is now full datetime
+            seg_seconds = int((now - task.start_time).total_seconds())
+        else:
+            seg_seconds = 0
+        
+        if task.task_type == "work" or task.task_type == "absent":
+            total_work_seconds += seg_seconds
+            if task.task_type == "work" and task.end_time:
+                # Calculate amount manually: hours * hourly_rate
+                task_hours = task.duration_hours
+                total_amount += task_hours * hourly_rate
+        else:
+            total_pause_seconds += seg_seconds
+    
+    # Override calculated amount with real payment amount if exists
+    if assignment.payment:
+        total_amount = float(assignment.payment.amount)
+    
+    first_task = tasks[0] if tasks else None
+    last_task = tasks[-1] if tasks else None
+    
+    # Segments in descending order (newest first), stable sort by (start_time, id)
+    segment_responses = [
+        _task_to_response(
+            task, assignment,
+            worker_name=assignment.worker.full_name if assignment.worker else None,
+            employer_name=None,
+            hourly_rate=hourly_rate,
+            currency=currency
+        )
+        for task in sorted(tasks, key=lambda t: (t.start_time, t.id), reverse=True)
+    ]
+    
+    return AssignmentResponse(
+        assignment_id=assignment.id,
+        tracking_nr=assignment.tracking_nr,
+        assignment_type=assignment.assignment_type,
+        assignment_date=assignment.assignment_date,
+        worker_id=assignment.user_id,
+        worker_name=assignment.worker.full_name if assignment.worker else None,
+        employer_id=assignment.user_id,
+        employer_name=None,
+        start_time=first_task.start_time if first_task else None,
+        end_time=last_task.end_time if last_task and not is_active else None,
+        total_work_seconds=total_work_seconds,
+        total_pause_seconds=total_pause_seconds,
+        total_hours=round(total_work_seconds / 3600, 2),
+        total_amount=round(total_amount, 2),
+        hourly_rate=hourly_rate,
+        currency=currency,
+        description=assignment.description,
+        is_active=is_active,
+        payment_id=assignment.payment.id if assignment.payment else None,
+        payment_tracking_nr=assignment.payment.tracking_nr if assignment.payment else None,
+        payment_status=assignment.payment.payment_status if assignment.payment else None,
+        segments=segment_responses
+    )
+
+
+async def _serialize_assignment_for_event(db: AsyncSession, assignment_id: int) -> Optional[dict]:
+    """Загрузить смену и сериализовать для rich WebSocket событий (форма AssignmentResponse)"""
+    from utils.timeutil import now_server
+    
+    result = await db.execute(
+        select(Assignment).options(
+            joinedload(Assignment.worker),
+            joinedload(Assignment.tasks),
+            joinedload(Assignment.payment)
+        ).where(Assignment.id == assignment_id).execution_options(populate_existing=True)
+    )
+    assignment = result.unique().scalar_one_or_none()
+    if not assignment:
+        return None
+    emp_result = await db.execute(
+        select(EmploymentRelation).where(
+            and_(
+                EmploymentRelation.user_id == assignment.user_id,
+                EmploymentRelation.is_active == True
+            )
+        )
+    )
+    employment = emp_result.scalars().first()
+    return _assignment_to_response(assignment, employment, now_server()).model_dump(mode="json")
+
+
+@register_entity_loader("assignment")
+async def _load_assignment_entity(db: AsyncSession, assignment_id: int) -> Optional[dict]:
+    """{"assignment": ...} для rich WebSocket событий (вызывает диспетчер после COMMIT)"""
+    assignment = await _serialize_assignment_for_event(db, assignment_id)
+    return {"assignment": assignment} if assignment else None
+
+
+async def _assignment_spans(db: AsyncSession, worker_id: int, assignment_type: str,
+                            window_start: datetime, window_end: datetime) -> list:
+    """Интервалы смен работника данного типа, задевающие окно [window_start, window_end).
+
+    Один сгруппированный запрос: (начало первого задания, конец последнего, (id, tracking_nr));
+    активная смена длится до текущего момента.
+    """
+    from utils.timeutil import now_server
+    
+    span_start = func.min(Task.start_time)
+    span_end = func.max(func.coalesce(Task.end_time, literal(now_server(), Task.end_time.type)))
+    result = await db.execute(
+        select(Assignment.id, Assignment.tracking_nr, span_start, span_end)
+        .join(Task)
+        .where(
+            Assignment.user_id == worker_id,
+            Assignment.assignment_type == assignment_type
+        )
+        .group_by(Assignment.id)
+        .having(and_(span_start < as_utc(window_end), span_end > as_utc(window_start)))
+    )
+    return [
+        (start, end, (assignment_id, tracking_nr or f"#{assignment_id}"))
+        for assignment_id, tracking_nr, start, end in result.all()
+    ]
+
+
+async def _check_task_overlap(db: AsyncSession, assignment_id: int, task_id: int,
+                              start: datetime, end: Optional[datetime]) -> None:
+    """400, если [start, end) пересекает другое задание смены (end=None - активное задание)"""
+    result = await db.execute(
+        select(Task.start_time, Task.end_time, Task.id).where(
+            Task.assignment_id == assignment_id,
+            Task.id != task_id
+        )
+    )
+    overlap = IntervalIndex(result.all()).overlapping(start, end)
+    if overlap:
+        other_start, other_end, _ = overlap
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Время пересекается с другим сегментом ({other_start.strftime('%H:%M')}-{other_end.strftime('%H:%M') if other_end else '...'})"
+        )
+
+
 # Метки типов для отображения
 ASSIGNMENT_TYPE_LABELS = {
     AssignmentType.WORK: "Смена",
@@ -223,60 +383,15 @@ async def start_work_session(
             raise HTTPException(status_code=403, detail="Вы можете начать смену только для себя")
         target_worker_id = current_user.id
     
-    # Проверяем, есть ли активное трудовое отношение для работника
-    result = await db.execute(
-        select(EmploymentRelation).where(
-            and_(
-                EmploymentRelation.user_id == target_worker_id,
-                EmploymentRelation.is_active == True
-            )
+    from utils.work_sessions import WorkSessionConflict, start_session
+    try:
+        new_task, new_assignment, employment = await start_session(
+            db, target_worker_id, session_data.description, session_data.task_description
         )
-    )
-    employment = result.scalar_one_or_none()
-    
-    if not employment:
-        raise HTTPException(status_code=404, detail="Трудовые отношения не найдены")
-    
-    # Проверяем, нет ли уже активной сессии (незавершённого task)
-    result = await db.execute(
-        select(Task).join(Assignment).where(
-            and_(
-                Assignment.user_id == target_worker_id,
-                Task.end_time == None
-            )
-        )
-    )
-    active_task = result.scalar_one_or_none()
-    
-    if active_task:
-        raise HTTPException(status_code=400, detail="У работника уже есть активная сессия")
-    
-    from utils.timeutil import now_server
-    now = now_server()
-    
-    # Создаём Assignment (без assignment_date, hourly_rate, currency, is_active)
-    new_assignment = Assignment(
-        user_id=target_worker_id,
-        description=session_data.description
-    )
-    db.add(new_assignment)
-    await db.flush()  # Получаем ID
-    
-    # Generate tracking number using assignment ID
-    from utils.tracking import format_assignment_tracking_nr
-    new_assignment.tracking_nr = format_assignment_tracking_nr(new_assignment.id)
-    
-    # Создаём первый Task с полным datetime
-    new_task = Task(
-        assignment_id=new_assignment.id,
-        start_time=now,  # Теперь полная дата+время
-        task_type="work",
-        description=session_data.task_description or session_data.description
-    )
-    db.add(new_task)
-    await db.commit()
-    await db.refresh(new_task)
-    await db.refresh(new_assignment)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except WorkSessionConflict as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Загружаем worker и employment relationship
     result = await db.execute(
@@ -294,16 +409,6 @@ async def start_work_session(
         currency=employment.currency
     )
     
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([target_worker_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
-        "type": "assignment_started",
-        "assignment_id": new_assignment.id,
-        "user_id": target_worker_id
-    }, user_ids=target_users)
-    
     return return_response
 
 
@@ -349,17 +454,16 @@ async def create_manual_assignment(
                     detail=f"Задание #{i+1}: тип должен быть 'work' или 'pause'"
                 )
         
-        # Проверка пересечений между заданиями внутри смены
-        for i, task1 in enumerate(data.tasks):
-            for j, task2 in enumerate(data.tasks):
-                if i >= j:
-                    continue
-                # Пересечение: (start1 < end2) AND (end1 > start2)
-                if task1.start_time < task2.end_time and task1.end_time > task2.start_time:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Задания #{i+1} и #{j+1} пересекаются по времени"
-                    )
+        # Проверка пересечений между заданиями внутри смены (один проход по отсортированным)
+        conflicts = sweep_overlaps(
+            (task.start_time, task.end_time, i) for i, task in enumerate(data.tasks, start=1)
+        )
+        if conflicts:
+            first, second = sorted(conflicts[0])
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Задания #{first} и #{second} пересекаются по времени"
+            )
     
     # Проверяем, есть ли активное трудовое отношение для работника
     result = await db.execute(
@@ -381,63 +485,27 @@ async def create_manual_assignment(
     
     # Проверка пересечений с существующими сменами (для work типов)
     if not is_time_off and data.tasks:
-        from utils.timeutil import now_server
+        # Диапазон новой смены
+        new_shift_start = min(as_utc(t.start_time) for t in data.tasks)
+        new_shift_end = max(as_utc(t.end_time) for t in data.tasks)
         
-        # Получаем диапазон новой смены
-        new_tasks_sorted = sorted(data.tasks, key=lambda t: t.start_time)
-        new_shift_start = new_tasks_sorted[0].start_time
-        new_shift_end = new_tasks_sorted[-1].end_time
-        
-        # Ensure input times are timezone-aware (UTC) to match DB
-        if new_shift_start.tzinfo is None:
-            new_shift_start = new_shift_start.replace(tzinfo=timezone.utc)
-        if new_shift_end.tzinfo is None:
-            new_shift_end = new_shift_end.replace(tzinfo=timezone.utc)
-            
-        # Находим существующие assignments в том же временном диапазоне
-        result = await db.execute(
-            select(Assignment)
-            .options(joinedload(Assignment.tasks))
-            .join(Task)
-            .where(
-                and_(
-                    Assignment.user_id == target_worker_id,
-                    Assignment.assignment_type == "work",
-                    # Check if any tasks overlap with our time range
-                    Task.start_time < new_shift_end,
-                    Task.end_time > new_shift_start
-                )
+        # Смены работника, задевающие этот диапазон (активная - до текущего момента)
+        index = IntervalIndex(await _assignment_spans(db, target_worker_id, "work", new_shift_start, new_shift_end))
+        overlap = index.overlapping(new_shift_start, new_shift_end)
+        if overlap:
+            existing_start, existing_end, (_, tracking_nr) = overlap
+            raise HTTPException(
+                status_code=400,
+                detail=f"Смена пересекается с существующей {tracking_nr} ({existing_start.strftime('%d.%m %H:%M')}-{existing_end.strftime('%H:%M')})"
             )
-        )
-        existing_assignments = result.unique().scalars().all()
-        
-        for existing in existing_assignments:
-            if not existing.tasks:
-                continue
-            existing_tasks_sorted = sorted(existing.tasks, key=lambda t: t.start_time)
-            existing_start = existing_tasks_sorted[0].start_time
-            # Fallback to current server time (UTC) if task is still active
-            existing_end = existing_tasks_sorted[-1].end_time if existing_tasks_sorted[-1].end_time else now_server()
-            
-            # Проверяем пересечение
-            if new_shift_start < existing_end and new_shift_end > existing_start:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Смена пересекается с существующей {existing.tracking_nr} ({existing_start.strftime('%d.%m %H:%M')}-{existing_end.strftime('%H:%M')})'"
-                )
-    
-    # Создаём Assignment (без удалённых полей)
-    new_assignment = Assignment(
-        user_id=target_worker_id,
-        assignment_type=data.assignment_type,
-        description=data.description
-    )
-    db.add(new_assignment)
-    await db.flush()
     
-    # Generate tracking number
-    from utils.tracking import format_assignment_tracking_nr
-    new_assignment.tracking_nr = format_assignment_tracking_nr(new_assignment.id)
+    # Создаём Assignment одним INSERT ... RETURNING: id и tracking_nr (триггер БД) сразу
+    from database.bulk import insert_returning
+    new_assignment = await insert_returning(db, Assignment, {
+        "user_id": target_worker_id,
+        "assignment_type": data.assignment_type,
+        "description": data.description
+    })
     
     # Создаём Tasks
     total_work_seconds = 0
@@ -479,7 +547,6 @@ async def create_manual_assignment(
         if len(full_description) > 500:
             full_description = full_description[:497] + "..."
         
-        from utils.tracking import format_payment_tracking_nr
         from database.models import Role, PaymentCategoryGroup, PaymentGroupCode
         
         # Get employer (user with employer role)
@@ -504,41 +571,30 @@ async def create_manual_assignment(
         first_task = data.tasks[0] if data.tasks else None
         payment_date = strip_microseconds(first_task.start_time) if first_task else now_server()
         
-        payment = Payment(
-            payer_id=payer_id,
-            recipient_id=target_worker_id,
-            category_id=salary_category.id,
-            amount=total_amount,
-            currency=currency,
-            description=full_description,
-            payment_date=payment_date,
-            payment_status='unpaid',
-            assignment_id=new_assignment.id
-        )
-        db.add(payment)
-        await db.flush()
-        payment.tracking_nr = format_payment_tracking_nr(payment.id)
-    
-    await db.commit()
-    await db.refresh(new_assignment)
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([target_worker_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
+        payment = await insert_returning(db, Payment, {
+            "payer_id": payer_id,
+            "recipient_id": target_worker_id,
+            "category_id": salary_category.id,
+            "amount": total_amount,
+            "currency": currency,
+            "description": full_description,
+            "payment_date": payment_date,
+            "payment_status": 'unpaid',
+            "assignment_id": new_assignment.id
+        })
+    
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import EntityRef, stage_event
+    from utils.work_sessions import stage_payment_created
+    stage_event(db, {
         "type": "assignment_started",
         "assignment_id": new_assignment.id,
         "user_id": target_worker_id
-    }, user_ids=target_users)
-    
+    }, user_ids=[target_worker_id], entity=EntityRef("assignment", new_assignment.id))
     if payment:
-        await manager.broadcast({
-            "type": "payment_created",
-            "payment_id": payment.id,
-            "payer_id": payment.payer_id,
-            "recipient_id": payment.recipient_id
-        }, user_ids=target_users)
+        stage_payment_created(db, payment, target_worker_id)
+    
+    await db.commit()
     
     return ManualAssignmentResponse(
         assignment_id=new_assignment.id,
@@ -618,38 +674,24 @@ async def create_time_off(
     currency = employment.currency
     
     # Проверяем пересечение с существующими записями того же типа
-    result = await db.execute(
-        select(Assignment)
-        .options(joinedload(Assignment.tasks))
-        .join(Task)
-        .where(
-            and_(
-                Assignment.user_id == target_worker_id,
-                Assignment.assignment_type == data.assignment_type,
-                # Пересечение временных диапазонов
-                Task.start_time < data.end_time,
-                Task.end_time > data.start_time
-            )
-        )
+    index = IntervalIndex(
+        await _assignment_spans(db, target_worker_id, data.assignment_type, data.start_time, data.end_time)
     )
-    existing = result.scalars().first()
-    if existing:
+    if index.overlapping(data.start_time, data.end_time):
         raise HTTPException(
             status_code=400,
             detail=f"Запись типа '{data.assignment_type}' уже существует и пересекается с указанным периодом"
         )
     
     # Создаём один Assignment для группировки всех дней отсутствия
-    from utils.tracking import format_assignment_tracking_nr
+    # (INSERT ... RETURNING: id и tracking_nr сразу)
+    from database.bulk import insert_returning
     
-    new_assignment = Assignment(
-        user_id=target_worker_id,
-        assignment_type=data.assignment_type,
-        description=data.description
-    )
-    db.add(new_assignment)
-    await db.flush()
-    new_assignment.tracking_nr = format_assignment_tracking_nr(new_assignment.id)
+    new_assignment = await insert_returning(db, Assignment, {
+        "user_id": target_worker_id,
+        "assignment_type": data.assignment_type,
+        "description": data.description
+    })
     
     # Создаём отдельные задачи (TaskType.ABSENT) на каждый день периода
     # Начинаем в 8:00 утра каждого дня и длится hours_per_day
@@ -686,7 +728,6 @@ async def create_time_off(
     
     payment = None
     if total_amount > 0:
-        from utils.tracking import format_payment_tracking_nr
         from database.models import Role, PaymentCategoryGroup, PaymentGroupCode
         
         # Get employer
@@ -716,24 +757,18 @@ async def create_time_off(
                 payment_status='unpaid',
                 assignment_id=new_assignment.id
             )
+            # tracking_nr проставит триггер БД при COMMIT
             db.add(payment)
-            await db.flush()
-            payment.tracking_nr = format_payment_tracking_nr(payment.id)
-    
-    await db.commit()
-    await db.refresh(new_assignment)
-    if payment:
-        await db.refresh(payment)
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([target_worker_id] + await get_admin_ids()))
     
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import EntityRef, stage_event
+    stage_event(db, {
         "type": "assignment_started",
         "assignment_id": new_assignment.id,
         "user_id": target_worker_id
-    }, user_ids=target_users)
+    }, user_ids=[target_worker_id], entity=EntityRef("assignment", new_assignment.id))
+    
+    await db.commit()
 
     # Формируем ответ
     response = ManualAssignmentResponse(
@@ -754,6 +789,315 @@ async def create_time_off(
     )
 
 
+# ==================== Импорт смен ====================
+
+ASSIGNMENT_TYPES = ["work", "sick_leave", "vacation", "day_off", "unpaid_leave"]
+MAX_IMPORT_SHIFTS = 1000
+MAX_IMPORT_ERRORS = 20  # Сколько ошибок валидации показывать в ответе
+# Строка CSV - одно задание; shift группирует задания в смену
+IMPORT_CSV_COLUMNS = ("shift", "assignment_type", "shift_description", "start_time", "end_time", "task_type", "description")
+
+
+class ImportShift(BaseModel):
+    """Смена для импорта (как ManualAssignmentCreate без worker_id)"""
+    assignment_type: str = "work"
+    description: Optional[str] = None
+    tasks: List[ManualTaskCreate] = []
+
+
+class AssignmentImportRequest(BaseModel):
+    """Импорт смен одного работника"""
+    worker_id: int
+    shifts: List[ImportShift]
+
+
+class AssignmentImportResponse(BaseModel):
+    """Результат импорта смен"""
+    imported_count: int
+    payments_count: int
+    total_hours: float
+    total_amount: float
+    currency: str
+    assignments: List[ManualAssignmentResponse]
+
+
+
+
+def parse_import_csv(text: str, worker_id: int) -> AssignmentImportRequest:
+    """CSV с колонками IMPORT_CSV_COLUMNS -> запрос импорта (порядок смен - по первому появлению)"""
+    from pydantic import ValidationError
+    
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"shift", "start_time", "end_time"} - set(reader.fieldnames or ())
+    if missing:
+        raise HTTPException(status_code=400, detail=f"В CSV нет колонок: {', '.join(sorted(missing))}")
+    
+    shifts = {}
+    errors = []
+    for line, row in enumerate(reader, start=2):
+        cell = {name: (value or "").strip() for name, value in row.items() if name}
+        if not cell.get("shift"):
+            errors.append(f"Строка {line}: не указана смена")
+            continue
+        shift = shifts.setdefault(cell["shift"], {
+            "assignment_type": cell.get("assignment_type") or "work",
+            "description": cell.get("shift_description") or None,
+            "tasks": []
+        })
+        if not cell["start_time"] and not cell["end_time"]:
+            continue  # Смена без заданий (отсутствие)
+        try:
+            shift["tasks"].append(ManualTaskCreate(
+                start_time=cell["start_time"],
+                end_time=cell["end_time"],
+                task_type=cell.get("task_type") or "work",
+                description=cell.get("description") or None
+            ))
+        except ValidationError:
+            errors.append(f"Строка {line}: некорректное время задания")
+    if errors:
+        raise HTTPException(status_code=400, detail="Ошибки импорта: " + "; ".join(errors[:MAX_IMPORT_ERRORS]))
+    return AssignmentImportRequest(worker_id=worker_id, shifts=[ImportShift(**shift) for shift in shifts.values()])
+
+
+def _validate_import_shifts(shifts: List[ImportShift]) -> List[str]:
+    """Проверки смен и их заданий без обращения к БД"""
+    errors = []
+    for number, shift in enumerate(shifts, start=1):
+        if shift.assignment_type not in ASSIGNMENT_TYPES:
+            errors.append(f"Смена #{number}: недопустимый тип записи {shift.assignment_type}")
+        if shift.assignment_type == "work" and not shift.tasks:
+            errors.append(f"Смена #{number}: необходимо указать хотя бы одно задание")
+        for index, task in enumerate(shift.tasks, start=1):
+            if task.end_time <= task.start_time:
+                errors.append(f"Смена #{number}, задание #{index}: время окончания должно быть позже времени начала")
+            if task.task_type not in ["work", "pause"]:
+                errors.append(f"Смена #{number}, задание #{index}: тип должен быть 'work' или 'pause'")
+        tasks = [(task.start_time, task.end_time, index) for index, task in enumerate(shift.tasks, start=1)]
+        for first, second in sweep_overlaps(tasks):
+            errors.append(f"Смена #{number}: задания #{first} и #{second} пересекаются по времени")
+    return errors
+
+
+async def _existing_overlaps(db: AsyncSession, worker_id: int, shifts: List[ImportShift]) -> List[str]:
+    """Пересечения рабочих смен импорта друг с другом и с уже записанными (один запрос и один проход)"""
+    spans = [
+        (min(as_utc(t.start_time) for t in shift.tasks), max(as_utc(t.end_time) for t in shift.tasks), number)
+        for number, shift in enumerate(shifts, start=1)
+        if shift.assignment_type == "work" and shift.tasks
+    ]
+    if not spans:
+        return []
+    
+    existing = {}
+    for start, end, (assignment_id, tracking_nr) in await _assignment_spans(
+        db, worker_id, "work", min(s[0] for s in spans), max(s[1] for s in spans)
+    ):
+        existing[f"existing:{assignment_id}"] = (tracking_nr, start, end)
+        spans.append((start, end, f"existing:{assignment_id}"))
+    
+    errors = []
+    for first, second in sweep_overlaps(spans):
+        if first in existing and second in existing:
+            continue  # Старые пересечения импорт не касаются
+        if first in existing or second in existing:
+            number = second if first in existing else first
+            tracking_nr, start, end = existing[first if first in existing else second]
+            errors.append(
+                f"Смена #{number} пересекается с существующей {tracking_nr} "
+                f"({start.strftime('%d.%m %H:%M')}-{end.strftime('%H:%M')})"
+            )
+        else:
+            errors.append(f"Смены #{min(first, second)} и #{max(first, second)} пересекаются по времени")
+    return errors
+
+
+async def import_shifts(data: AssignmentImportRequest, db: AsyncSession, current_user: User) -> AssignmentImportResponse:
+    """Импорт завершённых смен работника пачкой: assignments, tasks и платежи за работу"""
+    from database.bulk import bulk_insert_ids
+    from database.change_log import log_bulk_inserts
+    from database.models import Role, PaymentCategoryGroup, PaymentGroupCode
+    from utils.event_outbox import stage_event
+    from utils.timeutil import strip_microseconds
+    from utils.tracking import format_assignment_tracking_nr, format_payment_tracking_nr
+    
+    target_worker_id = data.worker_id
+    if not current_user.is_admin and target_worker_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Вы можете импортировать смены только для себя")
+    if not data.shifts:
+        raise HTTPException(status_code=400, detail="Нет смен для импорта")
+    if len(data.shifts) > MAX_IMPORT_SHIFTS:
+        raise HTTPException(status_code=400, detail=f"За один импорт - не больше {MAX_IMPORT_SHIFTS} смен")
+    
+    errors = _validate_import_shifts(data.shifts)
+    if errors:
+        raise HTTPException(status_code=400, detail="Ошибки импорта: " + "; ".join(errors[:MAX_IMPORT_ERRORS]))
+    
+    result = await db.execute(
+        select(EmploymentRelation).where(
+            and_(
+                EmploymentRelation.user_id == target_worker_id,
+                EmploymentRelation.is_active == True
+            )
+        )
+    )
+    employment = result.scalars().first()
+    if not employment:
+        raise HTTPException(status_code=404, detail="Трудовые отношения не найдены")
+    hourly_rate = employment.hourly_rate
+    currency = employment.currency
+    
+    errors = await _existing_overlaps(db, target_worker_id, data.shifts)
+    if errors:
+        raise HTTPException(status_code=400, detail="Ошибки импорта: " + "; ".join(errors[:MAX_IMPORT_ERRORS]))
+    
+    # Assignments одной вставкой; tracking_nr проставляет триггер БД
+    assignment_ids = await bulk_insert_ids(db, Assignment, [
+        {"user_id": target_worker_id, "assignment_type": shift.assignment_type, "description": shift.description}
+        for shift in data.shifts
+    ])
+    
+    task_rows = []
+    totals = []  # (часы, сумма) по сменам
+    for assignment_id, shift in zip(assignment_ids, data.shifts):
+        work_seconds = 0
+        for task in shift.tasks:
+            task_rows.append({
+                "assignment_id": assignment_id,
+                "start_time": strip_microseconds(task.start_time),
+                "end_time": strip_microseconds(task.end_time),
+                "task_type": task.task_type,
+                "description": task.description
+            })
+            if task.task_type == "work":
+                work_seconds += int((task.end_time - task.start_time).total_seconds())
+        hours = work_seconds / 3600
+        totals.append((hours, Decimal(str(hours)) * hourly_rate))
+    task_ids = await bulk_insert_ids(db, Task, task_rows)
+    
+    # Платежи за смены с суммой > 0 (работодатель и категория - один раз на импорт)
+    payment_rows = []
+    if any(amount > 0 for _, amount in totals):
+        employer_result = await db.execute(
+            select(User).join(User.roles).where(Role.name == "employer")
+        )
+        employer = employer_result.scalars().first()
+        payer_id = employer.id if employer else target_worker_id
+        
+        salary_cat_result = await db.execute(
+            select(PaymentCategory).join(PaymentCategoryGroup).where(
+                PaymentCategoryGroup.code == PaymentGroupCode.SALARY.value
+            )
+        )
+        salary_category = salary_cat_result.scalars().first()
+        if not salary_category:
+            raise HTTPException(status_code=500, detail="Категория зарплаты не найдена")
+        
+        for assignment_id, shift, (_, amount) in zip(assignment_ids, data.shifts, totals):
+            if amount <= 0:
+                continue
+            comments = []
+            if shift.description:
+                comments.append(shift.description)
+            for task in shift.tasks:
+                if task.description and task.description not in comments:
+                    comments.append(task.description)
+            description = f"Смена {format_assignment_tracking_nr(assignment_id)}"
+            if comments:
+                description += f": {', '.join(comments)}"
+            if len(description) > 500:
+                description = description[:497] + "..."
+            payment_rows.append({
+                "payer_id": payer_id,
+                "recipient_id": target_worker_id,
+                "category_id": salary_category.id,
+                "amount": amount,
+                "currency": currency,
+                "description": description,
+                "payment_date": strip_microseconds(shift.tasks[0].start_time),
+                "payment_status": "unpaid",
+                "assignment_id": assignment_id
+            })
+    payment_ids = {}
+    if payment_rows:
+        ids = await bulk_insert_ids(db, Payment, payment_rows)
+        payment_ids = {row["assignment_id"]: payment_id for row, payment_id in zip(payment_rows, ids)}
+    
+    # Вставки в обход сессии: журнал пишем сами (sync-клиенты, снимки балансов)
+    await log_bulk_inserts(db, (
+        [("assignment", assignment_id, target_worker_id, None) for assignment_id in assignment_ids]
+        + [("task", task_id, target_worker_id, None) for task_id in task_ids]
+        + [("payment", payment_id, payment_rows[0]["payer_id"], target_worker_id) for payment_id in payment_ids.values()]
+    ))
+    
+    # Одно сводное событие вместо событий по каждой смене
+    stage_event(db, {
+        "type": "assignments_imported",
+        "user_id": target_worker_id,
+        "count": len(assignment_ids),
+        "payments_count": len(payment_ids)
+    }, user_ids=[target_worker_id])
+    
+    await db.commit()
+    
+    assignments = []
+    for assignment_id, shift, (hours, amount) in zip(assignment_ids, data.shifts, totals):
+        payment_id = payment_ids.get(assignment_id)
+        assignments.append(ManualAssignmentResponse(
+            assignment_id=assignment_id,
+            tracking_nr=format_assignment_tracking_nr(assignment_id),
+            assignment_type=shift.assignment_type,
+            payment_id=payment_id,
+            payment_tracking_nr=format_payment_tracking_nr(payment_id) if payment_id else None,
+            total_hours=hours,
+            total_amount=float(amount),
+            currency=currency
+        ))
+    return AssignmentImportResponse(
+        imported_count=len(assignments),
+        payments_count=len(payment_ids),
+        total_hours=round(sum(hours for hours, _ in totals), 2),
+        total_amount=float(sum(amount for _, amount in totals)),
+        currency=currency,
+        assignments=assignments
+    )
+
+
+@router.post(
+    "/import",
+    response_model=AssignmentImportResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "object"}},
+        "text/csv": {"schema": {"type": "string"}},
+    }}}
+)
+async def import_assignments(
+    request: Request,
+    worker_id: Optional[int] = Query(None, description="Работник для CSV (в JSON - поле worker_id)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Импорт завершённых смен: JSON (AssignmentImportRequest) или CSV (колонки IMPORT_CSV_COLUMNS)"""
+    from fastapi.exceptions import RequestValidationError
+    from pydantic import ValidationError
+    
+    body = await request.body()
+    if request.headers.get("content-type", "").split(";")[0].strip() in ("text/csv", "application/csv"):
+        if worker_id is None:
+            raise HTTPException(status_code=400, detail="Для CSV укажите worker_id")
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV должен быть в кодировке UTF-8")
+        data = parse_import_csv(text, worker_id)
+    else:
+        try:
+            data = AssignmentImportRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+    return await import_shifts(data, db, current_user)
+
+
 @router.post("/{session_id}/stop", response_model=WorkSessionResponse)
 async def stop_work_session(
     session_id: int,
@@ -776,95 +1120,14 @@ async def stop_work_session(
         raise HTTPException(status_code=400, detail="Сессия уже завершена")
     
     assignment = task.assignment
-    from utils.timeutil import now_server
-    now = now_server()
-    task.end_time = now  # Full datetime now
-    
-    # is_active is now a computed property, no need to set it
-    
-    # Get employment relation for rate/currency
-    emp_result = await db.execute(
-        select(EmploymentRelation).where(
-            and_(
-                EmploymentRelation.user_id == assignment.user_id,
-                EmploymentRelation.is_active == True
-            )
-        )
-    )
-    employment = emp_result.scalar_one_or_none()
+    from utils.work_sessions import stop_session
+    try:
+        employment, employer, _ = await stop_session(db, task)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     hourly_rate = employment.hourly_rate if employment else Decimal(0)
     currency = employment.currency if employment else "UAH"
     
-    # Рассчитываем общую сумму по всем work-tasks
-    result = await db.execute(
-        select(Task).where(Task.assignment_id == assignment.id)
-    )
-    all_tasks = result.scalars().all()
-    
-    total_amount = Decimal(0)
-    for t in all_tasks:
-        if t.task_type == "work" and t.end_time:
-            # Calculate amount manually: hours * hourly_rate
-            task_hours = Decimal(str(t.duration_hours))
-            total_amount += task_hours * hourly_rate
-    
-    # Создаём платёж только если сумма > 0
-    employer = None
-    if total_amount > 0:
-        # Собираем комментарии из смены и всех заданий
-        comments = []
-        if assignment.description:
-            comments.append(assignment.description)
-        
-        for t in all_tasks:
-            if t.description and t.description not in comments:
-                comments.append(t.description)
-        
-        joined_comments = ", ".join(comments)
-        full_description = f"Смена {assignment.tracking_nr}"
-        if joined_comments:
-            full_description += f": {joined_comments}"
-            
-        # Ограничиваем длину до 500 символов
-        if len(full_description) > 500:
-            full_description = full_description[:497] + "..."
-
-        # Generate tracking number for payment
-        from utils.tracking import format_payment_tracking_nr
-        from database.models import Role, PaymentCategoryGroup, PaymentGroupCode
-        
-        # Get employer (user with employer role)
-        employer_result = await db.execute(
-            select(User).join(User.roles).where(Role.name == "employer")
-        )
-        employer = employer_result.scalar_one_or_none()
-        payer_id = employer.id if employer else assignment.user_id  # fallback
-        
-        # Find salary category by group code (more reliable than name)
-        salary_cat_result = await db.execute(
-            select(PaymentCategory).join(PaymentCategoryGroup).where(
-                PaymentCategoryGroup.code == PaymentGroupCode.SALARY.value
-            )
-        )
-        salary_category = salary_cat_result.scalar_one_or_none()
-        if not salary_category:
-            raise HTTPException(status_code=500, detail="Категория зарплаты не найдена")
-
-        payment = Payment(
-            payer_id=payer_id,
-            recipient_id=assignment.user_id,  # Работник — получатель
-            category_id=salary_category.id,
-            amount=total_amount,
-            currency=currency,
-            description=full_description,
-            payment_date=now,
-            payment_status='unpaid',
-            assignment_id=assignment.id
-        )
-        db.add(payment)
-        await db.flush()  # Получаем ID
-        payment.tracking_nr = format_payment_tracking_nr(payment.id)
-    await db.commit()
     await db.refresh(task)
     
     return_response = _task_to_response(
@@ -875,25 +1138,6 @@ async def stop_work_session(
         currency=currency
     )
     
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    
-    # Notify about the new payment if it was created
-    if total_amount > 0:
-        await manager.broadcast({
-            "type": "payment_created",
-            "payment_id": payment.id,
-            "payer_id": payment.payer_id,
-            "recipient_id": payment.recipient_id
-        }, user_ids=target_users)
-
-    await manager.broadcast({
-        "type": "assignment_stopped",
-        "assignment_id": assignment.id,
-        "user_id": assignment.user_id
-    }, user_ids=target_users)
-    
     return return_response
 
 
@@ -951,19 +1195,19 @@ async def switch_task(
         description=request.description
     )
     db.add(new_task)
-    await db.commit()
-    await db.refresh(new_task)
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
+    await db.flush()  # Получаем ID
     
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "task_created",
         "assignment_id": assignment_id,
         "task_id": new_task.id,
         "user_id": assignment.user_id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id])
+    
+    await db.commit()
+    await db.refresh(new_task)
     
     return _task_to_response(
         new_task, assignment,
@@ -999,57 +1243,29 @@ async def update_work_session(
         if assignment.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Нет прав на редактирование этой сессии")
     
-    # Готовим новые значения
-    new_start = update_data.start_time if update_data.start_time is not None else task.start_time
-    new_end = update_data.end_time if update_data.end_time is not None else task.end_time
-    
-    # Хелпер для сравнения времени в минутах (игнорируем секунды)
-    def to_minutes(t: time) -> int:
-        return t.hour * 60 + t.minute
+    # Готовим новые значения: время из запроса - на дату самого задания
+    from utils.timeutil import strip_microseconds
+    new_start = task.start_time
+    if update_data.start_time is not None:
+        new_start = strip_microseconds(as_utc(datetime.combine(task.start_time.date(), update_data.start_time)))
+    new_end = task.end_time
+    if update_data.end_time is not None:
+        # Активное задание завершается в день начала
+        base_date = task.end_time.date() if task.end_time else task.start_time.date()
+        new_end = strip_microseconds(as_utc(datetime.combine(base_date, update_data.end_time)))
     
     # Валидация: конец должен быть после начала
-    if new_end is not None and to_minutes(new_end) <= to_minutes(new_start):
+    if new_end is not None and new_end <= new_start:
         raise HTTPException(status_code=400, detail="Время окончания должно быть позже времени начала")
     
-    # Валидация: проверяем пересечение с другими tasks в assignment
-    result = await db.execute(
-        select(Task).where(
-            Task.assignment_id == assignment.id,
-            Task.id != session_id
-        )
-    )
-    other_tasks = result.scalars().all()
-    
-    new_start_min = to_minutes(new_start)
-    new_end_min = to_minutes(new_end) if new_end else 24 * 60  # До конца дня
-    
-    for other in other_tasks:
-        other_start_min = to_minutes(other.start_time)
-        other_end_min = to_minutes(other.end_time) if other.end_time else 24 * 60
-        
-        # Строгое пересечение: (start1 < end2) AND (end1 > start2)
-        # Смежные интервалы НЕ считаются пересекающимися
-        if new_start_min < other_end_min and new_end_min > other_start_min:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Время пересекается с другим сегментом ({other.start_time.strftime('%H:%M')}-{other.end_time.strftime('%H:%M') if other.end_time else '...'})"
-            )
+    # Валидация: пересечение с другими tasks в assignment (смежные не пересекаются)
+    await _check_task_overlap(db, assignment.id, session_id, new_start, new_end)
     
     # Обновляем поля Task
-    from utils.timeutil import strip_microseconds
-    from datetime import datetime as dt
     if update_data.start_time is not None:
-        # update_data.start_time is time, task.start_time is datetime
-        new_start_dt = dt.combine(task.start_time.date(), update_data.start_time)
-        task.start_time = strip_microseconds(new_start_dt)
+        task.start_time = new_start
     if update_data.end_time is not None:
-        # update_data.end_time is time
-        # If task.end_time is None (active), what date to use? Assuming same as start date or today?
-        # But end_time cannot be set if it was None via this endpoint usually, or if it was, it uses assignment_date?
-        # For safety, use task.end_time.date() if exists, else task.start_time.date()
-        base_date = task.end_time.date() if task.end_time else task.start_time.date()
-        new_end_dt = dt.combine(base_date, update_data.end_time)
-        task.end_time = strip_microseconds(new_end_dt)
+        task.end_time = new_end
     if update_data.description is not None:
         task.description = update_data.description
     
@@ -1057,18 +1273,16 @@ async def update_work_session(
     if update_data.assignment_date is not None:
         assignment.assignment_date = update_data.assignment_date
     
-    await db.commit()
-    await db.refresh(task)
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "payment_updated", # Re-using this to trigger refresh as it affects balances/times
         "assignment_id": assignment.id,
         "task_id": task.id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id])
+    
+    await db.commit()
+    await db.refresh(task)
     
     return _task_to_response(
         task, assignment,
@@ -1129,17 +1343,15 @@ async def delete_work_session(
         # Удаляем только task
         await db.delete(task)
     
-    await db.commit()
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "task_deleted",
         "assignment_id": assignment.id,
         "task_id": session_id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id])
+    
+    await db.commit()
     
     return {"message": "Сессия удалена"}
 
@@ -1172,15 +1384,14 @@ async def update_assignment(
         # Allow empty string to clear description
         assignment.description = update_data.description if update_data.description else None
     
-    await db.commit()
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import EntityRef, stage_event
+    stage_event(db, {
         "type": "assignment_updated",
         "assignment_id": assignment_id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id], entity=EntityRef("assignment", assignment_id))
+    
+    await db.commit()
     
     return {"message": "Assignment обновлён", "id": assignment_id}
 
@@ -1230,15 +1441,14 @@ async def delete_assignment(
     # Удаляем assignment
     await db.delete(assignment)
     
-    await db.commit()
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "assignment_deleted",
         "assignment_id": assignment_id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id])
+    
+    await db.commit()
     
     return {"message": "Assignment удалён", "id": assignment_id}
 
@@ -1299,16 +1509,14 @@ async def bulk_delete_assignments(
             failed_ids.append(assignment_id)
             errors.append(f"ID {assignment_id}: {str(e)}")
     
-    await db.commit()
-    
-    # WebSocket broadcast
     if deleted_count > 0:
-        from api.routers.websocket import manager, get_admin_ids
-        target_users = list(set(list(deleted_user_ids) + await get_admin_ids()))
-        await manager.broadcast({
+        from utils.event_outbox import stage_event
+        stage_event(db, {
             "type": "assignments_bulk_deleted",
             "count": deleted_count
-        }, user_ids=target_users)
+        }, user_ids=deleted_user_ids)
+    
+    await db.commit()
     
     return BulkDeleteResponse(
         deleted_count=deleted_count,
@@ -1343,39 +1551,15 @@ async def update_task(
             raise HTTPException(status_code=403, detail="Нет прав на редактирование")
     
     # Готовим новые значения
-    new_start = update_data.start_time if update_data.start_time is not None else task.start_time
-    new_end = update_data.end_time if update_data.end_time is not None else task.end_time
-    
-    # Хелпер для сравнения времени в минутах (игнорируем секунды)
-    def to_minutes(t: time) -> int:
-        return t.hour * 60 + t.minute
+    new_start = as_utc(update_data.start_time) if update_data.start_time is not None else task.start_time
+    new_end = as_utc(update_data.end_time) if update_data.end_time is not None else task.end_time
     
     # Валидация: конец должен быть после начала
-    if new_end is not None and to_minutes(new_end) <= to_minutes(new_start):
+    if new_end is not None and new_end <= new_start:
         raise HTTPException(status_code=400, detail="Время окончания должно быть позже времени начала")
     
-    # Валидация: проверяем пересечение с другими tasks в assignment
-    result = await db.execute(
-        select(Task).where(
-            Task.assignment_id == assignment.id,
-            Task.id != task_id
-        )
-    )
-    other_tasks = result.scalars().all()
-    
-    new_start_min = to_minutes(new_start)
-    new_end_min = to_minutes(new_end) if new_end else 24 * 60
-    
-    for other in other_tasks:
-        other_start_min = to_minutes(other.start_time)
-        other_end_min = to_minutes(other.end_time) if other.end_time else 24 * 60
-        
-        # Строгое пересечение: смежные интервалы НЕ считаются пересекающимися
-        if new_start_min < other_end_min and new_end_min > other_start_min:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Время пересекается с другим сегментом ({other.start_time.strftime('%H:%M')}-{other.end_time.strftime('%H:%M') if other.end_time else '...'})"
-            )
+    # Валидация: пересечение с другими tasks в assignment (смежные не пересекаются)
+    await _check_task_overlap(db, assignment.id, task_id, new_start, new_end)
     
     # Обновляем поля
     from utils.timeutil import strip_microseconds
@@ -1390,16 +1574,15 @@ async def update_task(
     if update_data.description is not None:
         task.description = update_data.description
     
-    await db.commit()
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([assignment.user_id] + await get_admin_ids()))
-    await manager.broadcast({
+    # WebSocket: работнику и админам после COMMIT
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "task_updated",
         "assignment_id": assignment.id,
         "task_id": task_id
-    }, user_ids=target_users)
+    }, user_ids=[assignment.user_id])
+    
+    await db.commit()
     
     return {"message": "Task обновлён", "id": task_id}
 
@@ -1548,87 +1731,10 @@ async def get_grouped_sessions(
     emp_by_worker = {e.user_id: e for e in emp_result.scalars().all()}
     
     for assignment in paginated:
-        tasks = sorted(assignment.tasks, key=lambda t: (t.start_time, t.id))
-        
-        # Time-off assignments may have no tasks
-        is_time_off = assignment.assignment_type != "work"
-        
-        # For work assignments, skip if no tasks
-        if not tasks and not is_time_off:
+        # Time-off assignments may have no tasks; work assignments without tasks are skipped
+        if not assignment.tasks and assignment.assignment_type == "work":
             continue
-        
-        # Get employment relation for hourly rate
-        employment = emp_by_worker.get(assignment.user_id)
-        hourly_rate = float(employment.hourly_rate) if employment else 0.0
-        currency = employment.currency if employment else "UAH"
-        
-        # Calculate totals
-        total_work_seconds = 0
-        total_pause_seconds = 0
-        total_amount = 0.0
-        is_active = assignment.is_active
-        
-        for task in tasks:
-            if task.end_time:
-                seg_seconds = task.duration_seconds
-            elif task.end_time is None:
-                # Active task - Task.start_time is now full datetime
-                seg_seconds = int((now - task.start_time).total_seconds())
-            else:
-                seg_seconds = 0
-            
-            if task.task_type == "work" or task.task_type == "absent":
-                total_work_seconds += seg_seconds
-                if task.task_type == "work" and task.end_time:
-                    # Calculate amount manually: hours * hourly_rate
-                    task_hours = task.duration_hours
-                    total_amount += task_hours * hourly_rate
-            else:
-                total_pause_seconds += seg_seconds
-        
-        # Override calculated amount with real payment amount if exists
-        if assignment.payment:
-            total_amount = float(assignment.payment.amount)
-        
-        first_task = tasks[0] if tasks else None
-        last_task = tasks[-1] if tasks else None
-        
-        # Segments in descending order (newest first), stable sort by (start_time, id)
-        segment_responses = [
-            _task_to_response(
-                task, assignment,
-                worker_name=assignment.worker.full_name if assignment.worker else None,
-                employer_name=None,
-                hourly_rate=hourly_rate,
-                currency=currency
-            )
-            for task in sorted(tasks, key=lambda t: (t.start_time, t.id), reverse=True)
-        ]
-        
-        responses.append(AssignmentResponse(
-            assignment_id=assignment.id,
-            tracking_nr=assignment.tracking_nr,
-            assignment_type=assignment.assignment_type,
-            assignment_date=assignment.assignment_date,
-            worker_id=assignment.user_id,
-            worker_name=assignment.worker.full_name if assignment.worker else None,
-            employer_id=assignment.user_id,
-            employer_name=None,
-            start_time=first_task.start_time if first_task else None,
-            end_time=last_task.end_time if last_task and not is_active else None,
-            total_work_seconds=total_work_seconds,
-            total_pause_seconds=total_pause_seconds,
-            total_hours=round(total_work_seconds / 3600, 2),
-            total_amount=round(total_amount, 2),
-            hourly_rate=hourly_rate,
-            currency=currency,
-            description=assignment.description,
-            is_active=is_active,
-            payment_id=assignment.payment.id if assignment.payment else None,
-            payment_tracking_nr=assignment.payment.tracking_nr if assignment.payment else None,
-            payment_status=assignment.payment.payment_status if assignment.payment else None,
-            segments=segment_responses
-        ))
+        responses.append(_assignment_to_response(assignment, emp_by_worker.get(assignment.user_id), now))
     
     return responses
 
@@ -1827,7 +1933,6 @@ async def pause_work_session(
     current_user: User = Depends(get_current_user)
 ):
     """Pause active work session - ends current 'work' task and starts 'pause' task"""
-    from utils.timeutil import now_server
     
     # session_id is Task ID
     result = await db.execute(
@@ -1838,30 +1943,13 @@ async def pause_work_session(
     if not task:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    if task.end_time is not None:
-        raise HTTPException(status_code=400, detail="Session is not active")
-    
-    if task.task_type == "pause":
-        raise HTTPException(status_code=400, detail="Session is already paused")
-    
-    now = now_server()
-    assignment = task.assignment
-    
-    # End current work task
-    task.end_time = now  # Full datetime
-    if description:
-        task.description = description
-    
-    # Start new pause task
-    pause_task = Task(
-        assignment_id=assignment.id,
-        start_time=now,  # Full datetime
-        task_type="pause"
-    )
-    db.add(pause_task)
-    
-    await db.commit()
+    from utils.work_sessions import WorkSessionConflict, pause_session
+    try:
+        pause_task = await pause_session(db, task, description)
+    except WorkSessionConflict as e:
+        raise HTTPException(status_code=400, detail=str(e))
     await db.refresh(pause_task)
+    assignment = task.assignment
     
     # Get names
     result = await db.execute(
@@ -1886,7 +1974,6 @@ async def resume_work_session(
     current_user: User = Depends(get_current_user)
 ):
     """Resume paused session - ends 'pause' task and starts new 'work' task"""
-    from utils.timeutil import now_server
     
     # session_id is Task ID
     result = await db.execute(
@@ -1897,30 +1984,13 @@ async def resume_work_session(
     if not task:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    if task.end_time is not None:
-        raise HTTPException(status_code=400, detail="Session is not active")
-    
-    if task.task_type != "pause":
-        raise HTTPException(status_code=400, detail="Session is not paused - cannot resume")
-    
-    now = now_server()
-    assignment = task.assignment
-    
-    # End pause task
-    task.end_time = now  # Full datetime
-    if description:
-        task.description = description
-    
-    # Start new work task
-    work_task = Task(
-        assignment_id=assignment.id,
-        start_time=now,  # Full datetime
-        task_type="work"
-    )
-    db.add(work_task)
-    
-    await db.commit()
+    from utils.work_sessions import WorkSessionConflict, resume_session
+    try:
+        work_task = await resume_session(db, task, description)
+    except WorkSessionConflict as e:
+        raise HTTPException(status_code=400, detail=str(e))
     await db.refresh(work_task)
+    assignment = task.assignment
     
     # Get names
     result = await db.execute(
@@ -44,7 +44,13 @@ async def register(
     )
     
     db.add(request)
+    await db.flush()
+    
+    # WebSocket: админам после COMMIT; счётчик ожидающих заявок
+    from utils.registration_requests import pending_requests, stage_registration_event
+    stage_registration_event(db, "created", request)
     await db.commit()
+    pending_requests.adjust(+1)
     await db.refresh(request)
     
     return request
@@ -5,8 +5,8 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from datetime import date, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional, Tuple
 from decimal import Decimal
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -270,14 +270,13 @@ async def calculate_cards_new(
     )
 
 
-@router.get("/summary", response_model=DashboardSummary)
-async def get_balance_summary(
-    employer_id: Optional[int] = Query(None, description="ID работодателя (А)"),
-    worker_id: Optional[int] = Query(None, description="ID работника (Е)"),
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Получить сводку для Dashboard карточек"""
+async def balance_summary_sql(
+    employer_id: Optional[int],
+    worker_id: Optional[int],
+    db: AsyncSession,
+    current_user: User
+) -> DashboardSummary:
+    """Сводка для Dashboard карточек: эталонный расчёт запросом на каждую корзину"""
     import logging
     logger = logging.getLogger(__name__)
     
@@ -553,16 +552,52 @@ async def get_balance_summary(
     )
 
 
-@router.get("/monthly", response_model=List[MonthlySummary])
-async def get_monthly_summary(
-    employer_id: Optional[int] = Query(None),
-    worker_id: Optional[int] = Query(None),
-    months: int = Query(12, ge=1, le=24, description="Количество месяцев"),
+@router.get("/summary", response_model=DashboardSummary)
+async def get_balance_summary(
+    employer_id: Optional[int] = Query(None, description="ID работодателя (А)"),
+    worker_id: Optional[int] = Query(None, description="ID работника (Е)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Получить помесячную сводку (как в Übersicht из Excel)"""
+    """Получить сводку для Dashboard карточек"""
+    from utils.archive import history_session
+    from utils.balance_diff import shadow_compare
+    from utils.balance_engines import get_active_engine
+
+    # Балансы нарастающим итогом - вместе с архивом закрытых периодов
+    async with history_session(db) as source:
+        summary = await get_active_engine().summary(source, current_user, employer_id=employer_id,
+                                                    worker_id=worker_id)
+        await shadow_compare("summary", summary, db=source, current_user=current_user,
+                             employer_id=employer_id, worker_id=worker_id)
+    return summary
+
+
+def month_periods(months: int) -> List[Tuple[int, int]]:
+    """(год, месяц) помесячной сводки: от текущего месяца назад с шагом 30 дней"""
     from utils.timeutil import now_server
+    
+    now = now_server()
+    periods = []
+    for i in range(months):
+        month_date = now.date().replace(day=1) - timedelta(days=i * 30)
+        month_date = month_date.replace(day=1)
+        periods.append((month_date.year, month_date.month))
+    return periods
+
+
+async def monthly_summary_sql(
+    employer_id: Optional[int],
+    worker_id: Optional[int],
+    months: int,
+    db: AsyncSession,
+    current_user: User,
+    periods: Optional[List[Tuple[int, int]]] = None
+) -> List[MonthlySummary]:
+    """Помесячная сводка: эталонный расчёт запросами по каждому месяцу.
+
+    periods - явный список (год, месяц) вместо последних months месяцев.
+    """
     import logging
     logger = logging.getLogger(__name__)
     
@@ -580,16 +615,9 @@ async def get_monthly_summary(
         is_worker_view = True
 
     
-    now = now_server()
     summaries = []
     
-    for i in range(months):
-        # Вычисляем начало и конец месяца
-        month_date = now.date().replace(day=1) - timedelta(days=i * 30)
-        month_date = month_date.replace(day=1)
-        year = month_date.year
-        month = month_date.month
-        
+    for year, month in (month_periods(months) if periods is None else periods):
         # Начало и конец месяца
         start_date = date(year, month, 1)
         if month == 12:
@@ -1011,12 +1039,34 @@ async def get_monthly_summary(
     return summaries
 
 
-@router.get("/mutual", response_model=List[MutualBalance])
-async def get_mutual_balances(
+@router.get("/monthly", response_model=List[MonthlySummary])
+async def get_monthly_summary(
+    employer_id: Optional[int] = Query(None),
+    worker_id: Optional[int] = Query(None),
+    months: int = Query(12, ge=1, le=24, description="Количество месяцев"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Получить взаимные балансы долгов между парами пользователей.
+    """Получить помесячную сводку (как в Übersicht из Excel)"""
+    from utils.archive import history_session
+    from utils.balance_diff import shadow_compare
+    from utils.balance_engines import get_active_engine
+    from utils.period_close import monthly_with_snapshots
+
+    # Закрытые месяцы - из замороженных снимков, открытые - движком
+    summaries = await monthly_with_snapshots(get_active_engine(), db, current_user, employer_id, worker_id, months)
+    # Теневой движок пересчитывает все месяцы, включая перенесённые в архив
+    async with history_session(db) as source:
+        await shadow_compare("monthly", summaries, db=source, current_user=current_user,
+                             employer_id=employer_id, worker_id=worker_id, months=months)
+    return summaries
+
+
+async def mutual_balances_sql(
+    db: AsyncSession,
+    current_user: User
+) -> List[MutualBalance]:
+    """Взаимные балансы долгов между парами пользователей (эталонный расчёт).
     
     Показывает ОТДЕЛЬНЫЕ строки для:
     1. Долговых отношений (кредиты/авансы из категории 'debt')
@@ -1208,57 +1258,146 @@ async def get_mutual_balances(
     return balances
 
 
-@router.get("/debug", response_model=DebugExport)
-async def get_debug_export(
-    employer_id: Optional[int] = Query(None),
-    worker_id: Optional[int] = Query(None),
-    months: int = Query(6, ge=1, le=24),
+@router.get("/mutual", response_model=List[MutualBalance])
+async def get_mutual_balances(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """
-    Полный экспорт всех данных Dashboard для отладки.
-    Админы видят всё, работники - только свои данные.
-    """
-    from datetime import datetime
-    
-    # Workers can only export their own data
+    """Получить взаимные балансы долгов между парами пользователей"""
+    from utils.archive import history_session
+    from utils.balance_diff import shadow_compare
+    from utils.balance_engines import get_active_engine
+
+    async with history_session(db) as source:
+        balances = await get_active_engine().mutual(source, current_user)
+        await shadow_compare("mutual", balances, db=source, current_user=current_user)
+    return balances
+
+
+# ---------- Закрытие периодов ----------
+
+class ClosedPeriodResponse(BaseModel):
+    """Закрытый месяц"""
+    period: str
+    closed_by: Optional[int]
+    closed_at: datetime
+
+
+class PeriodPairBalanceResponse(BaseModel):
+    """Долг по паре на конец закрытого месяца"""
+    creditor_id: int
+    debtor_id: int
+    currency: str
+    paid: float
+    salary: float
+    debt: float
+
+
+@router.get("/periods", response_model=List[ClosedPeriodResponse])
+async def get_closed_periods(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Список закрытых месяцев"""
+    from database.models import ClosedPeriod
+
+    result = await db.execute(select(ClosedPeriod).order_by(ClosedPeriod.period.desc()))
+    return [ClosedPeriodResponse(period=p.period, closed_by=p.closed_by, closed_at=p.closed_at)
+            for p in result.scalars().all()]
+
+
+@router.post("/periods/{period}/close", response_model=ClosedPeriodResponse)
+async def close_period_endpoint(
+    period: str,
+    force: bool = Query(False, description="Закрыть, даже если в месяце есть неоплаченные платежи"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Закрыть месяц: заморозить помесячную сводку и долги по парам, запретить правки"""
+    from fastapi import HTTPException
+    from utils.period_close import PeriodConflict, close_period
+
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Только администратор может закрывать периоды")
+    try:
+        closed = await close_period(db, period, closed_by=current_user.id, force=force)
+    except PeriodConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ClosedPeriodResponse(period=closed.period, closed_by=closed.closed_by, closed_at=closed.closed_at)
+
+
+@router.delete("/periods/{period}")
+async def reopen_period_endpoint(
+    period: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Открыть закрытый месяц (снимки удаляются)"""
+    from fastapi import HTTPException
+    from utils.period_close import PeriodConflict, reopen_period
+
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Только администратор может открывать периоды")
+    try:
+        await reopen_period(db, period)
+    except PeriodConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Период {period} открыт"}
+
+
+@router.post("/periods/archive")
+async def archive_periods_endpoint(
+    through: str = Query(..., description="Последний переносимый месяц YYYY-MM (переносятся только закрытые)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Перенести задачи, смены и платежи закрытых месяцев в archive.db"""
+    from fastapi import HTTPException
+    from utils.archive import archive_periods
+    from utils.period_close import PeriodConflict
+
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Только администратор может архивировать периоды")
+    try:
+        moved = await archive_periods(db.bind, through)
+    except PeriodConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"through": through, "moved": moved}
+
+
+@router.get("/periods/{period}/pairs", response_model=List[PeriodPairBalanceResponse])
+async def get_period_pair_balances(
+    period: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Долги по парам на конец закрытого месяца (работнику - только свои пары)"""
+    from sqlalchemy import or_
+    from database.models import PeriodPairBalance
+
+    query = select(PeriodPairBalance).where(PeriodPairBalance.period == period)
     if not current_user.has_permission('view_all_reports'):
-        if not current_user.is_worker:
-            from fastapi import HTTPException
-            raise HTTPException(status_code=403, detail="Нет прав на экспорт данных")
-        # Force worker to see only their own data
-        worker_id = current_user.id
-    
-    # Получаем все данные
-    summary = await get_balance_summary(
-        employer_id=employer_id,
-        worker_id=worker_id,
-        db=db,
-        current_user=current_user
-    )
-    
-    monthly = await get_monthly_summary(
-        employer_id=employer_id,
-        worker_id=worker_id,
-        months=months,
-        db=db,
-        current_user=current_user
-    )
-    
-    # Фильтруем пустые периоды для экономии токенов
-    monthly = [
-        m for m in monthly 
-        if m.sessions > 0 or m.hours > 0 or m.salary > 0 or m.expenses > 0 or 
-           m.credit > 0 or m.bonus > 0 or m.salary_paid > 0 or m.debt > 0 or m.salary_unpaid > 0
-    ]
-    
-    mutual = await get_mutual_balances(
-        db=db,
-        current_user=current_user
-    )
-    
-    # Получаем все платежи с категориями и именами
+        query = query.where(or_(PeriodPairBalance.creditor_id == current_user.id,
+                                PeriodPairBalance.debtor_id == current_user.id))
+    result = await db.execute(query.order_by(PeriodPairBalance.creditor_id, PeriodPairBalance.debtor_id))
+    return [PeriodPairBalanceResponse(creditor_id=b.creditor_id, debtor_id=b.debtor_id, currency=b.currency,
+                                      paid=b.paid, salary=b.salary, debt=b.debt)
+            for b in result.scalars().all()]
+
+
+DEBUG_PAYMENT_COLUMNS = tuple(PaymentDebug.model_fields)
+
+
+def _debug_payments_query(worker_id: Optional[int]):
+    """Платежи для отладочного экспорта (работнику - только свои)"""
     from sqlalchemy.orm import aliased
     PayerUser = aliased(User)
     RecipientUser = aliased(User)
@@ -1294,30 +1433,127 @@ async def get_debug_export(
             or_(Payment.payer_id == worker_id, Payment.recipient_id == worker_id)
         )
     
-    payments_query = payments_query.order_by(Payment.payment_date.desc())
-    
-    result = await db.execute(payments_query)
-    payments_data = []
-    for row in result.all():
-        payments_data.append(PaymentDebug(
-            id=row.id,
-            tracking_nr=row.tracking_nr,
-            payer_id=row.payer_id,
-            payer_name=row.payer_name,
-            recipient_id=row.recipient_id,
-            recipient_name=row.recipient_name or "—",
-            amount=float(row.amount),
-            currency=row.currency,
-            payment_status=row.payment_status,
-            payment_date=row.payment_date.isoformat() if row.payment_date else "",
-            category_name=row.category_name,
-            category_group=row.category_group,
-            description=row.description
-        ))
+    return payments_query.order_by(Payment.payment_date.desc())
+
+
+def _payment_debug(row) -> PaymentDebug:
+    return PaymentDebug(
+        id=row["id"],
+        tracking_nr=row["tracking_nr"],
+        payer_id=row["payer_id"],
+        payer_name=row["payer_name"],
+        recipient_id=row["recipient_id"],
+        recipient_name=row["recipient_name"] or "—",
+        amount=float(row["amount"]),
+        currency=row["currency"],
+        payment_status=row["payment_status"],
+        payment_date=row["payment_date"].isoformat() if row["payment_date"] else "",
+        category_name=row["category_name"],
+        category_group=row["category_group"],
+        description=row["description"]
+    )
+
+
+async def _debug_sections(employer_id, worker_id, months, db, current_user):
+    """Карточки, взаимные расчёты и помесячный обзор для экспорта"""
+    summary = await get_balance_summary(
+        employer_id=employer_id,
+        worker_id=worker_id,
+        db=db,
+        current_user=current_user
+    )
+    
+    monthly = await get_monthly_summary(
+        employer_id=employer_id,
+        worker_id=worker_id,
+        months=months,
+        db=db,
+        current_user=current_user
+    )
+    
+    # Фильтруем пустые периоды для экономии токенов
+    monthly = [
+        m for m in monthly 
+        if m.sessions > 0 or m.hours > 0 or m.salary > 0 or m.expenses > 0 or 
+           m.credit > 0 or m.bonus > 0 or m.salary_paid > 0 or m.debt > 0 or m.salary_unpaid > 0
+    ]
+    
+    mutual = await get_mutual_balances(
+        db=db,
+        current_user=current_user
+    )
     
     # Получаем cards с новой логикой
     user_filter_id = None if current_user.has_permission('view_all_reports') else current_user.id
-    cards = await calculate_cards_new(db, user_filter_id=user_filter_id, worker_id=worker_id)
+    from utils.archive import history_session
+    from utils.balance_engines import get_active_engine
+    async with history_session(db) as source:
+        cards = await get_active_engine().cards(source, user_filter_id=user_filter_id, worker_id=worker_id)
+    return cards, mutual, monthly
+
+
+async def _debug_export_batches(employer_id, worker_id, months, db, current_user):
+    """NDJSON-строки экспорта: заголовок, секции, затем платежи порциями курсора"""
+    from datetime import datetime
+    from utils.export_stream import stream_rows
+
+    yield [{"section": "export", "export_timestamp": datetime.now().isoformat()}]
+    cards, mutual, monthly = await _debug_sections(employer_id, worker_id, months, db, current_user)
+    yield [{"section": "cards", **cards.model_dump()}]
+    yield [{"section": "mutual_balances", **item.model_dump()} for item in mutual]
+    yield [{"section": "monthly", **item.model_dump()} for item in monthly]
+    async for batch in stream_rows(db, _debug_payments_query(worker_id)):
+        yield [{"section": "payments", **_payment_debug(row).model_dump()} for row in batch]
+
+
+async def _debug_payment_batches(worker_id, db):
+    from utils.export_stream import stream_rows
+
+    async for batch in stream_rows(db, _debug_payments_query(worker_id)):
+        yield [_payment_debug(row).model_dump() for row in batch]
+
+
+@router.get("/debug", response_model=DebugExport)
+async def get_debug_export(
+    employer_id: Optional[int] = Query(None),
+    worker_id: Optional[int] = Query(None),
+    months: int = Query(6, ge=1, le=24),
+    format: Literal["json", "ndjson", "csv"] = Query(
+        "json", description="json - один документ; ndjson - секции и платежи построчно; csv - только платежи"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Полный экспорт всех данных Dashboard для отладки.
+    Админы видят всё, работники - только свои данные.
+    """
+    from datetime import datetime
+    from utils.archive import history_session, stream_history
+    from utils.export_stream import export_response
+    
+    # Workers can only export their own data
+    if not current_user.has_permission('view_all_reports'):
+        if not current_user.is_worker:
+            from fastapi import HTTPException
+            raise HTTPException(status_code=403, detail="Нет прав на экспорт данных")
+        # Force worker to see only their own data
+        worker_id = current_user.id
+    
+    if format == "ndjson":
+        batches = stream_history(
+            db, lambda source: _debug_export_batches(employer_id, worker_id, months, source, current_user)
+        )
+        return export_response(batches, format, "balances-debug", DEBUG_PAYMENT_COLUMNS)
+    if format == "csv":
+        batches = stream_history(db, lambda source: _debug_payment_batches(worker_id, source))
+        return export_response(batches, format, "balances-debug", DEBUG_PAYMENT_COLUMNS)
+    
+    async with history_session(db) as source:
+        cards, mutual, monthly = await _debug_sections(employer_id, worker_id, months, source, current_user)
+        
+        result = await source.execute(_debug_payments_query(worker_id))
+        payments_data = [_payment_debug(row) for row in result.mappings()]
     
     return DebugExport(
         cards=cards,
@@ -3,8 +3,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
@@ -19,10 +19,46 @@ from api.schemas.payment import (
 )
 from api.auth.oauth import get_current_user, get_admin_user
 from utils.timeutil import now_server
+from utils.serialization import FastJSONResponse
+from utils.event_outbox import register_entity_loader
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
+async def serialize_payments_for_event(db: AsyncSession, payment_ids: List[int]) -> dict:
+    """Загрузить платежи одним запросом и сериализовать для rich WebSocket событий.
+
+    Возвращает {payment_id: dict в форме PaymentSchema}.
+    """
+    if not payment_ids:
+        return {}
+    result = await db.execute(
+        select(Payment)
+        .options(
+            joinedload(Payment.category).joinedload(PaymentCategory.category_group),
+            joinedload(Payment.payer),
+            joinedload(Payment.recipient),
+            joinedload(Payment.assignment)
+        )
+        .where(Payment.id.in_(payment_ids))
+    )
+    return {
+        p.id: PaymentSchema.model_validate(p).model_dump(mode="json")
+        for p in result.unique().scalars().all()
+    }
+
+
+def _payment_entity(serialized: dict, payment_id: int) -> Optional[dict]:
+    payment = serialized.get(payment_id)
+    return {"payment": payment} if payment else None
+
+
+@register_entity_loader("payment")
+async def _load_payment_entity(db: AsyncSession, payment_id: int) -> Optional[dict]:
+    """{"payment": ...} для rich WebSocket событий (вызывает диспетчер после COMMIT)"""
+    return _payment_entity(await serialize_payments_for_event(db, [payment_id]), payment_id)
+
+
 # ==================== Payment Category Groups ====================
 
 @router.get("/groups", response_model=List[PaymentCategoryGroupResponse])
@@ -171,18 +207,22 @@ async def create_payment(
     else:
         payment_data['paid_at'] = None
     
-    # Generate tracking number after getting ID
-    from utils.tracking import format_payment_tracking_nr
-        
-    db_payment = Payment(**payment_data)
-    db.add(db_payment)
-    await db.flush()  # Получаем ID
+    # Один INSERT ... RETURNING: id и tracking_nr (триггер БД) сразу
+    from database.bulk import insert_returning
+    db_payment = await insert_returning(db, Payment, payment_data)
     
-    db_payment.tracking_nr = format_payment_tracking_nr(db_payment.id)
-    await db.commit()
-    await db.refresh(db_payment)
+    # WebSocket: плательщику, получателю и всем админам - после COMMIT
+    from utils.event_outbox import EntityRef, stage_event
+    stage_event(db, {
+        "type": "payment_created",
+        "payment_id": db_payment.id,
+        "payer_id": db_payment.payer_id,
+        "recipient_id": db_payment.recipient_id
+    }, user_ids=[db_payment.payer_id, db_payment.recipient_id], entity=EntityRef("payment", db_payment.id))
     
-    result = await db.execute(
+    # Связи для ответа - в той же транзакции, до COMMIT: строка из RETURNING уже в identity map,
+    # запрос только дозагружает категорию, пользователей и смену
+    await db.execute(
         select(Payment)
         .options(
             joinedload(Payment.category).joinedload(PaymentCategory.category_group),
@@ -192,39 +232,238 @@ async def create_payment(
         )
         .where(Payment.id == db_payment.id)
     )
-    db_payment = result.unique().scalar_one()
+    response = PaymentSchema.model_validate(db_payment)
     
-    # WebSocket broadcast: уведомляем плательщика, получателя и всех админов
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([db_payment.payer_id, db_payment.recipient_id] + await get_admin_ids()))
+    await db.commit()
+    return response
+
+
+MAX_BATCH_PAYMENTS = 1000
+# Колонки CSV пакета платежей (пустое значение - как отсутствующее поле JSON)
+PAYMENT_BATCH_CSV_COLUMNS = (
+    "payment_date", "amount", "currency", "category_id", "payer_id", "recipient_id",
+    "payment_status", "description", "assignment_id",
+)
+
+
+class PaymentBatchRowResult(BaseModel):
+    """Результат строки пакета"""
+    row: int  # Номер строки в пакете (с 1)
+    status: Literal["created", "invalid", "skipped"]  # skipped - строка верна, но пакет не записан
+    id: Optional[int] = None
+    tracking_nr: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PaymentBatchResponse(BaseModel):
+    """Ответ на пакетное создание платежей"""
+    created_count: int
+    invalid_count: int
+    results: List[PaymentBatchRowResult]
+
+
+def parse_payment_batch_csv(text: str) -> List[dict]:
+    """CSV с заголовком (колонки PAYMENT_BATCH_CSV_COLUMNS) -> строки для create_payment_batch"""
+    import csv
+    import io
+    
+    reader = csv.DictReader(io.StringIO(text))
+    unknown = set(reader.fieldnames or ()) - set(PAYMENT_BATCH_CSV_COLUMNS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные колонки CSV: {', '.join(sorted(unknown))}")
+    return [
+        {name: value.strip() for name, value in row.items() if name and value and value.strip()}
+        for row in reader
+    ]
+
+
+def _validation_message(error) -> str:
+    """Первая ошибка pydantic в виде 'поле: сообщение'"""
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+async def create_payment_batch(
+    rows: List[dict],
+    db: AsyncSession,
+    current_user: User,
+    skip_invalid: bool = False
+) -> PaymentBatchResponse:
+    """Создать платежи пакетом по правилам create_payment.
+
+    Справочники (валюта по умолчанию, категории, пользователи, смены) читаются
+    один раз на пакет, все строки проверяются до записи, вставка - одной
+    транзакцией. Если есть ошибки и не skip_invalid, ничего не записывается.
+    """
+    from pydantic import ValidationError
+    from database.bulk import bulk_insert_ids
+    from database.change_log import log_bulk_inserts
+    from utils.event_outbox import stage_event
+    from utils.period_close import get_closed_periods
+    from utils.tracking import format_payment_tracking_nr
     
-    await manager.broadcast({
-        "type": "payment_created",
-        "payment_id": db_payment.id,
-        "payer_id": db_payment.payer_id,
-        "recipient_id": db_payment.recipient_id
-    }, user_ids=target_users)
+    if not rows:
+        raise HTTPException(status_code=400, detail="Пакет пуст")
+    if len(rows) > MAX_BATCH_PAYMENTS:
+        raise HTTPException(status_code=400, detail=f"В пакете не больше {MAX_BATCH_PAYMENTS} платежей")
     
-    return PaymentSchema.model_validate(db_payment)
+    errors = {}  # номер строки -> ошибка
+    payments = {}  # номер строки -> PaymentCreate
+    for number, row in enumerate(rows, start=1):
+        try:
+            # Валюта необязательна: пустая - валюта по умолчанию (как в create_payment)
+            payment = PaymentCreate.model_validate({"currency": "", **row})
+        except ValidationError as e:
+            errors[number] = _validation_message(e)
+            continue
+        if not payment.payer_id:
+            errors[number] = "payer_id is required"
+            continue
+        payments[number] = payment
+    
+    # Справочники - по одному запросу на пакет
+    default_currency = 'UAH'
+    if any(not payment.currency for payment in payments.values()):
+        result = await db.execute(select(Currency.code).where(Currency.is_default == True))
+        default_currency = result.scalar_one_or_none() or 'UAH'
+    
+    category_ids = {payment.category_id for payment in payments.values()}
+    known_categories = set((await db.execute(
+        select(PaymentCategory.id).where(PaymentCategory.id.in_(category_ids))
+    )).scalars().all()) if category_ids else set()
+    
+    user_ids = {payment.payer_id for payment in payments.values()}
+    user_ids |= {payment.recipient_id for payment in payments.values() if payment.recipient_id}
+    users = {}
+    if user_ids:
+        result = await db.execute(select(User).options(selectinload(User.roles)).where(User.id.in_(user_ids)))
+        users = {user.id: user for user in result.scalars().all()}
+    
+    assignment_ids = {payment.assignment_id for payment in payments.values() if payment.assignment_id}
+    known_assignments = set((await db.execute(
+        select(Assignment.id).where(Assignment.id.in_(assignment_ids))
+    )).scalars().all()) if assignment_ids else set()
+    
+    # Single-employer модель: worker платит без получателя → получатель - первый admin
+    admin_id = None
+    if any(not payment.recipient_id and payment.payer_id in users and not users[payment.payer_id].is_admin
+           for payment in payments.values()):
+        result = await db.execute(select(User.id).join(User.roles).where(Role.name == 'admin').limit(1))
+        admin_id = result.scalar_one_or_none()
+    
+    # Закрытые месяцы: строку отклоняем сами, иначе триггер БД отменит весь пакет (409)
+    closed_periods = await get_closed_periods(db) if payments else set()
+    
+    now = now_server()
+    insert_rows = {}  # номер строки -> значения для INSERT
+    for number, payment in payments.items():
+        if payment.category_id not in known_categories:
+            errors[number] = f"Категория {payment.category_id} не найдена"
+        elif payment.payer_id not in users:
+            errors[number] = f"Плательщик {payment.payer_id} не найден"
+        elif payment.recipient_id and payment.recipient_id not in users:
+            errors[number] = f"Получатель {payment.recipient_id} не найден"
+        elif payment.assignment_id and payment.assignment_id not in known_assignments:
+            errors[number] = f"Смена {payment.assignment_id} не найдена"
+        elif payment.payment_date.strftime("%Y-%m") in closed_periods:
+            errors[number] = f"Период {payment.payment_date.strftime('%Y-%m')} закрыт"
+        else:
+            recipient_id = payment.recipient_id
+            if not recipient_id and not users[payment.payer_id].is_admin:
+                recipient_id = admin_id
+            # Если payment_date без времени, добавляем текущее время
+            payment_date = payment.payment_date
+            if payment_date.time() == datetime.min.time():
+                payment_date = payment_date.replace(hour=now.hour, minute=now.minute, second=now.second)
+            status = PaymentStatus(payment.payment_status).value
+            insert_rows[number] = {
+                "payer_id": payment.payer_id,
+                "recipient_id": recipient_id,
+                "category_id": payment.category_id,
+                "amount": payment.amount,
+                "currency": payment.currency or default_currency,
+                "description": payment.description,
+                "payment_date": payment_date,
+                "payment_status": status,
+                "paid_at": now if status == PaymentStatus.PAID.value else None,
+                "assignment_id": payment.assignment_id,
+                "modified_at": payment.modified_at,
+            }
+    
+    write = not errors or skip_invalid
+    created = {}  # номер строки -> id
+    if write and insert_rows:
+        ids = await bulk_insert_ids(db, Payment, list(insert_rows.values()))
+        created = dict(zip(insert_rows, ids))
+        await log_bulk_inserts(db, [
+            ("payment", created[number], row["payer_id"], row["recipient_id"])
+            for number, row in insert_rows.items()
+        ])
+        # Одно сводное событие на пакет: всем участникам и админам
+        stage_event(db, {
+            "type": "payments_batch_created",
+            "count": len(created)
+        }, user_ids=[user_id for row in insert_rows.values() for user_id in (row["payer_id"], row["recipient_id"])])
+        await db.commit()
+    
+    results = []
+    for number in range(1, len(rows) + 1):
+        if number in errors:
+            results.append(PaymentBatchRowResult(row=number, status="invalid", error=errors[number]))
+        elif number in created:
+            results.append(PaymentBatchRowResult(
+                row=number, status="created", id=created[number],
+                tracking_nr=format_payment_tracking_nr(created[number])
+            ))
+        else:
+            results.append(PaymentBatchRowResult(row=number, status="skipped"))
+    return PaymentBatchResponse(created_count=len(created), invalid_count=len(errors), results=results)
 
 
-@router.get("/", response_model=List[PaymentSchema])
-async def get_payments(
-    skip: int = Query(0, ge=0),
-    limit: Optional[int] = Query(None),
-    category_id: Optional[int] = Query(None),
-    start_date: Optional[datetime] = Query(None),
-    end_date: Optional[datetime] = Query(None),
+@router.post(
+    "/batch",
+    response_model=PaymentBatchResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+        "text/csv": {"schema": {"type": "string"}},
+    }}}
+)
+async def create_payments_batch(
+    request: Request,
+    skip_invalid: bool = Query(False, description="Записать верные строки, даже если в пакете есть ошибки"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
-) -> List[PaymentSchema]:
-    query = select(Payment).options(
-        joinedload(Payment.category).joinedload(PaymentCategory.category_group),
-        joinedload(Payment.payer),
-        joinedload(Payment.recipient),
-        joinedload(Payment.assignment)
-    )
+):
+    """Пакетное создание платежей: JSON-массив объектов PaymentCreate или CSV (PAYMENT_BATCH_CSV_COLUMNS)"""
+    from utils.serialization import loads
     
+    body = await request.body()
+    if request.headers.get("content-type", "").split(";")[0].strip() in ("text/csv", "application/csv"):
+        try:
+            rows = parse_payment_batch_csv(body.decode("utf-8-sig"))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV должен быть в кодировке UTF-8")
+    else:
+        try:
+            rows = loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный JSON")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise HTTPException(status_code=400, detail="Ожидается JSON-массив объектов")
+    return await create_payment_batch(rows, db, current_user, skip_invalid)
+
+
+PAYMENT_EXPORT_COLUMNS = (
+    "id", "tracking_nr", "payment_date", "payer_id", "payer_name", "recipient_id", "recipient_name",
+    "amount", "currency", "payment_status", "category_name", "category_group", "description",
+    "assignment_tracking_nr", "created_at", "paid_at",
+)
+
+
+def _filter_payments(query, current_user: User, category_id: Optional[int],
+                     start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Общие фильтры списка платежей (RBAC, категория, период)"""
     # RBAC: workers видят только свои платежи (где они payer или recipient)
     if not current_user.is_admin:
         from sqlalchemy import or_
@@ -241,6 +480,74 @@ async def get_payments(
         query = query.where(Payment.payment_date >= start_date)
     if end_date:
         query = query.where(Payment.payment_date <= end_date)
+    return query
+
+
+def _payment_export_query():
+    """Плоские строки платежей для потокового экспорта (без ORM-объектов и identity map)"""
+    from sqlalchemy.orm import aliased
+    PayerUser = aliased(User)
+    RecipientUser = aliased(User)
+    return select(
+        Payment.id,
+        Payment.tracking_nr,
+        Payment.payment_date,
+        Payment.payer_id,
+        PayerUser.full_name.label("payer_name"),
+        Payment.recipient_id,
+        RecipientUser.full_name.label("recipient_name"),
+        Payment.amount,
+        Payment.currency,
+        Payment.payment_status,
+        PaymentCategory.name.label("category_name"),
+        PaymentCategoryGroup.name.label("category_group"),
+        Payment.description,
+        Assignment.tracking_nr.label("assignment_tracking_nr"),
+        Payment.created_at,
+        Payment.paid_at,
+    ).select_from(Payment).outerjoin(
+        PayerUser, Payment.payer_id == PayerUser.id
+    ).outerjoin(
+        RecipientUser, Payment.recipient_id == RecipientUser.id
+    ).outerjoin(
+        PaymentCategory, Payment.category_id == PaymentCategory.id
+    ).outerjoin(
+        PaymentCategoryGroup, PaymentCategory.group_id == PaymentCategoryGroup.id
+    ).outerjoin(
+        Assignment, Payment.assignment_id == Assignment.id
+    )
+
+
+@router.get("/", response_model=List[PaymentSchema])
+async def get_payments(
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    format: Literal["json", "ndjson", "csv"] = Query("json", description="json или потоковый ndjson/csv"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> List[PaymentSchema]:
+    from utils.archive import stream_history
+    from utils.export_stream import STREAM_FORMATS, export_response, stream_rows
+
+    if format in STREAM_FORMATS:
+        query = _filter_payments(_payment_export_query(), current_user, category_id, start_date, end_date)
+        query = query.order_by(Payment.payment_date.desc()).offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        # Экспорт, задевающий архивные месяцы, читает и архив; список json - только живые платежи
+        batches = stream_history(db, lambda source: stream_rows(source, query), start_date)
+        return export_response(batches, format, "payments", PAYMENT_EXPORT_COLUMNS)
+
+    query = select(Payment).options(
+        joinedload(Payment.category).joinedload(PaymentCategory.category_group),
+        joinedload(Payment.payer),
+        joinedload(Payment.recipient),
+        joinedload(Payment.assignment)
+    )
+    query = _filter_payments(query, current_user, category_id, start_date, end_date)
     
     query = query.offset(skip)
     if limit is not None:
@@ -254,7 +561,7 @@ async def get_payments(
     return serialized
 
 
-@router.get("/reports")
+@router.get("/reports", response_class=FastJSONResponse)
 async def get_payment_reports(
     period: str = Query("month", pattern="^(day|week|month|year)$"),
     start_date: Optional[datetime] = Query(None),
@@ -448,25 +755,18 @@ async def update_payment(
     else:
         auto_offset_ids = []
     
+    # WebSocket: об изменённом и автоматически зачтённых платежах - после COMMIT
+    from utils.event_outbox import EntityRef, stage_event
+    target_users = [db_payment.payer_id, db_payment.recipient_id]
+    for changed_id in [db_payment.id] + auto_offset_ids:
+        stage_event(db, {
+            "type": "payment_updated",
+            "payment_id": changed_id
+        }, user_ids=target_users, entity=EntityRef("payment", changed_id))
+    
     await db.commit()
     await db.refresh(db_payment)
     
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    target_users = list(set([db_payment.payer_id, db_payment.recipient_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
-        "type": "payment_updated",
-        "payment_id": db_payment.id
-    }, user_ids=target_users)
-    
-    # Уведомления об автоматически зачтенных платежах
-    for offset_payment_id in auto_offset_ids:
-        await manager.broadcast({
-            "type": "payment_updated",
-            "payment_id": offset_payment_id
-        }, user_ids=target_users)
-    
     return {"id": db_payment.id, "message": "Payment updated successfully"}
 
 
@@ -492,18 +792,14 @@ async def delete_payment(
     if not current_user.is_admin and not is_owner:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    await db.delete(db_payment)
-    await db.commit()
-    
-    # WebSocket broadcast
-    from api.routers.websocket import manager, get_admin_ids
-    # For deleted payment, we use IDs from the db_payment object before it was fully detached
-    target_users = list(set([db_payment.payer_id, db_payment.recipient_id] + await get_admin_ids()))
-    
-    await manager.broadcast({
+    from utils.event_outbox import stage_event
+    stage_event(db, {
         "type": "payment_deleted",
         "payment_id": payment_id
-    }, user_ids=target_users)
+    }, user_ids=[db_payment.payer_id, db_payment.recipient_id])
+    
+    await db.delete(db_payment)
+    await db.commit()
     
     return {"message": "Payment deleted"}
 
@@ -560,16 +856,14 @@ async def bulk_delete_payments(
             failed_ids.append(payment_id)
             errors.append(f"ID {payment_id}: {str(e)}")
     
-    await db.commit()
-    
-    # WebSocket broadcast
     if deleted_count > 0:
-        from api.routers.websocket import manager, get_admin_ids
-        target_users = list(set(list(affected_user_ids) + await get_admin_ids()))
-        await manager.broadcast({
+        from utils.event_outbox import stage_event
+        stage_event(db, {
             "type": "payments_bulk_deleted",
             "count": deleted_count
-        }, user_ids=target_users)
+        }, user_ids=affected_user_ids)
+    
+    await db.commit()
     
     return BulkDeleteResponse(
         deleted_count=deleted_count,
@@ -0,0 +1,122 @@
+"""
+API роутер фоновых отчётов: постановка в очередь, статус и скачивание результата.
+Выполнение - utils/report_jobs.py.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import json
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from database.core import get_db
+from database.models import User, ReportJob, ReportJobStatus
+from api.auth.oauth import get_current_user
+from api.schemas.report import ReportJobCreate, ReportJobResponse
+from utils.export_stream import MEDIA_TYPES
+from utils.report_jobs import report_queue
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+def _job_response(job: ReportJob) -> ReportJobResponse:
+    response = ReportJobResponse.model_validate(job)
+    if job.status == ReportJobStatus.RUNNING.value:
+        response.progress = report_queue.progress.get(job.id, job.progress)
+    if job.status == ReportJobStatus.DONE.value:
+        response.download_url = f"/api/reports/jobs/{job.id}/download"
+    return response
+
+
+async def _get_own_job(job_id: int, db: AsyncSession, current_user: User) -> ReportJob:
+    job = await db.get(ReportJob, job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="Отчёт не найден")
+    return job
+
+
+@router.post("/jobs", response_model=ReportJobResponse, status_code=202)
+async def create_report_job(
+    request: ReportJobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Поставить отчёт в очередь; результат - файл, о готовности сообщает WebSocket"""
+    if request.kind == "balances_debug":
+        # Те же права, что у /balances/debug
+        if not current_user.has_permission('view_all_reports'):
+            if not current_user.is_worker:
+                raise HTTPException(status_code=403, detail="Нет прав на экспорт данных")
+            request.worker_id = current_user.id
+        if request.months > 24:
+            raise HTTPException(status_code=400, detail="Для balances_debug доступно не более 24 месяцев")
+
+    if not report_queue.running:
+        raise HTTPException(status_code=503, detail="Фоновые отчёты недоступны")
+    if report_queue.full():
+        raise HTTPException(status_code=503, detail="Очередь отчётов переполнена, повторите позже")
+
+    job = ReportJob(
+        user_id=current_user.id,
+        kind=request.kind,
+        format=request.format,
+        params=json.dumps(request.model_dump(mode="json", exclude={"kind", "format"})),
+        status=ReportJobStatus.QUEUED.value,
+        progress=0.0,
+        rows=0,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    try:
+        report_queue.submit(job.id)
+    except asyncio.QueueFull:
+        job.status = ReportJobStatus.FAILED.value
+        job.error = "Очередь отчётов переполнена"
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Очередь отчётов переполнена, повторите позже")
+    return _job_response(job)
+
+
+@router.get("/jobs", response_model=List[ReportJobResponse])
+async def list_report_jobs(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Последние отчёты текущего пользователя"""
+    result = await db.execute(
+        select(ReportJob).where(ReportJob.user_id == current_user.id).order_by(ReportJob.id.desc()).limit(50)
+    )
+    return [_job_response(job) for job in result.scalars().all()]
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Статус и прогресс отчёта"""
+    return _job_response(await _get_own_job(job_id, db, current_user))
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_report(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Скачать готовый файл отчёта"""
+    job = await _get_own_job(job_id, db, current_user)
+    if job.status != ReportJobStatus.DONE.value:
+        raise HTTPException(status_code=409, detail="Отчёт ещё не готов")
+    if not job.file_path or not Path(job.file_path).exists():
+        raise HTTPException(status_code=404, detail="Файл отчёта не найден")
+    return FileResponse(job.file_path, media_type=MEDIA_TYPES[job.format],
+                        filename=f"report-{job.id}-{job.kind}.{job.format}")
@@ -0,0 +1,141 @@
+"""
+API роутер для инкрементальной синхронизации (delta sync).
+
+Клиент хранит локальную копию платежей, смен и задач и периодически
+запрашивает только изменения с момента последнего курсора.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import joinedload
+
+from database.core import get_db
+from database.models import User, Payment, PaymentCategory, Assignment, Task, ChangeLog, ChangeOp
+from database.change_log import get_latest_seq, get_horizon
+from api.auth.oauth import get_current_user
+from api.schemas.payment import Payment as PaymentSchema
+from api.schemas.sync import SyncResponse, SyncAssignment, SyncTask, SyncTombstone
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+SYNC_ENTITY_TYPES = ("payment", "assignment", "task")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Курсор - seq последней записи change_log, которую видел клиент"""
+    try:
+        seq = int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return seq
+
+
+@router.get("", response_model=SyncResponse)
+async def get_changes(
+    since: Optional[str] = Query(None, description="Курсор из предыдущего ответа"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Изменения платежей, смен и задач с момента курсора + tombstones удалённых.
+
+    Без since (или если курсор старше горизонта компакции change_log)
+    возвращается полный снимок видимых пользователю данных. Сущность,
+    которая изменилась и перестала быть видна работнику (например, платёж
+    передан другому получателю), приходит ему как tombstone.
+    """
+    since_seq = decode_cursor(since) if since else None
+    latest_seq = await get_latest_seq(db)
+    full = since_seq is None or since_seq < await get_horizon(db)
+
+    payments_query = select(Payment).options(
+        joinedload(Payment.category).joinedload(PaymentCategory.category_group),
+        joinedload(Payment.payer),
+        joinedload(Payment.recipient),
+        joinedload(Payment.assignment)
+    )
+    assignments_query = select(Assignment)
+    tasks_query = select(Task)
+
+    # RBAC: workers видят только свои данные
+    if not current_user.is_admin:
+        payments_query = payments_query.where(
+            or_(Payment.payer_id == current_user.id, Payment.recipient_id == current_user.id)
+        )
+        assignments_query = assignments_query.where(Assignment.user_id == current_user.id)
+        tasks_query = tasks_query.join(Assignment, Task.assignment_id == Assignment.id).where(
+            Assignment.user_id == current_user.id
+        )
+
+    deleted = []
+    if not full:
+        # Последняя видимая пользователю операция по каждой сущности в окне (since, latest].
+        # Видимость - по владельцам на момент записи: при смене владельца прежний тоже
+        # получает запись (database/models.py, _previous_owners)
+        last_seq = select(func.max(ChangeLog.seq)).where(
+            ChangeLog.seq > since_seq,
+            ChangeLog.seq <= latest_seq,
+            ChangeLog.entity_type.in_(SYNC_ENTITY_TYPES)
+        )
+        if not current_user.is_admin:
+            last_seq = last_seq.where(
+                or_(ChangeLog.owner_id == current_user.id,
+                    ChangeLog.counterparty_id == current_user.id)
+            )
+        last_seq = last_seq.group_by(ChangeLog.entity_type, ChangeLog.entity_id)
+        changes_query = select(ChangeLog).where(ChangeLog.seq.in_(last_seq))
+        changes = (await db.execute(changes_query.order_by(ChangeLog.seq))).scalars().all()
+
+        changed_ids = {entity_type: [] for entity_type in SYNC_ENTITY_TYPES}
+        for change in changes:
+            if change.op == ChangeOp.DELETE.value:
+                deleted.append(SyncTombstone(
+                    entity_type=change.entity_type,
+                    entity_id=change.entity_id,
+                    deleted_at=change.created_at
+                ))
+            else:
+                changed_ids[change.entity_type].append(change.entity_id)
+
+        payments_query = payments_query.where(Payment.id.in_(changed_ids["payment"]))
+        assignments_query = assignments_query.where(Assignment.id.in_(changed_ids["assignment"]))
+        tasks_query = tasks_query.where(Task.id.in_(changed_ids["task"]))
+
+    payments = (await db.execute(payments_query.order_by(Payment.id))).scalars().all()
+    assignments = (await db.execute(assignments_query.order_by(Assignment.id))).scalars().all()
+    tasks = (await db.execute(tasks_query.order_by(Task.id))).scalars().all()
+
+    if not full and not current_user.is_admin:
+        # Изменённые сущности, которые есть в БД, но уже не видны работнику - tombstones.
+        # Строки, перенесённые в архив (utils/archive.py), остаются у клиентов как есть
+        loaded = {
+            "payment": {p.id for p in payments},
+            "assignment": {a.id for a in assignments},
+            "task": {t.id for t in tasks},
+        }
+        hidden = [change for change in changes
+                  if change.op != ChangeOp.DELETE.value and change.entity_id not in loaded[change.entity_type]]
+        for entity_type, model in (("payment", Payment), ("assignment", Assignment), ("task", Task)):
+            ids = [change.entity_id for change in hidden if change.entity_type == entity_type]
+            if not ids:
+                continue
+            existing = set((await db.execute(select(model.id).where(model.id.in_(ids)))).scalars().all())
+            deleted.extend(
+                SyncTombstone(entity_type=entity_type, entity_id=change.entity_id, deleted_at=change.created_at)
+                for change in hidden if change.entity_type == entity_type and change.entity_id in existing
+            )
+
+    return SyncResponse(
+        cursor=str(latest_seq),
+        full=full,
+        payments=[PaymentSchema.model_validate(p) for p in payments],
+        assignments=[SyncAssignment.model_validate(a) for a in assignments],
+        tasks=[SyncTask.model_validate(t) for t in tasks],
+        deleted=deleted,
+    )
@@ -0,0 +1,37 @@
+"""
+Вебхук Telegram-бота (BOT_MODE=api или webhook, см. bot/webhook.py)
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+
+@router.post("/webhook", include_in_schema=False)
+async def telegram_webhook(request: Request):
+    """Принять обновление: проверка секретного токена и постановка в очередь воркеров"""
+    from bot.webhook import SECRET_HEADER, get_webhook
+
+    webhook = get_webhook()
+    if webhook is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not webhook.check_secret(request.headers.get(SECRET_HEADER)):
+        raise HTTPException(status_code=403, detail="Неверный секретный токен")
+
+    try:
+        data = await request.json()
+        if not isinstance(data, dict):
+            raise ValueError("Update must be a JSON object")
+        accepted = webhook.submit(data)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Некорректное обновление")
+    except asyncio.QueueFull:
+        # Telegram повторит доставку
+        raise HTTPException(status_code=503, detail="Очередь обновлений переполнена",
+                            headers={"Retry-After": "1"})
+    return {"ok": True, "accepted": accepted}
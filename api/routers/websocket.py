@@ -5,13 +5,14 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from jose import jwt, JWTError
-import json
 import logging
 
 from config.settings import settings
+from utils.metrics import registry, Gauge, timer_tick_duration_seconds
+from utils.serialization import dumps_text
 
 router = APIRouter(tags=["websocket"])
 logger = logging.getLogger(__name__)
@@ -25,17 +26,22 @@ class ConnectionManager:
         self.active_connections: Dict[int, List[WebSocket]] = {}
         # Track which users need timer updates (have active sessions)
         self.timer_subscriptions: Dict[int, bool] = {}
+        # Connections that opted in to rich events (payload includes the serialized entity)
+        self.rich_connections: Set[WebSocket] = set()
     
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def connect(self, websocket: WebSocket, user_id: int, rich: bool = False):
         """Accept connection and register it"""
         await websocket.accept()
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
         self.active_connections[user_id].append(websocket)
+        if rich:
+            self.rich_connections.add(websocket)
         logger.info(f"WebSocket connected: user_id={user_id}, total connections={self.get_total_connections()}")
     
     def disconnect(self, websocket: WebSocket, user_id: int):
         """Remove connection from registry"""
+        self.rich_connections.discard(websocket)
         if user_id in self.active_connections:
             if websocket in self.active_connections[user_id]:
                 self.active_connections[user_id].remove(websocket)
@@ -51,15 +57,40 @@ class ConnectionManager:
         """Get list of all connected user IDs"""
         return list(self.active_connections.keys())
     
-    async def broadcast(self, event: dict, user_ids: Optional[List[int]] = None, exclude_user_id: Optional[int] = None):
+    def has_rich_subscribers(self, user_ids: Optional[Iterable[int]] = None) -> bool:
+        """Check whether any of the given users has a rich-event connection.
+
+        Lets callers skip loading/serializing entities nobody will receive.
+        """
+        if not self.rich_connections:
+            return False
+        recipients = user_ids if user_ids is not None else self.active_connections.keys()
+        return any(
+            websocket in self.rich_connections
+            for user_id in recipients
+            for websocket in self.active_connections.get(user_id, [])
+        )
+    
+    async def broadcast(
+        self,
+        event: dict,
+        user_ids: Optional[List[int]] = None,
+        exclude_user_id: Optional[int] = None,
+        entity: Optional[dict] = None
+    ):
         """
         Send event to connected users.
         :param event: The message to send.
         :param user_ids: If provided, send only to these users.
         :param exclude_user_id: If provided, don't send to this user.
+        :param entity: Extra fields with the serialized entity (e.g. {"payment": {...}}),
+            merged into the event for rich connections only. The targeted users must all be
+            allowed to see the entity, so it is ignored for untargeted broadcasts.
         """
         logger.info(f"Broadcasting event: {event.get('type')}, target_users={user_ids}, exclude={exclude_user_id}")
-        message = json.dumps(event)
+        # Serialize once per visibility class: lean (ids only) and rich (ids + entity)
+        message = dumps_text(event)
+        rich_message = dumps_text({**event, **entity}) if entity and user_ids is not None else message
         disconnected = []
         
         # Determine who to send to
@@ -75,7 +106,7 @@ class ConnectionManager:
                 
             for websocket in connections:
                 try:
-                    await websocket.send_text(message)
+                    await websocket.send_text(rich_message if websocket in self.rich_connections else message)
                 except Exception as e:
                     logger.warning(f"Failed to send to user {user_id}: {e}")
                     disconnected.append((websocket, user_id))
@@ -89,7 +120,7 @@ class ConnectionManager:
         if user_id not in self.active_connections:
             return
         
-        message = json.dumps(event)
+        message = dumps_text(event)
         disconnected = []
         
         for websocket in self.active_connections[user_id]:
@@ -106,6 +137,12 @@ class ConnectionManager:
 # Global manager instance
 manager = ConnectionManager()
 
+registry.register(Gauge(
+    "nursia_websocket_connections", "Open WebSocket connections", manager.get_total_connections))
+registry.register(Gauge(
+    "nursia_websocket_users", "Users with at least one open WebSocket connection",
+    lambda: len(manager.active_connections)))
+
 
 def get_user_id_from_token(token: str) -> Optional[int]:
     """Extract user_id from JWT token"""
@@ -134,11 +171,16 @@ async def get_admin_ids() -> List[int]:
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
-    token: str = Query(...)
+    token: str = Query(...),
+    rich: bool = Query(False)
 ):
     """WebSocket endpoint for real-time updates.
     
-    Connect with: ws://host/api/ws?token=<jwt_token>
+    Connect with: ws://host/api/ws?token=<jwt_token>[&rich=true]
+    
+    With rich=true, payment_* events also carry "payment" (PaymentSchema shape) and
+    assignment_* events carry "assignment" (AssignmentResponse shape), so the client
+    can patch its state without a REST round trip.
     
     Events received:
     - payment_created: {type: "payment_created", payment_id: int, payer_id: int}
@@ -153,7 +195,7 @@ async def websocket_endpoint(
         await websocket.close(code=4001, reason="Invalid token")
         return
     
-    await manager.connect(websocket, user_id)
+    await manager.connect(websocket, user_id, rich=rich)
     
     try:
         while True:
@@ -176,6 +218,7 @@ async def websocket_endpoint(
 
 # Timer broadcast task
 import asyncio
+import time
 from datetime import datetime
 
 _timer_task = None
@@ -208,6 +251,7 @@ async def broadcast_timer_updates():
                 prev_active_users.clear()
                 continue
             
+            tick_started = time.perf_counter()
             async with AsyncSessionLocal() as db:
                 # Get all active tasks (open sessions)
                 query = select(Task).join(Assignment).options(
@@ -296,6 +340,8 @@ async def broadcast_timer_updates():
                         })
                 
                 prev_active_users = current_active_users
+            
+            timer_tick_duration_seconds.observe(time.perf_counter() - tick_started)
         
         except asyncio.CancelledError:
             logger.info("Timer broadcast task cancelled")
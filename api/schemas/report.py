@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ReportJobCreate(BaseModel):
+    kind: Literal["payments", "balances_debug", "monthly"]
+    format: Literal["ndjson", "csv"] = "csv"
+    employer_id: Optional[int] = None
+    worker_id: Optional[int] = None
+    months: int = Field(12, ge=1, le=120)  # monthly - до 10 лет, balances_debug - до 24
+    category_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+
+class ReportJobResponse(BaseModel):
+    id: int
+    kind: str
+    format: str
+    status: str
+    progress: float
+    rows: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Optional, List
+from pydantic import BaseModel, ConfigDict
+
+from api.schemas.payment import Payment as PaymentSchema
+
+
+class SyncAssignment(BaseModel):
+    id: int
+    user_id: int
+    assignment_type: str
+    description: Optional[str] = None
+    tracking_nr: Optional[str] = None
+    created_at: datetime
+    modified_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncTask(BaseModel):
+    id: int
+    assignment_id: int
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    task_type: str
+    description: Optional[str] = None
+    tracking_nr: Optional[str] = None
+    created_at: datetime
+    modified_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncTombstone(BaseModel):
+    entity_type: str
+    entity_id: int
+    deleted_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncResponse(BaseModel):
+    cursor: str  # Передать как since в следующем запросе
+    full: bool  # True - полный снимок (since не передан), клиент заменяет свою копию
+    payments: List[PaymentSchema] = []
+    assignments: List[SyncAssignment] = []
+    tasks: List[SyncTask] = []
+    deleted: List[SyncTombstone] = []
@@ -0,0 +1 @@
+"""Микробенчмарки и нагрузочные сценарии (запуск: python -m benchmarks.<name>)"""
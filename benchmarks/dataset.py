@@ -0,0 +1,255 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков и нагрузочных тестов.
+
+Один и тот же seed, масштаб и дата окончания дают побайтно одинаковый набор:
+пользователи (админ, работодатели, работники) с ролями, трудовые отношения,
+смены всех типов с задачами (работа/пауза/отсутствие) и платежи всех групп
+(PaymentGroupCode) и статусов (PaymentStatus).
+
+    async with session_factory() as db:
+        stats = await generate_dataset(db, DatasetConfig(workers=50, years=3))
+"""
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import (
+    Assignment, AssignmentType, EmploymentRelation, Payment, PaymentCategory,
+    PaymentCategoryGroup, PaymentGroupCode, PaymentStatus, Permission, Role,
+    Task, TaskType, User, role_permissions, user_roles,
+)
+from utils.tracking import format_assignment_tracking_nr, format_payment_tracking_nr
+
+BATCH_SIZE = 5000
+
+PERMISSIONS = (
+    "manage_users", "view_all_reports", "create_salary_payments",
+    "create_expense_payments", "manage_categories", "manage_payment_status",
+)
+ROLE_PERMISSIONS = {
+    "admin": PERMISSIONS,
+    "employer": ("create_salary_payments", "manage_payment_status"),
+    "worker": ("create_expense_payments",),
+}
+# Доля смен по типам; остальное - обычные рабочие смены
+TIME_OFF_WEIGHTS = {
+    AssignmentType.SICK_LEAVE.value: 0.02,
+    AssignmentType.VACATION.value: 0.02,
+    AssignmentType.DAY_OFF.value: 0.01,
+    AssignmentType.UNPAID_LEAVE.value: 0.01,
+}
+# Оплачиваемое отсутствие порождает зарплатный платёж, как и рабочая смена
+PAID_TIME_OFF = {AssignmentType.SICK_LEAVE.value, AssignmentType.VACATION.value}
+
+
+@dataclass
+class DatasetConfig:
+    workers: int = 50
+    employers: int = 3
+    years: int = 3
+    seed: int = 42
+    # Последний день набора; по умолчанию - сегодня (UTC), чтобы отчёты за
+    # последние месяцы были заполнены. Для побайтного повтора задайте явно.
+    end_date: Optional[date] = None
+
+
+@dataclass
+class DatasetStats:
+    users: int = 0
+    employment_relations: int = 0
+    assignments: int = 0
+    tasks: int = 0
+    payments: int = 0
+    payments_by_group: Dict[str, int] = field(default_factory=dict)
+    payments_by_status: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _utc(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(day, time(hour, minute), tzinfo=timezone.utc)
+
+
+def _money(value: float) -> Decimal:
+    return Decimal(str(round(value, 2)))
+
+
+async def _bulk_insert(db: AsyncSession, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        await db.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+async def generate_dataset(db: AsyncSession, config: Optional[DatasetConfig] = None) -> DatasetStats:
+    """Заполнить пустую БД синтетическими данными и вернуть статистику"""
+    config = config or DatasetConfig()
+    rng = random.Random(config.seed)
+    end_date = config.end_date or datetime.now(timezone.utc).date()
+    start_date = end_date - timedelta(days=365 * config.years)
+    stats = DatasetStats()
+
+    # --- RBAC ---
+    permission_ids = {name: i for i, name in enumerate(PERMISSIONS, start=1)}
+    role_ids = {name: i for i, name in enumerate(ROLE_PERMISSIONS, start=1)}
+    await _bulk_insert(db, Permission, [{"id": pid, "name": name} for name, pid in permission_ids.items()])
+    await _bulk_insert(db, Role, [
+        {"id": rid, "name": name, "type": "auth" if name == "admin" else "business"}
+        for name, rid in role_ids.items()
+    ])
+    await db.execute(insert(role_permissions), [
+        {"role_id": role_ids[role], "permission_id": permission_ids[name]}
+        for role, names in ROLE_PERMISSIONS.items() for name in names
+    ])
+
+    # --- Категории: по одной группе на каждый PaymentGroupCode ---
+    category_ids = {code.value: i for i, code in enumerate(PaymentGroupCode, start=1)}
+    await _bulk_insert(db, PaymentCategoryGroup, [
+        {"id": cid, "name": code.capitalize(), "code": code} for code, cid in category_ids.items()
+    ])
+    await _bulk_insert(db, PaymentCategory, [
+        {"id": cid, "name": code.capitalize(), "group_id": cid} for code, cid in category_ids.items()
+    ])
+
+    # --- Пользователи ---
+    users, roles = [], []
+    admin_id = 1
+    users.append({"id": admin_id, "username": "admin", "full_name": "Admin", "status": "active"})
+    roles.append({"user_id": admin_id, "role_id": role_ids["admin"]})
+    employer_ids = []
+    for i in range(config.employers):
+        user_id = len(users) + 1
+        employer_ids.append(user_id)
+        users.append({"id": user_id, "username": f"employer{i + 1}", "full_name": f"Employer {i + 1}", "status": "active"})
+        roles.append({"user_id": user_id, "role_id": role_ids["employer"]})
+    worker_ids = []
+    for i in range(config.workers):
+        user_id = len(users) + 1
+        worker_ids.append(user_id)
+        users.append({"id": user_id, "username": f"worker{i + 1}", "full_name": f"Worker {i + 1}", "status": "active"})
+        roles.append({"user_id": user_id, "role_id": role_ids["worker"]})
+    for user in users:
+        user["password_hash"] = "x"
+    await _bulk_insert(db, User, users)
+    await db.execute(insert(user_roles), roles)
+    stats.users = len(users)
+
+    # --- Трудовые отношения ---
+    employments, employer_of, rate_of = [], {}, {}
+    for worker_id in worker_ids:
+        employer_of[worker_id] = rng.choice(employer_ids) if employer_ids else admin_id
+        rate_of[worker_id] = _money(rng.uniform(8, 25))
+        employments.append({"id": len(employments) + 1, "user_id": worker_id,
+                            "hourly_rate": rate_of[worker_id], "currency": "UAH", "is_active": True})
+    await _bulk_insert(db, EmploymentRelation, employments)
+    stats.employment_relations = len(employments)
+
+    # --- Смены, задачи и платежи ---
+    assignments, tasks, payments = [], [], []
+    unpaid_from = end_date - timedelta(days=30)
+
+    def add_payment(payer_id, recipient_id, code, amount, moment, status, assignment_id=None, description=None):
+        payment_id = len(payments) + 1
+        payments.append({
+            "id": payment_id, "payer_id": payer_id, "recipient_id": recipient_id,
+            "category_id": category_ids[code], "amount": amount, "currency": "UAH",
+            "description": description, "payment_date": moment, "payment_status": status,
+            "paid_at": moment if status != PaymentStatus.UNPAID.value else None,
+            "assignment_id": assignment_id, "tracking_nr": format_payment_tracking_nr(payment_id),
+            "created_at": moment,
+        })
+        stats.payments_by_group[code] = stats.payments_by_group.get(code, 0) + 1
+        stats.payments_by_status[status] = stats.payments_by_status.get(status, 0) + 1
+
+    time_off_types = list(TIME_OFF_WEIGHTS)
+    time_off_weights = list(TIME_OFF_WEIGHTS.values())
+    time_off_share = sum(time_off_weights)
+
+    for worker_id in worker_ids:
+        employer_id = employer_of[worker_id]
+        rate = rate_of[worker_id]
+        outstanding_debt = Decimal("0")
+        day = start_date
+        while day <= end_date:
+            is_recent = day >= unpaid_from
+            if day.weekday() < 5:
+                assignment_id = len(assignments) + 1
+                if rng.random() < time_off_share:
+                    assignment_type = rng.choices(time_off_types, weights=time_off_weights)[0]
+                    segments = [(_utc(day, 8), _utc(day, 16), TaskType.ABSENT.value)]
+                else:
+                    assignment_type = AssignmentType.WORK.value
+                    begin = _utc(day, rng.randint(7, 10), rng.choice((0, 15, 30, 45)))
+                    first = timedelta(minutes=rng.randint(150, 270))
+                    pause = timedelta(minutes=rng.randint(20, 60))
+                    second = timedelta(minutes=rng.randint(120, 240))
+                    segments = [
+                        (begin, begin + first, TaskType.WORK.value),
+                        (begin + first, begin + first + pause, TaskType.PAUSE.value),
+                        (begin + first + pause, begin + first + pause + second, TaskType.WORK.value),
+                    ]
+                assignments.append({
+                    "id": assignment_id, "user_id": worker_id, "assignment_type": assignment_type,
+                    "tracking_nr": format_assignment_tracking_nr(assignment_id), "created_at": segments[0][0],
+                })
+                for task_start, task_end, task_type in segments:
+                    task_id = len(tasks) + 1
+                    tasks.append({
+                        "id": task_id, "assignment_id": assignment_id, "start_time": task_start,
+                        "end_time": task_end, "task_type": task_type, "tracking_nr": f"T{task_id}",
+                        "created_at": task_start,
+                    })
+                if assignment_type == AssignmentType.WORK.value or assignment_type in PAID_TIME_OFF:
+                    worked = sum(((end - begin) for begin, end, kind in segments if kind != TaskType.PAUSE.value),
+                                 timedelta())
+                    amount = _money(float(rate) * worked.total_seconds() / 3600)
+                    if is_recent:
+                        status = PaymentStatus.UNPAID.value
+                    elif outstanding_debt > 0 and rng.random() < 0.1:
+                        # Зачёт зарплаты в счёт долга работника
+                        status = PaymentStatus.OFFSET.value
+                        outstanding_debt = max(Decimal("0"), outstanding_debt - amount)
+                    else:
+                        status = PaymentStatus.PAID.value
+                    add_payment(employer_id, worker_id, PaymentGroupCode.SALARY.value, amount,
+                                segments[-1][1], status, assignment_id=assignment_id)
+
+                # Расходы работника за счёт работодателя
+                if rng.random() < 0.15:
+                    add_payment(worker_id, employer_id, PaymentGroupCode.EXPENSE.value,
+                                _money(rng.uniform(20, 400)), _utc(day, 12),
+                                PaymentStatus.UNPAID.value if is_recent or rng.random() < 0.05
+                                else PaymentStatus.PAID.value,
+                                description="Покупки")
+
+            if day.day == 1:
+                # Аванс (долг работника) и частичное погашение прошлого долга
+                if rng.random() < 0.3:
+                    advance = _money(rng.uniform(200, 1500))
+                    outstanding_debt += advance
+                    add_payment(employer_id, worker_id, PaymentGroupCode.DEBT.value, advance,
+                                _utc(day, 9), PaymentStatus.PAID.value, description="Аванс")
+                if outstanding_debt > 0 and rng.random() < 0.5:
+                    repayment = min(outstanding_debt, _money(rng.uniform(100, 800)))
+                    outstanding_debt -= repayment
+                    add_payment(worker_id, employer_id, PaymentGroupCode.REPAYMENT.value, repayment,
+                                _utc(day, 18), PaymentStatus.PAID.value)
+            if day.day == 15 and rng.random() < 0.2:
+                add_payment(employer_id, worker_id, PaymentGroupCode.BONUS.value, _money(rng.uniform(50, 500)),
+                            _utc(day, 17), PaymentStatus.UNPAID.value if is_recent else PaymentStatus.PAID.value,
+                            description="Премия")
+            day += timedelta(days=1)
+
+    await _bulk_insert(db, Assignment, assignments)
+    await _bulk_insert(db, Task, tasks)
+    await _bulk_insert(db, Payment, payments)
+    await db.commit()
+
+    stats.assignments = len(assignments)
+    stats.tasks = len(tasks)
+    stats.payments = len(payments)
+    return stats
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк middleware: req/s на /api/health и /api/payments/
+для старого стека (два BaseHTTPMiddleware) и нового SecurityMiddleware (pure ASGI).
+
+Запуск: python -m benchmarks.middleware_bench [--requests 2000] [--payments 200]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI, Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.auth.oauth import get_current_user
+from api.middleware.logging import log_request, log_response
+from api.middleware.security import SECURITY_HEADERS, SecurityMiddleware
+from api.routers import payments
+from database.core import get_db
+from database.models import Base, Payment, PaymentCategory, User
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация (до перехода на pure ASGI) - только для сравнения"""
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS.items():
+            response.headers[name] = value
+        return response
+
+
+class LegacySecurityLoggingMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация (до перехода на pure ASGI) - только для сравнения"""
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
+        log_request(request.method, request.url.path, client_ip)
+        response = await call_next(request)
+        log_response(request.method, request.url.path, client_ip, response.status_code)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+
+async def create_session_factory(payment_count: int) -> async_sessionmaker:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as db:
+        admin = User(username="admin", full_name="Admin", password_hash="x")
+        worker = User(username="worker", full_name="Worker", password_hash="x")
+        category = PaymentCategory(name="Зарплата")
+        db.add_all([admin, worker, category])
+        await db.flush()
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        db.add_all([
+            Payment(payer_id=admin.id, recipient_id=worker.id, category_id=category.id,
+                    amount=Decimal("100.00"), currency="UAH", payment_date=start + timedelta(hours=i),
+                    tracking_nr=f"P{i + 1}")
+            for i in range(payment_count)
+        ])
+        await db.commit()
+    return session_factory
+
+
+def build_app(stack: str, session_factory: async_sessionmaker) -> FastAPI:
+    app = FastAPI()
+    app.include_router(payments.router, prefix="/api")
+
+    @app.get("/api/health")
+    async def api_health_check():
+        return {"status": "healthy"}
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, is_admin=True)
+
+    if stack == "legacy":
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacySecurityLoggingMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(SecurityMiddleware)
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев
+        for _ in range(20):
+            (await client.get(path)).raise_for_status()
+
+        async def worker(count: int):
+            for _ in range(count):
+                (await client.get(path)).raise_for_status()
+
+        per_worker = requests // concurrency
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return per_worker * concurrency / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    # Логи (аудит, httpx) не должны влиять на замер
+    logging.getLogger().setLevel(logging.WARNING)
+
+    session_factory = await create_session_factory(args.payments)
+    print(f"requests={args.requests} concurrency={args.concurrency} payments={args.payments}")
+    print(f"{'endpoint':<18}{'stack':<10}{'req/s':>10}")
+    for path, requests in (("/api/health", args.requests), ("/api/payments/", max(args.requests // 10, args.concurrency))):
+        results = {}
+        for stack in ("none", "legacy", "asgi"):
+            results[stack] = await measure(build_app(stack, session_factory), path, requests, args.concurrency)
+            print(f"{path:<18}{stack:<10}{results[stack]:>10.0f}")
+        print(f"{path:<18}{'asgi/legacy':<10}{results['asgi'] / results['legacy']:>9.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
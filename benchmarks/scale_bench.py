@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк горячих эндпоинтов на синтетическом наборе (benchmarks.dataset).
+
+Каждый эндпоинт вызывается через httpx.AsyncClient поверх ASGI-приложения
+(api.main.app со всеми middleware); для каждого фиксируются p50/p95 латентности,
+число SQL-запросов на вызов и размер ответа. Отчёт пишется в JSON, два отчёта
+(например, до и после изменения) сравниваются через --compare.
+
+Запуск:
+    python -m benchmarks.scale_bench --workers 50 --years 3 --output before.json
+    python -m benchmarks.scale_bench --workers 50 --years 3 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.dataset import DatasetConfig, generate_dataset
+from database.models import Base, Role, User
+from utils.query_counter import count_queries
+
+REPORT_VERSION = 1
+
+# (пользователь, путь) - горячие эндпоинты Dashboard, списков и синхронизации
+SCENARIOS = (
+    ("admin", "/api/payments/"),
+    ("admin", "/api/assignments/grouped?period=all"),
+    ("admin", "/api/assignments/active"),
+    ("admin", "/api/balances/summary"),
+    ("admin", "/api/balances/monthly?months=12"),
+    ("admin", "/api/balances/mutual"),
+    ("admin", "/api/balances/debug?months=6"),
+    ("admin", "/api/sync"),
+    ("worker", "/api/payments/"),
+    ("worker", "/api/balances/summary"),
+    ("worker", "/api/balances/monthly?months=12"),
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль методом nearest-rank"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def git_revision() -> Optional[str]:
+    root = Path(__file__).parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+async def load_user(session_factory: async_sessionmaker, username: str) -> User:
+    async with session_factory() as db:
+        result = await db.execute(
+            select(User)
+            .options(selectinload(User.roles).selectinload(Role.permissions))
+            .where(User.username == username)
+        )
+        return result.scalar_one()
+
+
+async def run_benchmark(config: DatasetConfig, iterations: int, warmup: int, db_url: str) -> dict:
+    from api.auth.oauth import get_current_user
+    from api.main import app
+    from database.core import get_db
+
+    engine = create_async_engine(db_url, poolclass=StaticPool) if db_url.endswith("://") \
+        else create_async_engine(db_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    started = time.perf_counter()
+    async with session_factory() as db:
+        stats = await generate_dataset(db, config)
+    generation_seconds = time.perf_counter() - started
+    print(f"dataset: {stats.payments} payments, {stats.assignments} assignments, "
+          f"{stats.tasks} tasks ({generation_seconds:.1f}s)")
+
+    users = {"admin": await load_user(session_factory, "admin"),
+             "worker": await load_user(session_factory, "worker1")}
+    current = {"user": users["admin"]}
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: current["user"]
+
+    results: Dict[str, dict] = {}
+    print(f"{'endpoint':<58}{'p50 ms':>10}{'p95 ms':>10}{'queries':>8}")
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="https://bench", timeout=None) as client:
+            for user_key, path in SCENARIOS:
+                current["user"] = users[user_key]
+                for _ in range(warmup):
+                    (await client.get(path)).raise_for_status()
+
+                latencies, queries, size = [], [], 0
+                for _ in range(iterations):
+                    with count_queries(engine) as counter:
+                        request_started = time.perf_counter()
+                        response = await client.get(path)
+                        latencies.append((time.perf_counter() - request_started) * 1000)
+                    response.raise_for_status()
+                    queries.append(counter.count)
+                    size = len(response.content)
+
+                name = f"{user_key} GET {path}"
+                results[name] = {
+                    "p50_ms": round(percentile(latencies, 50), 2),
+                    "p95_ms": round(percentile(latencies, 95), 2),
+                    "mean_ms": round(sum(latencies) / len(latencies), 2),
+                    "max_ms": round(max(latencies), 2),
+                    "queries": max(queries),
+                    "bytes": size,
+                }
+                print(f"{name:<58}{results[name]['p50_ms']:>10.1f}{results[name]['p95_ms']:>10.1f}"
+                      f"{results[name]['queries']:>8}")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_current_user, None)
+        await engine.dispose()
+
+    return {
+        "version": REPORT_VERSION,
+        "commit": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "dataset": {
+            "workers": config.workers,
+            "employers": config.employers,
+            "years": config.years,
+            "seed": config.seed,
+            "end_date": (config.end_date or datetime.now(timezone.utc).date()).isoformat(),
+            "generation_seconds": round(generation_seconds, 2),
+            **stats.as_dict(),
+        },
+        "endpoints": results,
+    }
+
+
+def compare_reports(baseline: dict, report: dict) -> List[str]:
+    """Построчное сравнение двух отчётов: p50/p95 (отношение new/old) и число запросов"""
+    lines = [f"baseline {baseline.get('commit')} -> {report.get('commit')}"]
+    dataset_keys = ("workers", "employers", "years", "seed", "end_date", "payments")
+    if any(baseline.get("dataset", {}).get(key) != report["dataset"][key] for key in dataset_keys):
+        lines.append("WARNING: datasets differ, numbers are not directly comparable")
+    lines.append(f"{'endpoint':<58}{'p50 old':>10}{'p50 new':>10}{'ratio':>8}{'p95 ratio':>11}{'queries':>12}")
+    for name, new in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old is None:
+            lines.append(f"{name:<58}{'-':>10}{new['p50_ms']:>10.1f}")
+            continue
+        p50_ratio = new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        p95_ratio = new["p95_ms"] / old["p95_ms"] if old["p95_ms"] else float("inf")
+        lines.append(f"{name:<58}{old['p50_ms']:>10.1f}{new['p50_ms']:>10.1f}{p50_ratio:>7.2f}x"
+                     f"{p95_ratio:>10.2f}x{old['queries']:>6}->{new['queries']:<5}")
+    return lines
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--employers", type=int, default=3)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="последний день набора (YYYY-MM-DD), по умолчанию сегодня")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--db-url", default="sqlite+aiosqlite://",
+                        help="БД для набора (по умолчанию в памяти; файл будет пересоздан)")
+    parser.add_argument("--output", type=Path, help="куда записать JSON-отчёт")
+    parser.add_argument("--compare", type=Path, help="JSON-отчёт предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    # Логи (аудит, httpx, права в balances) не должны влиять на замер
+    logging.disable(logging.INFO)
+
+    config = DatasetConfig(workers=args.workers, employers=args.employers, years=args.years,
+                           seed=args.seed, end_date=args.end_date or datetime.now(timezone.utc).date())
+    report = await run_benchmark(config, args.iterations, args.warmup, args.db_url)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"report written to {args.output}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_reports(baseline, report)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк сериализации списка платежей (utils/serialization.py).
+
+Сравниваются способы превратить N схем Payment в JSON-байты:
+- jsonable_encoder + json.dumps - путь FastAPI без response_model / старых версий;
+- TypeAdapter.dump_json (dump_models) - путь FastAPI для response_model;
+- model_dump(mode="json") + dumps() - FastJSONResponse для моделей;
+а также текстовый кадр WebSocket (json.dumps против dumps_text) и строки NDJSON.
+
+Запуск: python -m benchmarks.serialization_bench [--payments 5000] [--repeat 20]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from api.schemas.payment import Payment as PaymentSchema
+from utils.serialization import BACKEND, dump_models, dumps, dumps_text
+
+
+def build_payments(count: int):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        PaymentSchema(
+            id=i + 1, payer_id=1, recipient_id=2, category_id=1 + i % 5,
+            amount=Decimal(100 + i % 900) + Decimal("0.50"), currency="UAH" if i % 7 else "EUR",
+            description=f"Оплата смены {i}", payment_date=start + timedelta(hours=i),
+            payment_status="paid" if i % 3 else "unpaid", tracking_nr=f"P{i + 1}",
+            created_at=start, assignment_id=i if i % 2 else None,
+            category={"id": 1 + i % 5, "name": "Зарплата", "created_at": start},
+            payer={"id": 1, "full_name": "Employer", "username": "employer"},
+            recipient={"id": 2, "full_name": "Worker", "username": "worker"},
+        )
+        for i in range(count)
+    ]
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Медиана времени вызова в миллисекундах"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payments = build_payments(args.payments)
+    rows = [payment.model_dump() for payment in payments]
+    event = {"type": "payment_updated", "id": 1, "payment": rows[0] | {"amount": "100.50"}}
+    event = json.loads(json.dumps(event, default=str))
+
+    cases = [
+        ("list: jsonable_encoder + json.dumps",
+         lambda: json.dumps(jsonable_encoder(payments), ensure_ascii=False).encode("utf-8")),
+        ("list: TypeAdapter.dump_json", lambda: dump_models(payments, PaymentSchema)),
+        (f"list: model_dump + {BACKEND}", lambda: dumps([p.model_dump(mode="json") for p in payments])),
+        ("ndjson: json.dumps per row",
+         lambda: "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in rows).encode("utf-8")),
+        (f"ndjson: {BACKEND} per row", lambda: b"".join(dumps(r) + b"\n" for r in rows)),
+        ("ws x1000: json.dumps", lambda: [json.dumps(event) for _ in range(1000)]),
+        (f"ws x1000: dumps_text ({BACKEND})", lambda: [dumps_text(event) for _ in range(1000)]),
+    ]
+    size = len(dump_models(payments, PaymentSchema))
+    print(f"payments={args.payments} repeat={args.repeat} backend={BACKEND} list_size={size / 1024:.0f}KB")
+    print(f"{'case':<42}{'median ms':>10}")
+    for name, func in cases:
+        print(f"{name:<42}{measure(func, args.repeat):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
+import logging
+
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
-from database.core import AsyncSessionLocal
-from database.crud import update_user_role, get_user
-from database.models import UserRole
 from bot.middleware import access_control
+from bot.users import bot_users
+
+logger = logging.getLogger(__name__)
 
 @access_control
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -13,19 +16,33 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    
+
+    # Only active admins may approve or reject
+    admin = await bot_users.get(query.from_user.id)
+    if not admin or not admin.is_admin or admin.status != "active":
+        logger.warning(f"User {query.from_user.id} tried to review a registration without admin rights")
+        return
+
     data = query.data
     action, user_id = data.split("_")
     user_id = int(user_id)
-    
-    async with AsyncSessionLocal() as session:
-        if action == "approve":
-            await update_user_role(session, user_id, UserRole.USER)
-            await query.edit_message_text(f"User {user_id} approved.")
-            try:
-                await context.bot.send_message(chat_id=user_id, text="Your account has been approved! You can now use the bot.")
-            except:
-                pass
-        elif action == "reject":
-            await update_user_role(session, user_id, UserRole.BLOCKED)
-            await query.edit_message_text(f"User {user_id} rejected.")
+
+    if action == "approve":
+        reviewed = await bot_users.set_status(user_id, "active")
+    elif action == "reject":
+        reviewed = await bot_users.set_status(user_id, "blocked")
+    else:
+        return
+
+    if not reviewed:
+        await query.edit_message_text(f"User {user_id} not found.")
+        return
+
+    if action == "approve":
+        await query.edit_message_text(f"User {user_id} approved.")
+        try:
+            await context.bot.send_message(chat_id=user_id, text="Your account has been approved! You can now use the bot.")
+        except TelegramError as e:
+            logger.warning(f"Failed to notify approved user {user_id}: {e}")
+    else:
+        await query.edit_message_text(f"User {user_id} rejected.")
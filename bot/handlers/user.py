@@ -1,26 +1,24 @@
+import logging
+
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 from bot.middleware import access_control
 from bot.keyboards import get_start_stop_keyboard, get_persistent_start_stop_keyboard
-from datetime import datetime, timezone
+from datetime import datetime
 from telegram import Message
-from typing import Dict, Any
 from sqlalchemy.exc import SQLAlchemyError
 
 from database.core import AsyncSessionLocal
-from database.crud import create_action
-
-
-
-# in-memory active timers: telegram_id -> dict(job, start_ts, chat_id, message_id)
-active_timers: Dict[int, Dict[str, Any]] = {}
+from bot.timer_scheduler import format_duration as _format_duration, timer_scheduler
+from bot.users import bot_users
+from utils.intervals import as_utc
+from utils.work_sessions import (
+    WorkSessionConflict, get_active_task, pause_session, recent_assignments, resume_session, start_session,
+    stop_session,
+)
 
-
-def _format_duration(seconds: int) -> str:
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
-    return f"{hours:02}:{minutes:02}:{secs:02}"
+logger = logging.getLogger(__name__)
 
 
 @access_control
@@ -66,29 +64,17 @@ async def handle_start_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 pass
 
 
-async def _timer_job(context: ContextTypes.DEFAULT_TYPE):
-    """Job that updates the timer message every second."""
-    job = context.job
-    data = job.data or {}
-    telegram_id = data.get("telegram_id")
-    start_ts = data.get("start_ts")
-    chat_id = data.get("chat_id")
-    message_id = data.get("message_id")
-    if not (telegram_id and start_ts and chat_id and message_id):
-        return
-
-    now = datetime.now(timezone.utc)
-    elapsed = int((now - start_ts).total_seconds())
-    text = f"Таймер запущен — { _format_duration(elapsed) }"
-    try:
-        await context.bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id)
-    except Exception:
-        # ignore edit failures
-        pass
+def _shift_start(task) -> datetime:
+    """Начало смены (первое задание) - от него считает таймер"""
+    return as_utc(min(t.start_time for t in task.assignment.tasks))
 
 
+@access_control
 async def persistent_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle messages from persistent keyboard: 'Старт' and 'Стоп'."""
+    """Handle messages from persistent keyboard: 'Старт', 'Стоп', 'Пауза' and 'История'.
+
+    The timer is the worker's shift (utils/work_sessions.py): the same session the web UI shows.
+    """
     if not update.message:
         return
     text = update.message.text.strip()
@@ -96,97 +82,93 @@ async def persistent_button_handler(update: Update, context: ContextTypes.DEFAUL
     telegram_id = user.id
     chat_id = update.message.chat_id
 
+    if text == "История":
+        await history_command(update, context)
+        return
+
+    # Cache hit: access_control has just loaded the user
+    bot_user = await bot_users.get(telegram_id)
+    if not bot_user:
+        return
+
     if text == "Старт":
-        if telegram_id in active_timers:
-            await update.message.reply_text("Таймер уже запущен.")
-            return
+        async with AsyncSessionLocal() as db:
+            try:
+                task, _, _ = await start_session(db, bot_user.id, description="Telegram")
+                start_ts = as_utc(task.start_time)
+            except LookupError:
+                await update.message.reply_text("Трудовые отношения не найдены — обратитесь к администратору.")
+                return
+            except WorkSessionConflict:
+                # Shift started in the web UI: attach the timer to it
+                task = await get_active_task(db, bot_user.id)
+                if not task or telegram_id in timer_scheduler.timers:
+                    await update.message.reply_text("Смена уже идёт.")
+                    return
+                start_ts = _shift_start(task)
 
-        start_ts = datetime.now(timezone.utc)
         # send initial timer message
         sent: Message = await update.message.reply_text("Таймер запущен — 00:00:00")
 
-        # schedule job to update message every second
-        job = context.job_queue.run_repeating(
-            _timer_job,
-            interval=1,
-            first=1,
-            data={
-                "telegram_id": telegram_id,
-                "start_ts": start_ts,
-                "chat_id": chat_id,
-                "message_id": sent.message_id,
-            },
-        )
+        # message is refreshed by the shared scheduler tick (bot/timer_scheduler.py)
+        await timer_scheduler.start(telegram_id, chat_id, sent.message_id, start_ts)
 
-        active_timers[telegram_id] = {
-            "job": job,
-            "start_ts": start_ts,
-            "chat_id": chat_id,
-            "message_id": sent.message_id,
-        }
+        await update.message.reply_text("Смена начата — отсчёт пошёл.")
 
-        await update.message.reply_text("Таймер запущен — отсчёт начался.")
+    elif text == "Пауза":
+        async with AsyncSessionLocal() as db:
+            task = await get_active_task(db, bot_user.id)
+            if not task:
+                await update.message.reply_text("Активной смены нет.")
+                return
+            if task.task_type == "pause":
+                await resume_session(db, task)
+                await update.message.reply_text("Работа продолжена.")
+            else:
+                await pause_session(db, task)
+                await update.message.reply_text("Пауза. Нажмите «Пауза» ещё раз, чтобы продолжить.")
 
     elif text == "Стоп":
-        state = active_timers.get(telegram_id)
-        if not state:
-            await update.message.reply_text("Таймер не запущен.")
-            return
-
-        # stop the job
-        job = state.get("job")
-        try:
-            job.schedule_removal()
-        except Exception:
-            pass
-
-        start_ts = state.get("start_ts")
-        stop_ts = datetime.now(timezone.utc)
-        duration = int((stop_ts - start_ts).total_seconds())
+        async with AsyncSessionLocal() as db:
+            task = await get_active_task(db, bot_user.id)
+            if not task:
+                await timer_scheduler.stop(telegram_id)
+                await update.message.reply_text("Активной смены нет.")
+                return
+            start_ts = _shift_start(task)
+            tracking_nr = task.assignment.tracking_nr
+            try:
+                _, _, payment = await stop_session(db, task)
+            except (SQLAlchemyError, RuntimeError) as e:
+                logger.error(f"Failed to stop shift of {telegram_id}: {e}")
+                await update.message.reply_text("Не удалось завершить смену, попробуйте ещё раз.")
+                return
+            stop_ts = as_utc(task.end_time)
+            amount = f"{payment.amount} {payment.currency}" if payment else None
 
-        # update the timer message to final summary
-        chat_id = state.get("chat_id")
-        message_id = state.get("message_id")
+        duration = int((stop_ts - start_ts).total_seconds())
         final_text = (
-            f"Таймер остановлен.\n"
+            f"Смена {tracking_nr} завершена.\n"
             f"Начало: {start_ts.isoformat()}\n"
             f"Конец: {stop_ts.isoformat()}\n"
             f"Длительность: { _format_duration(duration) }"
         )
-        try:
-            await context.bot.edit_message_text(text=final_text, chat_id=chat_id, message_id=message_id)
-        except Exception:
-            pass
-
-        # persist to DB
-        try:
-            async with AsyncSessionLocal() as session:
-                await create_action(
-                    session=session,
-                    telegram_id=telegram_id,
-                    full_name=user.full_name if user else None,
-                    username=user.username if user else None,
-                    start_ts=start_ts,
-                    stop_ts=stop_ts,
-                    duration_seconds=duration,
-                )
-        except SQLAlchemyError:
-            # if DB write fails, at least notify user
-            await update.message.reply_text("Сохранение в базу данных не удалось.")
-
-        # cleanup
-        active_timers.pop(telegram_id, None)
-        await update.message.reply_text(f"Таймер остановлен, длительность { _format_duration(duration) }.")
+        if amount:
+            final_text += f"\nК оплате: {amount}"
 
-    else:
-        # handle history button
-        if text == "История":
-            await history_command(update, context)
-        return
+        # update the timer message to final summary
+        state = await timer_scheduler.stop(telegram_id)
+        if state:
+            try:
+                await context.bot.edit_message_text(text=final_text, chat_id=state.chat_id, message_id=state.message_id)
+            except TelegramError as e:
+                logger.warning(f"Failed to finalize timer message of {telegram_id}: {e}")
+
+        await update.message.reply_text(final_text)
 
 
 async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show recent action history for the current user."""
+    """Show the latest shifts of the current user."""
     if update.message:
         user = update.message.from_user
         chat_id = update.message.chat_id
@@ -197,27 +179,31 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user:
         return
 
-    telegram_id = user.id
+    bot_user = await bot_users.get(user.id)
+    if not bot_user or bot_user.status != "active":
+        return
 
     try:
         async with AsyncSessionLocal() as session:
-            # Actions functionality removed
-            rows = []
-    except Exception:
+            rows = await recent_assignments(session, bot_user.id)
+    except SQLAlchemyError:
         await context.bot.send_message(chat_id=chat_id, text="Не удалось загрузить историю (ошибка БД).")
         return
 
     if not rows:
-        await context.bot.send_message(chat_id=chat_id, text="Записей по вашим действиям не найдено.")
+        await context.bot.send_message(chat_id=chat_id, text="Смен пока нет.")
         return
 
     lines = []
-    for r in rows:
-        start = r.start_ts.isoformat() if r.start_ts else "-"
-        stop = r.stop_ts.isoformat() if r.stop_ts else "-"
-        dur = _format_duration(r.duration_seconds) if r.duration_seconds is not None else "-"
-        lines.append(f"ID:{r.id} {start} — {stop} ({dur})")
-
-    text = "Последние действия:\n" + "\n".join(lines)
+    for assignment in rows:
+        if not assignment.tasks:
+            continue
+        start = min(t.start_time for t in assignment.tasks)
+        ends = [t.end_time for t in assignment.tasks]
+        stop = max(ends).isoformat() if all(ends) else "идёт"
+        worked = sum(t.duration_seconds for t in assignment.tasks if t.task_type == "work" and t.end_time)
+        lines.append(f"{assignment.tracking_nr} {start.isoformat()} — {stop} ({_format_duration(int(worked))})")
+
+    text = "Последние смены:\n" + "\n".join(lines)
     # send as message (may be long)
     await context.bot.send_message(chat_id=chat_id, text=text)
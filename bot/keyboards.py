@@ -25,7 +25,7 @@ def get_start_stop_keyboard() -> InlineKeyboardMarkup:
 
 
 def get_persistent_start_stop_keyboard() -> ReplyKeyboardMarkup:
-    """Return a persistent reply keyboard with two buttons: 'Старт' and 'Стоп'."""
-    # add a third button for viewing history
-    keyboard = [[KeyboardButton("Старт"), KeyboardButton("Стоп")], [KeyboardButton("История")]]
+    """Return a persistent reply keyboard: 'Старт', 'Стоп', 'Пауза' and 'История'."""
+    # 'Пауза' toggles pause/resume of the running shift
+    keyboard = [[KeyboardButton("Старт"), KeyboardButton("Стоп")], [KeyboardButton("Пауза"), KeyboardButton("История")]]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
@@ -4,29 +4,62 @@ from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandle
 from config.settings import settings
 from bot.handlers.user import start, help_command, handle_start_stop, persistent_button_handler, history_command
 from bot.handlers.admin import admin_panel, handle_approval
+from bot.timer_scheduler import TICK_SECONDS, timer_scheduler, timer_tick_job
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
-def main():
-    application = ApplicationBuilder().token(settings.TELEGRAM_TOKEN).build()
+async def post_init(application):
+    # Timers that were running before restart keep updating their messages
+    await timer_scheduler.restore()
+
+
+def build_application(webhook: bool = False, request=None):
+    """Application with all handlers; webhook=True - no Updater, updates come from bot/webhook.py"""
+    builder = ApplicationBuilder().token(settings.TELEGRAM_TOKEN).post_init(post_init)
+    if webhook:
+        builder = builder.updater(None)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
 
     # User handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("history", history_command))
-    # persistent start/stop/history buttons via ReplyKeyboardMarkup
-    application.add_handler(MessageHandler(filters.Regex(r"^(Старт|Стоп|История)$"), persistent_button_handler))
-    
+    # persistent start/stop/pause/history buttons via ReplyKeyboardMarkup
+    application.add_handler(MessageHandler(filters.Regex(r"^(Старт|Стоп|Пауза|История)$"), persistent_button_handler))
+
     # Admin handlers
     application.add_handler(CommandHandler("admin", admin_panel))
     application.add_handler(CallbackQueryHandler(handle_approval, pattern="^(approve|reject)_"))
     # Start/Stop inline callbacks (legacy / optional)
     application.add_handler(CallbackQueryHandler(handle_start_stop, pattern="^(bot_start|bot_stop)$"))
 
-    application.run_polling()
+    # Single tick loop refreshes all timer messages (bot/timer_scheduler.py)
+    application.job_queue.run_repeating(timer_tick_job, interval=TICK_SECONDS, first=TICK_SECONDS)
+    return application
+
+
+def main():
+    if settings.BOT_MODE == "api":
+        logging.getLogger(__name__).info("BOT_MODE=api: updates are served by the API process")
+        return
+
+    # No event dispatcher in this process: the API process relays our WebSocket events
+    from utils.event_outbox import relay_to_api
+    relay_to_api()
+
+    if settings.BOT_MODE == "webhook":
+        # Standalone webhook receiver with the same route as the API (bot/webhook.py)
+        import uvicorn
+        from bot.webhook import create_standalone_app
+        uvicorn.run(create_standalone_app(), host=settings.BOT_WEBHOOK_HOST, port=settings.BOT_WEBHOOK_PORT)
+        return
+
+    build_application().run_polling()
 
 if __name__ == '__main__':
     main()
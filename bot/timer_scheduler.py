@@ -0,0 +1,185 @@
+"""
+Планировщик сообщений-таймеров бота.
+
+Вместо отдельной задачи run_repeating на каждого пользователя - один цикл
+(tick раз в секунду), который правит сообщения всех запущенных таймеров:
+- общий token bucket (BOT_EDITS_PER_SECOND) не даёт превысить лимиты Telegram;
+  таймеры, не получившие токен, обновятся на следующих тиках (по очереди next_due);
+- интервал обновления растёт с нагрузкой (REFRESH_INTERVALS: 1с → 10с → 60с), а
+  время в тексте округляется до интервала - правка не отправляется, если текст
+  не изменился;
+- ошибки Telegram не глотаются молча: RetryAfter приостанавливает bucket,
+  удалённое сообщение или заблокированный бот снимают таймер, остальное - в лог;
+- запущенные таймеры хранятся в таблице bot_timers и восстанавливаются при
+  старте бота (restore).
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from config.settings import settings
+from database.models import BotTimer
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 1
+# Интервалы обновления сообщений: берётся первый, при котором все таймеры укладываются в лимит
+REFRESH_INTERVALS = (1, 10, 60)
+
+
+def format_duration(seconds: int) -> str:
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    secs = seconds % 60
+    return f"{hours:02}:{minutes:02}:{secs:02}"
+
+
+def render_timer(start_ts: datetime, now: datetime, interval: int) -> str:
+    """Текст сообщения-таймера; прошедшее время округляется вниз до интервала обновления"""
+    elapsed = max(int((now - start_ts).total_seconds()), 0)
+    return f"Таймер запущен — {format_duration(elapsed - elapsed % interval)}"
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity про запас"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены seconds секунд (ответ RetryAfter от Telegram)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+@dataclass
+class TimerState:
+    telegram_id: int
+    chat_id: int
+    message_id: int
+    start_ts: datetime
+    last_text: Optional[str] = None
+    next_due: Optional[datetime] = None  # None - обновить на ближайшем тике
+
+
+class TimerScheduler:
+    def __init__(self, session_factory=None, edits_per_second: Optional[float] = None):
+        self._session_factory = session_factory
+        self.bucket = TokenBucket(edits_per_second or settings.BOT_EDITS_PER_SECOND)
+        self.timers: Dict[int, TimerState] = {}
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from database.core import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    @property
+    def interval(self) -> int:
+        """Интервал обновления для текущего числа таймеров"""
+        for interval in REFRESH_INTERVALS:
+            if len(self.timers) <= self.bucket.rate * interval:
+                return interval
+        return REFRESH_INTERVALS[-1]
+
+    async def start(self, telegram_id: int, chat_id: int, message_id: int, start_ts: datetime) -> TimerState:
+        """Запустить таймер (сообщение message_id уже отправлено) и сохранить его в БД"""
+        state = TimerState(telegram_id, chat_id, message_id, start_ts)
+        async with self.session_factory() as db:
+            await db.merge(BotTimer(telegram_id=telegram_id, chat_id=chat_id,
+                                    message_id=message_id, start_ts=start_ts))
+            await db.commit()
+        self.timers[telegram_id] = state
+        return state
+
+    async def stop(self, telegram_id: int) -> Optional[TimerState]:
+        """Снять таймер; возвращает его состояние (None, если таймер не запущен)"""
+        state = self.timers.pop(telegram_id, None)
+        async with self.session_factory() as db:
+            await db.execute(delete(BotTimer).where(BotTimer.telegram_id == telegram_id))
+            await db.commit()
+        return state
+
+    async def restore(self) -> int:
+        """Загрузить запущенные таймеры из БД (старт бота)"""
+        async with self.session_factory() as db:
+            rows = (await db.execute(select(BotTimer))).scalars().all()
+        for row in rows:
+            self.timers[row.telegram_id] = TimerState(row.telegram_id, row.chat_id, row.message_id, row.start_ts)
+        if rows:
+            logger.info(f"Restored {len(rows)} bot timers")
+        return len(rows)
+
+    async def tick(self, bot, now: Optional[datetime] = None) -> int:
+        """Обновить сообщения таймеров, которым пора; возвращает число отправленных правок"""
+        now = now or datetime.now(timezone.utc)
+        interval = self.interval
+        due = [state for state in self.timers.values() if state.next_due is None or state.next_due <= now]
+        due.sort(key=lambda state: state.next_due or datetime.min.replace(tzinfo=timezone.utc))
+        sent = 0
+        for state in due:
+            text = render_timer(state.start_ts, now, interval)
+            if text == state.last_text:
+                state.next_due = now + timedelta(seconds=interval)
+                continue
+            if not self.bucket.try_acquire():
+                break  # Остальные - на следующих тиках, в порядке очереди
+            if await self._edit(bot, state, text):
+                sent += 1
+            state.next_due = now + timedelta(seconds=interval)
+        return sent
+
+    async def _edit(self, bot, state: TimerState, text: str) -> bool:
+        try:
+            await bot.edit_message_text(text=text, chat_id=state.chat_id, message_id=state.message_id)
+        except RetryAfter as e:
+            delay = e.retry_after
+            seconds = delay.total_seconds() if isinstance(delay, timedelta) else float(delay)
+            logger.warning(f"Telegram flood control: pausing timer edits for {seconds}s")
+            self.bucket.pause(seconds)
+            return False
+        except BadRequest as e:
+            if "not modified" in e.message.lower():
+                state.last_text = text
+                return False
+            logger.warning(f"Timer message of {state.telegram_id} is gone, dropping timer: {e.message}")
+            await self.stop(state.telegram_id)
+            return False
+        except Forbidden as e:
+            logger.warning(f"Bot cannot write to {state.telegram_id}, dropping timer: {e.message}")
+            await self.stop(state.telegram_id)
+            return False
+        except TelegramError as e:
+            logger.warning(f"Failed to update timer of {state.telegram_id}: {e}")
+            return False
+        state.last_text = text
+        return True
+
+
+timer_scheduler = TimerScheduler()
+
+
+async def timer_tick_job(context) -> None:
+    """Job JobQueue: один тик планировщика"""
+    await timer_scheduler.tick(context.bot)
@@ -0,0 +1,167 @@
+"""
+Пользователи бота: telegram_id -> users.
+
+- BotUserDirectory.get - кэш с TTL (BOT_USER_CACHE_TTL): каждое обновление
+  проходит access_control, и без кэша каждое нажатие кнопки стоило бы запроса
+  к users/roles; смена статуса через бота сбрасывает запись сразу;
+- неизвестный пользователь регистрируется как pending (ADMIN_IDS - сразу
+  активным админом) с username tg_<telegram_id> и без пароля ('temp_hash');
+- notify_admins рассылает уведомления админам параллельно; обработчик
+  запускает её фоновой задачей и не ждёт Telegram.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from config.settings import settings
+from database.models import Role, User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BotUser:
+    """Снимок пользователя для кэша (без привязки к сессии БД)"""
+    id: int
+    telegram_id: int
+    full_name: str
+    status: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "BotUser":
+        return cls(user.id, user.telegram_id, user.full_name, user.status, user.is_admin)
+
+
+class BotUserDirectory:
+    def __init__(self, session_factory=None, ttl: Optional[float] = None, max_size: int = 10000):
+        self._session_factory = session_factory
+        self.ttl = ttl if ttl is not None else settings.BOT_USER_CACHE_TTL
+        self.max_size = max_size
+        self._users: Dict[int, Tuple[float, BotUser]] = {}
+        self._admins: Optional[Tuple[float, List[int]]] = None
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from database.core import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def invalidate(self, telegram_id: Optional[int] = None) -> None:
+        """Сбросить запись пользователя (или весь кэш) и список админов"""
+        if telegram_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(telegram_id, None)
+        self._admins = None
+
+    def _remember(self, bot_user: BotUser) -> BotUser:
+        if len(self._users) >= self.max_size and bot_user.telegram_id not in self._users:
+            del self._users[next(iter(self._users))]  # Самая старая запись
+        self._users[bot_user.telegram_id] = (time.monotonic() + self.ttl, bot_user)
+        return bot_user
+
+    async def _load(self, db, telegram_id: int) -> Optional[User]:
+        result = await db.execute(
+            select(User).options(selectinload(User.roles)).where(User.telegram_id == telegram_id)
+        )
+        return result.scalars().first()
+
+    async def get(self, telegram_id: int) -> Optional[BotUser]:
+        """Пользователь по telegram_id (None - не зарегистрирован); повторные вызовы - из кэша"""
+        cached = self._users.get(telegram_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        async with self.session_factory() as db:
+            user = await self._load(db, telegram_id)
+        if user is None:
+            self._users.pop(telegram_id, None)
+            return None
+        return self._remember(BotUser.from_user(user))
+
+    async def register(self, telegram_id: int, full_name: Optional[str],
+                       username: Optional[str] = None) -> Tuple[BotUser, bool]:
+        """Найти или создать пользователя; (пользователь, создан ли сейчас)"""
+        existing = await self.get(telegram_id)
+        if existing:
+            return existing, False
+
+        is_admin = telegram_id in settings.ADMIN_IDS
+        async with self.session_factory() as db:
+            user = User(
+                telegram_id=telegram_id,
+                username=f"tg_{telegram_id}",
+                password_hash="temp_hash",  # Вход в веб-интерфейс - после смены пароля админом
+                full_name=full_name or username or str(telegram_id),
+                status="active" if is_admin else "pending"
+            )
+            if is_admin:
+                role = (await db.execute(select(Role).where(Role.name == "admin"))).scalar_one_or_none()
+                user.roles = [role] if role else []
+            else:
+                user.roles = []
+            db.add(user)
+            await db.flush()
+            bot_user = BotUser(user.id, telegram_id, user.full_name, user.status, is_admin)
+            await db.commit()
+        logger.info(f"Registered telegram user {telegram_id} as {bot_user.status}")
+        if is_admin:
+            self._admins = None
+        return self._remember(bot_user), True
+
+    async def set_status(self, telegram_id: int, status: str) -> Optional[BotUser]:
+        """Одобрить (active) или заблокировать (blocked) пользователя; кэш сбрасывается"""
+        async with self.session_factory() as db:
+            user = await self._load(db, telegram_id)
+            if user is None:
+                return None
+            user.status = status
+            if status == "active" and not user.roles:
+                role = (await db.execute(select(Role).where(Role.name == "worker"))).scalar_one_or_none()
+                if role:
+                    user.roles.append(role)
+            bot_user = BotUser.from_user(user)
+            await db.commit()
+        self.invalidate(telegram_id)
+        return self._remember(bot_user)
+
+    async def admin_chat_ids(self) -> List[int]:
+        """telegram_id активных админов (кэш на тот же TTL)"""
+        if self._admins and self._admins[0] > time.monotonic():
+            return self._admins[1]
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(User.telegram_id).join(User.roles).where(
+                    Role.name == "admin",
+                    User.status == "active",
+                    User.telegram_id != None
+                )
+            )
+            chat_ids = sorted(set(result.scalars().all()) | set(settings.ADMIN_IDS))
+        self._admins = (time.monotonic() + self.ttl, chat_ids)
+        return chat_ids
+
+
+bot_users = BotUserDirectory()
+
+
+async def notify_admins(bot, text: str, reply_markup=None, directory: Optional[BotUserDirectory] = None) -> int:
+    """Разослать сообщение всем админам параллельно; возвращает число доставленных"""
+    chat_ids = await (directory or bot_users).admin_chat_ids()
+    results = await asyncio.gather(
+        *(bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup) for chat_id in chat_ids),
+        return_exceptions=True
+    )
+    delivered = 0
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to notify admin {chat_id}: {result}")
+        else:
+            delivered += 1
+    return delivered
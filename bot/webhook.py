@@ -0,0 +1,228 @@
+"""
+Вебхук Telegram: приём обновлений и пул воркеров.
+
+Telegram присылает обновления POST-запросом (api/routers/telegram_webhook.py) с
+заголовком X-Telegram-Bot-Api-Secret-Token; запрос с другим токеном
+отклоняется. Принятое обновление ставится в очередь одного из BOT_WORKERS
+воркеров и сразу подтверждается, обработчики бота работают уже в фоне:
+- воркер выбирается по чату, поэтому обновления одного чата обрабатываются
+  по порядку, а разные чаты - параллельно;
+- очереди ограничены (BOT_QUEUE_SIZE): при переполнении вебхук отвечает 503,
+  и Telegram повторит доставку позже;
+- повторная доставка уже принятого update_id отбрасывается.
+
+Режим BOT_MODE: "api" - вебхук в процессе FastAPI (api/main.py), "webhook" -
+отдельный процесс bot/main.py с тем же роутом (create_standalone_app),
+"polling" - прежний run_polling.
+
+Бот (Application, JobQueue с тиками таймеров) должен работать в одном
+процессе. При BOT_MODE=api каждый воркер uvicorn запустил бы свой, поэтому
+API поднимает вебхук под файловой блокировкой (claim_webhook_lock): второй
+воркер не стартует. Для нескольких воркеров API - BOT_MODE=webhook.
+"""
+import asyncio
+import hmac
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from telegram import Update
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+RECENT_UPDATES = 10000  # Сколько последних update_id помнить для отсева повторных доставок
+
+
+def chat_key(update: Update) -> int:
+    """Ключ упорядочивания: чат, иначе пользователь, иначе само обновление"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+class UpdateWorkerPool:
+    """Ограниченные очереди по воркерам; обновления одного чата - в одной очереди"""
+
+    def __init__(self, handler: Callable[[Update], Awaitable[None]], workers: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        self.handler = handler
+        self.workers = settings.BOT_WORKERS if workers is None else workers
+        self.queue_size = settings.BOT_QUEUE_SIZE if queue_size is None else queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._queues)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Дообработать принятые обновления (не дольше timeout) и остановить воркеры"""
+        if self._queues:
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Telegram update queues not drained, dropping the rest")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    def submit(self, update: Update) -> bool:
+        """Поставить обновление в очередь его чата; False - повторная доставка.
+
+        asyncio.QueueFull, если очередь заполнена.
+        """
+        if not self._queues:
+            raise RuntimeError("Telegram update pool is not running")
+        if update.update_id in self._recent:
+            return False
+        self._queues[hash(chat_key(update)) % len(self._queues)].put_nowait(update)
+        self._recent[update.update_id] = None
+        if len(self._recent) > RECENT_UPDATES:
+            self._recent.popitem(last=False)
+        return True
+
+    async def join(self) -> None:
+        """Дождаться обработки всех принятых обновлений"""
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.handler(update)
+            except Exception as e:
+                logger.error(f"Telegram update {update.update_id} crashed: {e}")
+            finally:
+                queue.task_done()
+
+
+class TelegramWebhook:
+    """Жизненный цикл Application в режиме вебхука: инициализация, setWebhook, пул воркеров"""
+
+    def __init__(self, application, secret: Optional[str] = None, url: Optional[str] = None,
+                 workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.application = application
+        self.secret = settings.TELEGRAM_WEBHOOK_SECRET if secret is None else secret
+        self.url = settings.TELEGRAM_WEBHOOK_URL if url is None else url
+        if not self.secret:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET is required for webhook mode")
+        self.pool = UpdateWorkerPool(application.process_update, workers, queue_size)
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        return token is not None and hmac.compare_digest(token.encode(), self.secret.encode())
+
+    def submit(self, data: dict) -> bool:
+        """Разобрать JSON обновления и поставить в очередь (ValueError - не обновление)"""
+        update = Update.de_json(data, self.application.bot)
+        if update is None:
+            raise ValueError("Empty update")
+        return self.pool.submit(update)
+
+    async def start(self) -> None:
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()  # JobQueue (тики таймеров) и обработка ошибок
+        await self.pool.start()
+        if self.url:
+            await app.bot.set_webhook(url=self.url, secret_token=self.secret, allowed_updates=Update.ALL_TYPES)
+            logger.info(f"Telegram webhook set to {self.url}")
+
+    async def stop(self) -> None:
+        app = self.application
+        await self.pool.stop()
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+
+
+_webhook: Optional[TelegramWebhook] = None
+_lock_file = None
+
+
+def claim_webhook_lock(path: Optional[str] = None) -> None:
+    """Эксклюзивная блокировка файла на время жизни процесса; RuntimeError, если занята"""
+    global _lock_file
+    try:
+        import fcntl
+    except ImportError:  # Не POSIX - проверить нельзя
+        return
+    if _lock_file is not None:
+        return
+    path = path or settings.BOT_WEBHOOK_LOCK_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError("BOT_MODE=api needs a single API worker: the bot already runs in another process. "
+                           "Run uvicorn with one worker or use BOT_MODE=webhook")
+    _lock_file = lock_file
+
+
+def release_webhook_lock() -> None:
+    global _lock_file
+    if _lock_file is not None:
+        _lock_file.close()  # Закрытие файла снимает flock
+        _lock_file = None
+
+
+def get_webhook() -> Optional[TelegramWebhook]:
+    return _webhook
+
+
+async def start_webhook(application=None) -> TelegramWebhook:
+    """Запустить бота в режиме вебхука (старт FastAPI или отдельного процесса)"""
+    global _webhook
+    if application is None:
+        from bot.main import build_application
+        application = build_application(webhook=True)
+    _webhook = TelegramWebhook(application)
+    await _webhook.start()
+    return _webhook
+
+
+async def stop_webhook() -> None:
+    global _webhook
+    if _webhook is not None:
+        await _webhook.stop()
+        _webhook = None
+
+
+def create_standalone_app():
+    """FastAPI-приложение только с роутом вебхука (BOT_MODE=webhook)"""
+    from fastapi import FastAPI
+    from api.routers import telegram_webhook
+
+    app = FastAPI(title="Nursia Telegram webhook")
+    app.include_router(telegram_webhook.router, prefix="/api")
+
+    @app.on_event("startup")
+    async def startup_event():
+        await start_webhook()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await stop_webhook()
+
+    return app
@@ -13,14 +13,54 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
     FORCE_HTTPS: bool = False
-    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_ENABLED: bool = False  # 429 по политикам api/middleware/rate_limit.py
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (один процесс) или "sqlite" (общий для процессов)
+    RATE_LIMIT_DB_PATH: str = "data/rate_limits.db"  # Файл для RATE_LIMIT_BACKEND=sqlite
+    RATE_LIMIT_BUSY_TIMEOUT_MS: int = 50  # Ожидание занятого файла SQLite; дольше - запрос пропускается
     SECURITY_HEADERS_ENABLED: bool = True
+    METRICS_ENABLED: bool = False  # /api/metrics (Prometheus)
+    METRICS_TOKEN: str = ""  # Если задан - /api/metrics требует "Authorization: Bearer <токен>"
     
     # JWT settings
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 480  # 8 часов
 
+    # Change log
+    CHANGE_LOG_RETENTION_DAYS: int = 90  # Полная история хранится столько дней, дальше - компакция
+
+    # Balance engines
+    BALANCE_ENGINE: str = "numpy"  # Движок /balances/*: "numpy" (колоночный, в памяти) или "sql" (эталон)
+    BALANCE_SHADOW_ENGINE: str = ""  # Движок для теневого сравнения на живых запросах ("" - выключено)
+    BALANCE_SHADOW_SAMPLE_RATE: float = 0.01  # Доля запросов /balances/*, пересчитываемых теневым движком
+
+    # Report jobs
+    REPORTS_DIR: str = "data/reports"  # Файлы результатов фоновых отчётов
+    REPORT_WORKERS: int = 2  # Одновременно выполняемых отчётов
+    REPORT_PROCESS_WORKERS: int = 2  # Процессов для форматирования строк (0 - в event loop)
+    REPORT_QUEUE_SIZE: int = 50  # Максимум отчётов в очереди
+    REPORT_RETENTION_DAYS: int = 7  # Готовые отчёты и их файлы удаляются через столько дней
+
+    # Cold archive
+    ARCHIVE_DB_PATH: str = ""  # Файл архива закрытых периодов ("" - archive.db рядом с основной БД)
+
+    # WebSocket events
+    EVENT_QUEUE_SIZE: int = 10000  # Событий в очереди диспетчера (при переполнении - отбрасываются)
+    EVENT_RELAY_INTERVAL: float = 1.0  # Как часто API забирает события бота из event_outbox (0 - не забирать)
+    EVENT_RELAY_RETENTION: int = 300  # Сколько секунд строки event_outbox хранятся до удаления
+
+    # Telegram bot
+    BOT_EDITS_PER_SECOND: float = 20.0  # Общий лимит правок сообщений-таймеров (лимит Telegram - ~30 сообщений/с)
+    BOT_USER_CACHE_TTL: int = 60  # Сколько секунд бот помнит пользователя telegram_id -> users (bot/users.py)
+    BOT_MODE: str = "polling"  # "polling", "webhook" (отдельный процесс) или "api" (вебхук в процессе FastAPI)
+    TELEGRAM_WEBHOOK_URL: str = ""  # Публичный URL вебхука: https://<домен>/api/telegram/webhook
+    TELEGRAM_WEBHOOK_SECRET: str = ""  # Секретный токен вебхука (обязателен в режимах webhook/api)
+    BOT_WEBHOOK_HOST: str = "0.0.0.0"  # Адрес отдельного процесса вебхука (BOT_MODE=webhook)
+    BOT_WEBHOOK_PORT: int = 8081
+    BOT_WORKERS: int = 8  # Воркеров обработки обновлений (обновления одного чата - по порядку)
+    BOT_QUEUE_SIZE: int = 100  # Обновлений в очереди воркера (при переполнении - 503, Telegram повторит)
+    BOT_WEBHOOK_LOCK_PATH: str = "data/bot_webhook.lock"  # BOT_MODE=api: бот только в одном воркере API
+
     @field_validator('ADMIN_IDS', mode='before')
     @classmethod
     def parse_admin_ids(cls, v):
@@ -0,0 +1,58 @@
+"""
+Вставки в обход unit of work ORM-сессии (импорт смен, пакеты платежей, создание
+смены или платежа одним запросом).
+
+Строки вставляются пачками insertmanyvalues (INSERT ... VALUES (...), (...)
+RETURNING id), tracking_nr проставляет триггер БД (database/models.py,
+tracking_nr_trigger). Хук after_flush такие вставки не видит - change_log
+пишет insert_returning, для пачек - вызывающий код
+(database.change_log.log_bulk_inserts).
+"""
+from typing import List
+
+from sqlalchemy import func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database.models import TRACKED_ENTITIES, ChangeLog, ChangeOp, _change_owners
+from utils.tracking import TRACKING_PREFIXES, tracking_nr_expression
+
+
+async def bulk_insert_ids(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """INSERT пачками с RETURNING id; id в порядке rows.
+
+    Порядок гарантирует sort_by_parameter_order: SQLAlchemy сопоставляет строки
+    RETURNING с параметрами по колонке-сентинелу модели (orm_insert_sentinel), а не
+    полагается на порядок выдачи id. Без сентинела вставка пошла бы по строке.
+    Все строки должны иметь одинаковый набор ключей.
+    """
+    if not rows:
+        return []
+    table = model.__table__
+    result = await db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars().all())
+
+
+async def insert_returning(db: AsyncSession, model, values: dict):
+    """INSERT ... RETURNING: объект model со всеми колонками (id, server defaults, tracking_nr)
+    за один запрос вместо flush + UPDATE tracking_nr + повторного SELECT.
+
+    Триггер tracking_nr срабатывает после RETURNING, поэтому номер вычисляется тем же
+    выражением в самом RETURNING. Объект попадает в identity map; связи не загружены.
+    """
+    prefix = TRACKING_PREFIXES[model.__tablename__]
+    tracking_nr = func.coalesce(model.tracking_nr, tracking_nr_expression(prefix, model.id))
+    result = await db.execute(insert(model).values(**values).returning(model, tracking_nr))
+    obj, number = result.one()
+    set_committed_value(obj, "tracking_nr", number)
+
+    owner_id, counterparty_id = _change_owners(db.sync_session, obj)
+    await db.execute(insert(ChangeLog.__table__).values(
+        entity_type=TRACKED_ENTITIES[model],
+        entity_id=obj.id,
+        op=ChangeOp.INSERT.value,
+        actor_id=db.info.get("actor_id"),
+        owner_id=owner_id,
+        counterparty_id=counterparty_id,
+    ))
+    return obj
@@ -0,0 +1,118 @@
+"""
+Журнал изменений (change_log): чтение позиции и компакция.
+
+Записи создаются автоматически хуком after_flush в database/models.py;
+массовые вставки через insert() пишут журнал сами (log_bulk_inserts).
+Политика компакции (для записей старше CHANGE_LOG_RETENTION_DAYS):
+1. запись удаляется, если для той же сущности есть более поздняя запись -
+   последняя операция по каждой сущности сохраняется;
+2. записи удаления (op=delete) удаляются целиком, их максимальный seq
+   становится горизонтом - читатели с курсором ниже горизонта должны
+   перечитать полный снимок.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from config.settings import settings
+from database.models import ChangeLog, ChangeOp, SystemSetting
+
+logger = logging.getLogger(__name__)
+
+HORIZON_SETTING_KEY = "change_log_horizon"
+
+
+async def get_latest_seq(db: AsyncSession) -> int:
+    """Последний записанный seq (0 если журнал пуст)"""
+    result = await db.execute(select(func.max(ChangeLog.seq)))
+    return result.scalar() or 0
+
+
+async def get_horizon(db: AsyncSession) -> int:
+    """Seq, до которого (включительно) история удалений была компактирована"""
+    result = await db.execute(
+        select(SystemSetting.value).where(SystemSetting.key == HORIZON_SETTING_KEY)
+    )
+    value = result.scalar_one_or_none()
+    return int(value) if value else 0
+
+
+async def log_bulk_inserts(
+    db: AsyncSession,
+    entries: Iterable[Tuple[str, int, Optional[int], Optional[int]]]
+) -> None:
+    """Записи change_log для строк, вставленных пачкой в обход ORM-сессии.
+
+    entries - (entity_type, entity_id, owner_id, counterparty_id); хук after_flush
+    такие вставки не видит. Все записи - одним executemany.
+    """
+    actor_id = db.info.get("actor_id")
+    rows = [
+        {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "op": ChangeOp.INSERT.value,
+            "actor_id": actor_id,
+            "owner_id": owner_id,
+            "counterparty_id": counterparty_id,
+        }
+        for entity_type, entity_id, owner_id, counterparty_id in entries
+    ]
+    if rows:
+        await db.execute(insert(ChangeLog.__table__), rows)
+
+
+async def compact_change_log(db: AsyncSession, retention_days: Optional[int] = None) -> int:
+    """Компакция журнала по политике выше. Возвращает количество удалённых записей."""
+    if retention_days is None:
+        retention_days = settings.CHANGE_LOG_RETENTION_DAYS
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    # 1. Старые записи, перекрытые более поздней записью той же сущности
+    newer = aliased(ChangeLog)
+    superseded = select(newer.seq).where(
+        newer.entity_type == ChangeLog.entity_type,
+        newer.entity_id == ChangeLog.entity_id,
+        newer.seq > ChangeLog.seq
+    ).exists()
+    result = await db.execute(
+        delete(ChangeLog).where(ChangeLog.created_at < cutoff, superseded)
+    )
+    removed = result.rowcount or 0
+
+    # 2. Старые удаления - сдвигаем горизонт
+    old_deletes = (ChangeLog.op == ChangeOp.DELETE.value, ChangeLog.created_at < cutoff)
+    max_deleted_seq = (await db.execute(select(func.max(ChangeLog.seq)).where(*old_deletes))).scalar()
+    if max_deleted_seq:
+        result = await db.execute(delete(ChangeLog).where(*old_deletes))
+        removed += result.rowcount or 0
+
+        horizon = await db.get(SystemSetting, HORIZON_SETTING_KEY)
+        if horizon is None:
+            db.add(SystemSetting(
+                key=HORIZON_SETTING_KEY,
+                value=str(max_deleted_seq),
+                value_type="number",
+                description="Seq горизонта компакции change_log (служебная)"
+            ))
+        elif int(horizon.value) < max_deleted_seq:
+            horizon.value = str(max_deleted_seq)
+
+    await db.commit()
+    return removed
+
+
+async def run_compaction() -> None:
+    """Компакция в отдельной сессии (фоновый запуск при старте приложения)"""
+    from database.core import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as db:
+            removed = await compact_change_log(db)
+        logger.info(f"change_log compaction removed {removed} entries")
+    except Exception as e:
+        logger.error(f"change_log compaction failed: {e}")
@@ -1,11 +1,13 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from config.settings import settings
+from utils.metrics import instrument_engine
 import logging
 
 # Disable aiosqlite debug spam
 logging.getLogger('aiosqlite').setLevel(logging.WARNING)
 
 engine = create_async_engine(settings.DB_URL, echo=False)
+instrument_engine(engine)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -0,0 +1,48 @@
+"""add delta sync support
+
+Revision ID: b2c3d4e5f6a7
+Revises: a1b2c3d4e5f6
+Create Date: 2026-01-12 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c3d4e5f6a7'
+down_revision: Union[str, Sequence[str], None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    - Add modified_at to assignments and tasks
+    - Create deleted_records (tombstones for /api/sync)
+    """
+    op.add_column('assignments', sa.Column('modified_at', sa.String(), nullable=True))
+    op.add_column('tasks', sa.Column('modified_at', sa.String(), nullable=True))
+
+    op.create_table(
+        'deleted_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('related_user_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deleted_records_deleted_at', 'deleted_records', ['deleted_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_deleted_records_deleted_at', table_name='deleted_records')
+    op.drop_table('deleted_records')
+    op.drop_column('tasks', 'modified_at')
+    op.drop_column('assignments', 'modified_at')
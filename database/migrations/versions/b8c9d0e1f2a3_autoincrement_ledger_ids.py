@@ -0,0 +1,96 @@
+"""autoincrement ids of payments, tasks and assignments
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-03-02 10:00:00.000000
+
+"""
+import os
+import sqlite3
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, Sequence[str], None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> префикс tracking_nr
+TRACKING_PREFIXES = {"payments": "P", "assignments": "A", "tasks": "T"}
+# Таблица -> колонка даты, определяющая месяц строки
+TRIGGER_COLUMNS = {"payments": "payment_date", "tasks": "start_time"}
+TRIGGER_EVENTS = (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",)))
+
+
+def _create_triggers() -> None:
+    """Пересоздание таблицы удаляет её триггеры - ставим заново"""
+    for table, prefix in TRACKING_PREFIXES.items():
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_tracking_nr "
+            f"AFTER INSERT ON {table} WHEN NEW.tracking_nr IS NULL "
+            f"BEGIN UPDATE {table} SET tracking_nr = '{prefix}' || NEW.id WHERE id = NEW.id; END"
+        )
+    for table, column in TRIGGER_COLUMNS.items():
+        for event_name, rows in TRIGGER_EVENTS:
+            months = ", ".join(f"substr({row}.{column}, 1, 7)" for row in rows)
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_closed_period_{event_name.lower()} "
+                f"BEFORE {event_name} ON {table} "
+                f"WHEN EXISTS (SELECT 1 FROM closed_periods WHERE period IN ({months})) "
+                f"BEGIN SELECT RAISE(ABORT, 'period_closed'); END"
+            )
+
+
+def _archived_max_ids() -> dict:
+    """Максимальные id в archive.db (utils/archive.py), если архив уже есть"""
+    from utils.archive import archive_path
+
+    path = archive_path(op.get_bind().engine.url)
+    if path is None or not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT max(id) FROM {table}").fetchone()[0] for table in TRACKING_PREFIXES}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    - Rebuild payments, tasks and assignments with AUTOINCREMENT: ids of deleted
+      or archived rows are never reused, so tracking_nr stays unique
+    - Seed sqlite_sequence with the archived max id
+    """
+    for table in TRACKING_PREFIXES:
+        with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+            pass
+
+    bind = op.get_bind()
+    for table, max_id in _archived_max_ids().items():
+        if max_id is None:
+            continue
+        updated = bind.execute(
+            sa.text("UPDATE sqlite_sequence SET seq = max(seq, :seq) WHERE name = :name"),
+            {"seq": max_id, "name": table}
+        )
+        if updated.rowcount == 0:
+            bind.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                         {"seq": max_id, "name": table})
+
+    _create_triggers()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKING_PREFIXES:
+        with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+            pass
+
+    _create_triggers()
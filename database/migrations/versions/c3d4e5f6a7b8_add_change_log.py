@@ -0,0 +1,63 @@
+"""add change_log
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2026-01-14 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, Sequence[str], None] = 'b2c3d4e5f6a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    - Create change_log (append-only, AUTOINCREMENT seq)
+    - Drop deleted_records: tombstones are now change_log entries with op=delete
+    """
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=30), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(length=10), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('counterparty_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_change_log_created_at', 'change_log', ['created_at'])
+    op.create_index('ix_change_log_entity', 'change_log', ['entity_type', 'entity_id'])
+
+    op.drop_index('ix_deleted_records_deleted_at', table_name='deleted_records')
+    op.drop_table('deleted_records')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        'deleted_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('related_user_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deleted_records_deleted_at', 'deleted_records', ['deleted_at'])
+
+    op.drop_index('ix_change_log_entity', table_name='change_log')
+    op.drop_index('ix_change_log_created_at', table_name='change_log')
+    op.drop_table('change_log')
@@ -0,0 +1,38 @@
+"""add insert sentinels
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-03-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d0e1f2a3b4'
+down_revision: Union[str, Sequence[str], None] = 'b8c9d0e1f2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблицы с пакетными вставками (database/bulk.py)
+SENTINEL_TABLES = ("payments", "assignments", "tasks")
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    - Nullable _sentinel column: lets batched INSERT ... RETURNING match ids
+      to parameter rows (sort_by_parameter_order) on SQLite
+    """
+    for table in SENTINEL_TABLES:
+        op.add_column(table, sa.Column('_sentinel', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # ALTER TABLE ... DROP COLUMN (SQLite 3.35+): пересоздание таблицы удалило бы триггеры
+    for table in SENTINEL_TABLES:
+        op.execute(f"ALTER TABLE {table} DROP COLUMN _sentinel")
@@ -0,0 +1,100 @@
+"""add period close
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-02-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, Sequence[str], None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> колонка даты, определяющая месяц строки
+TRIGGER_COLUMNS = {"payments": "payment_date", "tasks": "start_time"}
+TRIGGER_EVENTS = (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",)))
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    - closed_periods, period_monthly_snapshots, period_pair_balances
+    - Triggers rejecting changes to payments/tasks dated inside a closed month
+    """
+    op.create_table(
+        'closed_periods',
+        sa.Column('period', sa.String(length=7), nullable=False),
+        sa.Column('closed_by', sa.Integer(), nullable=True),
+        sa.Column('closed_at', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['closed_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('period')
+    )
+    op.create_table(
+        'period_monthly_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=7), nullable=False),
+        sa.Column('employer_id', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.Integer(), nullable=False),
+        sa.Column('worker_view', sa.Boolean(), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('hours', sa.Float(), nullable=False),
+        sa.Column('credit', sa.Float(), nullable=False),
+        sa.Column('salary', sa.Float(), nullable=False),
+        sa.Column('salary_paid', sa.Float(), nullable=False),
+        sa.Column('salary_unpaid', sa.Float(), nullable=False),
+        sa.Column('expenses', sa.Float(), nullable=False),
+        sa.Column('expenses_paid', sa.Float(), nullable=False),
+        sa.Column('expenses_unpaid', sa.Float(), nullable=False),
+        sa.Column('debt', sa.Float(), nullable=False),
+        sa.Column('bonus', sa.Float(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.ForeignKeyConstraint(['period'], ['closed_periods.period'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_period_monthly_snapshots_scope', 'period_monthly_snapshots',
+                    ['period', 'employer_id', 'worker_id', 'worker_view'], unique=True)
+    op.create_table(
+        'period_pair_balances',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=7), nullable=False),
+        sa.Column('creditor_id', sa.Integer(), nullable=False),
+        sa.Column('debtor_id', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('paid', sa.Float(), nullable=False),
+        sa.Column('salary', sa.Float(), nullable=False),
+        sa.Column('debt', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['period'], ['closed_periods.period'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_period_pair_balances_period', 'period_pair_balances', ['period'])
+
+    for table, column in TRIGGER_COLUMNS.items():
+        for event_name, rows in TRIGGER_EVENTS:
+            months = ", ".join(f"substr({row}.{column}, 1, 7)" for row in rows)
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_closed_period_{event_name.lower()} "
+                f"BEFORE {event_name} ON {table} "
+                f"WHEN EXISTS (SELECT 1 FROM closed_periods WHERE period IN ({months})) "
+                f"BEGIN SELECT RAISE(ABORT, 'period_closed'); END"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRIGGER_COLUMNS:
+        for event_name, _ in TRIGGER_EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_closed_period_{event_name.lower()}")
+
+    op.drop_index('ix_period_pair_balances_period', table_name='period_pair_balances')
+    op.drop_table('period_pair_balances')
+    op.drop_index('ux_period_monthly_snapshots_scope', table_name='period_monthly_snapshots')
+    op.drop_table('period_monthly_snapshots')
+    op.drop_table('closed_periods')
@@ -0,0 +1,53 @@
+"""add tracking_nr triggers
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-02-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a7b8c9d0e1'
+down_revision: Union[str, Sequence[str], None] = 'e5f6a7b8c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> префикс tracking_nr
+TRACKING_PREFIXES = {"payments": "P", "assignments": "A", "tasks": "T"}
+# Триггеры закрытых периодов запрещают UPDATE строк закрытых месяцев
+CLOSED_PERIOD_COLUMNS = {"payments": "payment_date", "tasks": "start_time"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, prefix in TRACKING_PREFIXES.items():
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_tracking_nr "
+            f"AFTER INSERT ON {table} WHEN NEW.tracking_nr IS NULL "
+            f"BEGIN UPDATE {table} SET tracking_nr = '{prefix}' || NEW.id WHERE id = NEW.id; END"
+        )
+
+    # Номера строкам, созданным без них (задания раньше номер не получали);
+    # на время заполнения снимаем UPDATE-триггеры закрытых периодов
+    for table in CLOSED_PERIOD_COLUMNS:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_closed_period_update")
+    for table, prefix in TRACKING_PREFIXES.items():
+        op.execute(f"UPDATE {table} SET tracking_nr = '{prefix}' || id WHERE tracking_nr IS NULL")
+    for table, column in CLOSED_PERIOD_COLUMNS.items():
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_closed_period_update "
+            f"BEFORE UPDATE ON {table} "
+            f"WHEN EXISTS (SELECT 1 FROM closed_periods WHERE period IN "
+            f"(substr(OLD.{column}, 1, 7), substr(NEW.{column}, 1, 7))) "
+            f"BEGIN SELECT RAISE(ABORT, 'period_closed'); END"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKING_PREFIXES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_tracking_nr")
@@ -4,7 +4,12 @@ from enum import Enum
 from typing import Optional
 
 from sqlalchemy import BigInteger, String, DateTime, Date, Time, func, Numeric, ForeignKey, Text, Boolean, Table, Column, Integer, TypeDecorator
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import DDL, Index, event, insert, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, orm_insert_sentinel, relationship
+from sqlalchemy.orm.attributes import get_history, set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from utils.tracking import TRACKING_PREFIXES
 
 
 class CleanDateTime(TypeDecorator):
@@ -51,6 +56,11 @@ class Base(DeclarativeBase):
     pass
 
 
+def _utcnow() -> datetime:
+    """Текущее UTC-время для onupdate на стороне Python (без expire атрибута после flush)"""
+    return datetime.now(timezone.utc)
+
+
 # ================================
 # RBAC: Roles, Permissions
 # ================================
@@ -270,6 +280,8 @@ class PaymentCategory(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    # AUTOINCREMENT: id (и tracking_nr P{id}) не переиспользуется после удаления или архивации
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     payer_id: Mapped[int] = mapped_column(ForeignKey("users.id"))  # Кто платит (работодатель)
@@ -285,6 +297,9 @@ class Payment(Base):
     tracking_nr: Mapped[Optional[str]] = mapped_column(String(20), unique=True, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     modified_at: Mapped[Optional[datetime]] = mapped_column(CleanDateTime(), nullable=True)
+    # Сентинел insertmanyvalues: пачка INSERT ... RETURNING сопоставляет id со строками
+    # параметров (sort_by_parameter_order) - у SQLite нет своего упорядоченного RETURNING
+    _sentinel: Mapped[int] = orm_insert_sentinel()
 
     payer: Mapped["User"] = relationship("User", foreign_keys=[payer_id], back_populates="payments_made")
     recipient: Mapped[Optional["User"]] = relationship("User", foreign_keys=[recipient_id], back_populates="payments_received")
@@ -371,6 +386,7 @@ class AssignmentType(str, Enum):
 class Assignment(Base):
     """Посещение/смена - родительская сущность для tasks"""
     __tablename__ = "assignments"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))  # Кто работал → users!
@@ -378,6 +394,8 @@ class Assignment(Base):
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     tracking_nr: Mapped[Optional[str]] = mapped_column(String(20), unique=True, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(CleanDateTime(), onupdate=_utcnow, nullable=True)
+    _sentinel: Mapped[int] = orm_insert_sentinel()
 
     worker: Mapped["User"] = relationship("User", back_populates="assignments")
     tasks: Mapped[list["Task"]] = relationship("Task", back_populates="assignment", order_by="Task.start_time")
@@ -417,6 +435,7 @@ class Assignment(Base):
 class Task(Base):
     """Рабочий или паузный сегмент внутри assignment"""
     __tablename__ = "tasks"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     assignment_id: Mapped[int] = mapped_column(ForeignKey("assignments.id"))
@@ -426,6 +445,8 @@ class Task(Base):
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     tracking_nr: Mapped[Optional[str]] = mapped_column(String(20), unique=True, nullable=True)  # Txxx
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(CleanDateTime(), onupdate=_utcnow, nullable=True)
+    _sentinel: Mapped[int] = orm_insert_sentinel()
 
     assignment: Mapped["Assignment"] = relationship("Assignment", back_populates="tasks")
 
@@ -444,3 +465,325 @@ class Task(Base):
     def __repr__(self) -> str:
         return f"<Task(id={self.id}, type={self.task_type}, start={self.start_time})>"
 
+
+
+# ================================
+# Change log
+# ================================
+
+class ChangeOp(str, Enum):
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class ChangeLog(Base):
+    """Append-only журнал изменений (монотонный seq) - основа для sync, кешей и fan-out"""
+    __tablename__ = "change_log"
+    # AUTOINCREMENT: seq не переиспользуется даже после компакции
+    __table_args__ = (
+        Index("ix_change_log_entity", "entity_type", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity_type: Mapped[str] = mapped_column(String(30))
+    entity_id: Mapped[int] = mapped_column(Integer)
+    op: Mapped[str] = mapped_column(String(10))  # insert, update, delete
+    actor_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Кто изменил (None - система/бот)
+    owner_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Чья сущность (плательщик / работник)
+    counterparty_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Получатель платежа
+    created_at: Mapped[datetime] = mapped_column(CleanDateTime(), default=_utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ChangeLog(seq={self.seq}, {self.op} {self.entity_type}#{self.entity_id})>"
+
+
+class EventOutboxEntry(Base):
+    """WebSocket событие процесса без диспетчера (бот): его рассылает процесс API (utils/event_outbox.py)"""
+    __tablename__ = "event_outbox"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    payload: Mapped[str] = mapped_column(Text)  # JSON: событие, получатели, ссылка на сущность
+    created_at: Mapped[datetime] = mapped_column(CleanDateTime(), default=_utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<EventOutboxEntry(id={self.id})>"
+
+
+# ================================
+# Report jobs
+# ================================
+
+class ReportJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ReportJob(Base):
+    """Фоновый отчёт: параметры, прогресс и файл результата под data/"""
+    __tablename__ = "report_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    kind: Mapped[str] = mapped_column(String(30))  # payments, balances_debug, monthly
+    format: Mapped[str] = mapped_column(String(10))  # ndjson, csv
+    params: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    status: Mapped[str] = mapped_column(String(10), default=ReportJobStatus.QUEUED.value)
+    owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)  # "host:pid:очередь" выполняющего
+    progress: Mapped[float] = mapped_column(default=0.0)  # 0..1
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    file_path: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(CleanDateTime(), default=_utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(CleanDateTime(), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ReportJob(id={self.id}, {self.kind}/{self.format}, {self.status})>"
+
+
+# ================================
+# Telegram bot
+# ================================
+
+class BotTimer(Base):
+    """Запущенный таймер бота: сообщение, которое обновляет планировщик (bot/timer_scheduler.py)"""
+    __tablename__ = "bot_timers"
+
+    telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_id: Mapped[int] = mapped_column(BigInteger)
+    start_ts: Mapped[datetime] = mapped_column(CleanDateTime())
+
+    def __repr__(self) -> str:
+        return f"<BotTimer(telegram_id={self.telegram_id}, message_id={self.message_id})>"
+
+
+# ================================
+# Period close
+# ================================
+
+class ClosedPeriod(Base):
+    """Закрытый месяц: платежи и задачи с датой внутри него менять нельзя (триггеры ниже)"""
+    __tablename__ = "closed_periods"
+
+    period: Mapped[str] = mapped_column(String(7), primary_key=True)  # "2025-09"
+    closed_by: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)
+    closed_at: Mapped[datetime] = mapped_column(CleanDateTime(), default=_utcnow)
+
+    def __repr__(self) -> str:
+        return f"<ClosedPeriod({self.period})>"
+
+
+class PeriodMonthlySnapshot(Base):
+    """Замороженная строка помесячной сводки (MonthlySummary) закрытого месяца для одного фильтра"""
+    __tablename__ = "period_monthly_snapshots"
+    __table_args__ = (
+        Index("ux_period_monthly_snapshots_scope", "period", "employer_id", "worker_id", "worker_view", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    period: Mapped[str] = mapped_column(String(7), ForeignKey("closed_periods.period", ondelete="CASCADE"))
+    # Фильтр сводки: 0 - без фильтра; worker_view - вид работника (без view_all_reports)
+    employer_id: Mapped[int] = mapped_column(Integer, default=0)
+    worker_id: Mapped[int] = mapped_column(Integer, default=0)
+    worker_view: Mapped[bool] = mapped_column(default=False)
+    sessions: Mapped[int] = mapped_column(Integer)
+    hours: Mapped[float]
+    credit: Mapped[float]
+    salary: Mapped[float]
+    salary_paid: Mapped[float]
+    salary_unpaid: Mapped[float]
+    expenses: Mapped[float]
+    expenses_paid: Mapped[float]
+    expenses_unpaid: Mapped[float]
+    debt: Mapped[float]
+    bonus: Mapped[float]
+    total: Mapped[float]
+    currency: Mapped[str] = mapped_column(String(3))
+
+
+class PeriodPairBalance(Base):
+    """Долг по паре (кредитор -> должник, валюта) на конец закрытого месяца, нарастающим итогом"""
+    __tablename__ = "period_pair_balances"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    period: Mapped[str] = mapped_column(String(7), ForeignKey("closed_periods.period", ondelete="CASCADE"),
+                                        index=True)
+    creditor_id: Mapped[int] = mapped_column(Integer)  # Плательщик (payer)
+    debtor_id: Mapped[int] = mapped_column(Integer)  # Получатель (recipient)
+    currency: Mapped[str] = mapped_column(String(3))
+    paid: Mapped[float]  # Долги + выплаченная зарплата
+    salary: Mapped[float]  # Начисленная зарплата (paid + offset)
+    debt: Mapped[float]  # max(0, paid - salary)
+
+
+# Текст ошибки триггера (sqlite3.IntegrityError) - API превращает его в 409
+PERIOD_CLOSED_ERROR = "period_closed"
+# Месяц платежа - payment_date, месяц задачи - start_time (как в помесячной сводке)
+CLOSED_PERIOD_COLUMNS = {"payments": "payment_date", "tasks": "start_time"}
+
+
+def closed_period_triggers(table: str) -> list:
+    """DDL триггеров, запрещающих INSERT/UPDATE/DELETE строк с датой в закрытом месяце"""
+    column = CLOSED_PERIOD_COLUMNS[table]
+    triggers = []
+    for event_name, rows in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+        months = ", ".join(f"substr({row}.{column}, 1, 7)" for row in rows)
+        triggers.append(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_closed_period_{event_name.lower()} "
+            f"BEFORE {event_name} ON {table} "
+            f"WHEN EXISTS (SELECT 1 FROM closed_periods WHERE period IN ({months})) "
+            f"BEGIN SELECT RAISE(ABORT, '{PERIOD_CLOSED_ERROR}'); END"
+        )
+    return triggers
+
+
+for _table in (Payment.__table__, Task.__table__):
+    for _ddl in closed_period_triggers(_table.name):
+        event.listen(_table, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+
+
+# ================================
+# Tracking numbers
+# ================================
+
+def tracking_nr_trigger(table: str) -> str:
+    """DDL триггера, проставляющего tracking_nr = префикс || id строке, вставленной без номера"""
+    prefix = TRACKING_PREFIXES[table]
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_tracking_nr "
+        f"AFTER INSERT ON {table} WHEN NEW.tracking_nr IS NULL "
+        f"BEGIN UPDATE {table} SET tracking_nr = '{prefix}' || NEW.id WHERE id = NEW.id; END"
+    )
+
+
+for _table in (Payment.__table__, Assignment.__table__, Task.__table__):
+    event.listen(_table, "after_create", DDL(tracking_nr_trigger(_table.name)).execute_if(dialect="sqlite"))
+
+
+@event.listens_for(Session, "after_flush")
+def _mirror_tracking_numbers(session, flush_context):
+    """Номер, выданный триггером, - в объекты сессии без повторного SELECT"""
+    for obj in session.new:
+        prefix = TRACKING_PREFIXES.get(getattr(obj, "__tablename__", None))
+        if prefix and obj.tracking_nr is None:
+            set_committed_value(obj, "tracking_nr", f"{prefix}{obj.id}")
+
+
+# Отслеживаемые сущности: класс -> entity_type
+TRACKED_ENTITIES = {
+    Payment: "payment",
+    PaymentCategory: "payment_category",
+    PaymentCategoryGroup: "payment_category_group",
+    Assignment: "assignment",
+    Task: "task",
+    EmploymentRelation: "employment",
+    User: "user",
+    Role: "role",
+    Permission: "permission",
+    RegistrationRequest: "registration_request",
+}
+
+
+def _change_owners(session, obj):
+    """(owner_id, counterparty_id) для фильтрации видимости при чтении журнала"""
+    if isinstance(obj, Payment):
+        return obj.payer_id, obj.recipient_id
+    if isinstance(obj, (Assignment, EmploymentRelation)):
+        return obj.user_id, None
+    if isinstance(obj, User):
+        return obj.id, None
+    if isinstance(obj, Task):
+        # Task не хранит работника напрямую - берём его из assignment в identity map (без SQL)
+        assignment = obj.__dict__.get("assignment") or session.identity_map.get(
+            identity_key(Assignment, obj.assignment_id))
+        if assignment is not None:
+            return assignment.user_id, None
+        return (
+            select(Assignment.user_id).where(Assignment.id == obj.assignment_id).scalar_subquery(),
+            None
+        )
+    return None, None
+
+
+def _previous_value(obj, key):
+    """Значение колонки до изменения в этом flush (None - не менялась)"""
+    deleted = get_history(obj, key).deleted
+    return deleted[0] if deleted else None
+
+
+def _previous_owners(session, obj):
+    """(owner_id, counterparty_id) до UPDATE, если кто-то из них потерял доступ к сущности.
+
+    Журнал фильтруется по текущим владельцам строки, поэтому без отдельной записи
+    прежний получатель платежа (или работник перенесённой смены) не узнал бы,
+    что сущность у него больше не видна.
+    """
+    if isinstance(obj, Payment):
+        old_payer, old_recipient = _previous_value(obj, "payer_id"), _previous_value(obj, "recipient_id")
+        if old_payer is None and old_recipient is None:
+            return None
+        previous = (old_payer if old_payer is not None else obj.payer_id,
+                    old_recipient if old_recipient is not None else obj.recipient_id)
+        if set(previous) - {None} <= {obj.payer_id, obj.recipient_id}:
+            return None
+        return previous
+    if isinstance(obj, (Assignment, EmploymentRelation)):
+        old_user = _previous_value(obj, "user_id")
+        return (old_user, None) if old_user is not None and old_user != obj.user_id else None
+    if isinstance(obj, Task):
+        old_assignment_id = _previous_value(obj, "assignment_id")
+        if old_assignment_id is None:
+            return None
+        assignment = session.identity_map.get(identity_key(Assignment, old_assignment_id))
+        if assignment is not None:
+            return assignment.user_id, None
+        return select(Assignment.user_id).where(Assignment.id == old_assignment_id).scalar_subquery(), None
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _record_changes(session, flush_context):
+    """Пишет change_log для всех изменений отслеживаемых сущностей в той же транзакции"""
+    actor_id = session.info.get("actor_id")
+    rows = []
+    for op, objects in (
+        (ChangeOp.INSERT, session.new),
+        (ChangeOp.UPDATE, session.dirty),
+        (ChangeOp.DELETE, session.deleted),
+    ):
+        for obj in objects:
+            entity_type = TRACKED_ENTITIES.get(type(obj))
+            if entity_type is None:
+                continue
+            if op is ChangeOp.UPDATE and not session.is_modified(obj):
+                continue
+            owners = [_change_owners(session, obj)]
+            if op is ChangeOp.UPDATE:
+                # Прежние владельцы получают свою запись: /sync отдаст им tombstone
+                previous = _previous_owners(session, obj)
+                if previous is not None:
+                    owners.append(previous)
+            for owner_id, counterparty_id in owners:
+                rows.append({
+                    "entity_type": entity_type,
+                    "entity_id": obj.id,
+                    "op": op.value,
+                    "actor_id": actor_id,
+                    "owner_id": owner_id,
+                    "counterparty_id": counterparty_id,
+                })
+    if not rows:
+        return
+    connection = session.connection()
+    plain = [row for row in rows if isinstance(row["owner_id"], (int, type(None)))]
+    if plain:
+        connection.execute(insert(ChangeLog.__table__), plain)
+    # Строки с owner_id из подзапроса вставляются по одной
+    for row in rows:
+        if not isinstance(row["owner_id"], (int, type(None))):
+            connection.execute(insert(ChangeLog.__table__).values(**row))
@@ -5,6 +5,7 @@ import { ExpandMore } from '@mui/icons-material';
 import axios from 'axios';
 import useIdleTimer from '../hooks/useIdleTimer';
 import FloatingTimer from './FloatingTimer';
+import { useWebSocket } from '../contexts/WebSocketContext';
 
 const NotificationContext = createContext();
 
@@ -23,27 +24,25 @@ function Layout({ onLogout }) {
   const [settingsAnchor, setSettingsAnchor] = useState(null);
   const [accountAnchor, setAccountAnchor] = useState(null);
   const [hasRequests, setHasRequests] = useState(false);
-  const [checkInterval, setCheckInterval] = useState(30);
+  const { subscribe, isConnected } = useWebSocket();
   // ActiveSession context is still used by FloatingTimer child component
 
   useEffect(() => {
     checkUserRole();
   }, []);
 
+  // Заявки на регистрацию: события по WebSocket вместо периодического опроса;
+  // после переподключения счётчик перечитывается (события за время разрыва потеряны)
   useEffect(() => {
-    if (isAdmin) {
-      loadCheckInterval();
-      checkRequests();
-    }
-  }, [isAdmin]);
-
-  useEffect(() => {
-    if (isAdmin && checkInterval) {
-      const intervalMs = checkInterval * 60 * 1000; // Переводим минуты в миллисекунды
-      const interval = setInterval(checkRequests, intervalMs);
-      return () => clearInterval(interval);
-    }
-  }, [isAdmin, checkInterval]);
+    if (!isAdmin) return undefined;
+    checkRequests();
+    return subscribe([
+      'registration_request_created',
+      'registration_request_approved',
+      'registration_request_rejected',
+      'registration_request_deleted'
+    ], checkRequests);
+  }, [isAdmin, subscribe, isConnected]);
 
   const checkUserRole = async () => {
     try {
@@ -55,38 +54,18 @@ function Layout({ onLogout }) {
       const isAdminUser = roles.includes('admin');
       setIsAdmin(isAdminUser);
       setUserName(response.data.full_name || response.data.username);
-
-      // Проверяем заявки при логине админа
-      if (isAdminUser) {
-        checkRequests();
-      }
     } catch (error) {
       console.error('Failed to get user info:', error);
     }
   };
 
-  const loadCheckInterval = async () => {
-    try {
-      const token = localStorage.getItem('token');
-      const response = await axios.get('/api/settings/requests_check_interval', {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setCheckInterval(parseInt(response.data.value)); // Значение в минутах
-    } catch (error) {
-      console.error('Failed to load check interval:', error);
-    }
-  };
-
-
-
   const checkRequests = async () => {
     try {
       const token = localStorage.getItem('token');
-      const response = await axios.get('/api/admin/registration-requests', {
+      const response = await axios.get('/api/admin/registration-requests/count', {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const pendingRequests = response.data.filter(r => r.status === 'pending');
-      setHasRequests(pendingRequests.length > 0);
+      setHasRequests(response.data.pending > 0);
     } catch (error) {
       console.error('Failed to check requests:', error);
     }
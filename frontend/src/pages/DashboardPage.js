@@ -77,7 +77,8 @@ function DashboardPage() {
     // Subscribe to WebSocket events for real-time updates (silent refresh)
     useEffect(() => {
         const unsubscribe = subscribe(
-            ['payment_created', 'payment_updated', 'payment_deleted', 'assignment_started', 'assignment_stopped'],
+            ['payment_created', 'payment_updated', 'payment_deleted', 'assignment_started', 'assignment_stopped',
+             'assignments_imported', 'payments_batch_created'],
             (event) => {
                 // Silent reload - no loading spinner
                 loadData(false);
@@ -429,7 +429,7 @@ function PaymentsPage() {
 
   // Subscribe to payment WebSocket events
   useEffect(() => {
-    const unsubscribe = subscribe(['payment_created', 'payment_updated', 'payment_deleted'], () => {
+    const unsubscribe = subscribe(['payment_created', 'payment_updated', 'payment_deleted', 'assignments_imported', 'payments_batch_created'], () => {
       loadPayments(true); // Silent refresh
     });
     return unsubscribe;
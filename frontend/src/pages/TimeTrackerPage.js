@@ -602,7 +602,8 @@ function TimeTrackerPage() {
         const events = [
             'assignment_started', 'assignment_stopped', 'assignment_updated', 'assignment_deleted',
             'task_created', 'task_updated', 'task_deleted',
-            'payment_created', 'payment_updated', 'payment_deleted'
+            'payment_created', 'payment_updated', 'payment_deleted',
+            'assignments_imported', 'payments_batch_created'
         ];
         const unsubscribe = subscribe(events, (event) => {
             loadData(true); // Silent refresh - no loading spinner
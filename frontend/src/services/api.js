@@ -113,6 +113,10 @@ export const balances = {
   getDebug: (params) => api.get('/balances/debug', { params })
 };
 
+export const sync = {
+  getChanges: (since) => api.get('/sync', { params: since ? { since } : {} })
+};
+
 export const settings = {
   getDebug: () => api.get('/settings/debug')
 };
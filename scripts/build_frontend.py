@@ -28,6 +28,10 @@ def main():
         
         build_dir = frontend_dir / "build"
         if build_dir.exists():
+            # .gz/.br рядом с файлами: сервер отдаёт их без сжатия на лету
+            sys.path.append(str(project_root))
+            from utils.static_assets import precompress_build
+            print(f"🗜️  Предварительно сжато файлов: {precompress_build(str(build_dir))}")
             print("✅ React приложение успешно собрано!")
             print(f"📁 Файлы находятся в: {build_dir}")
         else:
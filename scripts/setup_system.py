@@ -113,7 +113,6 @@ async def init_settings(session):
         {"key": "password_rules", "value": "Пароль должен содержать минимум 6 символов и 1 цифру", "value_type": "string", "description": "Требования к паролю"},
         {"key": "security_login_delay_enabled", "value": "true", "value_type": "boolean", "description": "Включить задержку при неверном входе (защита от перебора)"},
         {"key": "security_login_delay_seconds", "value": "1.0", "value_type": "number", "description": "Длительность задержки в секундах"},
-        {"key": "requests_check_interval", "value": "5", "value_type": "number", "description": "Интервал проверки новых заявок (минуты)"},
         # Debug settings for export button visibility
         {"key": "debug_export_json_admin", "value": "true", "value_type": "boolean", "description": "Показывать кнопку экспорта JSON для админов"},
         {"key": "debug_export_json_worker", "value": "false", "value_type": "boolean", "description": "Показывать кнопку экспорта JSON для работников"},
@@ -32,3 +32,40 @@ async def db_session():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
     await engine.dispose()
+
+
+@pytest.fixture
+def query_counter(db_session):
+    """Счётчик SQL-запросов движка db_session.
+
+    with query_counter() as counter:
+        await endpoint(...)
+    counter.assert_budget(max_statements=10, max_repeats=1)
+    """
+    from functools import partial
+    from utils.query_counter import count_queries
+    return partial(count_queries, db_session.bind)
+
+
+@pytest.fixture
+def session_factory(db_session):
+    """Фабрика сессий на движке db_session - для диспетчеров и кешей со своими сессиями"""
+    return async_sessionmaker(bind=db_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def worker(db_session):
+    """Работник (telegram_id 555) с трудовыми отношениями и категорией зарплаты"""
+    from decimal import Decimal
+    from database.models import EmploymentRelation, PaymentCategory, PaymentCategoryGroup, User
+
+    worker = User(username="worker", full_name="Worker", password_hash="hash", telegram_id=555, status="active")
+    group = PaymentCategoryGroup(name="Зарплата", code="salary")
+    db_session.add_all([worker, group])
+    await db_session.flush()
+    db_session.add_all([
+        PaymentCategory(name="Зарплата", group_id=group.id),
+        EmploymentRelation(user_id=worker.id, hourly_rate=Decimal("10"), currency="UAH"),
+    ])
+    await db_session.commit()
+    return worker
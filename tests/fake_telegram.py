@@ -0,0 +1,75 @@
+"""
+Локальный фейковый сервер Telegram Bot API для тестов бота.
+
+Подключается к Application как транспорт (ApplicationBuilder().request(...)):
+вызовы Bot API не уходят в сеть, а записываются в calls и получают
+правдоподобные ответы. make_update строит JSON входящего обновления - то, что
+Telegram присылает на вебхук.
+"""
+import json
+import time
+from itertools import count
+from typing import List, Optional, Tuple
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_INFO = {"id": 1, "is_bot": True, "first_name": "Nursia", "username": "nursia_bot",
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class FakeTelegram(BaseRequest):
+    def __init__(self):
+        self.calls: List[Tuple[str, dict]] = []
+        self._message_ids = count(1000)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def sent(self, method: str) -> List[dict]:
+        """Параметры всех вызовов метода Bot API"""
+        return [params for name, params in self.calls if name == method]
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((api_method, params))
+
+        if api_method == "getMe":
+            result = BOT_INFO
+        elif api_method in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "from": BOT_INFO,
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> dict:
+    """Входящее текстовое сообщение от пользователя chat_id (личный чат)"""
+    user = {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+            **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]}
+               if text.startswith("/") else {}),
+        },
+    }
@@ -0,0 +1,154 @@
+"""
+Test cold archive of closed periods (utils/archive.py)
+"""
+import json
+import os
+import random
+import sqlite3
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models import Assignment, Base, Payment, PeriodMonthlySnapshot, Task
+from utils.archive import archive_periods, archived_through, dispose_history_engines, history_session
+from utils.balance_diff import ADMIN, Viewer, diff_results, seed_random_ledger
+from utils.period_close import PeriodConflict, close_period, period_key, reopen_period
+from utils.timeutil import now_server
+
+
+def _months_back(count: int):
+    """(год, месяц) за count месяцев до текущего"""
+    now = now_server()
+    index = now.year * 12 + now.month - 1 - count
+    return index // 12, index % 12 + 1
+
+
+@pytest_asyncio.fixture
+async def archived_db(tmp_path):
+    """Файловая БД с реестром, закрытыми месяцами старше прошлого и архивом до них"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'nursia.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    async with session_factory() as db:
+        ledger = await seed_random_ledger(db, random.Random(4))
+        await db.execute(update(Task).where(Task.end_time == None).values(end_time=Task.start_time))
+        await db.commit()
+        for back in range(16, 1, -1):
+            await close_period(db, period_key(*_months_back(back)), closed_by=None, force=True)
+    yield engine, session_factory, ledger
+    await dispose_history_engines()
+    await engine.dispose()
+
+
+async def _counts(db):
+    return [(await db.execute(select(func.count(model.id)))).scalar() for model in (Payment, Task, Assignment)]
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_closed_rows_and_keeps_history(archived_db, tmp_path):
+    from api.routers.balances import get_balance_summary, get_mutual_balances
+
+    engine, session_factory, ledger = archived_db
+    through = period_key(*_months_back(2))
+    async with session_factory() as db:
+        before = await _counts(db)
+        max_payment_id = (await db.execute(select(func.max(Payment.id)))).scalar()
+        template = await db.get(Payment, max_payment_id)
+        summary = await get_balance_summary(employer_id=None, worker_id=None, db=db, current_user=ADMIN)
+        mutual = await get_mutual_balances(db=db, current_user=ADMIN)
+
+    moved = await archive_periods(engine, through)
+    assert moved["payments"] > 0 and moved["tasks"] > 0
+    assert os.path.exists(tmp_path / "archive.db")
+    assert archived_through(engine.url) == through
+
+    async with session_factory() as db:
+        # Горячий путь видит только живые строки
+        live = await _counts(db)
+        assert live == [count - moved[table] for count, table in zip(before, ("payments", "tasks", "assignments"))]
+        archive = sqlite3.connect(tmp_path / "archive.db")
+        assert archive.execute("SELECT count(*) FROM payments").fetchone()[0] == moved["payments"]
+        archive.close()
+
+        # История: UNION ALL с архивом, балансы нарастающим итогом не изменились
+        async with history_session(db) as source:
+            assert source is not db
+            assert await _counts(source) == before
+        assert diff_results(summary, await get_balance_summary(employer_id=None, worker_id=None, db=db,
+                                                               current_user=ADMIN)) == []
+        assert diff_results(mutual, await get_mutual_balances(db=db, current_user=ADMIN)) == []
+
+        # Диапазон после архива - обычная сессия
+        async with history_session(db, datetime.now() - timedelta(days=3)) as source:
+            assert source is db
+
+        # Живые платежи с максимальными id удалены - новый id всё равно не совпадает с архивным
+        await db.execute(delete(Payment).where(Payment.payment_date >= datetime(*_months_back(1), 1)))
+        payment = Payment(payer_id=template.payer_id, recipient_id=template.recipient_id,
+                          category_id=template.category_id, amount=Decimal("5.00"), currency="UAH",
+                          payment_date=now_server(), payment_status="paid")
+        db.add(payment)
+        await db.flush()
+        assert payment.id == max_payment_id + 1
+        await db.rollback()
+
+        with pytest.raises(PeriodConflict):
+            await reopen_period(db, through)
+
+
+@pytest.mark.asyncio
+async def test_monthly_without_snapshot_reads_archive(archived_db, monkeypatch, caplog):
+    from api.routers.balances import get_monthly_summary
+
+    engine, session_factory, ledger = archived_db
+    monkeypatch.setattr("config.settings.settings.BALANCE_SHADOW_ENGINE", "sql")
+    monkeypatch.setattr("config.settings.settings.BALANCE_SHADOW_SAMPLE_RATE", 1.0)
+
+    async def monthly(db):
+        return [await get_monthly_summary(employer_id=None, worker_id=worker_id, months=18, db=db,
+                                          current_user=ADMIN) for worker_id in ledger.worker_ids]
+
+    async with session_factory() as db:
+        # Фильтры без снимков (пара без общих платежей и т.п.) считаются движком
+        await db.execute(delete(PeriodMonthlySnapshot).where(PeriodMonthlySnapshot.worker_id != 0))
+        await db.commit()
+        before = await monthly(db)
+    await archive_periods(engine, period_key(*_months_back(2)))
+    async with session_factory() as db:
+        after = await monthly(db)
+    assert any(summary.hours for summaries in before for summary in summaries[2:])
+    assert diff_results(before, after) == []
+    # Теневой движок тоже считает перенесённые месяцы по архиву
+    assert "diverged" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_export_reads_archive(archived_db):
+    from api.routers.payments import get_payments
+
+    engine, session_factory, ledger = archived_db
+    admin = SimpleNamespace(id=0, is_admin=True)
+
+    async def export_ids(db, start_date=None):
+        response = await get_payments(skip=0, limit=None, category_id=None, start_date=start_date,
+                                      end_date=None, format="ndjson", db=db, current_user=admin)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return sorted(json.loads(line)["id"] for line in body.splitlines())
+
+    async with session_factory() as db:
+        everything = await export_ids(db)
+        recent_start = datetime(*_months_back(1), 1)
+        recent = await export_ids(db, recent_start)
+
+    await archive_periods(engine, period_key(*_months_back(2)))
+    async with session_factory() as db:
+        assert await export_ids(db) == everything
+        assert await export_ids(db, recent_start) == recent
+        # Второй перенос ничего не дублирует
+        await archive_periods(engine, period_key(*_months_back(2)))
+        assert await export_ids(db) == everything
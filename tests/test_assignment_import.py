@@ -0,0 +1,87 @@
+"""
+Test bulk shift import (POST /api/assignments/import)
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from unittest.mock import MagicMock
+
+from api.routers.assignments import (
+    AssignmentImportRequest, ImportShift, ManualTaskCreate, import_shifts, parse_import_csv
+)
+from database.models import Assignment, ChangeLog, Payment, Task
+
+START = datetime(2025, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def _admin():
+    return MagicMock(id=1, is_admin=True)
+
+
+def _shift(day: int, hours: int = 8, **kwargs) -> ImportShift:
+    start = START + timedelta(days=day)
+    return ImportShift(tasks=[
+        ManualTaskCreate(start_time=start, end_time=start + timedelta(hours=hours), description=f"day {day}"),
+        ManualTaskCreate(start_time=start + timedelta(hours=hours), end_time=start + timedelta(hours=hours, minutes=30),
+                         task_type="pause"),
+    ], **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_import_inserts_shifts_payments_and_change_log(db_session, worker, query_counter):
+    shifts = [_shift(day) for day in range(150)] + [ImportShift(assignment_type="vacation")]
+    with query_counter() as counter:
+        result = await import_shifts(AssignmentImportRequest(worker_id=worker.id, shifts=shifts),
+                                     db_session, _admin())
+    # Число запросов не зависит от числа смен
+    counter.assert_budget(max_statements=12, max_repeats=2)
+
+    assert result.imported_count == 151 and result.payments_count == 150
+    assert result.total_hours == 1200 and result.total_amount == 12000
+    first = result.assignments[0]
+    assert first.tracking_nr == f"A{first.assignment_id}" and first.payment_tracking_nr == f"P{first.payment_id}"
+
+    assignment = await db_session.get(Assignment, first.assignment_id)
+    payment = await db_session.get(Payment, first.payment_id)
+    assert assignment.tracking_nr == first.tracking_nr and payment.tracking_nr == first.payment_tracking_nr
+    assert payment.amount == Decimal("80.00") and payment.description == f"Смена {first.tracking_nr}: day 0"
+    assert (await db_session.execute(select(func.count(Task.id)))).scalar() == 300
+
+    logged = dict((await db_session.execute(
+        select(ChangeLog.entity_type, func.count()).group_by(ChangeLog.entity_type)
+    )).all())
+    assert logged["assignment"] == 151 and logged["task"] == 300 and logged["payment"] == 150
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_overlaps_without_writing(db_session, worker):
+    await import_shifts(AssignmentImportRequest(worker_id=worker.id, shifts=[_shift(0)]), db_session, _admin())
+    tracking_nr = (await db_session.execute(select(Assignment.tracking_nr))).scalar_one()
+
+    overlapping = [_shift(0, hours=2), _shift(5), _shift(5, hours=1), _shift(7)]
+    with pytest.raises(HTTPException) as exc:
+        await import_shifts(AssignmentImportRequest(worker_id=worker.id, shifts=overlapping),
+                            db_session, _admin())
+    assert exc.value.status_code == 400
+    assert f"Смена #1 пересекается с существующей {tracking_nr}" in exc.value.detail
+    assert "Смены #2 и #3 пересекаются" in exc.value.detail and "#4" not in exc.value.detail
+    assert (await db_session.execute(select(func.count(Assignment.id)))).scalar() == 1
+
+
+def test_parse_import_csv_groups_rows_into_shifts():
+    text = (
+        "shift,assignment_type,shift_description,start_time,end_time,task_type,description\n"
+        "a,,Склад,2025-03-01T08:00:00,2025-03-01T12:00:00,,утро\n"
+        "a,,,2025-03-01T12:00:00,2025-03-01T12:30:00,pause,\n"
+        "b,vacation,,,,,\n"
+    )
+    data = parse_import_csv(text, worker_id=5)
+    assert data.worker_id == 5 and len(data.shifts) == 2
+    assert data.shifts[0].description == "Склад" and [t.task_type for t in data.shifts[0].tasks] == ["work", "pause"]
+    assert data.shifts[1].assignment_type == "vacation" and data.shifts[1].tasks == []
+
+    with pytest.raises(HTTPException) as exc:
+        parse_import_csv("shift,start_time,end_time\na,вчера,2025-03-01T12:00:00\n", worker_id=5)
+    assert "Строка 2" in exc.value.detail
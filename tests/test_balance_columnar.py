@@ -0,0 +1,56 @@
+"""
+Test columnar NumPy balance engine (utils/balance_columnar.py) against the SQL reference
+"""
+import random
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+pytest.importorskip("numpy")
+
+from database.models import Payment
+from utils.balance_diff import ADMIN, diff_results, run_differential, seed_random_ledger
+from utils.balance_engines import get_active_engine, get_engine
+
+FIXTURES = sorted((Path(__file__).parent / "balance_fixtures").glob("*.json"))
+
+
+@pytest.mark.asyncio
+async def test_columnar_engine_matches_reference():
+    report = await run_differential(get_engine("numpy"), ledgers=3, seed=3, fixtures=FIXTURES)
+    assert report.calls > report.ledgers * 4
+    assert report.ok, report.divergences
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_rebuilt_when_data_changes(db_session):
+    engine = get_engine("numpy")
+    ledger = await seed_random_ledger(db_session, random.Random(9))
+    await db_session.commit()
+
+    snapshot = await engine.snapshots.get(db_session)
+    assert await engine.snapshots.get(db_session) is snapshot
+
+    # Новый платёж через ORM пишет change_log - версия меняется, снимок пересобирается
+    payment = await db_session.get(Payment, 1)
+    db_session.add(Payment(
+        payer_id=payment.payer_id, recipient_id=ledger.worker_ids[0], category_id=payment.category_id,
+        amount=Decimal("123.45"), currency="UAH", payment_date=datetime(2025, 1, 15, 12, 0),
+        payment_status="paid", tracking_nr="P-COLUMNAR",
+    ))
+    await db_session.commit()
+
+    assert await engine.snapshots.get(db_session) is not snapshot
+    reference = get_engine("sql")
+    assert diff_results(await reference.cards(db_session), await engine.cards(db_session)) == []
+    assert diff_results(await reference.summary(db_session, ADMIN), await engine.summary(db_session, ADMIN)) == []
+
+
+def test_unknown_engine_falls_back_to_reference(monkeypatch):
+    from config.settings import settings
+
+    monkeypatch.setattr(settings, "BALANCE_ENGINE", "missing")
+    assert get_active_engine().name == "sql"
+    monkeypatch.setattr(settings, "BALANCE_ENGINE", "numpy")
+    assert get_active_engine().name == "numpy"
@@ -0,0 +1,80 @@
+"""
+Test differential harness for balance engines (utils/balance_diff.py)
+"""
+import logging
+import random
+import pytest
+from pathlib import Path
+
+from utils.balance_diff import (
+    ADMIN, diff_results, run_differential, seed_random_ledger, shadow_compare,
+)
+from utils.balance_engines import SqlBalanceEngine, get_engine, register_engine
+from utils.metrics import balance_shadow_comparisons_total
+
+FIXTURES = sorted((Path(__file__).parent / "balance_fixtures").glob("*.json"))
+
+
+class DriftingMonthlyEngine(SqlBalanceEngine):
+    """Эталон с намеренной ошибкой: долг в первом месяце завышен на копейку"""
+    name = "test-drift"
+
+    async def monthly(self, db, current_user, employer_id=None, worker_id=None, months=12):
+        summaries = await super().monthly(db, current_user, employer_id, worker_id, months)
+        if summaries:
+            summaries[0] = summaries[0].model_copy(update={"debt": summaries[0].debt + 0.01})
+        return summaries
+
+
+def test_diff_results_reports_field_paths():
+    reference = {"cards": {"salary": 100.0, "debt": 20.0}, "monthly": [{"period": "2025-08", "total": 1.0}]}
+    assert diff_results(reference, {"cards": {"salary": 100.004, "debt": 20.0},
+                                    "monthly": [{"period": "2025-08", "total": 1.0}]}) == []
+    assert diff_results(reference, {"cards": {"salary": 100.0, "debt": 20.01},
+                                    "monthly": [{"period": "2025-09", "total": 1.0}, {}]}) == [
+        ".cards.debt: 20.0 != 20.01",
+        ".monthly: length 1 != 2",
+        ".monthly[0].period: '2025-08' != '2025-09'",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reference_engine_agrees_with_itself():
+    report = await run_differential(get_engine("sql"), ledgers=2, seed=1, fixtures=FIXTURES)
+    assert report.ledgers == len(FIXTURES) + 2
+    assert report.calls > report.ledgers * 4
+    assert report.ok, report.divergences
+
+
+@pytest.mark.asyncio
+async def test_divergence_is_reported_per_call_and_field():
+    report = await run_differential(DriftingMonthlyEngine(), ledgers=0, fixtures=FIXTURES[:1])
+    assert not report.ok
+    assert all(d.call.startswith("monthly(") for d in report.divergences)
+    assert any(".debt" in diff for d in report.divergences for diff in d.differences)
+
+
+@pytest.mark.asyncio
+async def test_shadow_mode_logs_divergence(db_session, monkeypatch, caplog):
+    from api.routers.balances import get_monthly_summary
+    from config.settings import settings
+
+    register_engine(DriftingMonthlyEngine())
+    monkeypatch.setattr(settings, "BALANCE_SHADOW_ENGINE", "test-drift")
+    monkeypatch.setattr(settings, "BALANCE_SHADOW_SAMPLE_RATE", 1.0)
+    ledger = await seed_random_ledger(db_session, random.Random(5))
+
+    before = balance_shadow_comparisons_total.get("test-drift", "monthly", "diverged")
+    with caplog.at_level(logging.WARNING, logger="nursia.balance_shadow"):
+        served = await get_monthly_summary(employer_id=None, worker_id=None, months=ledger.months,
+                                           db=db_session, current_user=ADMIN)
+
+    # Ответ не меняется, расхождение только логируется
+    assert served == await get_engine("sql").monthly(db_session, ADMIN, months=ledger.months)
+    assert balance_shadow_comparisons_total.get("test-drift", "monthly", "diverged") == before + 1
+    assert "diverged on monthly" in caplog.text
+
+    # Выключенный теневой режим ничего не пересчитывает
+    monkeypatch.setattr(settings, "BALANCE_SHADOW_ENGINE", "")
+    await shadow_compare("monthly", served, db=db_session, current_user=ADMIN, months=ledger.months)
+    assert balance_shadow_comparisons_total.get("test-drift", "monthly", "diverged") == before + 1
@@ -0,0 +1,68 @@
+"""
+Test telegram_id -> user cache and admin notification fan-out of the bot (bot/users.py)
+"""
+import pytest
+from sqlalchemy import select
+
+from database.models import Role, User
+
+telegram = pytest.importorskip("telegram")
+
+from bot.users import BotUserDirectory, notify_admins
+
+
+@pytest.fixture
+def directory(session_factory):
+    return BotUserDirectory(session_factory=session_factory, ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_directory_caches_users_and_registers_pending(db_session, directory, worker, query_counter):
+    db_session.add(Role(name="worker", type="business"))
+    await db_session.commit()
+
+    known = await directory.get(555)
+    assert known.id == worker.id and known.status == "active"
+    with query_counter() as counter:
+        assert await directory.get(555) == known
+    assert counter.count == 0
+
+    pending, created = await directory.register(777, "New User", "new_user")
+    assert created and pending.status == "pending" and not pending.is_admin
+    assert (await directory.register(777, "New User"))[1] is False
+
+    approved = await directory.set_status(777, "active")
+    assert approved.status == "active"
+    assert (await directory.get(777)).status == "active"
+    stored = (await db_session.execute(select(User).where(User.telegram_id == 777))).scalar_one()
+    await db_session.refresh(stored, ["roles"])
+    assert stored.username == "tg_777" and [r.name for r in stored.roles] == ["worker"]
+
+
+class FanOutBot:
+    """Бот для рассылки: chat_id из failing отвечают ошибкой"""
+
+    def __init__(self, failing=()):
+        self.sent = []
+        self.failing = set(failing)
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self.failing:
+            raise telegram.error.Forbidden("bot was blocked by the user")
+        self.sent.append(chat_id)
+
+
+@pytest.mark.asyncio
+async def test_notify_admins_survives_failed_chats(db_session, directory):
+    role = Role(name="admin", type="auth")
+    admins = [
+        User(username=f"admin{i}", full_name="Admin", password_hash="hash", telegram_id=100 + i,
+             status="active", roles=[role])
+        for i in range(3)
+    ]
+    db_session.add_all(admins)
+    await db_session.commit()
+
+    bot = FanOutBot(failing={101})
+    assert await notify_admins(bot, "New user", directory=directory) == 2
+    assert sorted(bot.sent) == [100, 102]
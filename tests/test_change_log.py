@@ -0,0 +1,108 @@
+"""
+Test append-only change log (written by the after_flush hook) and its compaction
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import select, update
+
+from database.models import User, Payment, PaymentCategory, Assignment, Task, ChangeLog
+from database.change_log import compact_change_log, get_horizon, get_latest_seq
+
+
+async def _entries(db):
+    result = await db.execute(select(ChangeLog).order_by(ChangeLog.seq))
+    return [(c.entity_type, c.op) for c in result.scalars().all()]
+
+
+@pytest.mark.asyncio
+async def test_mutations_are_logged_in_same_transaction(db_session):
+    db = db_session
+    worker = User(username="worker", full_name="Worker", password_hash="hash")
+    db.add(worker)
+    await db.commit()
+    db.info["actor_id"] = worker.id
+
+    assignment = Assignment(user_id=worker.id)
+    db.add(assignment)
+    await db.flush()
+    task = Task(assignment_id=assignment.id, start_time=datetime.now(timezone.utc))
+    db.add(task)
+    await db.commit()
+
+    task.description = "edited"
+    await db.commit()
+    await db.delete(task)
+    await db.commit()
+
+    assert await _entries(db) == [
+        ("user", "insert"),
+        ("assignment", "insert"),
+        ("task", "insert"),
+        ("task", "update"),
+        ("task", "delete"),
+    ]
+    last = (await db.execute(select(ChangeLog).order_by(ChangeLog.seq.desc()).limit(1))).scalar_one()
+    assert last.actor_id == worker.id
+    assert last.owner_id == worker.id
+
+    # Откат транзакции откатывает и записи журнала
+    seq_before = await get_latest_seq(db)
+    db.add(Assignment(user_id=worker.id))
+    await db.flush()
+    await db.rollback()
+    assert await get_latest_seq(db) == seq_before
+
+
+@pytest.mark.asyncio
+async def test_unchanged_dirty_objects_are_not_logged(db_session):
+    db = db_session
+    user = User(username="u", full_name="U", password_hash="hash")
+    db.add(user)
+    await db.commit()
+
+    user.full_name = "U"  # Присваивание того же значения
+    await db.commit()
+    assert await _entries(db) == [("user", "insert")]
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_latest_entry_and_moves_horizon(db_session):
+    db = db_session
+    admin = User(username="admin", full_name="Admin", password_hash="hash")
+    category = PaymentCategory(name="Зарплата")
+    db.add_all([admin, category])
+    await db.flush()
+    kept = Payment(payer_id=admin.id, category_id=category.id, amount=Decimal("1.00"),
+                   currency="UAH", payment_date=datetime.now(timezone.utc))
+    removed = Payment(payer_id=admin.id, category_id=category.id, amount=Decimal("2.00"),
+                      currency="UAH", payment_date=datetime.now(timezone.utc))
+    db.add_all([kept, removed])
+    await db.commit()
+    kept.amount = Decimal("3.00")
+    await db.commit()
+    await db.delete(removed)
+    await db.commit()
+    delete_seq = await get_latest_seq(db)
+
+    # Состариваем всю историю за пределы срока хранения
+    old = (datetime.now(timezone.utc) - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
+    await db.execute(update(ChangeLog).values(created_at=old))
+    await db.commit()
+
+    removed_count = await compact_change_log(db, retention_days=30)
+
+    # payment#kept: insert свёрнут в update; payment#removed: insert и delete удалены
+    remaining = (await db.execute(select(ChangeLog))).scalars().all()
+    assert {(c.entity_type, c.entity_id, c.op) for c in remaining} == {
+        ("user", admin.id, "insert"),
+        ("payment_category", category.id, "insert"),
+        ("payment", kept.id, "update"),
+    }
+    assert removed_count == 3
+    assert await get_horizon(db) == delete_seq
+
+    # seq не переиспользуется после компакции
+    db.add(Assignment(user_id=admin.id))
+    await db.commit()
+    assert await get_latest_seq(db) > delete_seq
@@ -0,0 +1,45 @@
+"""
+Test synthetic dataset generator (benchmarks.dataset): determinism and coverage
+"""
+import pytest
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from benchmarks.dataset import DatasetConfig, generate_dataset
+from database.models import Base, Payment, Assignment, PaymentGroupCode, PaymentStatus, AssignmentType
+
+
+async def _generate(config):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session_maker() as db:
+        stats = await generate_dataset(db, config)
+        payments = (await db.execute(
+            select(Payment.payer_id, Payment.recipient_id, Payment.category_id, Payment.amount,
+                   Payment.payment_date, Payment.payment_status, Payment.tracking_nr).order_by(Payment.id)
+        )).all()
+        assignment_types = set((await db.execute(select(Assignment.assignment_type))).scalars().all())
+    await engine.dispose()
+    return stats, payments, assignment_types
+
+
+@pytest.mark.asyncio
+async def test_dataset_is_deterministic_and_covers_all_groups():
+    config = DatasetConfig(workers=3, employers=2, years=1, seed=7, end_date=date(2026, 3, 31))
+
+    stats, payments, assignment_types = await _generate(config)
+    stats_again, payments_again, _ = await _generate(config)
+
+    assert payments == payments_again
+    assert stats == stats_again
+    assert stats.payments == len(payments)
+    assert set(stats.payments_by_group) == {code.value for code in PaymentGroupCode}
+    assert set(stats.payments_by_status) == {status.value for status in PaymentStatus}
+    assert assignment_types == {t.value for t in AssignmentType}
+
+    _, other_payments, _ = await _generate(DatasetConfig(workers=3, employers=2, years=1, seed=8,
+                                                         end_date=date(2026, 3, 31)))
+    assert other_payments != payments
@@ -0,0 +1,155 @@
+"""
+Test transactional WebSocket event outbox (utils/event_outbox.py)
+"""
+import json
+import pytest
+import pytest_asyncio
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from unittest.mock import AsyncMock, MagicMock
+
+from api.routers.websocket import ConnectionManager
+from database.models import Payment, PaymentCategory, PaymentCategoryGroup, User
+from utils.event_outbox import EntityRef, EventDispatcher, OutboxEvent, relay_to_api, stage_event
+from utils.timeutil import now_server
+
+ADMIN_ID = 99
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+
+
+@pytest_asyncio.fixture
+async def outbox(session_factory, monkeypatch):
+    """Диспетчер на БД теста и отдельный менеджер соединений"""
+    manager = ConnectionManager()
+    monkeypatch.setattr("api.routers.websocket.manager", manager)
+    monkeypatch.setattr("api.routers.websocket.get_admin_ids", AsyncMock(return_value=[ADMIN_ID]))
+    # relay_interval=0: опрос event_outbox на общем соединении теста откатывал бы его транзакции
+    dispatcher = EventDispatcher(session_factory=session_factory, queue_size=100, relay_interval=0)
+    monkeypatch.setattr("utils.event_outbox.event_dispatcher", dispatcher)
+    await dispatcher.start()
+    yield dispatcher, manager
+    await dispatcher.stop()
+
+
+async def _connect(manager, user_id, rich=False):
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, user_id, rich=rich)
+    return websocket
+
+
+@pytest.mark.asyncio
+async def test_endpoint_event_is_sent_after_commit(db_session, outbox):
+    from api.routers.payments import delete_payment
+
+    dispatcher, manager = outbox
+    group = PaymentCategoryGroup(name="Зарплата", code="salary")
+    payer = User(username="payer", full_name="Payer", password_hash="hash")
+    recipient = User(username="recipient", full_name="Recipient", password_hash="hash")
+    db_session.add_all([group, payer, recipient])
+    await db_session.flush()
+    category = PaymentCategory(name="Зарплата", group_id=group.id)
+    db_session.add(category)
+    await db_session.flush()
+    payment = Payment(payer_id=payer.id, recipient_id=recipient.id, category_id=category.id,
+                      amount=Decimal("10.00"), currency="UAH", payment_date=now_server(), payment_status="unpaid")
+    db_session.add(payment)
+    await db_session.commit()
+
+    recipient_socket, admin_socket, outsider = (
+        await _connect(manager, recipient.id), await _connect(manager, ADMIN_ID), await _connect(manager, 555))
+    admin = MagicMock(id=ADMIN_ID, is_admin=True)
+    await delete_payment(payment.id, db=db_session, current_user=admin)
+
+    await dispatcher.stop()  # Доставляет всё, что уже в очереди
+    expected = {"type": "payment_deleted", "payment_id": payment.id}
+    assert recipient_socket.sent == [expected] and admin_socket.sent == [expected]
+    assert outsider.sent == []
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_events_are_discarded(db_session, outbox):
+    dispatcher, manager = outbox
+    socket = await _connect(manager, 1)
+    db_session.add(User(username="taken", full_name="Taken", password_hash="hash"))
+    await db_session.commit()
+
+    stage_event(db_session, {"type": "user_created"}, user_ids=[1])
+    db_session.add(User(username="taken", full_name="Duplicate", password_hash="hash"))
+    with pytest.raises(IntegrityError):
+        await db_session.commit()
+    await db_session.rollback()
+
+    # Следующий успешный COMMIT не выпускает событие откатившейся транзакции
+    db_session.add(User(username="other", full_name="Other", password_hash="hash"))
+    await db_session.commit()
+    await dispatcher.stop()
+    assert socket.sent == []
+
+
+@pytest.mark.asyncio
+async def test_duplicates_are_coalesced_and_entities_loaded_for_rich_only(outbox):
+    dispatcher, manager = outbox
+    lean, rich = await _connect(manager, 1), await _connect(manager, ADMIN_ID, rich=True)
+    loader = AsyncMock(return_value={"payment": {"id": 7}})
+
+    updated = OutboxEvent({"type": "payment_updated", "payment_id": 7}, (1,), True, entity=loader)
+    lean_only = OutboxEvent({"type": "task_updated", "task_id": 3}, (1,), False, entity=loader)
+    await dispatcher.deliver([updated, lean_only, updated])
+
+    assert loader.await_count == 1  # Одно событие после схлопывания; task_updated не видят rich-подписчики
+    assert lean.sent == [{"type": "payment_updated", "payment_id": 7}, {"type": "task_updated", "task_id": 3}]
+    assert rich.sent == [{"type": "payment_updated", "payment_id": 7, "payment": {"id": 7}}]
+
+
+@pytest.mark.asyncio
+async def test_bot_process_events_are_relayed_by_api(db_session, session_factory, monkeypatch):
+    import api.routers.payments  # noqa: F401 - загрузчик сущности "payment"
+    from database.models import EventOutboxEntry
+
+    manager = ConnectionManager()
+    monkeypatch.setattr("api.routers.websocket.manager", manager)
+    monkeypatch.setattr("api.routers.websocket.get_admin_ids", AsyncMock(return_value=[]))
+
+    # Процесс бота: диспетчер не запущен, события уходят в event_outbox вместе с COMMIT
+    monkeypatch.setattr("utils.event_outbox.event_dispatcher", EventDispatcher(session_factory=session_factory))
+    relay_to_api()
+    group = PaymentCategoryGroup(name="Зарплата", code="salary")
+    worker = User(username="worker", full_name="Worker", password_hash="hash")
+    db_session.add_all([group, worker])
+    await db_session.flush()
+    category = PaymentCategory(name="Зарплата", group_id=group.id)
+    db_session.add(category)
+    await db_session.flush()
+    payment = Payment(payer_id=worker.id, recipient_id=worker.id, category_id=category.id,
+                      amount=Decimal("10.00"), currency="UAH", payment_date=now_server(), payment_status="unpaid")
+    db_session.add(payment)
+    await db_session.flush()
+    event = {"type": "payment_created", "payment_id": payment.id}
+    stage_event(db_session, event, user_ids=[worker.id], admins=False, entity=EntityRef("payment", payment.id))
+    await db_session.commit()
+
+    stage_event(db_session, {"type": "user_created"}, user_ids=[worker.id])
+    await db_session.rollback()
+    assert len((await db_session.execute(select(EventOutboxEntry))).scalars().all()) == 1
+
+    # Процесс API: диспетчер забирает строку и рассылает её с сущностью для rich-подписчика
+    api_dispatcher = EventDispatcher(session_factory=session_factory, queue_size=100, relay_interval=0)
+    monkeypatch.setattr("utils.event_outbox.event_dispatcher", api_dispatcher)
+    await api_dispatcher.start()
+    socket = await _connect(manager, worker.id, rich=True)
+    assert await api_dispatcher.relay_once(0) > 0
+    await api_dispatcher.stop()
+
+    assert len(socket.sent) == 1
+    assert socket.sent[0]["type"] == "payment_created" and socket.sent[0]["payment"]["id"] == payment.id
@@ -0,0 +1,76 @@
+"""
+Test streaming NDJSON/CSV export for /payments/ and /balances/debug
+"""
+import csv
+import io
+import json
+import random
+import pytest
+from unittest.mock import MagicMock
+
+from utils.balance_diff import ADMIN, seed_random_ledger
+
+
+def _admin_user():
+    user = MagicMock()
+    user.id = ADMIN.id
+    user.is_admin = True
+    user.is_worker = False
+    user.has_permission = lambda name: True
+    return user
+
+
+async def _read(response):
+    chunks = [chunk async for chunk in response.body_iterator]
+    return chunks, b"".join(chunks).decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_payments_csv_and_ndjson_match_json_list(db_session):
+    from api.routers.payments import PAYMENT_EXPORT_COLUMNS, get_payments
+
+    await seed_random_ledger(db_session, random.Random(3))
+    await db_session.commit()
+    params = dict(skip=0, limit=None, category_id=None, start_date=None, end_date=None,
+                  db=db_session, current_user=_admin_user())
+    payments = await get_payments(format="json", **params)
+
+    response = await get_payments(format="csv", **params)
+    assert response.media_type.startswith("text/csv")
+    assert 'filename="payments.csv"' in response.headers["content-disposition"]
+    chunks, text = await _read(response)
+    # Заголовок CSV уходит отдельным первым чанком, до строк из БД
+    assert chunks[0].decode("utf-8").strip() == ",".join(PAYMENT_EXPORT_COLUMNS)
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [int(row["id"]) for row in rows] == [p.id for p in payments]
+    assert [row["tracking_nr"] for row in rows] == [p.tracking_nr or "" for p in payments]
+
+    _, text = await _read(await get_payments(format="ndjson", **params))
+    records = [json.loads(line) for line in text.splitlines()]
+    assert [r["id"] for r in records] == [p.id for p in payments]
+    assert [r["amount"] for r in records] == [float(p.amount) for p in payments]
+
+
+@pytest.mark.asyncio
+async def test_debug_export_streams_sections_then_payments(db_session):
+    from api.routers.balances import get_debug_export
+
+    ledger = await seed_random_ledger(db_session, random.Random(4))
+    await db_session.commit()
+    params = dict(employer_id=None, worker_id=None, months=ledger.months, db=db_session,
+                  current_user=_admin_user())
+    document = await get_debug_export(format="json", **params)
+
+    _, text = await _read(await get_debug_export(format="ndjson", **params))
+    records = [json.loads(line) for line in text.splitlines()]
+    sections = [r.pop("section") for r in records]
+    assert sections[0] == "export"
+    assert sections[1] == "cards" and records[1] == document.cards.model_dump()
+    assert [r for s, r in zip(sections, records) if s == "monthly"] == [m.model_dump() for m in document.monthly]
+    assert [r for s, r in zip(sections, records) if s == "payments"] == \
+        [p.model_dump() for p in document.payments]
+    # Платежи идут последними
+    assert sections[-len(document.payments):] == ["payments"] * len(document.payments)
+
+    _, text = await _read(await get_debug_export(format="csv", **params))
+    assert [int(row["id"]) for row in csv.DictReader(io.StringIO(text))] == [p.id for p in document.payments]
@@ -0,0 +1,85 @@
+"""
+Test interval overlap engine (utils/intervals.py) and its use in assignment endpoints
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from unittest.mock import MagicMock
+
+from api.routers.assignments import (
+    ManualAssignmentCreate, ManualTaskCreate, TaskUpdate, create_manual_assignment, update_task
+)
+from database.models import Assignment, Task
+from utils.intervals import IntervalIndex, sweep_overlaps
+
+START = datetime(2025, 6, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def _at(hours: float) -> datetime:
+    return START + timedelta(hours=hours)
+
+
+def test_sweep_overlaps_pairs_and_adjacent_intervals():
+    intervals = [(_at(0), _at(2), "a"), (_at(2), _at(3), "b"), (_at(1), _at(1.5), "c"), (_at(5), None, "d"),
+                 (_at(6), _at(7), "e")]
+    # Смежные a и b не пересекаются; c внутри a; открытый d накрывает e
+    assert sweep_overlaps(intervals) == [("a", "c"), ("d", "e")]
+    # Время без зоны - UTC
+    assert sweep_overlaps([(_at(0).replace(tzinfo=None), _at(1).replace(tzinfo=None), 1), (_at(0.5), _at(2), 2)]) == [(1, 2)]
+
+
+def test_interval_index_finds_longest_reaching_interval():
+    index = IntervalIndex([(_at(0), _at(10), "long"), (_at(1), _at(2), "short"), (_at(20), None, "active")])
+    assert len(index) == 3
+    # short закончился раньше, но long всё ещё идёт
+    assert index.overlapping(_at(3), _at(4))[2] == "long"
+    assert index.overlapping(_at(10), _at(20)) is None
+    assert index.overlapping(_at(-2), _at(0)) is None
+    assert index.overlapping(_at(100), _at(101)) == (_at(20), None, "active")
+    assert index.overlapping(_at(15), None)[2] == "active"
+    assert IntervalIndex().overlapping(_at(0), _at(1)) is None
+
+
+@pytest.mark.asyncio
+async def test_manual_assignment_checks_existing_shifts(db_session, worker):
+    admin = MagicMock(id=1, is_admin=True)
+    first = await create_manual_assignment(ManualAssignmentCreate(worker_id=worker.id, tasks=[
+        ManualTaskCreate(start_time=_at(0), end_time=_at(4)),
+    ]), db_session, admin)
+
+    with pytest.raises(HTTPException) as exc:
+        await create_manual_assignment(ManualAssignmentCreate(worker_id=worker.id, tasks=[
+            ManualTaskCreate(start_time=_at(3), end_time=_at(6)),
+        ]), db_session, admin)
+    assert exc.value.detail == f"Смена пересекается с существующей {first.tracking_nr} (02.06 08:00-12:00)"
+
+    with pytest.raises(HTTPException) as exc:
+        await create_manual_assignment(ManualAssignmentCreate(worker_id=worker.id, tasks=[
+            ManualTaskCreate(start_time=_at(5), end_time=_at(7)),
+            ManualTaskCreate(start_time=_at(6), end_time=_at(8), task_type="pause"),
+        ]), db_session, admin)
+    assert exc.value.detail == "Задания #1 и #2 пересекаются по времени"
+
+    # Смежная смена допустима
+    await create_manual_assignment(ManualAssignmentCreate(worker_id=worker.id, tasks=[
+        ManualTaskCreate(start_time=_at(4), end_time=_at(6)),
+    ]), db_session, admin)
+
+
+@pytest.mark.asyncio
+async def test_update_task_compares_full_dates(db_session, worker):
+    assignment = Assignment(user_id=worker.id)
+    db_session.add(assignment)
+    await db_session.flush()
+    night = Task(assignment_id=assignment.id, start_time=_at(14), end_time=_at(20))  # 22:00-04:00
+    next_day = Task(assignment_id=assignment.id, start_time=_at(24), end_time=_at(25))
+    db_session.add_all([night, next_day])
+    await db_session.commit()
+    admin = MagicMock(id=1, is_admin=True)
+
+    # То же время суток, но другой день - не пересечение (раньше сравнивались только минуты)
+    await update_task(next_day.id, TaskUpdate(start_time=_at(23), end_time=_at(25)), db_session, admin)
+
+    with pytest.raises(HTTPException) as exc:
+        await update_task(next_day.id, TaskUpdate(start_time=_at(19)), db_session, admin)
+    assert exc.value.detail == "Время пересекается с другим сегментом (22:00-04:00)"
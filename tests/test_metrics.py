@@ -0,0 +1,99 @@
+"""
+Test metrics subsystem (per-route latency, SQL accounting, Prometheus output)
+"""
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from api.middleware.metrics import MetricsMiddleware
+from utils.metrics import (
+    Counter, Histogram, instrument_engine,
+    db_statements_per_request, http_requests_total, render_metrics,
+)
+
+
+def test_sql_statements_are_attributed_to_route():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    instrument_engine(engine)
+
+    mini = FastAPI()
+
+    @mini.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    mini.add_middleware(MetricsMiddleware)
+    client = TestClient(mini)
+
+    before = http_requests_total.get("GET", "/items/{item_id}", "200")
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/missing").status_code == 404
+
+    assert http_requests_total.get("GET", "/items/{item_id}", "200") == before + 2
+    assert http_requests_total.get("GET", "unmatched", "404") >= 1
+
+    output = render_metrics()
+    assert 'nursia_db_statements_per_request_bucket{method="GET",route="/items/{item_id}",le="2"}' in output
+    assert 'nursia_http_request_duration_seconds_count{method="GET",route="/items/{item_id}"}' in output
+
+
+def test_route_label_includes_router_prefix():
+    router = APIRouter(prefix="/widgets")
+
+    @router.get("/{widget_id}")
+    async def get_widget(widget_id: int):
+        return {"id": widget_id}
+
+    mini = FastAPI()
+    mini.include_router(router, prefix="/api")
+    mini.add_middleware(MetricsMiddleware)
+
+    before = http_requests_total.get("GET", "/api/widgets/{widget_id}", "200")
+    assert TestClient(mini).get("/api/widgets/1").status_code == 200
+    assert http_requests_total.get("GET", "/api/widgets/{widget_id}", "200") == before + 1
+
+
+def test_histogram_and_counter_rendering():
+    histogram = Histogram("test_latency", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = histogram.render()
+    assert 'test_latency_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_latency_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_latency_count{route="/a"} 3' in lines
+
+    counter = Counter("test_total", "Total", ("path",))
+    counter.inc('a"b')
+    assert 'test_total{path="a\\"b"} 1' in counter.render()
+
+
+def test_metrics_endpoint(monkeypatch):
+    from api.main import app
+
+    client = TestClient(app)
+    assert client.get("/api/metrics").status_code == 404  # По умолчанию выключено
+    monkeypatch.setattr("config.settings.settings.METRICS_ENABLED", True)
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE nursia_http_requests_total counter" in response.text
+    assert "nursia_websocket_connections 0" in response.text
+
+
+def test_metrics_endpoint_requires_scrape_token(monkeypatch):
+    from api.main import app
+
+    monkeypatch.setattr("config.settings.settings.METRICS_ENABLED", True)
+    monkeypatch.setattr("config.settings.settings.METRICS_TOKEN", "scrape-secret")
+    client = TestClient(app)
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
@@ -0,0 +1,111 @@
+"""
+Test batch payment creation (POST /api/payments/batch)
+"""
+import pytest
+import pytest_asyncio
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from unittest.mock import MagicMock
+
+from api.routers.payments import create_payment_batch, parse_payment_batch_csv
+from database.models import ChangeLog, ClosedPeriod, Currency, Payment, PaymentCategory, PaymentCategoryGroup, Role, User
+
+
+@pytest_asyncio.fixture
+async def ledger(db_session):
+    admin = User(username="admin", full_name="Admin", password_hash="hash",
+                 roles=[Role(name="admin", type="auth")])
+    worker = User(username="worker", full_name="Worker", password_hash="hash")
+    group = PaymentCategoryGroup(name="Расходы", code="expense")
+    db_session.add_all([admin, worker, group, Currency(code="EUR", name="Euro", symbol="€", is_default=True)])
+    await db_session.flush()
+    category = PaymentCategory(name="Продукты", group_id=group.id)
+    db_session.add(category)
+    await db_session.commit()
+    return {"admin": admin, "worker": worker, "category": category}
+
+
+def _admin(ledger):
+    return MagicMock(id=ledger["admin"].id, is_admin=True)
+
+
+def _row(ledger, day: int, **overrides) -> dict:
+    row = {"category_id": ledger["category"].id, "amount": "12.50", "payer_id": ledger["worker"].id,
+           "payment_date": f"2025-04-{day % 28 + 1:02d}T10:00:00"}
+    return {**row, **overrides}
+
+
+@pytest.mark.asyncio
+async def test_batch_resolves_references_once(db_session, ledger, query_counter):
+    rows = [_row(ledger, day) for day in range(200)]
+    rows.append(_row(ledger, 0, payer_id=ledger["admin"].id, recipient_id=ledger["worker"].id,
+                     currency="UAH", payment_status="paid"))
+    with query_counter() as counter:
+        response = await create_payment_batch(rows, db_session, _admin(ledger))
+    counter.assert_budget(max_statements=10, max_repeats=1)
+
+    assert response.created_count == 201 and response.invalid_count == 0
+    first, last = response.results[0], response.results[-1]
+    assert first.status == "created" and first.tracking_nr == f"P{first.id}"
+
+    worker_payment = await db_session.get(Payment, first.id)
+    assert worker_payment.tracking_nr == first.tracking_nr
+    # Валюта по умолчанию и получатель-админ для платежа работника - как в create_payment
+    assert worker_payment.currency == "EUR" and worker_payment.recipient_id == ledger["admin"].id
+    assert worker_payment.amount == Decimal("12.50") and worker_payment.paid_at is None
+    paid = await db_session.get(Payment, last.id)
+    assert paid.currency == "UAH" and paid.paid_at is not None
+
+    logged = (await db_session.execute(
+        select(func.count()).select_from(ChangeLog).where(ChangeLog.entity_type == "payment")
+    )).scalar()
+    assert logged == 201
+
+
+@pytest.mark.asyncio
+async def test_invalid_rows_block_batch_unless_skipped(db_session, ledger):
+    rows = [_row(ledger, 1), _row(ledger, 2, category_id=999), _row(ledger, 3, amount="-5"), _row(ledger, 4)]
+
+    response = await create_payment_batch(rows, db_session, _admin(ledger))
+    assert [r.status for r in response.results] == ["skipped", "invalid", "invalid", "skipped"]
+    assert "Категория 999" in response.results[1].error and response.results[2].error.startswith("amount")
+    assert (await db_session.execute(select(func.count(Payment.id)))).scalar() == 0
+
+    response = await create_payment_batch(rows, db_session, _admin(ledger), skip_invalid=True)
+    assert [r.status for r in response.results] == ["created", "invalid", "invalid", "created"]
+    assert (await db_session.execute(select(func.count(Payment.id)))).scalar() == 2
+
+
+@pytest.mark.asyncio
+async def test_created_ids_match_their_rows(db_session, ledger, query_counter):
+    rows = [_row(ledger, day, description=f"row {day}") for day in range(50)]
+    with query_counter() as counter:
+        response = await create_payment_batch(rows, db_session, _admin(ledger))
+    assert sum(statement.startswith("INSERT INTO payments") for statement in counter.statements) == 1
+
+    descriptions = dict((await db_session.execute(select(Payment.id, Payment.description))).all())
+    assert [descriptions[result.id] for result in response.results] == [row["description"] for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_rows_in_closed_period_are_invalid(db_session, ledger):
+    db_session.add(ClosedPeriod(period="2025-03"))
+    await db_session.commit()
+    rows = [_row(ledger, 1), _row(ledger, 2, payment_date="2025-03-15T10:00:00")]
+
+    response = await create_payment_batch(rows, db_session, _admin(ledger), skip_invalid=True)
+    assert [r.status for r in response.results] == ["created", "invalid"]
+    assert response.results[1].error == "Период 2025-03 закрыт"
+    assert (await db_session.execute(select(func.count(Payment.id)))).scalar() == 1
+
+
+def test_parse_payment_batch_csv():
+    rows = parse_payment_batch_csv(
+        "payment_date,amount,currency,category_id,payer_id,description\n"
+        "2025-04-01,10.00,,3,2,Хлеб\n"
+    )
+    assert rows == [{"payment_date": "2025-04-01", "amount": "10.00", "category_id": "3", "payer_id": "2",
+                     "description": "Хлеб"}]
+    with pytest.raises(HTTPException):
+        parse_payment_batch_csv("amount,bank_ref\n1,x\n")
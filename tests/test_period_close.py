@@ -0,0 +1,158 @@
+"""
+Test period close (utils/period_close.py, /api/balances/periods)
+"""
+import random
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database.models import Payment, PeriodMonthlySnapshot, PeriodPairBalance, Task
+from utils.balance_diff import ADMIN, Viewer, diff_results, seed_random_ledger
+from utils.balance_engines import get_engine
+from utils.period_close import PeriodConflict, close_period, monthly_with_snapshots, period_key, reopen_period
+from utils.timeutil import now_server
+
+
+def _previous_month():
+    last = now_server().replace(day=1) - timedelta(days=1)
+    return last.year, last.month
+
+
+def _months_back(count: int):
+    now = now_server()
+    index = now.year * 12 + now.month - 1 - count
+    return index // 12, index % 12 + 1
+
+
+async def _close_earlier(db):
+    """Месяцы закрываются по порядку: сначала все до прошлого"""
+    for back in range(16, 1, -1):
+        await close_period(db, period_key(*_months_back(back)), closed_by=None, force=True)
+
+
+async def _seed(db):
+    """Случайный реестр + платёж в прошлом месяце; незавершённые задачи завершаются"""
+    ledger = await seed_random_ledger(db, random.Random(5))
+    year, month = _previous_month()
+    payment = await db.get(Payment, 1)
+    db.add(Payment(
+        payer_id=ledger.employer_ids[0], recipient_id=ledger.worker_ids[0], category_id=payment.category_id,
+        amount=Decimal("100.00"), currency="UAH", payment_date=datetime(year, month, 10, 12, 0),
+        payment_status="unpaid", tracking_nr="P-PERIOD",
+    ))
+    await db.execute(update(Task).where(Task.end_time == None).values(end_time=Task.start_time))
+    await db.commit()
+    return ledger
+
+
+@pytest.mark.asyncio
+async def test_close_period_freezes_monthly(db_session):
+    ledger = await _seed(db_session)
+    engine = get_engine("sql")
+    worker = Viewer(id=ledger.worker_ids[0], is_worker=True)
+    before_admin = await engine.monthly(db_session, ADMIN, months=3)
+    before_worker = await engine.monthly(db_session, worker, months=3)
+
+    period = period_key(*_previous_month())
+    await _close_earlier(db_session)
+    # Неоплаченный платёж в месяце: закрыть можно только с force
+    with pytest.raises(PeriodConflict):
+        await close_period(db_session, period, closed_by=None)
+    await close_period(db_session, period, closed_by=None, force=True)
+
+    assert diff_results(before_admin, await monthly_with_snapshots(engine, db_session, ADMIN, None, None, 3)) == []
+    assert diff_results(before_worker, await monthly_with_snapshots(engine, db_session, worker, None, None, 3)) == []
+    pairs = (await db_session.execute(select(func.count(PeriodPairBalance.id)))).scalar()
+    assert pairs > 0
+
+    # Закрытый месяц читается из снимка, а не пересчитывается
+    await db_session.execute(
+        update(PeriodMonthlySnapshot)
+        .where(PeriodMonthlySnapshot.period == period, PeriodMonthlySnapshot.employer_id == 0,
+               PeriodMonthlySnapshot.worker_id == 0)
+        .values(total=12345.0)
+    )
+    frozen = await monthly_with_snapshots(engine, db_session, ADMIN, None, None, 3)
+    assert [s.total for s in frozen if s.period == period] == [12345.0]
+
+    await reopen_period(db_session, period)
+    assert (await db_session.execute(
+        select(func.count(PeriodMonthlySnapshot.id)).where(PeriodMonthlySnapshot.period == period)
+    )).scalar() == 0
+    assert diff_results(before_admin, await monthly_with_snapshots(engine, db_session, ADMIN, None, None, 3)) == []
+
+
+@pytest.mark.asyncio
+async def test_closed_period_rejects_changes(db_session):
+    await _seed(db_session)
+    year, month = _previous_month()
+    await _close_earlier(db_session)
+    await close_period(db_session, period_key(year, month), closed_by=None, force=True)
+
+    payment = (await db_session.execute(select(Payment).where(Payment.tracking_nr == "P-PERIOD"))).scalar_one()
+    payer_id, recipient_id, category_id = payment.payer_id, payment.recipient_id, payment.category_id
+    payment.payment_status = "paid"
+    with pytest.raises(IntegrityError, match="period_closed"):
+        await db_session.commit()
+    await db_session.rollback()
+
+    # Новый платёж с датой в закрытом месяце
+    db_session.add(Payment(
+        payer_id=payer_id, recipient_id=recipient_id, category_id=category_id,
+        amount=Decimal("1.00"), currency="UAH", payment_date=datetime(year, month, 5, 9, 0),
+        payment_status="paid", tracking_nr="P-LATE",
+    ))
+    with pytest.raises(IntegrityError, match="period_closed"):
+        await db_session.commit()
+    await db_session.rollback()
+
+    payment = (await db_session.execute(select(Payment).where(Payment.tracking_nr == "P-PERIOD"))).scalar_one()
+    await db_session.delete(payment)
+    with pytest.raises(IntegrityError, match="period_closed"):
+        await db_session.commit()
+    await db_session.rollback()
+
+    await reopen_period(db_session, period_key(year, month))
+    payment = (await db_session.execute(select(Payment).where(Payment.tracking_nr == "P-PERIOD"))).scalar_one()
+    payment.payment_status = "paid"
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_close_period_validation(db_session):
+    await _seed(db_session)
+    now = now_server()
+    with pytest.raises(PeriodConflict):
+        await close_period(db_session, period_key(now.year, now.month), closed_by=None)
+    with pytest.raises(ValueError):
+        await close_period(db_session, "2025-13", closed_by=None)
+    with pytest.raises(LookupError):
+        await reopen_period(db_session, "2020-01")
+
+    # Незавершённая задача в месяце не даёт закрыть его даже с force
+    year, month = _previous_month()
+    task = (await db_session.execute(select(Task))).scalars().first()
+    task.start_time = datetime(year, month, 3, 8, 0)
+    task.end_time = None
+    await db_session.commit()
+    with pytest.raises(PeriodConflict):
+        await close_period(db_session, period_key(year, month), closed_by=None, force=True)
+
+
+@pytest.mark.asyncio
+async def test_periods_close_forward_and_reopen_backward(db_session):
+    await _seed(db_session)
+    previous, before = period_key(*_months_back(1)), period_key(*_months_back(2))
+    # Снимки нарастающие: прошлый месяц нельзя закрыть раньше предыдущих
+    with pytest.raises(PeriodConflict, match=before):
+        await close_period(db_session, previous, closed_by=None, force=True)
+
+    await _close_earlier(db_session)
+    await close_period(db_session, previous, closed_by=None, force=True)
+    with pytest.raises(PeriodConflict, match=previous):
+        await reopen_period(db_session, before)
+
+    await reopen_period(db_session, previous)
+    await reopen_period(db_session, before)
@@ -0,0 +1,234 @@
+"""
+Query budgets per route: a regression in the number of SQL statements
+(or a new N+1 loop) fails the build.
+
+Budgets are declared in QUERY_BUDGETS. max_repeats limits how often one
+statement shape may run in a single call; routes with a known per-item loop
+carry an explicit allowance until that loop is removed.
+"""
+import pytest
+import pytest_asyncio
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Optional
+from unittest.mock import MagicMock
+
+from database.models import (
+    User, Payment, PaymentCategory, PaymentCategoryGroup, Assignment, Task, EmploymentRelation
+)
+from utils.timeutil import now_server
+
+BALANCE_ENGINES = ("numpy", "sql")
+
+
+@dataclass
+class QueryBudget:
+    max_statements: int
+    max_repeats: Optional[int] = 1
+
+
+# Значения соответствуют текущей реализации на наборе данных ниже (2 работника, 3 месяца)
+QUERY_BUDGETS = {
+    "GET /payments/": QueryBudget(1),
+    # INSERT ... RETURNING, change_log, связи для ответа (до COMMIT, без повторного SELECT после)
+    "POST /payments/": QueryBudget(3),
+    "GET /assignments/grouped": QueryBudget(2),
+    # Балансы - по движку (settings.BALANCE_ENGINE). numpy: max(seq) change_log и
+    # загрузка снимка (холодный кеш) + поиск снимков закрытых месяцев для monthly
+    "GET /balances/summary [numpy]": QueryBudget(6),
+    "GET /balances/monthly [numpy]": QueryBudget(7),
+    "GET /balances/mutual [numpy]": QueryBudget(6),
+    # sql (эталон): одна форма запроса с разными статусами/группами
+    "GET /balances/summary [sql]": QueryBudget(12, max_repeats=4),
+    # Известные N+1 эталона: 15 запросов на месяц (months=6) + снимки закрытых месяцев / запросы на пару
+    "GET /balances/monthly [sql]": QueryBudget(6 * 15 + 1, max_repeats=6 * 2),
+    "GET /balances/mutual [sql]": QueryBudget(9, max_repeats=4),
+    "POST /payments/bulk-delete": QueryBudget(6, max_repeats=4),
+    "POST /assignments/assignment/bulk-delete": QueryBudget(7, max_repeats=4),
+}
+
+
+def _admin_user(user_id):
+    user = MagicMock()
+    user.id = user_id
+    user.is_admin = True
+    user.has_permission = lambda name: True
+    return user
+
+
+def _use_engine(monkeypatch, name):
+    """Явный движок балансов: бюджеты numpy и sql различаются"""
+    from utils.balance_engines import available_engines
+
+    if name not in available_engines():
+        pytest.skip(f"Balance engine {name!r} is not available")
+    monkeypatch.setattr("config.settings.settings.BALANCE_ENGINE", name)
+
+
+@pytest_asyncio.fixture
+async def ledger(db_session, monkeypatch):
+    """Два работника, по несколько платежей всех групп за 3 месяца и смены с задачами"""
+    # Незапущенный диспетчер: события после COMMIT отбрасываются и не добавляют запросов
+    from utils.event_outbox import EventDispatcher
+    monkeypatch.setattr("utils.event_outbox.event_dispatcher", EventDispatcher())
+
+    db = db_session
+    admin = User(username="admin", full_name="Admin", password_hash="hash")
+    workers = [User(username=f"worker{i}", full_name=f"Worker {i}", password_hash="hash") for i in range(2)]
+    db.add_all([admin] + workers)
+    await db.flush()
+
+    categories = {}
+    for code in ("salary", "expense", "debt", "bonus", "repayment"):
+        group = PaymentCategoryGroup(name=code, code=code)
+        db.add(group)
+        await db.flush()
+        categories[code] = PaymentCategory(name=code, group_id=group.id)
+        db.add(categories[code])
+    await db.flush()
+
+    now = now_server().replace(microsecond=0)
+    payments, assignments = [], []
+    for worker in workers:
+        db.add(EmploymentRelation(user_id=worker.id, hourly_rate=Decimal("10"), currency="UAH"))
+        for month in range(3):
+            moment = now - timedelta(days=30 * month)
+            for code, status in (("salary", "paid"), ("salary", "unpaid"), ("expense", "unpaid"),
+                                 ("debt", "paid"), ("bonus", "paid"), ("repayment", "paid")):
+                payer, recipient = (worker, admin) if code in ("expense", "repayment") else (admin, worker)
+                payments.append(Payment(
+                    payer_id=payer.id, recipient_id=recipient.id, category_id=categories[code].id,
+                    amount=Decimal("100.00"), currency="UAH", payment_date=moment, payment_status=status
+                ))
+            assignment = Assignment(user_id=worker.id)
+            db.add(assignment)
+            await db.flush()
+            db.add(Task(assignment_id=assignment.id, start_time=moment - timedelta(hours=8), end_time=moment))
+            assignments.append(assignment)
+    db.add_all(payments)
+    await db.commit()
+    return {"admin": admin, "payments": payments, "assignments": assignments}
+
+
+@pytest.mark.asyncio
+async def test_get_payments_budget(db_session, ledger, query_counter):
+    from api.routers.payments import get_payments
+
+    with query_counter() as counter:
+        result = await get_payments(skip=0, limit=None, category_id=None, start_date=None, end_date=None,
+                                    db=db_session, current_user=_admin_user(ledger["admin"].id))
+    assert len(result) == len(ledger["payments"])
+    budget = QUERY_BUDGETS["GET /payments/"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+async def test_create_payment_budget(db_session, ledger, query_counter):
+    from api.routers.payments import create_payment
+    from api.schemas.payment import PaymentCreate
+
+    admin, worker = ledger["admin"], ledger["payments"][0].recipient_id
+    payment = PaymentCreate(category_id=ledger["payments"][0].category_id, amount=Decimal("5.00"), currency="UAH",
+                            payment_date=now_server(), payer_id=admin.id, recipient_id=worker)
+    with query_counter() as counter:
+        result = await create_payment(payment, db=db_session, current_user=_admin_user(admin.id))
+    assert result.tracking_nr == f"P{result.id}"
+    assert result.category.category_group is not None
+    assert result.payer.id == admin.id and result.recipient.id == worker
+    budget = QUERY_BUDGETS["POST /payments/"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+async def test_grouped_assignments_budget(db_session, ledger, query_counter):
+    from api.routers.assignments import get_grouped_sessions
+
+    with query_counter() as counter:
+        result = await get_grouped_sessions(worker_id=None, employer_id=None, period="all", limit=None, offset=0,
+                                            db=db_session, current_user=_admin_user(ledger["admin"].id))
+    assert len(result) == len(ledger["assignments"])
+    budget = QUERY_BUDGETS["GET /assignments/grouped"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("engine", BALANCE_ENGINES)
+async def test_balance_summary_budget(db_session, ledger, query_counter, monkeypatch, engine):
+    from api.routers.balances import get_balance_summary
+
+    _use_engine(monkeypatch, engine)
+    with query_counter() as counter:
+        await get_balance_summary(employer_id=None, worker_id=None,
+                                  db=db_session, current_user=_admin_user(ledger["admin"].id))
+    budget = QUERY_BUDGETS[f"GET /balances/summary [{engine}]"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("engine", BALANCE_ENGINES)
+async def test_monthly_summary_budget(db_session, ledger, query_counter, monkeypatch, engine):
+    from api.routers.balances import get_monthly_summary
+
+    _use_engine(monkeypatch, engine)
+    with query_counter() as counter:
+        await get_monthly_summary(employer_id=None, worker_id=None, months=6,
+                                  db=db_session, current_user=_admin_user(ledger["admin"].id))
+    budget = QUERY_BUDGETS[f"GET /balances/monthly [{engine}]"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("engine", BALANCE_ENGINES)
+async def test_mutual_balances_budget(db_session, ledger, query_counter, monkeypatch, engine):
+    from api.routers.balances import get_mutual_balances
+
+    _use_engine(monkeypatch, engine)
+    with query_counter() as counter:
+        await get_mutual_balances(db=db_session, current_user=_admin_user(ledger["admin"].id))
+    budget = QUERY_BUDGETS[f"GET /balances/mutual [{engine}]"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_payments_budget(db_session, ledger, query_counter):
+    from api.routers.payments import bulk_delete_payments, BulkDeleteRequest
+
+    ids = [p.id for p in ledger["payments"][:4]]
+    with query_counter() as counter:
+        result = await bulk_delete_payments(BulkDeleteRequest(ids=ids), db=db_session,
+                                            current_user=_admin_user(ledger["admin"].id))
+    assert result.deleted_count == 4
+    budget = QUERY_BUDGETS["POST /payments/bulk-delete"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_assignments_budget(db_session, ledger, query_counter):
+    from api.routers.assignments import bulk_delete_assignments, BulkDeleteRequest
+
+    ids = [a.id for a in ledger["assignments"][:4]]
+    with query_counter() as counter:
+        result = await bulk_delete_assignments(BulkDeleteRequest(ids=ids), db=db_session,
+                                               current_user=_admin_user(ledger["admin"].id))
+    assert result.deleted_count == 4
+    budget = QUERY_BUDGETS["POST /assignments/assignment/bulk-delete"]
+    counter.assert_budget(budget.max_statements, budget.max_repeats)
+
+
+def test_repeated_shapes_are_flagged():
+    from utils.query_counter import QueryCounter, QueryBudgetExceeded
+
+    counter = QueryCounter([
+        "SELECT * FROM payments WHERE id = ?",
+        "SELECT * FROM payments WHERE id = ?",
+        "SELECT * FROM payments WHERE id IN (?, ?, ?)",
+        "SELECT * FROM payments WHERE id IN (?)",
+    ])
+    assert counter.repeated_shapes() == {
+        "SELECT * FROM payments WHERE id = ?": 2,
+        "SELECT * FROM payments WHERE id IN (?)": 2,
+    }
+    counter.assert_budget(max_statements=4)
+    with pytest.raises(QueryBudgetExceeded, match="2x"):
+        counter.assert_budget(max_statements=4, max_repeats=1)
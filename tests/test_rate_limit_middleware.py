@@ -0,0 +1,102 @@
+"""
+Test GCRA rate limiting backends and API middleware (utils/rate_limit.py, api/middleware/rate_limit.py)
+"""
+import sqlite3
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.auth.oauth import create_access_token
+from api.middleware.rate_limit import RateLimitMiddleware
+from utils.rate_limit import MemoryRateLimiter, RatePolicy, SQLiteRateLimiter
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryRateLimiter()
+    else:
+        backend = SQLiteRateLimiter(str(tmp_path / "rate_limits.db"))
+        yield backend
+        backend.close()
+
+
+def test_gcra_allows_burst_then_one_per_interval(limiter):
+    policy = RatePolicy(limit=3, window=3)
+    assert [limiter.hit("k", policy, now=100.0)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.hit("k", policy, now=100.5)
+    assert not allowed and retry_after == pytest.approx(0.5)
+    # Через интервал (window / limit) проходит ровно один запрос
+    assert limiter.hit("k", policy, now=101.0)[0]
+    assert not limiter.hit("k", policy, now=101.0)[0]
+    # Другие ключи независимы
+    assert limiter.hit("other", policy, now=101.0)[0]
+
+
+def test_shared_sqlite_backend_between_instances(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    first, second = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+    policy = RatePolicy(limit=2, window=60)
+    assert first.hit("ip:1", policy, now=0)[0] and second.hit("ip:1", policy, now=1)[0]
+    assert not first.hit("ip:1", policy, now=2)[0]
+    first.close()
+    second.close()
+
+
+def test_sqlite_backend_fails_open_when_file_is_locked(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    limiter = SQLiteRateLimiter(path, busy_timeout_ms=20)
+    policy = RatePolicy(limit=1, window=60)
+    # Другой процесс держит блокировку записи
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    started = time.monotonic()
+    assert limiter.hit("ip:1", policy, now=0) == (True, 0.0)
+    assert time.monotonic() - started < 1
+    assert limiter.failed_open == 1
+
+    other.execute("COMMIT")
+    other.close()
+    assert limiter.hit("ip:1", policy, now=1)[0]
+    assert not limiter.hit("ip:1", policy, now=2)[0]
+    limiter.close()
+
+def test_memory_backend_memory_is_bounded():
+    limiter = MemoryRateLimiter(max_keys=10)
+    policy = RatePolicy(limit=1, window=60)
+    for key in range(100):
+        limiter.hit(str(key), policy, now=0)
+    assert len(limiter._tat) <= 10
+
+
+def test_middleware_applies_route_policies_per_client():
+    app = FastAPI()
+
+    @app.post("/api/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/api/payments/")
+    async def payments():
+        return {"ok": True}
+
+    policies = (("POST", "/api/auth/login", RatePolicy(2, 60)), (None, "/api/", RatePolicy(100, 60)))
+    app.add_middleware(RateLimitMiddleware, policies=policies, limiter=MemoryRateLimiter())
+    client = TestClient(app)
+
+    assert [client.post("/api/auth/login").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.post("/api/auth/login")
+    assert response.json()["detail"].startswith("Слишком много запросов")
+    assert int(response.headers["Retry-After"]) >= 1
+    # Остальные маршруты - своя политика; авторизованный пользователь - свой ключ
+    assert client.get("/api/payments/").status_code == 200
+    token = create_access_token({"sub": "7"})
+    assert client.post("/api/auth/login", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_telegram_webhook_is_exempt_from_default_policies():
+    middleware = RateLimitMiddleware(FastAPI())
+    assert middleware.policy_for("POST", "/api/telegram/webhook") is None
+    assert middleware.policy_for("GET", "/api/telegram/webhook") is not None
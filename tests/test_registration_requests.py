@@ -0,0 +1,94 @@
+"""
+Test registration request events and the pending request counter (utils/registration_requests.py)
+"""
+import json
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from api.routers.admin import (
+    ApproveRequest, approve_registration, delete_registration_request, get_registration_requests_count,
+    reject_registration,
+)
+from api.routers.auth import register
+from api.routers.websocket import ConnectionManager
+from api.schemas.auth import UserRegister
+from database.models import RegistrationRequest, Role
+from utils.event_outbox import EventDispatcher
+from utils.registration_requests import PendingRequestCounter
+
+ADMIN_ID = 99
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+
+
+@pytest_asyncio.fixture
+async def outbox(session_factory, monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr("api.routers.websocket.manager", manager)
+    monkeypatch.setattr("api.routers.websocket.get_admin_ids", AsyncMock(return_value=[ADMIN_ID]))
+    # relay_interval=0: опрос event_outbox на общем соединении теста откатывал бы его транзакции
+    dispatcher = EventDispatcher(session_factory=session_factory, queue_size=100, relay_interval=0)
+    monkeypatch.setattr("utils.event_outbox.event_dispatcher", dispatcher)
+    monkeypatch.setattr("utils.registration_requests.pending_requests", PendingRequestCounter())
+    await dispatcher.start()
+    yield dispatcher, manager
+    await dispatcher.stop()
+
+
+def _user_data(username):
+    return UserRegister(username=username, password="secret1", full_name=username.title())
+
+
+@pytest.mark.asyncio
+async def test_register_and_review_publish_events_to_admins(db_session, outbox):
+    dispatcher, manager = outbox
+    db_session.add(Role(name="worker", type="business"))
+    await db_session.commit()
+    admin_socket, worker_socket = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(admin_socket, ADMIN_ID)
+    await manager.connect(worker_socket, 5)
+    admin = MagicMock(id=ADMIN_ID, is_admin=True)
+
+    first = await register(_user_data("anna"), db=db_session)
+    second = await register(_user_data("boris"), db=db_session)
+    third = await register(_user_data("vera"), db=db_session)
+    await approve_registration(first.id, ApproveRequest(), db=db_session, current_user=admin)
+    await reject_registration(second.id, db=db_session, current_user=admin)
+    await delete_registration_request(third.id, db=db_session, current_user=admin)
+
+    await dispatcher.stop()  # Доставляет всё, что уже в очереди
+    assert [(e["type"], e["username"]) for e in admin_socket.sent] == [
+        ("registration_request_created", "anna"),
+        ("registration_request_created", "boris"),
+        ("registration_request_created", "vera"),
+        ("registration_request_approved", "anna"),
+        ("registration_request_rejected", "boris"),
+        ("registration_request_deleted", "vera"),
+    ]
+    assert worker_socket.sent == []
+
+
+@pytest.mark.asyncio
+async def test_count_is_served_from_memory_after_first_load(db_session, outbox, query_counter):
+    admin = MagicMock(id=ADMIN_ID, is_admin=True)
+    db_session.add(RegistrationRequest(username="old", email="", full_name="Old", password_hash="hash"))
+    await db_session.commit()
+
+    assert await get_registration_requests_count(db=db_session, current_user=admin) == {"pending": 1}
+    created = await register(_user_data("anna"), db=db_session)
+    with query_counter() as counter:
+        assert await get_registration_requests_count(db=db_session, current_user=admin) == {"pending": 2}
+    assert counter.count == 0
+
+    await reject_registration(created.id, db=db_session, current_user=admin)
+    assert await get_registration_requests_count(db=db_session, current_user=admin) == {"pending": 1}
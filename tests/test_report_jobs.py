@@ -0,0 +1,183 @@
+"""
+Test background report jobs (utils/report_jobs.py, /api/reports/jobs)
+"""
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+from datetime import timedelta
+from pathlib import Path
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from unittest.mock import AsyncMock
+
+from api.schemas.report import ReportJobCreate
+from config.settings import settings
+from database.models import Payment, Permission, ReportJob, Role, User
+from utils.balance_diff import _fresh_session_factory, seed_random_ledger
+from utils.report_jobs import ReportJobQueue
+from utils.timeutil import now_server
+
+
+@pytest_asyncio.fixture
+async def reports(tmp_path, monkeypatch):
+    """Очередь на отдельной БД в памяти, уведомления WebSocket перехватываются"""
+    engine, session_factory = await _fresh_session_factory()
+    queue = ReportJobQueue(session_factory=session_factory, workers=2, process_workers=1,
+                           reports_dir=str(tmp_path / "reports"))
+    monkeypatch.setattr("api.routers.reports.report_queue", queue)
+    notify = AsyncMock()
+    monkeypatch.setattr("api.routers.websocket.manager.send_to_user", notify)
+
+    async with session_factory() as db:
+        await seed_random_ledger(db, random.Random(2))
+        role = Role(name="admin", type="auth", permissions=[Permission(name="view_all_reports")])
+        db.add(User(username="reporter", full_name="Reporter", password_hash="hash", roles=[role]))
+        await db.commit()
+    async with session_factory() as db:
+        user = (await db.execute(
+            select(User).options(selectinload(User.roles).selectinload(Role.permissions))
+            .where(User.username == "reporter")
+        )).scalar_one()
+
+    await queue.start()
+    yield queue, session_factory, user, notify
+    await queue.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_payments_job_writes_file_and_notifies(reports):
+    from api.routers.reports import create_report_job, download_report, get_report_job
+
+    queue, session_factory, user, notify = reports
+    async with session_factory() as db:
+        job = await create_report_job(ReportJobCreate(kind="payments", format="csv"), db=db, current_user=user)
+        assert job.status == "queued" and job.download_url is None
+
+        await queue.join()
+        job = await get_report_job(job.id, db=db, current_user=user)
+        assert job.status == "done" and job.progress == 1.0
+        assert job.download_url == f"/api/reports/jobs/{job.id}/download"
+
+        payments = (await db.execute(select(func.count(Payment.id)))).scalar()
+        response = await download_report(job.id, db=db, current_user=user)
+    with open(response.path, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == payments == job.rows
+
+    event = notify.await_args.args[1]
+    assert notify.await_args.args[0] == user.id
+    assert event["type"] == "report_job_completed" and event["job_id"] == job.id
+    assert event["download_url"] == job.download_url
+
+
+@pytest.mark.asyncio
+async def test_monthly_and_debug_jobs(reports):
+    from api.routers.reports import create_report_job, get_report_job
+
+    queue, session_factory, user, notify = reports
+    async with session_factory() as db:
+        monthly = await create_report_job(ReportJobCreate(kind="monthly", format="ndjson", months=36),
+                                          db=db, current_user=user)
+        debug = await create_report_job(ReportJobCreate(kind="balances_debug", format="ndjson", months=6),
+                                        db=db, current_user=user)
+        await queue.join()
+        monthly = await get_report_job(monthly.id, db=db, current_user=user)
+        debug = await get_report_job(debug.id, db=db, current_user=user)
+        debug_path = (await db.get(ReportJob, debug.id)).file_path
+
+    assert monthly.status == "done" and monthly.rows == 36
+    assert debug.status == "done"
+    with open(debug_path, encoding="utf-8") as f:
+        sections = [json.loads(line)["section"] for line in f]
+    assert sections[:2] == ["export", "cards"] and sections[-1] == "payments"
+
+
+@pytest.mark.asyncio
+async def test_job_validation_and_access(reports):
+    from api.routers.reports import create_report_job, download_report, get_report_job
+
+    queue, session_factory, user, notify = reports
+    async with session_factory() as db:
+        with pytest.raises(HTTPException) as exc:
+            await create_report_job(ReportJobCreate(kind="balances_debug", months=36), db=db, current_user=user)
+        assert exc.value.status_code == 400
+
+        job = await create_report_job(ReportJobCreate(kind="payments"), db=db, current_user=user)
+        stranger = User(id=999, username="x", full_name="X", password_hash="hash", roles=[])
+        with pytest.raises(HTTPException) as exc:
+            await get_report_job(job.id, db=db, current_user=stranger)
+        assert exc.value.status_code == 404
+        await queue.join()
+
+        await queue.stop()
+        with pytest.raises(HTTPException) as exc:
+            await create_report_job(ReportJobCreate(kind="payments"), db=db, current_user=user)
+        assert exc.value.status_code == 503
+
+        # Задание, прерванное остановкой приложения: скачать нельзя, после перезапуска выполняется заново
+        interrupted = ReportJob(user_id=user.id, kind="payments", format="ndjson", params="{}",
+                                status="running", progress=0.5, rows=0)
+        db.add(interrupted)
+        await db.commit()
+        with pytest.raises(HTTPException) as exc:
+            await download_report(interrupted.id, db=db, current_user=user)
+        assert exc.value.status_code == 409
+
+    await queue.start()
+    await queue.join()
+    async with session_factory() as db:
+        assert (await db.get(ReportJob, interrupted.id)).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_job_is_claimed_once_and_live_owners_keep_their_jobs(reports):
+    queue, session_factory, user, notify = reports
+    await queue.stop()
+    async with session_factory() as db:
+        queued = ReportJob(user_id=user.id, kind="payments", format="csv", params="{}")
+        # Выполняется живым процессом этого хоста (родитель теста) - не перезапускается
+        foreign = ReportJob(user_id=user.id, kind="payments", format="csv", params="{}", status="running",
+                            owner=f"{socket.gethostname()}:{os.getppid()}:other")
+        db.add_all([queued, foreign])
+        await db.commit()
+
+    # Два воркера берут одно задание: выполняет только тот, чей UPDATE захватил строку
+    await asyncio.gather(queue.run_job(queued.id), queue.run_job(queued.id))
+    assert notify.await_count == 1
+
+    await queue.start()
+    await queue.join()
+    async with session_factory() as db:
+        assert (await db.get(ReportJob, queued.id)).status == "done"
+        assert (await db.get(ReportJob, foreign.id)).status == "running"
+
+
+@pytest.mark.asyncio
+async def test_expired_jobs_and_files_are_purged(reports):
+    from api.routers.reports import create_report_job
+
+    queue, session_factory, user, notify = reports
+    # По одному заданию: воркеры фикстуры делят одно соединение БД в памяти
+    async with session_factory() as db:
+        job = await create_report_job(ReportJobCreate(kind="payments", format="csv"), db=db, current_user=user)
+        await queue.join()
+        fresh = await create_report_job(ReportJobCreate(kind="payments", format="csv"), db=db, current_user=user)
+        await queue.join()
+    async with session_factory() as db:
+        old = await db.get(ReportJob, job.id)
+        old.finished_at = now_server() - timedelta(days=settings.REPORT_RETENTION_DAYS + 1)
+        await db.commit()
+        path = Path(old.file_path)
+        fresh_path = Path((await db.get(ReportJob, fresh.id)).file_path)
+
+    assert await queue.purge_expired() == 1
+    assert not path.exists() and fresh_path.exists()
+    async with session_factory() as db:
+        assert await db.get(ReportJob, job.id) is None
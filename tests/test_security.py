@@ -47,4 +47,40 @@ def test_settings_loaded(client):
     
     assert settings.ENVIRONMENT == "development"
     assert settings.DEBUG is True
-    assert "http://localhost:3000" in settings.origins_list
\ No newline at end of file
+    assert "http://localhost:3000" in settings.origins_list
+
+def test_security_middleware_streaming_and_audit_log(caplog):
+    """Pure ASGI middleware: headers on streaming responses, toggle, audit log"""
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse, JSONResponse
+    from api.middleware.security import SecurityMiddleware
+    
+    def build(headers_enabled):
+        mini = FastAPI()
+        
+        @mini.get("/stream")
+        async def stream():
+            async def chunks():
+                for i in range(3):
+                    yield f"{i}\n"
+            return StreamingResponse(chunks(), media_type="text/plain")
+        
+        @mini.post("/api/auth/login")
+        async def login():
+            return JSONResponse({"detail": "bad"}, status_code=401)
+        
+        mini.add_middleware(SecurityMiddleware, headers_enabled=headers_enabled)
+        return TestClient(mini)
+    
+    response = build(True).get("/stream")
+    assert response.text == "0\n1\n2\n"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert float(response.headers["X-Process-Time"]) >= 0
+    
+    response = build(False).get("/stream")
+    assert "X-Frame-Options" not in response.headers
+    assert "X-Process-Time" in response.headers
+    
+    with caplog.at_level("INFO", logger="nursia.security"):
+        build(True).post("/api/auth/login")
+    assert "Failed login attempt" in caplog.text
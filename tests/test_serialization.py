@@ -0,0 +1,74 @@
+"""
+Test JSON serialization layer (utils/serialization.py) and its stdlib fallback
+"""
+import importlib
+import json
+import sys
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+
+import pytest
+from pydantic import BaseModel
+
+import utils.serialization as serialization
+
+
+class Color(str, Enum):
+    RED = "red"
+
+
+class Item(BaseModel):
+    id: int
+    amount: Decimal
+    when: datetime
+
+
+SAMPLE = {
+    "amount": Decimal("10.50"),
+    "moment": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    "day": date(2026, 1, 2),
+    "color": Color.RED,
+    "name": "Зарплата",
+    "ids": {3},
+    7: "int key",
+}
+EXPECTED = {
+    "amount": 10.5, "moment": "2026-01-02T03:04:05+00:00", "day": "2026-01-02", "color": "red",
+    "name": "Зарплата", "ids": [3], "7": "int key",
+}
+
+
+@pytest.fixture(params=["default", "stdlib"])
+def backend(request, monkeypatch):
+    """Модуль с orjson (если установлен) и перезагруженный без него"""
+    if request.param == "stdlib":
+        monkeypatch.setitem(sys.modules, "orjson", None)
+        module = importlib.reload(serialization)
+        assert module.BACKEND == "json"
+        yield module
+        monkeypatch.undo()
+        importlib.reload(serialization)
+    else:
+        yield serialization
+
+
+def test_dumps_matches_across_backends(backend):
+    data = backend.dumps(SAMPLE)
+    assert isinstance(data, bytes) and "Зарплата".encode("utf-8") in data
+    assert json.loads(data) == EXPECTED
+    assert backend.loads(data) == EXPECTED
+    assert json.loads(backend.dumps({"item": Item(id=1, amount=Decimal("2.00"), when=datetime(2026, 1, 1))})) == {
+        "item": {"id": 1, "amount": "2.00", "when": "2026-01-01T00:00:00"}
+    }
+    with pytest.raises(TypeError):
+        backend.dumps({"bad": object()})
+
+
+def test_response_and_model_lists(backend):
+    response = backend.FastJSONResponse({"total": Decimal("1.25")})
+    assert response.body == b'{"total":1.25}' and response.media_type == "application/json"
+
+    items = [Item(id=i, amount=Decimal("3.10"), when=datetime(2026, 1, 1)) for i in range(3)]
+    assert json.loads(backend.dump_models(items, Item)) == [item.model_dump(mode="json") for item in items]
+    assert json.loads(backend.dumps_text({"type": "ping"})) == {"type": "ping"}
@@ -0,0 +1,94 @@
+"""
+Test in-memory static SPA server (utils/static_assets.py)
+"""
+import gzip
+import json
+import pytest
+
+from utils.static_assets import ENCODERS, IMMUTABLE, REVALIDATE, StaticAssets, accepted_encodings, precompress_build
+
+BUNDLE = b"console.log('nursia');\n" * 200
+
+
+@pytest.fixture
+def build(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>" + " " * 2000)
+    (tmp_path / "static" / "js" / "main.1a2b3c4d.js").write_bytes(BUNDLE)
+    (tmp_path / "favicon.svg").write_text("<svg/>")
+    (tmp_path / "asset-manifest.json").write_text(json.dumps({
+        "files": {"main.js": "/static/js/main.1a2b3c4d.js", "index.html": "/index.html"}
+    }))
+    assets = StaticAssets(str(tmp_path))
+    assets.load()
+    return assets
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br;q=0.5") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings("") == set()
+
+
+@pytest.mark.asyncio
+async def test_hashed_asset_is_immutable_and_compressed(build):
+    asset = build.asset("static/js/main.1a2b3c4d.js")
+    response = await build.response(asset, {"accept-encoding": "gzip"})
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == BUNDLE
+    assert "gzip" in asset.encoded  # Сжато один раз и закешировано
+
+    plain = await build.response(asset, {})
+    assert "content-encoding" not in plain.headers and plain.body == BUNDLE
+
+    # Маленькие файлы не сжимаются
+    favicon = await build.response(build.asset("favicon.svg"), {"accept-encoding": "gzip"})
+    assert "content-encoding" not in favicon.headers
+    assert favicon.headers["cache-control"] == REVALIDATE
+
+    assert build.asset("../etc/passwd") is None and build.asset("static/js/missing.js") is None
+
+
+@pytest.mark.asyncio
+async def test_index_revalidates_with_etag(build, tmp_path):
+    response = await build.response(build.index, {"accept-encoding": "br, gzip"})
+    assert response.headers["cache-control"] == REVALIDATE
+    assert response.headers["content-encoding"] == ("br" if "br" in ENCODERS else "gzip")
+
+    etag = (await build.response(build.index, {})).headers["etag"]
+    not_modified = await build.response(build.index, {"if-none-match": etag})
+    assert not_modified.status_code == 304 and not_modified.body == b""
+
+    # index.html держится в памяти: изменения на диске видны только после load()
+    (tmp_path / "index.html").write_text("<!doctype html>new")
+    assert (await build.response(build.index, {})).headers["etag"] == etag
+    build.load()
+    assert (await build.response(build.index, {})).headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_each_encoding_has_its_own_etag(build):
+    asset = build.asset("static/js/main.1a2b3c4d.js")
+    plain = await build.response(asset, {})
+    gzipped = await build.response(asset, {"accept-encoding": "gzip"})
+    assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gz"'
+
+    # 304 только если клиент уже держит отдаваемый вариант
+    stale = await build.response(asset, {"accept-encoding": "gzip", "if-none-match": plain.headers["etag"]})
+    assert stale.status_code == 200 and stale.headers["content-encoding"] == "gzip"
+    cached = await build.response(asset, {"accept-encoding": "gzip",
+                                          "if-none-match": f'"other", W/{gzipped.headers["etag"]}'})
+    assert cached.status_code == 304 and cached.headers["etag"] == gzipped.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_precompressed_variants_are_used(build, tmp_path):
+    assert precompress_build(str(tmp_path)) == 2  # index.html и main.js; favicon меньше порога
+    marker = gzip.compress(b"precompressed")
+    (tmp_path / "static" / "js" / "main.1a2b3c4d.js.gz").write_bytes(marker)
+    build.load()
+    assert "static/js/main.1a2b3c4d.js.gz" not in build.files
+
+    response = await build.response(build.asset("static/js/main.1a2b3c4d.js"), {"accept-encoding": "gzip"})
+    assert response.body == marker
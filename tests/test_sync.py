@@ -0,0 +1,125 @@
+"""
+Test incremental delta sync (/api/sync)
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from database.models import Base, User, Payment, PaymentCategory, Assignment, Task
+from api.routers.sync import get_changes
+
+
+def _mock_user(user_id, is_admin=False):
+    user = MagicMock()
+    user.id = user_id
+    user.is_admin = is_admin
+    return user
+
+
+@pytest.mark.asyncio
+async def test_sync_returns_only_changes_and_tombstones():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    long_ago = datetime.now(timezone.utc) - timedelta(days=1)
+
+    async with async_session_maker() as db:
+        admin = User(username="admin", full_name="Admin", password_hash="hash")
+        worker = User(username="worker", full_name="Worker", password_hash="hash")
+        other = User(username="other", full_name="Other", password_hash="hash")
+        category = PaymentCategory(name="Зарплата")
+        db.add_all([admin, worker, other, category])
+        await db.flush()
+
+        assignment = Assignment(user_id=worker.id, created_at=long_ago)
+        other_assignment = Assignment(user_id=other.id, created_at=long_ago)
+        db.add_all([assignment, other_assignment])
+        await db.flush()
+
+        task = Task(assignment_id=assignment.id, start_time=long_ago,
+                    end_time=long_ago + timedelta(hours=1), created_at=long_ago)
+        other_task = Task(assignment_id=other_assignment.id, start_time=long_ago, created_at=long_ago)
+        kept = Payment(payer_id=admin.id, recipient_id=worker.id, category_id=category.id,
+                       amount=Decimal("10.00"), currency="UAH", payment_date=long_ago, created_at=long_ago)
+        removed = Payment(payer_id=admin.id, recipient_id=worker.id, category_id=category.id,
+                          amount=Decimal("20.00"), currency="UAH", payment_date=long_ago, created_at=long_ago)
+        db.add_all([task, other_task, kept, removed])
+        await db.commit()
+
+        # Полный снимок для работника - только его данные
+        snapshot = await get_changes(since=None, db=db, current_user=_mock_user(worker.id))
+        assert snapshot.full is True
+        assert {p.id for p in snapshot.payments} == {kept.id, removed.id}
+        assert [a.id for a in snapshot.assignments] == [assignment.id]
+        assert [t.id for t in snapshot.tasks] == [task.id]
+        assert snapshot.deleted == []
+
+        cursor = snapshot.cursor
+
+        # Изменения после курсора
+        task.description = "updated"
+        other_task.description = "updated"
+        removed_id = removed.id
+        await db.delete(removed)
+        await db.commit()
+
+        delta = await get_changes(since=cursor, db=db, current_user=_mock_user(worker.id))
+        assert delta.full is False
+        assert int(delta.cursor) > int(cursor)
+        assert delta.payments == []
+        assert delta.assignments == []
+        assert [t.id for t in delta.tasks] == [task.id]
+        assert delta.tasks[0].modified_at is not None
+        assert [(d.entity_type, d.entity_id) for d in delta.deleted] == [("payment", removed_id)]
+
+        # Админ видит изменения всех пользователей
+        admin_delta = await get_changes(since=cursor, db=db, current_user=_mock_user(admin.id, is_admin=True))
+        assert {t.id for t in admin_delta.tasks} == {task.id, other_task.id}
+        assert len(admin_delta.deleted) == 1
+
+        # Повторный запрос с новым курсором - изменений нет
+        empty = await get_changes(since=delta.cursor, db=db, current_user=_mock_user(worker.id))
+        assert (empty.payments, empty.assignments, empty.tasks, empty.deleted) == ([], [], [], [])
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_previous_recipient_gets_tombstone(db_session):
+    db = db_session
+    admin = User(username="admin", full_name="Admin", password_hash="hash")
+    worker = User(username="worker", full_name="Worker", password_hash="hash")
+    other = User(username="other", full_name="Other", password_hash="hash")
+    category = PaymentCategory(name="Зарплата")
+    db.add_all([admin, worker, other, category])
+    await db.flush()
+    assignment = Assignment(user_id=worker.id)
+    payment = Payment(payer_id=admin.id, recipient_id=worker.id, category_id=category.id,
+                      amount=Decimal("10.00"), currency="UAH", payment_date=datetime.now(timezone.utc))
+    db.add_all([assignment, payment])
+    await db.commit()
+    cursor = (await get_changes(since=None, db=db, current_user=_mock_user(worker.id))).cursor
+
+    # Платёж и смена переданы другому работнику
+    payment.recipient_id = other.id
+    assignment.user_id = other.id
+    await db.commit()
+
+    delta = await get_changes(since=cursor, db=db, current_user=_mock_user(worker.id))
+    assert delta.payments == [] and delta.assignments == []
+    assert {(d.entity_type, d.entity_id) for d in delta.deleted} == {
+        ("payment", payment.id), ("assignment", assignment.id)
+    }
+
+    new_owner = await get_changes(since=cursor, db=db, current_user=_mock_user(other.id))
+    assert [p.id for p in new_owner.payments] == [payment.id]
+    assert [a.id for a in new_owner.assignments] == [assignment.id]
+    assert new_owner.deleted == []
+
+    # Плательщик не терял доступ - для него обычное изменение
+    payer = await get_changes(since=cursor, db=db, current_user=_mock_user(admin.id))
+    assert [p.id for p in payer.payments] == [payment.id] and payer.deleted == []
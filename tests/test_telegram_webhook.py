@@ -0,0 +1,145 @@
+"""
+Test Telegram webhook ingestion and the update worker pool (bot/webhook.py)
+"""
+import asyncio
+import pytest
+
+telegram = pytest.importorskip("telegram")
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from telegram import Update
+from telegram.ext import ApplicationBuilder, CommandHandler
+
+from api.routers import telegram_webhook
+from bot import webhook as bot_webhook
+from bot.webhook import (
+    SECRET_HEADER, UpdateWorkerPool, claim_webhook_lock, release_webhook_lock, start_webhook, stop_webhook,
+)
+from fake_telegram import FakeTelegram, make_update
+
+SECRET = "test-secret"
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_chat_order_and_runs_chats_in_parallel():
+    handled = []
+    active = {"now": 0, "max": 0}
+
+    async def handler(update):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        # Поздние обновления чата обрабатываются быстрее ранних - порядок держит очередь
+        await asyncio.sleep(0.01 * (5 - update.update_id % 5))
+        handled.append((update.effective_chat.id, update.update_id))
+        active["now"] -= 1
+
+    pool = UpdateWorkerPool(handler, workers=4, queue_size=10)
+    await pool.start()
+    for i in range(5):
+        for chat_id in (11, 12, 13):
+            assert pool.submit(Update.de_json(make_update(chat_id * 100 + i, chat_id, "hi"), None))
+    # Повторная доставка того же update_id отбрасывается
+    assert not pool.submit(Update.de_json(make_update(1100, 11, "hi"), None))
+    await pool.join()
+    await pool.stop()
+
+    for chat_id in (11, 12, 13):
+        assert [u for c, u in handled if c == chat_id] == [chat_id * 100 + i for i in range(5)]
+    assert len(handled) == 15
+    assert active["max"] > 1
+
+
+@pytest.fixture
+def webhook_settings(monkeypatch):
+    monkeypatch.setattr(bot_webhook.settings, "TELEGRAM_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(bot_webhook.settings, "TELEGRAM_WEBHOOK_URL", "https://example.com/api/telegram/webhook")
+
+
+@pytest.mark.asyncio
+async def test_webhook_validates_secret_and_replies_through_bot_api(webhook_settings):
+    fake = FakeTelegram()
+    application = ApplicationBuilder().token("123:TEST").updater(None).request(fake).build()
+
+    async def echo(update, context):
+        await update.message.reply_text(f"pong {update.effective_chat.id}")
+
+    application.add_handler(CommandHandler("ping", echo))
+    webhook = await start_webhook(application)
+    api = FastAPI()
+    api.include_router(telegram_webhook.router, prefix="/api")
+    try:
+        assert fake.sent("setWebhook")[0]["secret_token"] == SECRET
+
+        async with AsyncClient(transport=ASGITransport(app=api), base_url="http://test") as client:
+            url = "/api/telegram/webhook"
+            response = await client.post(url, json=make_update(1, 42, "/ping"))
+            assert response.status_code == 403
+            response = await client.post(url, json=make_update(1, 42, "/ping"), headers={SECRET_HEADER: "wrong"})
+            assert response.status_code == 403
+            response = await client.post(url, content=b"not json", headers={SECRET_HEADER: SECRET})
+            assert response.status_code == 400
+            for payload in ([make_update(1, 42, "/ping")], "update", 1):
+                response = await client.post(url, json=payload, headers={SECRET_HEADER: SECRET})
+                assert response.status_code == 400
+
+            response = await client.post(url, json=make_update(1, 42, "/ping"), headers={SECRET_HEADER: SECRET})
+            assert response.status_code == 200 and response.json()["accepted"] is True
+            await webhook.pool.join()
+    finally:
+        await stop_webhook()
+
+    assert [(m["chat_id"], m["text"]) for m in fake.sent("sendMessage")] == [(42, "pong 42")]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_answers_503_for_telegram_retry(webhook_settings, monkeypatch):
+    monkeypatch.setattr(bot_webhook.settings, "BOT_QUEUE_SIZE", 1)
+    fake = FakeTelegram()
+    application = ApplicationBuilder().token("123:TEST").updater(None).request(fake).build()
+    release = asyncio.Event()
+
+    async def slow(update, context):
+        await release.wait()
+
+    application.add_handler(CommandHandler("ping", slow))
+    await start_webhook(application)
+    api = FastAPI()
+    api.include_router(telegram_webhook.router, prefix="/api")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=api), base_url="http://test") as client:
+            statuses = []
+            for update_id in range(1, 5):
+                response = await client.post("/api/telegram/webhook", json=make_update(update_id, 7, "/ping"),
+                                             headers={SECRET_HEADER: SECRET})
+                statuses.append(response.status_code)
+                await asyncio.sleep(0)
+        # Один обрабатывается, один ждёт в очереди, остальные - 503
+        assert statuses.count(200) == 2 and statuses.count(503) == 2
+    finally:
+        release.set()
+        await stop_webhook()
+
+
+def test_webhook_lock_allows_one_process(tmp_path):
+    path = str(tmp_path / "bot_webhook.lock")
+    claim_webhook_lock(path)
+    try:
+        # Второй воркер API: своя блокировка того же файла
+        bot_webhook._lock_file, held = None, bot_webhook._lock_file
+        try:
+            with pytest.raises(RuntimeError, match="single API worker"):
+                claim_webhook_lock(path)
+        finally:
+            bot_webhook._lock_file = held
+    finally:
+        release_webhook_lock()
+    claim_webhook_lock(path)
+    release_webhook_lock()
+
+def test_build_application_for_webhook_has_no_updater():
+    from bot.main import build_application
+
+    application = build_application(webhook=True, request=FakeTelegram())
+    assert application.updater is None
+    assert application.job_queue is not None
+    assert application.handlers[0]
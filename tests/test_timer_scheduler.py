@@ -0,0 +1,87 @@
+"""
+Test coalescing timer scheduler of the Telegram bot (bot/timer_scheduler.py)
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+
+telegram = pytest.importorskip("telegram")
+from telegram.error import BadRequest, RetryAfter
+
+from bot.timer_scheduler import TimerScheduler
+
+START = datetime(2025, 7, 1, 9, 0, tzinfo=timezone.utc)
+
+
+class RecordingBot:
+    """Бот, записывающий правки; errors[message_id] - исключение для этой правки"""
+
+    def __init__(self):
+        self.edits = []
+        self.errors = {}
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        if message_id in self.errors:
+            raise self.errors.pop(message_id)
+        self.edits.append((message_id, text))
+
+
+@pytest.fixture
+def scheduler_factory(session_factory):
+    return lambda rate=100: TimerScheduler(session_factory=session_factory, edits_per_second=rate)
+
+
+@pytest.mark.asyncio
+async def test_tick_skips_unchanged_text_and_adapts_interval(scheduler_factory):
+    scheduler = scheduler_factory(rate=2)
+    bot = RecordingBot()
+    await scheduler.start(1, chat_id=10, message_id=100, start_ts=START)
+    assert scheduler.interval == 1
+
+    assert await scheduler.tick(bot, now=START + timedelta(seconds=5)) == 1
+    # Тот же текст - правка не отправляется
+    scheduler.timers[1].next_due = None
+    assert await scheduler.tick(bot, now=START + timedelta(seconds=5)) == 0
+    assert bot.edits == [(100, "Таймер запущен — 00:00:05")]
+
+    # Больше таймеров, чем правок в секунду, - обновление раз в 10 секунд, потом раз в минуту
+    for telegram_id in range(2, 4):
+        await scheduler.start(telegram_id, chat_id=telegram_id, message_id=telegram_id, start_ts=START)
+    assert scheduler.interval == 10
+    for telegram_id in range(4, 30):
+        scheduler.timers[telegram_id] = scheduler.timers[1]
+    assert scheduler.interval == 60
+
+
+@pytest.mark.asyncio
+async def test_global_bucket_spreads_edits_over_ticks(scheduler_factory):
+    scheduler = scheduler_factory(rate=2)
+    bot = RecordingBot()
+    for telegram_id in range(1, 6):
+        await scheduler.start(telegram_id, chat_id=telegram_id, message_id=telegram_id, start_ts=START)
+
+    assert await scheduler.tick(bot, now=START + timedelta(seconds=30)) == 2
+    assert await scheduler.tick(bot, now=START + timedelta(seconds=30)) == 0
+    scheduler.bucket._tokens = 2  # прошла секунда
+    await scheduler.tick(bot, now=START + timedelta(seconds=31))
+    # Следующими обновляются таймеры, не получившие правку на прошлом тике
+    assert sorted(message_id for message_id, _ in bot.edits) == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_telegram_errors_pause_or_drop_timers(scheduler_factory):
+    scheduler = scheduler_factory()
+    bot = RecordingBot()
+    await scheduler.start(1, chat_id=1, message_id=1, start_ts=START)
+    await scheduler.start(2, chat_id=2, message_id=2, start_ts=START)
+
+    bot.errors[1] = BadRequest("Message to edit not found")
+    bot.errors[2] = RetryAfter(timedelta(seconds=30))
+    assert await scheduler.tick(bot, now=START + timedelta(seconds=1)) == 0
+    assert list(scheduler.timers) == [2]
+    assert not scheduler.bucket.try_acquire()
+
+    # Сохранённое состояние переживает перезапуск
+    restored = scheduler_factory()
+    assert await restored.restore() == 1
+    state = restored.timers[2]
+    assert (state.chat_id, state.message_id, state.start_ts) == (2, 2, START)
@@ -0,0 +1,70 @@
+"""
+Test DB-generated tracking numbers and INSERT ... RETURNING helper
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import select
+from unittest.mock import MagicMock
+
+from api.routers.assignments import ManualAssignmentCreate, ManualTaskCreate, create_manual_assignment
+from database.bulk import insert_returning
+from database.models import Assignment, ChangeLog, Payment, Task
+
+START = datetime(2025, 5, 5, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_trigger_numbers_rows_inserted_without_tracking_nr(db_session, worker):
+    assignment = Assignment(user_id=worker.id)
+    db_session.add(assignment)
+    await db_session.flush()
+    db_session.add_all([
+        Task(assignment_id=assignment.id, start_time=START),
+        Task(assignment_id=assignment.id, start_time=START + timedelta(hours=1), tracking_nr="LEGACY-1"),
+    ])
+    await db_session.commit()
+
+    # Номер в объекте сессии совпадает с записанным триггером
+    stored = dict((await db_session.execute(select(Task.id, Task.tracking_nr))).all())
+    tasks = (await db_session.execute(select(Task).order_by(Task.id))).scalars().all()
+    assert [t.tracking_nr for t in tasks] == [f"T{tasks[0].id}", "LEGACY-1"]
+    assert stored == {t.id: t.tracking_nr for t in tasks}
+    assert assignment.tracking_nr == f"A{assignment.id}"
+    assert (await db_session.execute(select(Assignment.tracking_nr))).scalar_one() == assignment.tracking_nr
+
+
+@pytest.mark.asyncio
+async def test_insert_returning_loads_row_in_one_statement(db_session, worker, query_counter):
+    with query_counter() as counter:
+        assignment = await insert_returning(db_session, Assignment, {"user_id": worker.id, "description": "Склад"})
+    # INSERT ... RETURNING и запись change_log
+    assert counter.count == 2
+    assert assignment.tracking_nr == f"A{assignment.id}"
+    assert assignment.assignment_type == "work" and assignment.created_at is not None
+    await db_session.commit()
+
+    logged = (await db_session.execute(
+        select(ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.owner_id)
+    )).all()
+    assert ("assignment", assignment.id, worker.id) in logged
+
+
+@pytest.mark.asyncio
+async def test_manual_assignment_writes_without_tracking_updates(db_session, worker, query_counter):
+    data = ManualAssignmentCreate(worker_id=worker.id, description="Склад", tasks=[
+        ManualTaskCreate(start_time=START, end_time=START + timedelta(hours=4)),
+        ManualTaskCreate(start_time=START + timedelta(hours=4), end_time=START + timedelta(hours=5),
+                         task_type="pause"),
+    ])
+    with query_counter() as counter:
+        response = await create_manual_assignment(data, db_session, MagicMock(id=1, is_admin=True))
+    # Ни UPDATE tracking_nr, ни перечитывания строк после COMMIT
+    assert not [s for s in counter.statements if s.lstrip().upper().startswith("UPDATE")]
+    counter.assert_budget(max_statements=11)
+
+    assert response.tracking_nr == f"A{response.assignment_id}"
+    assert response.payment_tracking_nr == f"P{response.payment_id}"
+    payment = await db_session.get(Payment, response.payment_id)
+    assert payment.description == f"Смена {response.tracking_nr}: Склад"
+    assert payment.amount == Decimal("40.00")
@@ -0,0 +1,51 @@
+"""
+Test rich WebSocket events (entity payload for opted-in connections)
+"""
+import json
+import pytest
+
+from api.routers.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_rich_payload_only_for_opted_in_connections():
+    manager = ConnectionManager()
+    lean, rich, outsider = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(lean, 1)
+    await manager.connect(rich, 1, rich=True)
+    await manager.connect(outsider, 2, rich=True)
+
+    assert manager.has_rich_subscribers([1]) is True
+    assert manager.has_rich_subscribers([3]) is False
+
+    event = {"type": "payment_created", "payment_id": 5}
+    await manager.broadcast(event, user_ids=[1], entity={"payment": {"id": 5, "amount": "10.00"}})
+
+    assert json.loads(lean.sent[0]) == event
+    assert json.loads(rich.sent[0])["payment"] == {"id": 5, "amount": "10.00"}
+    # Пользователь вне списка получателей не видит сущность
+    assert outsider.sent == []
+
+
+@pytest.mark.asyncio
+async def test_entity_ignored_for_untargeted_broadcast():
+    manager = ConnectionManager()
+    rich = FakeWebSocket()
+    await manager.connect(rich, 1, rich=True)
+
+    await manager.broadcast({"type": "payment_updated", "payment_id": 7}, entity={"payment": {"id": 7}})
+    assert "payment" not in json.loads(rich.sent[0])
+
+    manager.disconnect(rich, 1)
+    assert manager.has_rich_subscribers() is False
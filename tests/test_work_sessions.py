@@ -0,0 +1,59 @@
+"""
+Test shared work session service (utils/work_sessions.py)
+"""
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy import select
+
+from database.models import Assignment, Payment, Task, User
+from utils.work_sessions import (
+    WorkSessionConflict, get_active_task, pause_session, resume_session, start_session, stop_session
+)
+
+
+@pytest.mark.asyncio
+async def test_session_lifecycle_is_shared_by_bot_and_api(db_session, worker):
+    task, assignment, employment = await start_session(db_session, worker.id, description="Telegram")
+    assert assignment.tracking_nr == f"A{assignment.id}" and employment.currency == "UAH"
+
+    # Вторая смена не начинается - ни из бота, ни из веба
+    with pytest.raises(WorkSessionConflict):
+        await start_session(db_session, worker.id)
+
+    # Смена идёт два часа
+    task.start_time = task.start_time - timedelta(hours=2)
+    await db_session.commit()
+
+    active = await get_active_task(db_session, worker.id)
+    assert active.id == task.id and active.assignment.id == assignment.id
+
+    pause = await pause_session(db_session, active)
+    assert pause.task_type == "pause" and active.end_time is not None
+    with pytest.raises(WorkSessionConflict):
+        await pause_session(db_session, pause)
+    work = await resume_session(db_session, pause)
+    assert work.task_type == "work"
+
+    active = await get_active_task(db_session, worker.id)
+    _, _, payment = await stop_session(db_session, active)
+    assert await get_active_task(db_session, worker.id) is None
+    with pytest.raises(WorkSessionConflict):
+        await stop_session(db_session, active)
+
+    tasks = (await db_session.execute(select(Task).where(Task.assignment_id == assignment.id))).scalars().all()
+    assert [t.task_type for t in sorted(tasks, key=lambda t: t.id)] == ["work", "pause", "work"]
+    # Оплачено рабочее время по ставке трудовых отношений
+    assert payment.amount >= Decimal("20") and payment.tracking_nr == f"P{payment.id}"
+    stored = (await db_session.execute(select(Payment))).scalar_one()
+    assert stored.assignment_id == assignment.id and stored.description == f"Смена {assignment.tracking_nr}: Telegram"
+
+
+@pytest.mark.asyncio
+async def test_start_without_employment_raises_lookup_error(db_session):
+    user = User(username="nobody", full_name="Nobody", password_hash="hash")
+    db_session.add(user)
+    await db_session.commit()
+    with pytest.raises(LookupError):
+        await start_session(db_session, user.id)
+    assert (await db_session.execute(select(Assignment))).first() is None
@@ -0,0 +1,284 @@
+"""
+Холодный архив задач, смен и платежей закрытых периодов.
+
+Строки закрытых месяцев (utils/period_close.py) переносятся из основной БД в
+archive.db, подключённую через ATTACH DATABASE. Перенос идёт одной транзакцией
+по обеим БД: INSERT INTO archive.<t> ... SELECT, затем DELETE из main.<t>.
+
+- Горячие пути (списки платежей и смен, старт/стоп смены) работают с основной
+  БД как раньше и видят только живые строки.
+- Исторические чтения (экспорты, балансы нарастающим итогом, фоновые отчёты)
+  берут сессию из history_session(): её соединения подключают архив и создают
+  TEMP VIEW payments/tasks/assignments = main UNION ALL archive. TEMP-объекты
+  SQLite перекрывают одноимённые таблицы main, поэтому прежние запросы ORM
+  работают без изменений. Если архива нет или диапазон дат его не задевает,
+  используется обычная сессия.
+- tracking_nr строится из id (P{id}, A{id}, T{id}). Таблицы объявлены с
+  AUTOINCREMENT, а sqlite_sequence не опускается ниже максимального id архива,
+  поэтому id перенесённых строк новым записям не выдаются.
+- В change_log перенос не пишется: для /sync архивные строки не удалены, а
+  заморожены, и остаются у клиентов в последнем полученном виде.
+"""
+import logging
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from config.settings import settings
+from database.models import CLOSED_PERIOD_COLUMNS, closed_period_triggers
+
+logger = logging.getLogger(__name__)
+
+# Порядок переноса и удаления: сначала зависимые от assignments
+ARCHIVE_TABLES = ("payments", "tasks", "assignments")
+
+_history_engines: Dict[Tuple[str, str], AsyncEngine] = {}
+_through_cache: Dict[str, Tuple[int, Optional[str]]] = {}
+
+
+def archive_path(url) -> Optional[str]:
+    """Путь к archive.db для основной БД (None для БД в памяти)"""
+    if settings.ARCHIVE_DB_PATH:
+        return settings.ARCHIVE_DB_PATH
+    database = make_url(str(url)).database
+    if not database or database == ":memory:":
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(database)), "archive.db")
+
+
+def archived_through(url) -> Optional[str]:
+    """Последний перенесённый в архив месяц (YYYY-MM) или None, если архива нет"""
+    path = archive_path(url)
+    if path is None or not os.path.exists(path):
+        return None
+    mtime = os.stat(path).st_mtime_ns
+    cached = _through_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT through FROM archive_meta").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    through = row[0] if row else None
+    _through_cache[path] = (mtime, through)
+    return through
+
+
+def reaches_archive(url, start: Optional[datetime] = None) -> bool:
+    """Задевает ли диапазон дат, начинающийся со start (None - с начала), архивные месяцы"""
+    through = archived_through(url)
+    if through is None:
+        return False
+    return start is None or start.strftime("%Y-%m") <= through
+
+
+def _columns(cursor, schema: str, table: str):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _create_history_views(cursor) -> None:
+    """TEMP VIEW <t> = main.<t> UNION ALL archive.<t> (колонки архива, которых нет, - NULL)"""
+    for table in ARCHIVE_TABLES:
+        columns = _columns(cursor, "main", table)
+        archived = set(_columns(cursor, "archive", table))
+        live = ", ".join(columns)
+        old = ", ".join(column if column in archived else f"NULL AS {column}" for column in columns)
+        cursor.execute(
+            f"CREATE TEMP VIEW IF NOT EXISTS {table} AS "
+            f"SELECT {live} FROM main.{table} UNION ALL SELECT {old} FROM archive.{table}"
+        )
+
+
+def _history_engine(url, path: str) -> AsyncEngine:
+    key = (str(url), path)
+    engine = _history_engines.get(key)
+    if engine is None:
+        from utils.metrics import instrument_engine
+
+        engine = create_async_engine(url, echo=False)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _attach_archive(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("ATTACH DATABASE ? AS archive", (path,))
+            _create_history_views(cursor)
+            cursor.close()
+
+        instrument_engine(engine)
+        _history_engines[key] = engine
+    return engine
+
+
+@asynccontextmanager
+async def history_session(db: AsyncSession, start: Optional[datetime] = None) -> AsyncIterator[AsyncSession]:
+    """Сессия только для чтения, видящая и архив; db, если архив для диапазона не нужен"""
+    url = db.bind.url
+    if db.bind in _history_engines.values() or not reaches_archive(url, start):
+        yield db
+        return
+    factory = async_sessionmaker(_history_engine(url, archive_path(url)), class_=AsyncSession,
+                                 expire_on_commit=False, autoflush=False)
+    async with factory() as session:
+        yield session
+
+
+async def stream_history(db: AsyncSession, make_batches: Callable[[AsyncSession], AsyncIterator],
+                         start: Optional[datetime] = None) -> AsyncIterator:
+    """Пачки make_batches(сессия) из истории; сессия живёт, пока читается поток"""
+    async with history_session(db, start) as source:
+        async for batch in make_batches(source):
+            yield batch
+
+
+async def dispose_history_engines() -> None:
+    for engine in _history_engines.values():
+        await engine.dispose()
+    _history_engines.clear()
+
+
+def _ensure_archive_schema(cursor) -> None:
+    """Таблицы архива по образцу main (без ограничений), новые колонки main добавляются"""
+    cursor.execute("CREATE TABLE IF NOT EXISTS archive.archive_meta (through TEXT NOT NULL)")
+    for table in ARCHIVE_TABLES:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+        archived = set(_columns(cursor, "archive", table))
+        for column in _columns(cursor, "main", table):
+            if column not in archived:
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS archive.ux_{table}_id ON {table} (id)")
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS archive.ux_{table}_tracking_nr ON {table} (tracking_nr)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.ix_payments_payment_date ON payments (payment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.ix_tasks_assignment_id ON tasks (assignment_id)")
+
+
+def _select_rows(cursor, through: str) -> None:
+    """Id переносимых строк во временные таблицы archive_<t>"""
+    cursor.execute(
+        "CREATE TEMP TABLE archive_periods AS SELECT period FROM main.closed_periods WHERE period <= ?",
+        (through,)
+    )
+    # Смена уходит целиком: все задачи завершены и в закрытых месяцах, её платежи - тоже
+    cursor.execute("""
+        CREATE TEMP TABLE archive_assignments AS
+        SELECT a.id FROM main.assignments a
+        WHERE EXISTS (SELECT 1 FROM main.tasks t WHERE t.assignment_id = a.id)
+          AND NOT EXISTS (
+              SELECT 1 FROM main.tasks t WHERE t.assignment_id = a.id AND (
+                  t.end_time IS NULL OR substr(t.start_time, 1, 7) NOT IN (SELECT period FROM archive_periods)))
+          AND NOT EXISTS (
+              SELECT 1 FROM main.payments p WHERE p.assignment_id = a.id
+                AND substr(p.payment_date, 1, 7) NOT IN (SELECT period FROM archive_periods))
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE archive_tasks AS
+        SELECT id FROM main.tasks WHERE assignment_id IN (SELECT id FROM archive_assignments)
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE archive_payments AS
+        SELECT p.id FROM main.payments p
+        WHERE substr(p.payment_date, 1, 7) IN (SELECT period FROM archive_periods)
+          AND (p.assignment_id IS NULL
+               OR p.assignment_id IN (SELECT id FROM archive_assignments)
+               OR p.assignment_id NOT IN (SELECT id FROM main.assignments))
+    """)
+
+
+def _check_autoincrement(cursor) -> None:
+    """Без AUTOINCREMENT SQLite выдаст id удалённой строки повторно - архив запрещён"""
+    from utils.period_close import PeriodConflict
+
+    for table in ARCHIVE_TABLES:
+        cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if "AUTOINCREMENT" not in cursor.fetchone()[0].upper():
+            raise PeriodConflict(f"Таблица {table} без AUTOINCREMENT - примените миграции БД")
+
+
+def _seed_sequences(cursor) -> None:
+    """sqlite_sequence не ниже максимального id архива (архив мог появиться до AUTOINCREMENT)"""
+    for table in ARCHIVE_TABLES:
+        cursor.execute(f"SELECT max(id) FROM archive.{table}")
+        max_id = cursor.fetchone()[0]
+        if max_id is None:
+            continue
+        cursor.execute("UPDATE main.sqlite_sequence SET seq = max(seq, ?) WHERE name = ?", (max_id, table))
+        if cursor.rowcount == 0:
+            cursor.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)", (table, max_id))
+
+
+def _drop_temp(cursor) -> None:
+    for name in ("archive_periods",) + tuple(f"archive_{table}" for table in ARCHIVE_TABLES):
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{name}")
+
+
+def _archive_sync(dbapi_connection, path: str, through: str) -> Dict[str, int]:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        _check_autoincrement(cursor)
+        _ensure_archive_schema(cursor)
+        # Явная транзакция: DROP/CREATE TRIGGER и перенос атомарны для обеих БД
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Триггеры закрытых периодов запрещают DELETE - на время переноса снимаются
+            for table in CLOSED_PERIOD_COLUMNS:
+                for operation in ("insert", "update", "delete"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS main.trg_{table}_closed_period_{operation}")
+            _select_rows(cursor, through)
+            moved = {}
+            for table in ARCHIVE_TABLES:
+                columns = ", ".join(_columns(cursor, "main", table))
+                cursor.execute(f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} "
+                               f"WHERE id IN (SELECT id FROM temp.archive_{table})")
+                cursor.execute(f"DELETE FROM main.{table} WHERE id IN (SELECT id FROM temp.archive_{table})")
+                moved[table] = cursor.rowcount
+            _seed_sequences(cursor)
+            for table in CLOSED_PERIOD_COLUMNS:
+                for ddl in closed_period_triggers(table):
+                    cursor.execute(ddl)
+            cursor.execute("SELECT through FROM archive.archive_meta")
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO archive.archive_meta (through) VALUES (?)", (through,))
+            elif row[0] < through:
+                cursor.execute("UPDATE archive.archive_meta SET through = ?", (through,))
+            _drop_temp(cursor)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            _drop_temp(cursor)
+            raise
+    finally:
+        cursor.execute("DETACH DATABASE archive")
+        cursor.close()
+    return moved
+
+
+async def archive_periods(engine: AsyncEngine, through: str) -> Dict[str, int]:
+    """Перенести строки закрытых месяцев до through (YYYY-MM) в архив; число строк по таблицам"""
+    from utils.balance_columnar import invalidate_snapshots
+    from utils.period_close import PeriodConflict, parse_period
+
+    parse_period(through)
+    path = archive_path(engine.url)
+    if path is None:
+        raise PeriodConflict("Архив недоступен для БД в памяти")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    async with engine.connect() as conn:
+        # Своё соединение без транзакции SQLAlchemy: ATTACH внутри транзакции запрещён
+        moved = await conn.run_sync(
+            lambda sync_conn: _archive_sync(sync_conn.connection.dbapi_connection, path, through)
+        )
+    invalidate_snapshots()
+    logger.info(f"Archived through {through}: {moved}")
+    return moved
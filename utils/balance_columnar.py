@@ -0,0 +1,509 @@
+"""
+Колоночный движок балансов на NumPy ("numpy").
+
+Все платежи и рабочие задачи держатся в памяти как массивы (сумма в копейках,
+плательщик, получатель, код группы, статус, валюта, индекс месяца); карточки,
+помесячная сводка и взаимные расчёты считаются булевыми масками и np.bincount.
+Снимок перестраивается лениво, когда меняется версия данных - max(seq) журнала
+change_log; каждая запись через ORM-сессию сдвигает версию.
+
+Правила расчёта повторяют эталон api/routers/balances.py поле в поле (включая
+его особенности: фильтр по работодателю в одних корзинах через "if", в других
+через "elif", расходы без фильтра по пользователю в expenses_paid и т.д.).
+Совпадение проверяется utils/balance_diff.py.
+"""
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import (
+    Assignment, Payment, PaymentCategory, PaymentCategoryGroup, PaymentGroupCode, PaymentStatus, Task, User,
+)
+from utils.balance_engines import BalanceEngine
+
+# Классы групп платежа (в эталоне - join payments -> categories -> groups)
+SALARY, EXPENSE, BONUS, DEBT, REPAYMENT = 0, 1, 2, 3, 4
+OTHER_CODE = 5  # Группа с кодом вне PaymentGroupCode
+NULL_CODE = 6   # Группа без кода (code IS NULL)
+NO_GROUP = 7    # Категория без группы: отпадает при inner join
+GROUP_CLASSES = {
+    PaymentGroupCode.SALARY.value: SALARY,
+    PaymentGroupCode.EXPENSE.value: EXPENSE,
+    PaymentGroupCode.BONUS.value: BONUS,
+    PaymentGroupCode.DEBT.value: DEBT,
+    PaymentGroupCode.REPAYMENT.value: REPAYMENT,
+}
+
+UNPAID, PAID, OFFSET, OTHER_STATUS = 0, 1, 2, 3
+STATUSES = {PaymentStatus.UNPAID.value: UNPAID, PaymentStatus.PAID.value: PAID, PaymentStatus.OFFSET.value: OFFSET}
+
+# julianday() в SQLite: целые миллисекунды от начала юлианской эпохи / 86400000.0
+_UNIX_EPOCH_JD_MS = 210866760000000
+
+
+def _month_index(year: int, month: int) -> int:
+    """Индекс месяца в той же шкале, что datetime64[M]: месяцы с 1970-01"""
+    return (year - 1970) * 12 + month - 1
+
+
+def _parse_moments(values: List[str]) -> np.ndarray:
+    """Строки CleanDateTime ('YYYY-MM-DD HH:MM:SS') -> datetime64[s]"""
+    if not values:
+        return np.array([], dtype="datetime64[s]")
+    try:
+        return np.array(values, dtype="datetime64[s]")
+    except ValueError:
+        # Нестандартный формат (например, с часовым поясом) - сравнение в SQL идёт по строке,
+        # поэтому берём "настенное" время без учёта пояса, как в строке
+        return np.array([v[:19].replace(" ", "T") for v in values], dtype="datetime64[s]")
+
+
+@dataclass
+class PaymentColumns:
+    id: np.ndarray
+    amount: np.ndarray      # int64, копейки
+    payer: np.ndarray       # int64
+    recipient: np.ndarray   # int64, -1 = NULL
+    group: np.ndarray       # int8, класс группы
+    status: np.ndarray      # int8
+    currency: np.ndarray    # int32, индекс в currencies (отсортированы как строки)
+    month: np.ndarray       # int64, индекс месяца payment_date
+
+
+@dataclass
+class TaskColumns:
+    assignment: np.ndarray  # int64
+    user: np.ndarray        # int64, Assignment.user_id
+    month: np.ndarray       # int64, индекс месяца start_time
+    counted: np.ndarray     # bool: завершённая задача типа work
+    hours: np.ndarray       # float64, (julianday(end) - julianday(start)) * 24
+
+
+@dataclass
+class BalanceSnapshot:
+    version: int
+    payments: PaymentColumns
+    tasks: TaskColumns
+    currencies: List[str]
+    user_names: Dict[int, str]
+
+    def __post_init__(self):
+        p = self.payments
+        self.is_salary = p.group == SALARY
+        self.is_expense = p.group == EXPENSE
+        self.is_bonus = p.group == BONUS
+        self.is_debt = p.group == DEBT
+        self.is_repayment = p.group == REPAYMENT
+        # code != 'repayment' после inner join: NULL-код и категории без группы не проходят
+        self.is_coded_not_repayment = np.isin(p.group, (SALARY, EXPENSE, BONUS, DEBT, OTHER_CODE))
+        self.unpaid = p.status == UNPAID
+        self.paid = p.status == PAID
+        self.offset = p.status == OFFSET
+        self.settled = self.paid | self.offset
+        self.all = np.ones(len(p.amount), dtype=bool)
+
+    def total(self, mask: np.ndarray) -> float:
+        """SUM(amount) по маске, как float(SUM) в эталоне"""
+        return int(self.payments.amount[mask].sum()) / 100
+
+    def recipient_is(self, user_id: Optional[int]) -> np.ndarray:
+        return self.payments.recipient == user_id if user_id else self.all
+
+    def payer_is(self, user_id: Optional[int]) -> np.ndarray:
+        return self.payments.payer == user_id if user_id else self.all
+
+    def party_is(self, user_id: int) -> np.ndarray:
+        return (self.payments.recipient == user_id) | (self.payments.payer == user_id)
+
+    def name(self, user_id: int) -> Optional[str]:
+        return self.user_names.get(user_id)
+
+
+async def load_snapshot(db: AsyncSession, version: int) -> BalanceSnapshot:
+    """Прочитать платежи, задачи и справочники в колоночный снимок"""
+    group_codes = dict((await db.execute(select(PaymentCategoryGroup.id, PaymentCategoryGroup.code))).all())
+    category_classes = {}
+    for category_id, group_id in (await db.execute(select(PaymentCategory.id, PaymentCategory.group_id))).all():
+        if group_id is None or group_id not in group_codes:
+            category_classes[category_id] = NO_GROUP
+        else:
+            code = group_codes[group_id]
+            category_classes[category_id] = NULL_CODE if code is None else GROUP_CLASSES.get(code, OTHER_CODE)
+
+    rows = (await db.execute(
+        select(Payment.id, Payment.amount, Payment.payer_id, Payment.recipient_id, Payment.category_id,
+               Payment.payment_status, Payment.currency, type_coerce(Payment.payment_date, String))
+        .order_by(Payment.id)
+    )).all()
+    currencies = sorted({row[6] for row in rows})
+    currency_index = {code: i for i, code in enumerate(currencies)}
+    payments = PaymentColumns(
+        id=np.array([row[0] for row in rows], dtype=np.int64),
+        amount=np.array([int(row[1] * 100) for row in rows], dtype=np.int64),
+        payer=np.array([row[2] for row in rows], dtype=np.int64),
+        recipient=np.array([-1 if row[3] is None else row[3] for row in rows], dtype=np.int64),
+        group=np.array([category_classes.get(row[4], NO_GROUP) for row in rows], dtype=np.int8),
+        status=np.array([STATUSES.get(row[5], OTHER_STATUS) for row in rows], dtype=np.int8),
+        currency=np.array([currency_index[row[6]] for row in rows], dtype=np.int32),
+        month=_parse_moments([row[7] for row in rows]).astype("datetime64[M]").astype(np.int64),
+    )
+
+    rows = (await db.execute(
+        select(Task.assignment_id, Assignment.user_id, Task.task_type,
+               type_coerce(Task.start_time, String), type_coerce(Task.end_time, String))
+        .join(Assignment, Task.assignment_id == Assignment.id)
+    )).all()
+    starts = _parse_moments([row[3] for row in rows])
+    ends = _parse_moments([row[4] or row[3] for row in rows])
+    start_jd = (starts.astype(np.int64) * 1000 + _UNIX_EPOCH_JD_MS) / 86400000.0
+    end_jd = (ends.astype(np.int64) * 1000 + _UNIX_EPOCH_JD_MS) / 86400000.0
+    tasks = TaskColumns(
+        assignment=np.array([row[0] for row in rows], dtype=np.int64),
+        user=np.array([row[1] for row in rows], dtype=np.int64),
+        month=starts.astype("datetime64[M]").astype(np.int64),
+        counted=np.array([row[2] == "work" and row[4] is not None for row in rows], dtype=bool),
+        hours=(end_jd - start_jd) * 24,
+    )
+
+    user_names = dict((await db.execute(select(User.id, User.full_name))).all())
+    return BalanceSnapshot(version, payments, tasks, currencies, user_names)
+
+
+class SnapshotCache:
+    """Снимок на каждый движок БД; перестраивается при смене max(seq) в change_log.
+
+    Массовые загрузки в обход ORM-сессии (insert() без журнала) должны вызвать invalidate().
+    """
+
+    def __init__(self):
+        self._entries = weakref.WeakKeyDictionary()  # sync Engine -> [lock, snapshot]
+
+    async def get(self, db: AsyncSession) -> BalanceSnapshot:
+        from database.change_log import get_latest_seq
+
+        version = await get_latest_seq(db)
+        key = db.get_bind()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Lock(), None]
+        lock, snapshot = entry
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        async with lock:
+            snapshot = entry[1]
+            if snapshot is None or snapshot.version != version:
+                snapshot = entry[1] = await load_snapshot(db, version)
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Сбросить все снимки (для загрузок в обход ORM-сессии и журнала)"""
+        self._entries.clear()
+
+
+class ColumnarBalanceEngine(BalanceEngine):
+    name = "numpy"
+
+    def __init__(self):
+        self.snapshots = SnapshotCache()
+
+    # ---------- Карточки ----------
+
+    async def cards(self, db, user_filter_id=None, worker_id=None):
+        from api.routers.balances import CardsSummary
+
+        s = await self.snapshots.get(db)
+        recipient = s.recipient_is(user_filter_id or worker_id)
+        total_salary = s.total(s.is_salary & s.settled & recipient)
+        salary_paid = s.total(s.is_salary & s.paid & recipient)
+        salary_unpaid = s.total(s.is_salary & s.unpaid & recipient)
+        credits_given = s.total(s.is_debt & s.paid & recipient)
+        expenses_paid = s.total(s.is_expense & s.paid & s.payer_is(user_filter_id or worker_id))
+        total_bonus = s.total(s.is_bonus & s.settled & recipient)
+
+        paid = credits_given + salary_paid
+        debt = max(0, paid - total_salary)
+        total = paid
+        return CardsSummary(
+            salary=round(total_salary, 2),
+            expenses=round(expenses_paid, 2),
+            paid=round(paid, 2),
+            unpaid=round(salary_unpaid, 2),
+            debt=round(debt, 2),
+            bonus=round(total_bonus, 2),
+            total=round(total, 2),
+            currency="UAH"
+        )
+
+    # ---------- Сводка Dashboard ----------
+
+    async def summary(self, db, current_user, employer_id=None, worker_id=None):
+        from api.routers.balances import BalanceItem, DashboardSummary
+
+        user_filter_id = None
+        try:
+            if not current_user.has_permission('view_all_reports'):
+                user_filter_id = current_user.id
+        except Exception:
+            user_filter_id = current_user.id
+
+        s = await self.snapshots.get(db)
+        recipient = s.recipient_is(user_filter_id or worker_id)
+        payer = s.payer_is(user_filter_id or worker_id)
+
+        total_salary = s.total(s.is_salary & s.settled & recipient)
+        total_salary_paid = s.total(s.is_salary & s.paid & recipient)
+        if user_filter_id:
+            total_expenses = s.total(s.is_expense & s.unpaid & s.payer_is(user_filter_id))
+        else:
+            total_expenses = s.total(s.is_expense & s.settled & s.payer_is(worker_id))
+        total_credits = s.total(s.is_debt & s.paid & recipient)
+        unpaid_amount = s.total(s.unpaid & s.is_coded_not_repayment & recipient)
+        total_bonus = s.total(s.is_bonus & s.settled & recipient)
+        repayment_explicit = s.total(s.is_repayment & s.paid & payer)
+        salary_offset = s.total(s.is_salary & s.offset & recipient)
+
+        total_repayment = min(repayment_explicit + salary_offset, total_credits)
+        if user_filter_id:
+            total_unpaid = unpaid_amount
+            total = total_salary + total_credits + total_bonus - total_repayment - total_expenses
+        else:
+            total_unpaid = max(0, total_credits - total_repayment)
+            total = total_salary_paid + total_credits + total_bonus + total_expenses
+
+        # Неоплаченные долги по (payer, recipient, currency) в порядке GROUP BY
+        balances = []
+        currency = "UAH"
+        mask = s.unpaid & (s.payments.recipient == user_filter_id if user_filter_id else s.all)
+        for (payer_id, recipient_id, currency_id), cents in _group_sums(s, mask):
+            currency = s.currencies[currency_id]
+            recipient_id = None if recipient_id == -1 else recipient_id
+            balances.append(BalanceItem(
+                debtor_id=payer_id,
+                debtor_name=s.name(payer_id) or f"ID:{payer_id}",
+                creditor_id=recipient_id or 0,
+                creditor_name=(s.name(recipient_id) or "—") if recipient_id else "—",
+                amount=cents / 100,
+                currency=currency
+            ))
+
+        return DashboardSummary(
+            total_salary=total_salary,
+            total_expenses=total_expenses,
+            total_credits=total_credits,
+            total_repayment=total_repayment,
+            total_unpaid=total_unpaid,
+            total_bonus=total_bonus,
+            total=total,
+            currency=currency,
+            balances=balances
+        )
+
+    # ---------- Помесячная сводка ----------
+
+    async def monthly(self, db, current_user, employer_id=None, worker_id=None, months=12, periods=None):
+        from api.routers.balances import MonthlySummary, month_periods
+
+        is_worker_view = False
+        try:
+            if not current_user.has_permission('view_all_reports'):
+                worker_id = current_user.id
+                is_worker_view = True
+        except Exception:
+            worker_id = current_user.id
+            is_worker_view = True
+
+        # Те же периоды, что в эталоне (шаг 30 дней от первого числа текущего месяца)
+        if periods is None:
+            periods = month_periods(months)
+        if not periods:
+            return []
+        indexes = [_month_index(year, month) for year, month in periods]
+        first, last = min(indexes), max(indexes)
+        width = last - first + 1
+
+        s = await self.snapshots.get(db)
+        p = s.payments
+        in_window = (p.month >= first) & (p.month <= last)
+
+        def per_month(mask: np.ndarray) -> np.ndarray:
+            mask = mask & in_window
+            return np.bincount(p.month[mask] - first, weights=p.amount[mask], minlength=width)
+
+        by_worker_recipient = s.recipient_is(worker_id)
+        by_worker_payer = s.payer_is(worker_id)
+        by_employer_payer = s.payer_is(employer_id)
+        by_employer_recipient = s.recipient_is(employer_id)
+        # Корзины, где работодатель учитывается только без работника (elif в эталоне)
+        if worker_id:
+            credit_filter = s.recipient_is(worker_id)
+            repayment_filter = s.party_is(worker_id)
+        elif employer_id:
+            credit_filter = s.payer_is(employer_id)
+            repayment_filter = s.party_is(employer_id)
+        else:
+            credit_filter = repayment_filter = s.all
+        salary_filter = by_worker_recipient & by_employer_payer
+
+        salary = per_month(s.is_salary & s.settled & salary_filter)
+        salary_paid = per_month(s.is_salary & s.paid & salary_filter)
+        salary_unpaid = per_month(s.is_salary & s.unpaid & salary_filter)
+        credits = per_month(s.is_debt & s.paid & credit_filter)
+        repayments = per_month(s.is_repayment & s.paid & repayment_filter)
+        salary_offsets = per_month(s.is_salary & s.offset & credit_filter)
+        expenses_all = per_month(s.is_expense & by_worker_payer & by_employer_recipient)
+        expenses_settled = per_month(s.is_expense & s.settled)
+        bonuses = per_month(s.is_bonus & s.settled & by_worker_recipient & by_employer_payer)
+
+        t = s.tasks
+        task_mask = t.counted & (t.month >= first) & (t.month <= last)
+        if worker_id:
+            task_mask &= t.user == worker_id
+        hours_by_month = np.bincount(t.month[task_mask] - first, weights=t.hours[task_mask], minlength=width)
+        session_keys = np.unique(np.stack([t.month[task_mask] - first, t.assignment[task_mask]]), axis=1) \
+            if task_mask.any() else np.empty((2, 0), dtype=np.int64)
+        sessions_by_month = np.bincount(session_keys[0], minlength=width)
+
+        summaries = []
+        for (year, month), index in zip(periods, indexes):
+            k = index - first
+            sessions = int(sessions_by_month[k])
+            hours = float(hours_by_month[k]) if hours_by_month[k] else 0
+            month_salary = int(salary[k]) / 100
+            month_salary_paid = int(salary_paid[k]) / 100
+            month_salary_unpaid = int(salary_unpaid[k]) / 100
+            credits_given = int(credits[k]) / 100
+            repayment_explicit = int(repayments[k]) / 100
+            salary_offset = int(salary_offsets[k]) / 100
+            credits_offset = min(repayment_explicit + salary_offset, credits_given)
+            expenses = int(expenses_all[k]) / 100
+            expenses_paid = int(expenses_settled[k]) / 100
+            bonus = int(bonuses[k]) / 100
+
+            remaining = expenses - expenses_paid
+            if is_worker_view:
+                total = month_salary + credits_given + bonus - credits_offset - remaining
+            else:
+                total = month_salary_paid + credits_given + bonus + expenses_paid
+            debt_remaining = max(0, credits_given - credits_offset)
+
+            summaries.append(MonthlySummary(
+                period=f"{year}-{month:02d}",
+                sessions=sessions,
+                hours=round(hours, 2),
+                credit=round(credits_given, 2),
+                salary=round(month_salary, 2),
+                salary_paid=round(month_salary_paid, 2),
+                salary_unpaid=round(month_salary_unpaid, 2),
+                expenses=round(remaining, 2) if is_worker_view else round(expenses_paid, 2),
+                expenses_paid=round(expenses_paid, 2),
+                expenses_unpaid=round(remaining, 2),
+                debt=round(debt_remaining, 2),
+                bonus=round(bonus, 2),
+                total=round(total, 2),
+                currency="UAH"
+            ))
+        return summaries
+
+    # ---------- Взаимные расчёты ----------
+
+    async def mutual(self, db, current_user):
+        from api.routers.balances import MutualBalance
+
+        user_filter_id = None
+        if not current_user.has_permission('view_all_reports'):
+            user_filter_id = current_user.id
+
+        s = await self.snapshots.get(db)
+        p = s.payments
+        has_recipient = p.recipient != -1
+        debt_mask = has_recipient & s.is_debt & s.paid
+        if user_filter_id:
+            debt_mask &= s.party_is(user_filter_id)
+
+        # Пары (payer, recipient, currency) в порядке первого появления (SCAN payments + DISTINCT)
+        keys = _pair_keys(s)
+        _, first_seen = np.unique(keys[debt_mask], return_index=True)
+        pair_rows = np.flatnonzero(debt_mask)[np.sort(first_seen)]
+
+        debt_sums = _keyed_sums(keys, p.amount, s.is_debt & s.paid & has_recipient)
+        salary_paid_sums = _keyed_sums(keys, p.amount, s.is_salary & s.paid & has_recipient)
+        salary_total_sums = _keyed_sums(keys, p.amount, s.is_salary & s.settled & has_recipient)
+
+        balances = []
+        processed = set()
+        for row in pair_rows:
+            payer_id, recipient_id, currency_id = int(p.payer[row]), int(p.recipient[row]), int(p.currency[row])
+            pair_key = (min(payer_id, recipient_id), max(payer_id, recipient_id), currency_id)
+            if pair_key in processed:
+                continue
+            processed.add(pair_key)
+            a_id, b_id = pair_key[0], pair_key[1]
+            key = _pair_key(s, a_id, b_id, currency_id)
+
+            debt_a_to_b = debt_sums.get(key, 0) / 100
+            salary_paid_a_to_b = salary_paid_sums.get(key, 0) / 100
+            salary_total_a_to_b = salary_total_sums.get(key, 0) / 100
+
+            paid_a_to_b = debt_a_to_b + salary_paid_a_to_b
+            debt_b_owes_a = max(0, paid_a_to_b - salary_total_a_to_b)
+            if debt_b_owes_a > 0.01:
+                balances.append(MutualBalance(
+                    creditor_id=a_id,
+                    creditor_name=s.name(a_id) or f"ID:{a_id}",
+                    debtor_id=b_id,
+                    debtor_name=s.name(b_id) or f"ID:{b_id}",
+                    paid=round(paid_a_to_b, 2),
+                    salary=round(salary_total_a_to_b, 2),
+                    debt=round(debt_b_owes_a, 2),
+                    currency=s.currencies[currency_id]
+                ))
+        return balances
+
+
+def _key_sizes(s: BalanceSnapshot) -> Tuple[int, int]:
+    p = s.payments
+    max_user = int(max(p.payer.max(initial=0), p.recipient.max(initial=0))) + 2
+    return max_user, max(len(s.currencies), 1)
+
+
+def _pair_key(s: BalanceSnapshot, payer_id: int, recipient_id: int, currency_id: int) -> int:
+    users, currencies = _key_sizes(s)
+    return (payer_id * users + recipient_id + 1) * currencies + currency_id
+
+
+def _pair_keys(s: BalanceSnapshot) -> np.ndarray:
+    """Ключ (payer, recipient, currency) одним int64; порядок ключей = порядок сортировки кортежей"""
+    p = s.payments
+    users, currencies = _key_sizes(s)
+    return (p.payer * users + p.recipient + 1) * currencies + p.currency
+
+
+def _keyed_sums(keys: np.ndarray, amounts: np.ndarray, mask: np.ndarray) -> Dict[int, int]:
+    unique, inverse = np.unique(keys[mask], return_inverse=True)
+    sums = np.bincount(inverse, weights=amounts[mask], minlength=len(unique))
+    return {int(k): int(v) for k, v in zip(unique, sums)}
+
+
+def _group_sums(s: BalanceSnapshot, mask: np.ndarray) -> List[Tuple[Tuple[int, int, int], int]]:
+    """GROUP BY payer, recipient, currency (NULL-получатель первым, как в SQLite)"""
+    p = s.payments
+    users, currencies = _key_sizes(s)
+    result = []
+    for key, cents in sorted(_keyed_sums(_pair_keys(s), p.amount, mask).items()):
+        currency_id = key % currencies
+        rest = key // currencies
+        result.append(((rest // users, rest % users - 1, currency_id), cents))
+    return result
+
+
+def invalidate_snapshots() -> None:
+    """Сбросить снимки зарегистрированного колоночного движка (после загрузок без change_log)"""
+    from utils.balance_engines import available_engines, get_engine
+
+    if ColumnarBalanceEngine.name in available_engines():
+        get_engine(ColumnarBalanceEngine.name).snapshots.invalidate()
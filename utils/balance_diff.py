@@ -0,0 +1,429 @@
+"""
+Дифференциальная проверка движков балансов против эталона ("sql").
+
+Эталон и проверяемый движок считают одно и то же на одной БД, после чего
+сравнивается каждое поле ответа (карточки, помесячная сводка, взаимные
+расчёты, строки балансов). Источники данных:
+
+- JSON-экспорты из tests/balance_fixtures/ (формат /balances/debug);
+- случайные реестры платежей (seed_random_ledger) с граничными случаями:
+  платежи ровно на границе месяца, без получателя, в другой валюте,
+  категории без группы и группы без кода.
+
+Запуск: python -m utils.balance_diff --engine <name> [--ledgers 1000] [--seed 1]
+
+Теневой режим (shadow_compare) пересчитывает долю живых запросов /balances/*
+движком из BALANCE_SHADOW_ENGINE и пишет расхождения в лог nursia.balance_shadow.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from utils.balance_engines import REFERENCE_ENGINE, BalanceEngine, get_active_engine, get_engine
+
+logger = logging.getLogger("nursia.balance_shadow")
+
+# Поля ответов округляются до копеек; расхождение меньше копейки не считается
+DEFAULT_TOLERANCE = 0.01
+MAX_LOGGED_DIFFERENCES = 10
+FIXTURES_DIR = Path(__file__).parent.parent / "tests" / "balance_fixtures"
+
+
+def _plain(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return value
+
+
+def diff_results(reference: Any, candidate: Any, tolerance: float = DEFAULT_TOLERANCE, path: str = "") -> List[str]:
+    """Список расхождений вида 'path: reference != candidate' (пустой - результаты совпадают)"""
+    reference, candidate = _plain(reference), _plain(candidate)
+    where = path or "<root>"
+
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        differences = []
+        for key in sorted(set(reference) | set(candidate), key=str):
+            if key not in candidate:
+                differences.append(f"{path}.{key}: missing in candidate")
+            elif key not in reference:
+                differences.append(f"{path}.{key}: unexpected in candidate")
+            else:
+                differences.extend(diff_results(reference[key], candidate[key], tolerance, f"{path}.{key}"))
+        return differences
+
+    if isinstance(reference, (list, tuple)) and isinstance(candidate, (list, tuple)):
+        differences = []
+        if len(reference) != len(candidate):
+            differences.append(f"{where}: length {len(reference)} != {len(candidate)}")
+        for i, (ref_item, cand_item) in enumerate(zip(reference, candidate)):
+            differences.extend(diff_results(ref_item, cand_item, tolerance, f"{path}[{i}]"))
+        return differences
+
+    numeric = (int, float, Decimal)
+    if isinstance(reference, numeric) and isinstance(candidate, numeric) \
+            and not isinstance(reference, bool) and not isinstance(candidate, bool):
+        if abs(float(reference) - float(candidate)) >= tolerance - 1e-9:
+            return [f"{where}: {reference} != {candidate}"]
+        return []
+
+    if reference != candidate:
+        return [f"{where}: {reference!r} != {candidate!r}"]
+    return []
+
+
+@dataclass(frozen=True)
+class Viewer:
+    """Пользователь, от имени которого считается отчёт (как current_user в эндпоинтах)"""
+    id: int
+    permissions: FrozenSet[str] = frozenset()
+    is_worker: bool = False
+
+    def has_permission(self, permission_name: str) -> bool:
+        return permission_name in self.permissions
+
+    def __str__(self) -> str:
+        role = "admin" if self.permissions else ("worker" if self.is_worker else "user")
+        return f"{role}#{self.id}"
+
+
+@dataclass(frozen=True)
+class BalanceCall:
+    endpoint: str  # summary | monthly | mutual | cards
+    params: Tuple[Tuple[str, Any], ...]
+    viewer: Optional[Viewer] = None
+
+    def kwargs(self) -> Dict[str, Any]:
+        kwargs = dict(self.params)
+        if self.endpoint != "cards":
+            kwargs["current_user"] = self.viewer
+        return kwargs
+
+    def __str__(self) -> str:
+        args = ", ".join(f"{k}={v}" for k, v in self.params)
+        who = f" as {self.viewer}" if self.viewer else ""
+        return f"{self.endpoint}({args}){who}"
+
+
+@dataclass
+class Ledger:
+    """Участники реестра: по ним строится набор вызовов"""
+    name: str
+    employer_ids: List[int]
+    worker_ids: List[int]
+    months: int = 12
+
+
+@dataclass
+class Divergence:
+    ledger: str
+    call: str
+    differences: List[str]
+
+
+@dataclass
+class DiffReport:
+    engine: str
+    ledgers: int = 0
+    calls: int = 0
+    divergences: List[Divergence] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.divergences
+
+
+ADMIN = Viewer(id=10_000, permissions=frozenset({"view_all_reports"}))
+
+
+def build_calls(ledger: Ledger) -> List[BalanceCall]:
+    """Набор вызовов: админ со всеми фильтрами, каждый работник, работодатель без прав"""
+    months = ledger.months
+    calls = [
+        BalanceCall("summary", (("employer_id", None), ("worker_id", None)), ADMIN),
+        BalanceCall("monthly", (("employer_id", None), ("worker_id", None), ("months", months)), ADMIN),
+        BalanceCall("mutual", (), ADMIN),
+        BalanceCall("cards", (("user_filter_id", None), ("worker_id", None))),
+    ]
+    for employer_id in ledger.employer_ids[:2]:
+        calls += [
+            BalanceCall("summary", (("employer_id", employer_id), ("worker_id", None)), ADMIN),
+            BalanceCall("monthly", (("employer_id", employer_id), ("worker_id", None), ("months", months)), ADMIN),
+            BalanceCall("summary", (("employer_id", None), ("worker_id", None)), Viewer(id=employer_id)),
+            BalanceCall("mutual", (), Viewer(id=employer_id)),
+        ]
+    for worker_id in ledger.worker_ids[:3]:
+        worker = Viewer(id=worker_id, is_worker=True)
+        calls += [
+            BalanceCall("summary", (("employer_id", None), ("worker_id", worker_id)), ADMIN),
+            BalanceCall("monthly", (("employer_id", None), ("worker_id", worker_id), ("months", months)), ADMIN),
+            BalanceCall("cards", (("user_filter_id", None), ("worker_id", worker_id))),
+            BalanceCall("summary", (("employer_id", None), ("worker_id", None)), worker),
+            BalanceCall("monthly", (("employer_id", None), ("worker_id", None), ("months", months)), worker),
+            BalanceCall("mutual", (), worker),
+            BalanceCall("cards", (("user_filter_id", worker_id), ("worker_id", None))),
+        ]
+    return calls
+
+
+async def compare_engines(db: AsyncSession, ledger: Ledger, candidate: BalanceEngine,
+                          reference: Optional[BalanceEngine] = None,
+                          tolerance: float = DEFAULT_TOLERANCE) -> Tuple[int, List[Divergence]]:
+    """Выполнить все вызовы ledger эталоном и кандидатом; вернуть (число вызовов, расхождения)"""
+    reference = reference or get_engine(REFERENCE_ENGINE)
+    divergences = []
+    calls = build_calls(ledger)
+    for call in calls:
+        expected = await getattr(reference, call.endpoint)(db=db, **call.kwargs())
+        try:
+            actual = await getattr(candidate, call.endpoint)(db=db, **call.kwargs())
+        except Exception as e:
+            divergences.append(Divergence(ledger.name, str(call), [f"candidate raised {type(e).__name__}: {e}"]))
+            continue
+        differences = diff_results(expected, actual, tolerance)
+        if differences:
+            divergences.append(Divergence(ledger.name, str(call), differences))
+    return len(calls), divergences
+
+
+# ================================
+# Источники данных
+# ================================
+
+async def _create_groups(db: AsyncSession) -> Dict[str, int]:
+    """Группы всех кодов + группа без кода; категории: по одной на группу и одна без группы"""
+    from database.models import PaymentCategory, PaymentCategoryGroup, PaymentGroupCode
+
+    groups = {"Зарплата": PaymentGroupCode.SALARY.value, "Расходы": PaymentGroupCode.EXPENSE.value,
+              "Долги": PaymentGroupCode.DEBT.value, "Премии": PaymentGroupCode.BONUS.value,
+              "Погашения": PaymentGroupCode.REPAYMENT.value, "Прочее": None}
+    category_ids = {}
+    for name, code in groups.items():
+        group = PaymentCategoryGroup(name=name, code=code)
+        db.add(group)
+        await db.flush()
+        category = PaymentCategory(name=name, group_id=group.id)
+        db.add(category)
+        await db.flush()
+        category_ids[name] = category.id
+    orphan = PaymentCategory(name="Без группы", group_id=None)
+    db.add(orphan)
+    await db.flush()
+    category_ids[orphan.name] = orphan.id
+    return category_ids
+
+
+async def seed_from_export(db: AsyncSession, export: dict, name: str = "export") -> Ledger:
+    """Загрузить платежи из JSON-экспорта /balances/debug (tests/balance_fixtures)"""
+    from database.models import Payment, User
+
+    category_ids = await _create_groups(db)
+    users = {}
+    for p in export.get("payments", []):
+        for role in ("payer", "recipient"):
+            user_id = p.get(f"{role}_id")
+            if user_id and user_id not in users:
+                users[user_id] = User(id=user_id, username=f"user{user_id}", password_hash="x",
+                                      full_name=p.get(f"{role}_name") or f"User {user_id}", status="active")
+    db.add_all(users.values())
+    await db.flush()
+
+    employer_ids, worker_ids = set(), set()
+    oldest = datetime.now(timezone.utc)
+    for p in export.get("payments", []):
+        group = p.get("category_group")
+        if group in ("Зарплата", "Долги", "Премии") and p.get("recipient_id"):
+            employer_ids.add(p["payer_id"])
+            worker_ids.add(p["recipient_id"])
+        payment_date = datetime.fromisoformat(p["payment_date"].replace("Z", "+00:00"))
+        oldest = min(oldest, payment_date)
+        db.add(Payment(
+            tracking_nr=p.get("tracking_nr"), payer_id=p["payer_id"], recipient_id=p.get("recipient_id"),
+            amount=Decimal(str(p.get("amount", 0))), currency=p.get("currency", "UAH"),
+            category_id=category_ids.get(group, category_ids["Прочее"]),
+            payment_status=p.get("payment_status", "unpaid"),
+            payment_date=payment_date, description=p.get("description"),
+        ))
+    await db.commit()
+    # Помесячная сводка должна дотянуться до самого старого платежа (максимум 24 месяца)
+    now = datetime.now(timezone.utc)
+    months = min(24, (now.year - oldest.year) * 12 + now.month - oldest.month + 2)
+    return Ledger(name, sorted(employer_ids), sorted(worker_ids), months=months)
+
+
+async def seed_random_ledger(db: AsyncSession, rng: random.Random, name: str = "random",
+                             now: Optional[datetime] = None) -> Ledger:
+    """Случайный реестр: 1-2 работодателя, 1-3 работника, до 40 платежей и смены с задачами"""
+    from database.models import Assignment, Payment, Task, User
+
+    now = now or datetime.now(timezone.utc)
+    category_ids = await _create_groups(db)
+    category_names = list(category_ids)
+
+    employers = [User(username=f"employer{i}", full_name=f"Employer {i}", password_hash="x", status="active")
+                 for i in range(rng.randint(1, 2))]
+    workers = [User(username=f"worker{i}", full_name=f"Worker {i}", password_hash="x", status="active")
+               for i in range(rng.randint(1, 3))]
+    db.add_all(employers + workers)
+    await db.flush()
+    employer_ids = [u.id for u in employers]
+    worker_ids = [u.id for u in workers]
+    months = rng.choice((1, 2, 6, 13))
+    horizon_days = 31 * (months + 1)
+
+    def random_moment() -> datetime:
+        roll = rng.random()
+        day = (now - timedelta(days=rng.randint(-3, horizon_days))).date()
+        if roll < 0.1:
+            # Ровно на начало месяца
+            return datetime.combine(day.replace(day=1), time(0, 0), tzinfo=timezone.utc)
+        if roll < 0.2:
+            # Последняя секунда месяца
+            first = day.replace(day=1)
+            return datetime.combine(first, time(0, 0), tzinfo=timezone.utc) - timedelta(seconds=1)
+        return datetime.combine(day, time(rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59)),
+                                tzinfo=timezone.utc)
+
+    everyone = employer_ids + worker_ids
+    for _ in range(rng.randint(0, 40)):
+        category = rng.choice(category_names)
+        if rng.random() < 0.8:
+            # Типичное направление: зарплата/аванс/премия от работодателя, расходы/погашения от работника
+            employer, worker = rng.choice(employer_ids), rng.choice(worker_ids)
+            payer, recipient = (worker, employer) if category in ("Расходы", "Погашения") else (employer, worker)
+        else:
+            payer, recipient = rng.choice(everyone), rng.choice(everyone)
+        if rng.random() < 0.05:
+            recipient = None
+        db.add(Payment(
+            payer_id=payer, recipient_id=recipient, category_id=category_ids[category],
+            amount=Decimal(rng.randint(1, 500_000)) / 100,
+            currency="EUR" if rng.random() < 0.15 else "UAH",
+            payment_date=random_moment(),
+            payment_status=rng.choice(("unpaid", "paid", "offset")),
+        ))
+
+    for worker_id in worker_ids:
+        for _ in range(rng.randint(0, 6)):
+            assignment = Assignment(user_id=worker_id)
+            db.add(assignment)
+            await db.flush()
+            start = random_moment()
+            for _ in range(rng.randint(1, 3)):
+                end = start + timedelta(minutes=rng.randint(1, 300))
+                db.add(Task(assignment_id=assignment.id, start_time=start,
+                            end_time=None if rng.random() < 0.1 else end,
+                            task_type=rng.choice(("work", "work", "pause", "absent"))))
+                start = end
+    await db.commit()
+    return Ledger(name, employer_ids, worker_ids, months=months)
+
+
+async def _fresh_session_factory():
+    from database.models import Base
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def run_differential(candidate: BalanceEngine, ledgers: int = 100, seed: int = 0,
+                           fixtures: Sequence[Path] = (), reference: Optional[BalanceEngine] = None,
+                           tolerance: float = DEFAULT_TOLERANCE) -> DiffReport:
+    """Сверить движок с эталоном на фикстурах и ledgers случайных реестрах"""
+    report = DiffReport(engine=candidate.name)
+    sources = [("fixture", path) for path in fixtures] + [("random", i) for i in range(ledgers)]
+    for kind, source in sources:
+        engine, session_factory = await _fresh_session_factory()
+        try:
+            async with session_factory() as db:
+                if kind == "fixture":
+                    export = json.loads(Path(source).read_text(encoding="utf-8"))
+                    ledger = await seed_from_export(db, export, name=Path(source).stem)
+                else:
+                    ledger = await seed_random_ledger(db, random.Random(f"{seed}:{source}"),
+                                                      name=f"random seed={seed}:{source}")
+                calls, divergences = await compare_engines(db, ledger, candidate, reference, tolerance)
+        finally:
+            await engine.dispose()
+        report.ledgers += 1
+        report.calls += calls
+        report.divergences.extend(divergences)
+    return report
+
+
+# ================================
+# Теневой режим
+# ================================
+
+async def shadow_compare(endpoint: str, served: Any, db: AsyncSession, **params) -> None:
+    """Пересчитать выборку живых запросов теневым движком и залогировать расхождения.
+
+    Выполняется в том же запросе и той же сессии, что и основной расчёт (те же
+    данные), поэтому добавляет задержку только к попавшим в выборку запросам.
+    Ошибки теневого движка никогда не влияют на ответ.
+    """
+    from config.settings import settings
+    from utils.metrics import balance_shadow_comparisons_total
+
+    engine_name = settings.BALANCE_SHADOW_ENGINE
+    if not engine_name or engine_name == get_active_engine().name \
+            or random.random() >= settings.BALANCE_SHADOW_SAMPLE_RATE:
+        return
+
+    try:
+        candidate = await getattr(get_engine(engine_name), endpoint)(db=db, **params)
+    except Exception:
+        balance_shadow_comparisons_total.inc(engine_name, endpoint, "error")
+        logger.exception(f"Shadow balance engine {engine_name!r} failed on {endpoint}")
+        return
+
+    differences = diff_results(served, candidate)
+    if not differences:
+        balance_shadow_comparisons_total.inc(engine_name, endpoint, "match")
+        return
+
+    balance_shadow_comparisons_total.inc(engine_name, endpoint, "diverged")
+    user = params.get("current_user")
+    filters = {k: v for k, v in params.items() if k != "current_user"}
+    logger.warning(
+        f"Shadow balance engine {engine_name!r} diverged on {endpoint} "
+        f"(user={getattr(user, 'id', None)}, filters={filters}): "
+        f"{len(differences)} field(s): " + "; ".join(differences[:MAX_LOGGED_DIFFERENCES])
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", required=True, help="проверяемый движок")
+    parser.add_argument("--ledgers", type=int, default=1000, help="число случайных реестров")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-fixtures", action="store_true", help="не проверять tests/balance_fixtures")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    fixtures = [] if args.no_fixtures else sorted(FIXTURES_DIR.glob("*.json"))
+    report = await run_differential(get_engine(args.engine), ledgers=args.ledgers, seed=args.seed,
+                                    fixtures=fixtures)
+    for divergence in report.divergences:
+        print(f"[{divergence.ledger}] {divergence.call}")
+        for difference in divergence.differences[:MAX_LOGGED_DIFFERENCES]:
+            print(f"    {difference}")
+    print(f"engine={report.engine} ledgers={report.ledgers} calls={report.calls} "
+          f"divergent_calls={len(report.divergences)}")
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
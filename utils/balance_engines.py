@@ -0,0 +1,99 @@
+"""
+Движки расчёта балансов (карточки, помесячная сводка, взаимные расчёты).
+
+Эталон - "sql": исходная реализация в api/routers/balances.py (запрос на каждую
+корзину). Альтернативные движки регистрируются через register_engine и
+сверяются с эталоном в utils/balance_diff.py. "numpy" (utils/balance_columnar.py)
+регистрируется, только если установлен numpy.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_ENGINE = "sql"
+
+
+class BalanceEngine:
+    """Интерфейс движка; параметры совпадают с эндпоинтами /balances/*"""
+    name = "base"
+
+    async def summary(self, db: AsyncSession, current_user, employer_id: Optional[int] = None,
+                      worker_id: Optional[int] = None):
+        raise NotImplementedError
+
+    async def monthly(self, db: AsyncSession, current_user, employer_id: Optional[int] = None,
+                      worker_id: Optional[int] = None, months: int = 12,
+                      periods: Optional[List[Tuple[int, int]]] = None) -> List:
+        """periods - явный список (год, месяц) вместо последних months месяцев"""
+        raise NotImplementedError
+
+    async def mutual(self, db: AsyncSession, current_user) -> List:
+        raise NotImplementedError
+
+    async def cards(self, db: AsyncSession, user_filter_id: Optional[int] = None,
+                    worker_id: Optional[int] = None):
+        raise NotImplementedError
+
+
+class SqlBalanceEngine(BalanceEngine):
+    """Эталонный движок: SQL-агрегаты из api/routers/balances.py"""
+    name = REFERENCE_ENGINE
+
+    async def summary(self, db, current_user, employer_id=None, worker_id=None):
+        from api.routers.balances import balance_summary_sql
+        return await balance_summary_sql(employer_id, worker_id, db, current_user)
+
+    async def monthly(self, db, current_user, employer_id=None, worker_id=None, months=12, periods=None):
+        from api.routers.balances import monthly_summary_sql
+        return await monthly_summary_sql(employer_id, worker_id, months, db, current_user, periods)
+
+    async def mutual(self, db, current_user):
+        from api.routers.balances import mutual_balances_sql
+        return await mutual_balances_sql(db, current_user)
+
+    async def cards(self, db, user_filter_id=None, worker_id=None):
+        from api.routers.balances import calculate_cards_new
+        return await calculate_cards_new(db, user_filter_id=user_filter_id, worker_id=worker_id)
+
+
+_engines: Dict[str, BalanceEngine] = {}
+
+
+def register_engine(engine: BalanceEngine) -> BalanceEngine:
+    _engines[engine.name] = engine
+    return engine
+
+
+def get_engine(name: str) -> BalanceEngine:
+    try:
+        return _engines[name]
+    except KeyError:
+        raise ValueError(f"Unknown balance engine: {name!r} (available: {', '.join(sorted(_engines))})")
+
+
+def available_engines() -> List[str]:
+    return sorted(_engines)
+
+
+def get_active_engine() -> BalanceEngine:
+    """Движок, которым обслуживаются /balances/* (settings.BALANCE_ENGINE)"""
+    from config.settings import settings
+
+    name = settings.BALANCE_ENGINE or REFERENCE_ENGINE
+    if name not in _engines:
+        logger.warning(f"Balance engine {name!r} is not available, falling back to {REFERENCE_ENGINE!r}")
+        name = REFERENCE_ENGINE
+    return _engines[name]
+
+
+register_engine(SqlBalanceEngine())
+
+try:
+    from utils.balance_columnar import ColumnarBalanceEngine
+except ImportError:  # numpy не установлен - остаётся только эталонный движок
+    ColumnarBalanceEngine = None
+else:
+    register_engine(ColumnarBalanceEngine())
@@ -0,0 +1,306 @@
+"""
+Transactional outbox для WebSocket событий.
+
+Эндпоинты не рассылают события сами: stage_event() откладывает событие в
+session.info, хук after_commit передаёт отложенные события в очередь
+диспетчера только после успешного COMMIT, при откате они отбрасываются.
+
+Диспетчер (фоновая задача процесса API) забирает из очереди всё накопленное,
+схлопывает одинаковые события, один раз на пачку получает id админов и
+сериализует сущности для rich-подписчиков в собственной сессии. Время ответа
+на запись не зависит от числа подключённых клиентов, а неудавшаяся
+транзакция не порождает событий.
+
+Сущность события задаётся EntityRef(вид, id): загрузчики регистрируют
+роутеры (register_entity_loader), поэтому сервисам из utils не нужно
+импортировать сериализацию роутеров.
+
+Бот работает в отдельном процессе без диспетчера и WebSocket-соединений.
+Там relay_to_api() включает запись событий в таблицу event_outbox в той же
+транзакции (хук before_commit), а диспетчер процесса API раз в
+EVENT_RELAY_INTERVAL секунд забирает новые строки и рассылает их как свои.
+Строки старше EVENT_RELAY_RETENTION секунд удаляются.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from utils.serialization import dumps, dumps_text, loads
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "outbox_events"
+
+# Загрузка сущности для rich-подписчиков: сессия диспетчера -> {"payment": {...}} или None
+EntityLoader = Callable[[AsyncSession], Awaitable[Optional[dict]]]
+
+# Вид сущности -> загрузчик (сессия, id); регистрируют роутеры, которые умеют её сериализовать
+_entity_loaders: Dict[str, Callable[[AsyncSession, int], Awaitable[Optional[dict]]]] = {}
+
+
+def register_entity_loader(kind: str):
+    """Декоратор: загрузчик сущности вида kind для EntityRef"""
+    def decorator(func):
+        _entity_loaders[kind] = func
+        return func
+    return decorator
+
+
+@dataclass(frozen=True)
+class EntityRef:
+    """Ссылка на сущность события: сервисам не нужно импортировать сериализацию роутеров"""
+    kind: str
+    id: int
+
+    async def __call__(self, db: AsyncSession) -> Optional[dict]:
+        loader = _entity_loaders.get(self.kind)
+        if loader is None:
+            logger.warning(f"No entity loader registered for {self.kind}")
+            return None
+        return await loader(db, self.id)
+
+
+@dataclass
+class OutboxEvent:
+    event: dict
+    user_ids: Optional[Tuple[int, ...]]  # None - все подключённые пользователи
+    admins: bool  # Добавить к получателям всех админов
+    exclude_user_id: Optional[int] = None
+    entity: Optional[EntityLoader] = None
+
+    @property
+    def key(self) -> bytes:
+        """Одинаковые события одинаковым получателям схлопываются"""
+        return dumps([self.event, self.user_ids, self.admins, self.exclude_user_id])
+
+    def to_payload(self) -> str:
+        """JSON для event_outbox; сохраняется только сущность-ссылка EntityRef"""
+        entity = [self.entity.kind, self.entity.id] if isinstance(self.entity, EntityRef) else None
+        return dumps_text({
+            "event": self.event,
+            "user_ids": self.user_ids,
+            "admins": self.admins,
+            "exclude_user_id": self.exclude_user_id,
+            "entity": entity
+        })
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "OutboxEvent":
+        data = loads(payload)
+        user_ids = data["user_ids"]
+        entity = data["entity"]
+        return cls(
+            data["event"],
+            tuple(user_ids) if user_ids is not None else None,
+            data["admins"],
+            data["exclude_user_id"],
+            EntityRef(*entity) if entity else None
+        )
+
+
+def stage_event(
+    db: AsyncSession,
+    event: dict,
+    user_ids: Optional[Iterable[Optional[int]]] = None,
+    admins: bool = True,
+    exclude_user_id: Optional[int] = None,
+    entity: Optional[EntityLoader] = None
+) -> None:
+    """Отложить событие до COMMIT сессии db"""
+    if user_ids is not None:
+        user_ids = tuple(sorted({user_id for user_id in user_ids if user_id is not None}))
+    item = OutboxEvent(event, user_ids, admins, exclude_user_id, entity)
+    db.info.setdefault(OUTBOX_KEY, {})[item.key] = item
+
+
+def relay_to_api() -> None:
+    """Процесс без диспетчера (бот): сохранять события в event_outbox для процесса API"""
+    event_dispatcher.persist = True
+
+
+@sa_event.listens_for(Session, "before_commit")
+def _persist_events(session):
+    # Запись в той же транзакции: событие есть в таблице тогда и только тогда, когда есть COMMIT
+    if not event_dispatcher.persist or event_dispatcher.running:
+        return
+    staged = session.info.pop(OUTBOX_KEY, None)
+    if staged:
+        from database.models import EventOutboxEntry
+        session.add_all([EventOutboxEntry(payload=item.to_payload()) for item in staged.values()])
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _release_events(session):
+    staged = session.info.pop(OUTBOX_KEY, None)
+    if staged:
+        event_dispatcher.publish(list(staged.values()))
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _discard_events(session, transaction):
+    # Корневая транзакция завершилась без COMMIT (after_commit уже забрал бы события)
+    if transaction.parent is None:
+        session.info.pop(OUTBOX_KEY, None)
+
+
+class EventDispatcher:
+    """Очередь событий и задача рассылки (запускается при старте приложения)"""
+
+    def __init__(self, session_factory: Optional[async_sessionmaker] = None, queue_size: Optional[int] = None,
+                 relay_interval: Optional[float] = None):
+        self._session_factory = session_factory
+        self.queue_size = settings.EVENT_QUEUE_SIZE if queue_size is None else queue_size
+        self.relay_interval = settings.EVENT_RELAY_INTERVAL if relay_interval is None else relay_interval
+        self.dropped = 0
+        self.persist = False  # relay_to_api(): процесс без диспетчера пишет события в event_outbox
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._relay_task: Optional[asyncio.Task] = None
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        if self._session_factory is None:
+            from database.core import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def publish(self, events: List[OutboxEvent]) -> None:
+        """Поставить события в очередь (без ожидания; вызывается из after_commit)"""
+        if self._queue is None:
+            # WebSocket-соединения есть только в процессе API; бот пишет события в event_outbox
+            # (relay_to_api), скрипты событий не рассылают
+            logger.debug(f"Event dispatcher is not running, {len(events)} events skipped")
+            return
+        for item in events:
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning(f"Event queue is full, dropping {item.event.get('type')}")
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(self._queue))
+        if self.relay_interval > 0:
+            self._relay_task = asyncio.create_task(self._relay(await self._last_relayed_id()))
+        logger.info("Event dispatcher started")
+
+    async def stop(self) -> None:
+        """Доставить уже поставленные события и остановиться"""
+        if not self.running:
+            return
+        if self._relay_task is not None:
+            self._relay_task.cancel()
+            try:
+                await self._relay_task
+            except asyncio.CancelledError:
+                pass
+            self._relay_task = None
+        queue, self._queue = self._queue, None
+        await queue.put(None)
+        await self._task
+        self._task = None
+        logger.info("Event dispatcher stopped")
+
+    async def _last_relayed_id(self) -> int:
+        """События других процессов, записанные до старта, уже неактуальны"""
+        from database.models import EventOutboxEntry
+
+        try:
+            async with self.session_factory() as session:
+                return (await session.execute(select(func.max(EventOutboxEntry.id)))).scalar() or 0
+        except Exception as e:
+            logger.error(f"Failed to read event outbox: {e}")
+            return 0
+
+    async def relay_once(self, last_id: int) -> int:
+        """Поставить в очередь события event_outbox с id > last_id; вернуть последний id"""
+        from database.models import EventOutboxEntry
+
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(EventOutboxEntry.id, EventOutboxEntry.payload)
+                .where(EventOutboxEntry.id > last_id)
+                .order_by(EventOutboxEntry.id)
+            )
+            rows = result.all()
+            if rows:
+                # Каждый воркер API читает таблицу сам, поэтому строки удаляются по возрасту, а не при чтении
+                cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.EVENT_RELAY_RETENTION)
+                await session.execute(delete(EventOutboxEntry).where(EventOutboxEntry.created_at < cutoff))
+                await session.commit()
+        if rows:
+            self.publish([OutboxEvent.from_payload(payload) for _, payload in rows])
+            last_id = rows[-1].id
+        return last_id
+
+    async def _relay(self, last_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.relay_interval)
+            try:
+                last_id = await self.relay_once(last_id)
+            except Exception as e:
+                logger.error(f"Event relay failed: {e}")
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            events = [item for item in batch if item is not None]
+            if events:
+                try:
+                    await self.deliver(events)
+                except Exception as e:
+                    logger.error(f"Event delivery failed: {e}")
+            if len(events) < len(batch):
+                return
+
+    async def deliver(self, events: List[OutboxEvent]) -> None:
+        """Разослать пачку событий подключённым клиентам"""
+        from api.routers.websocket import manager, get_admin_ids
+
+        if not manager.active_connections:
+            return
+        coalesced: Dict[bytes, OutboxEvent] = {}
+        for item in events:
+            coalesced[item.key] = item
+        admin_ids = await get_admin_ids() if any(item.admins for item in coalesced.values()) else []
+
+        session: Optional[AsyncSession] = None
+        try:
+            for item in coalesced.values():
+                user_ids = None
+                if item.user_ids is not None:
+                    user_ids = list(set(item.user_ids).union(admin_ids if item.admins else ()))
+                entity = None
+                if item.entity is not None and user_ids is not None and manager.has_rich_subscribers(user_ids):
+                    if session is None:
+                        session = self.session_factory()
+                    try:
+                        entity = await item.entity(session)
+                    except Exception as e:
+                        logger.error(f"Failed to load entity for {item.event.get('type')}: {e}")
+                await manager.broadcast(item.event, user_ids=user_ids, exclude_user_id=item.exclude_user_id,
+                                        entity=entity)
+        finally:
+            if session is not None:
+                await session.close()
+
+
+# Global instance (запускается при старте приложения)
+event_dispatcher = EventDispatcher()
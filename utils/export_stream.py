@@ -0,0 +1,76 @@
+"""
+Потоковый экспорт строк в NDJSON / CSV.
+
+Источник отдаёт строки пачками (dict-ы, одна пачка = одна порция курсора
+yield_per), каждая пачка сразу уходит клиенту через StreamingResponse - память
+не зависит от объёма истории:
+
+    rows = stream_rows(db, query)              # AsyncIterator[List[dict]]
+    return export_response(rows, "csv", "payments", PAYMENT_COLUMNS)
+"""
+import csv
+import io
+from datetime import date, datetime
+from typing import Any, AsyncIterator, List, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.serialization import dumps
+
+STREAM_FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+YIELD_PER = 1000  # Строк в одной порции курсора (и в одном чанке ответа)
+
+
+def _csv_value(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+async def stream_rows(db: AsyncSession, query) -> AsyncIterator[List[dict]]:
+    """Строки запроса пачками по YIELD_PER без загрузки всего результата в память"""
+    result = await db.stream(query.execution_options(yield_per=YIELD_PER))
+    async for partition in result.mappings().partitions():
+        yield [dict(row) for row in partition]
+
+
+def format_rows(rows: List[dict], format: str, columns: Sequence[str] = (), header: bool = False) -> bytes:
+    """Пачка строк в байты ndjson/csv (чистая функция - годится и для ProcessPoolExecutor)"""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([_csv_value(row.get(column)) for column in columns] for row in rows)
+        return buffer.getvalue().encode("utf-8")
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        if batch:
+            yield format_rows(batch, "ndjson")
+
+
+async def csv_chunks(batches: AsyncIterator[List[dict]], columns: Sequence[str]) -> AsyncIterator[bytes]:
+    # Заголовок уходит сразу, до первой строки из БД
+    yield format_rows([], "csv", columns, header=True)
+    async for batch in batches:
+        if batch:
+            yield format_rows(batch, "csv", columns)
+
+
+def export_response(batches: AsyncIterator[List[dict]], format: str, filename: str,
+                    columns: Sequence[str]) -> StreamingResponse:
+    """StreamingResponse в формате ndjson или csv (для csv - колонки columns в заданном порядке)"""
+    body = csv_chunks(batches, columns) if format == "csv" else ndjson_chunks(batches)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
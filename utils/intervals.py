@@ -0,0 +1,83 @@
+"""
+Проверка пересечений интервалов времени (смены и задания работника).
+
+Интервалы полуоткрытые [start, end): смежные не пересекаются. Время без зоны
+считается UTC (как в БД), end=None - открытый интервал (активное задание).
+
+- sweep_overlaps: пересечения внутри набора (задания смены, смены импорта) -
+  один проход по отсортированным началам, O(n log n);
+- IntervalIndex: отсортированный список с префиксным максимумом концов - ответ
+  «пересекает ли [a, b) что-нибудь» за O(log n). Строится по интервалам, которые
+  SQL выбрал в узком окне проверки (роутер assignments, _assignment_spans).
+"""
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+# Конец открытого интервала
+OPEN_END = datetime.max.replace(tzinfo=timezone.utc)
+
+Interval = Tuple[datetime, Optional[datetime], Hashable]
+
+
+def as_utc(value: datetime) -> datetime:
+    """Время без зоны считается UTC (как в БД)"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _normalized(intervals: Iterable[Interval]) -> List[Tuple[datetime, datetime, Hashable]]:
+    return sorted(
+        ((as_utc(start), as_utc(end) if end is not None else OPEN_END, key) for start, end, key in intervals),
+        key=lambda item: (item[0], item[1])
+    )
+
+
+def sweep_overlaps(intervals: Iterable[Interval]) -> List[Tuple[Hashable, Hashable]]:
+    """Пересечения в списке (start, end, key) одним проходом по отсортированным началам.
+
+    Интервал конфликтует с предыдущим, конец которого дальше всех: возвращаются пары ключей
+    (предыдущий, текущий).
+    """
+    conflicts = []
+    reach = None  # (end, key) самого дальнего из пройденных интервалов
+    for start, end, key in _normalized(intervals):
+        if reach is not None and start < reach[0]:
+            conflicts.append((reach[1], key))
+        if reach is None or end > reach[0]:
+            reach = (end, key)
+    return conflicts
+
+
+class IntervalIndex:
+    """Неизменяемый индекс интервалов (start, end, key) для запросов пересечения за O(log n)"""
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        items = _normalized(intervals)
+        self._starts = [start for start, _, _ in items]
+        self._items = items
+        # _reach[i] - интервал с самым дальним концом среди items[0..i]
+        self._reach = []
+        for item in items:
+            if not self._reach or item[1] > self._reach[-1][1]:
+                self._reach.append(item)
+            else:
+                self._reach.append(self._reach[-1])
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def overlapping(self, start: datetime, end: Optional[datetime]) -> Optional[Interval]:
+        """Какой-нибудь интервал, пересекающий [start, end), или None.
+
+        Пересекают те, что начались до end и закончились после start: среди начавшихся
+        до end достаточно проверить интервал с самым дальним концом.
+        """
+        start = as_utc(start)
+        end = as_utc(end) if end is not None else OPEN_END
+        position = bisect_left(self._starts, end) - 1
+        if position < 0:
+            return None
+        candidate = self._reach[position]
+        if candidate[1] > start:
+            return candidate[0], (candidate[1] if candidate[1] != OPEN_END else None), candidate[2]
+        return None
@@ -0,0 +1,244 @@
+"""
+Закрытие периодов (месяцев).
+
+Закрытый месяц замораживается: помесячная сводка (все поля MonthlySummary)
+сохраняется в period_monthly_snapshots для каждого фильтра, который может
+запросить UI (без фильтра, по работнику, по работодателю, по паре, вид
+работника), а долг по парам на конец месяца - в period_pair_balances.
+Снимки нарастающие (долг - по всем платежам до конца месяца), поэтому месяцы
+закрываются по порядку, а открываются с конца: закрыть месяц можно, только
+если закрыты все более ранние месяцы с данными, открыть - только последний
+закрытый.
+Триггеры на payments/tasks (database/models.py) запрещают менять строки с
+датой в закрытом месяце, поэтому снимки остаются верными. /balances/monthly
+берёт закрытые месяцы из снимков и считает живьём только открытые.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import String, and_, case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import (
+    Assignment, ClosedPeriod, Payment, PaymentCategory, PaymentCategoryGroup, PaymentGroupCode, PaymentStatus,
+    PeriodMonthlySnapshot, PeriodPairBalance, Task,
+)
+from utils.timeutil import now_server
+
+PERIOD_RE = re.compile(r"^(\d{4})-(0[1-9]|1[0-2])$")
+SNAPSHOT_FIELDS = (
+    "sessions", "hours", "credit", "salary", "salary_paid", "salary_unpaid", "expenses", "expenses_paid",
+    "expenses_unpaid", "debt", "bonus", "total", "currency",
+)
+
+
+class PeriodConflict(Exception):
+    """Период нельзя закрыть/открыть в текущем состоянии (409)"""
+
+
+def parse_period(period: str) -> Tuple[int, int]:
+    """'2025-09' -> (2025, 9); ValueError при неверном формате"""
+    match = PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f"Неверный период {period!r}, ожидается YYYY-MM")
+    return int(match.group(1)), int(match.group(2))
+
+
+def period_key(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1)
+    return start, datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+
+
+def _is_worker_view(current_user) -> bool:
+    try:
+        return not current_user.has_permission('view_all_reports')
+    except Exception:
+        return True
+
+
+async def get_closed_periods(db: AsyncSession) -> Set[str]:
+    return set((await db.execute(select(ClosedPeriod.period))).scalars().all())
+
+
+async def _open_periods_before(db: AsyncSession, start: datetime) -> List[str]:
+    """Незакрытые месяцы с платежами или задачами раньше start"""
+    months = set()
+    for column in (Payment.payment_date, Task.start_time):
+        months |= set((await db.execute(
+            select(func.substr(column, 1, 7, type_=String)).where(column < start).distinct()
+        )).scalars().all())
+    return sorted(months - await get_closed_periods(db))
+
+
+async def _snapshot_scopes(db: AsyncSession, start: datetime, end: datetime) -> List[Tuple[int, int, bool]]:
+    """(employer_id, worker_id, worker_view) для всех, у кого есть данные в месяце; 0 - без фильтра"""
+    in_month = and_(Payment.payment_date >= start, Payment.payment_date < end)
+    pairs = set((await db.execute(
+        select(Payment.payer_id, Payment.recipient_id).where(in_month, Payment.recipient_id != None).distinct()
+    )).all())
+    users = {user_id for pair in pairs for user_id in pair}
+    users |= set((await db.execute(select(Payment.payer_id).where(in_month).distinct())).scalars().all())
+    users |= set((await db.execute(
+        select(Assignment.user_id).join(Task, Task.assignment_id == Assignment.id)
+        .where(Task.start_time >= start, Task.start_time < end).distinct()
+    )).scalars().all())
+
+    scopes = {(0, 0, False)}
+    for user_id in users:
+        scopes |= {(0, user_id, False), (user_id, 0, False), (0, user_id, True)}
+    for employer_id, worker_id in pairs:
+        scopes |= {(employer_id, worker_id, False), (employer_id, worker_id, True)}
+    return sorted(scopes)
+
+
+async def _pair_balances(db: AsyncSession, period: str, end: datetime) -> List[PeriodPairBalance]:
+    """Долг по парам (payer -> recipient) нарастающим итогом на конец месяца, как в /balances/mutual"""
+    code = PaymentGroupCode
+    status = PaymentStatus
+    paid = func.sum(case(
+        (and_(PaymentCategoryGroup.code.in_((code.DEBT.value, code.SALARY.value)),
+              Payment.payment_status == status.PAID.value), Payment.amount),
+        else_=0
+    ))
+    salary = func.sum(case(
+        (and_(PaymentCategoryGroup.code == code.SALARY.value,
+              Payment.payment_status.in_((status.PAID.value, status.OFFSET.value))), Payment.amount),
+        else_=0
+    ))
+    result = await db.execute(
+        select(Payment.payer_id, Payment.recipient_id, Payment.currency, paid.label("paid"), salary.label("salary"))
+        .join(PaymentCategory, Payment.category_id == PaymentCategory.id)
+        .join(PaymentCategoryGroup, PaymentCategory.group_id == PaymentCategoryGroup.id)
+        .where(Payment.payment_date < end, Payment.recipient_id != None)
+        .group_by(Payment.payer_id, Payment.recipient_id, Payment.currency)
+    )
+    balances = []
+    for row in result.all():
+        row_paid, row_salary = float(row.paid or 0), float(row.salary or 0)
+        if row_paid or row_salary:
+            balances.append(PeriodPairBalance(
+                period=period, creditor_id=row.payer_id, debtor_id=row.recipient_id, currency=row.currency,
+                paid=round(row_paid, 2), salary=round(row_salary, 2),
+                debt=round(max(0, row_paid - row_salary), 2)
+            ))
+    return balances
+
+
+async def close_period(db: AsyncSession, period: str, closed_by: Optional[int],
+                       force: bool = False) -> ClosedPeriod:
+    """Закрыть месяц: проверки, снимки сводки и долгов по парам, запись в closed_periods"""
+    from utils.balance_diff import ADMIN, Viewer
+    from utils.balance_engines import get_active_engine
+
+    year, month = parse_period(period)
+    now = now_server()
+    if (year, month) >= (now.year, now.month):
+        raise PeriodConflict(f"Нельзя закрыть текущий или будущий месяц {period}")
+    if await db.get(ClosedPeriod, period) is not None:
+        raise PeriodConflict(f"Период {period} уже закрыт")
+
+    start, end = _month_bounds(year, month)
+    open_before = await _open_periods_before(db, start)
+    if open_before:
+        raise PeriodConflict(f"Сначала закройте более ранние месяцы: {', '.join(open_before)}")
+    running = (await db.execute(
+        select(func.count(Task.id)).where(Task.start_time >= start, Task.start_time < end, Task.end_time == None)
+    )).scalar()
+    if running:
+        raise PeriodConflict(f"В периоде {period} есть незавершённые задачи ({running})")
+    if not force:
+        unpaid = (await db.execute(
+            select(func.count(Payment.id)).where(
+                Payment.payment_date >= start, Payment.payment_date < end,
+                Payment.payment_status == PaymentStatus.UNPAID.value
+            )
+        )).scalar()
+        if unpaid:
+            raise PeriodConflict(f"В периоде {period} есть неоплаченные платежи ({unpaid}); "
+                                 f"закройте с force=true, чтобы заморозить их как есть")
+
+    # Сначала запись о закрытии: с этого момента триггеры не дают менять данные месяца
+    closed = ClosedPeriod(period=period, closed_by=closed_by)
+    db.add(closed)
+    await db.flush()
+
+    engine = get_active_engine()
+    snapshots = []
+    for employer_id, worker_id, worker_view in await _snapshot_scopes(db, start, end):
+        viewer = Viewer(id=worker_id, is_worker=True) if worker_view else ADMIN
+        [summary] = await engine.monthly(db, viewer, employer_id=employer_id or None,
+                                         worker_id=worker_id or None, periods=[(year, month)])
+        snapshots.append(PeriodMonthlySnapshot(
+            period=period, employer_id=employer_id, worker_id=worker_id, worker_view=worker_view,
+            **summary.model_dump(include=set(SNAPSHOT_FIELDS))
+        ))
+    db.add_all(snapshots)
+    db.add_all(await _pair_balances(db, period, end))
+    await db.commit()
+    return closed
+
+
+async def reopen_period(db: AsyncSession, period: str) -> None:
+    """Открыть месяц обратно: снимки удаляются, данные снова можно менять"""
+    from utils.archive import archived_through
+
+    parse_period(period)
+    closed = await db.get(ClosedPeriod, period)
+    if closed is None:
+        raise LookupError(f"Период {period} не закрыт")
+    through = archived_through(db.bind.url)
+    if through is not None and period <= through:
+        raise PeriodConflict(f"Период {period} перенесён в архив, открыть его нельзя")
+    later = (await db.execute(
+        select(ClosedPeriod.period).where(ClosedPeriod.period > period).order_by(ClosedPeriod.period)
+    )).scalars().all()
+    if later:
+        raise PeriodConflict(f"Сначала откройте более поздние месяцы: {', '.join(later)}")
+    await db.execute(delete(PeriodMonthlySnapshot).where(PeriodMonthlySnapshot.period == period))
+    await db.execute(delete(PeriodPairBalance).where(PeriodPairBalance.period == period))
+    await db.delete(closed)
+    await db.commit()
+
+
+async def monthly_with_snapshots(engine, db: AsyncSession, current_user, employer_id: Optional[int],
+                                 worker_id: Optional[int], months: int) -> List:
+    """Помесячная сводка: закрытые месяцы из снимков, остальные - движком.
+
+    Снимки есть не для всех фильтров (пара без общих платежей, вид работника с
+    фильтром по работодателю), поэтому движок считает по истории с архивом:
+    иначе перенесённые месяцы дали бы нули, а долг нарастающим итогом - неверный.
+    """
+    from api.routers.balances import MonthlySummary, month_periods
+    from utils.archive import history_session
+
+    worker_view = _is_worker_view(current_user)
+    if worker_view:
+        worker_id = current_user.id
+    periods = month_periods(months)
+    keys = [period_key(year, month) for year, month in periods]
+
+    result = await db.execute(
+        select(PeriodMonthlySnapshot).where(
+            PeriodMonthlySnapshot.period.in_(set(keys)),
+            PeriodMonthlySnapshot.employer_id == (employer_id or 0),
+            PeriodMonthlySnapshot.worker_id == (worker_id or 0),
+            PeriodMonthlySnapshot.worker_view == worker_view,
+        )
+    )
+    frozen: Dict[str, MonthlySummary] = {
+        row.period: MonthlySummary(period=row.period, **{name: getattr(row, name) for name in SNAPSHOT_FIELDS})
+        for row in result.scalars().all()
+    }
+    live_periods = [period for period, key in zip(periods, keys) if key not in frozen]
+    computed = []
+    if live_periods:
+        async with history_session(db) as source:
+            computed = await engine.monthly(source, current_user, employer_id=employer_id, worker_id=worker_id,
+                                            periods=live_periods)
+    live = iter(computed)
+    return [frozen[key] if key in frozen else next(live) for key in keys]
@@ -0,0 +1,78 @@
+"""
+Подсчёт SQL-запросов и поиск N+1 (повторяющихся «форм» запросов).
+
+Используется в тестах (фикстура query_counter в tests/conftest.py) и в бенчмарках:
+
+    with count_queries(engine) as counter:
+        await get_monthly_summary(...)
+    counter.assert_budget(max_statements=20, max_repeats=1)
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# IN (?, ?, ?) / IN (__[POSTCOMPILE_x]) -> IN (?): длина списка не меняет форму запроса
+_IN_LIST_RE = re.compile(r"IN \((?:\?(?:, \?)*|__\[POSTCOMPILE_\w+\])\)", re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Нормализованная форма запроса: без литералов, размеров IN-списков и лишних пробелов"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _LITERAL_RE.sub("?", shape)
+    return _IN_LIST_RE.sub("IN (?)", shape)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryCounter:
+    statements: List[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Dict[str, int]:
+        return dict(Counter(statement_shape(s) for s in self.statements))
+
+    def repeated_shapes(self, max_repeats: int = 1) -> Dict[str, int]:
+        """Формы запросов, выполненные больше max_repeats раз (кандидаты в N+1)"""
+        return {shape: n for shape, n in self.shapes().items() if n > max_repeats}
+
+    def reset(self) -> None:
+        self.statements.clear()
+
+    def assert_budget(self, max_statements: int, max_repeats: Optional[int] = None) -> None:
+        """Проверить бюджет: число запросов и (опционально) повторы одной формы"""
+        problems = []
+        if self.count > max_statements:
+            problems.append(f"{self.count} statements executed, budget is {max_statements}")
+        if max_repeats is not None:
+            for shape, n in sorted(self.repeated_shapes(max_repeats).items(), key=lambda item: -item[1]):
+                problems.append(f"{n}x (allowed {max_repeats}): {shape[:200]}")
+        if problems:
+            raise QueryBudgetExceeded("Query budget exceeded:\n  " + "\n  ".join(problems))
+
+
+@contextmanager
+def count_queries(engine) -> Iterator[QueryCounter]:
+    """Считать все SQL-запросы движка (AsyncEngine или Engine) внутри блока"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    counter = QueryCounter()
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _before_cursor_execute)
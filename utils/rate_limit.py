@@ -0,0 +1,136 @@
+"""
+Ограничение частоты запросов для бота и API (GCRA).
+
+GCRA (generic cell rate algorithm) - тот же token bucket, но на ключ хранится
+одно число: TAT, теоретическое время следующего запроса. Политика limit/window
+даёт интервал T = window / limit; запрос проходит, если max(TAT, now) + T - now
+не больше window, и тогда TAT сдвигается на T. Проверка - O(1) по времени и
+памяти, без списков отметок времени.
+
+Бэкенды:
+- MemoryRateLimiter - словарь в процессе (один процесс бота или API);
+- SQLiteRateLimiter - таблица в отдельном файле SQLite, общая для нескольких
+  процессов; проверка и сдвиг TAT - один атомарный UPSERT ... RETURNING.
+  Вызов синхронный и идёт в цикле событий, поэтому ожидание блокировки файла
+  ограничено RATE_LIMIT_BUSY_TIMEOUT_MS; не дождались - запрос пропускается
+  (fail open): лимитер не должен останавливать API и бота.
+
+Используется декоратором бота (bot/rate_limiter.py) и ASGI middleware API
+(api/middleware/rate_limit.py); бэкенд выбирает RATE_LIMIT_BACKEND.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """Не больше limit запросов за window секунд (с допуском всплеска до limit)"""
+    limit: int
+    window: float
+
+    @property
+    def interval(self) -> float:
+        return self.window / self.limit
+
+
+class MemoryRateLimiter:
+    """GCRA в памяти процесса: ключ -> TAT"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tat: Dict[str, float] = {}
+
+    def hit(self, key: str, policy: RatePolicy, now: Optional[float] = None) -> Tuple[bool, float]:
+        """(пропустить ли запрос, через сколько секунд повторить при отказе)"""
+        now = time.time() if now is None else now
+        tat = max(self._tat.get(key, now), now) + policy.interval
+        if tat - now > policy.window:
+            return False, tat - now - policy.window
+        if key not in self._tat and len(self._tat) >= self.max_keys:
+            self._evict(now)
+        self._tat[key] = tat
+        return True, 0.0
+
+    def _evict(self, now: float) -> None:
+        """Ключи с TAT в прошлом эквивалентны отсутствующим; если таких нет - самые старые"""
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        while len(self._tat) >= self.max_keys:
+            del self._tat[next(iter(self._tat))]
+
+
+class SQLiteRateLimiter:
+    """GCRA в файле SQLite, общий для процессов на одной машине"""
+
+    PURGE_EVERY = 1000  # Раз в столько проверок удаляются ключи с TAT в прошлом
+
+    def __init__(self, path: str, busy_timeout_ms: Optional[int] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if busy_timeout_ms is None:
+            busy_timeout_ms = settings.RATE_LIMIT_BUSY_TIMEOUT_MS
+        # autocommit: каждый UPSERT - своя короткая транзакция; схема создаётся с обычным ожиданием
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        self._lock = threading.Lock()
+        self._hits = 0
+        self.failed_open = 0  # Проверки, пропущенные из-за занятого файла
+
+    def hit(self, key: str, policy: RatePolicy, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.time() if now is None else now
+        try:
+            return self._hit(key, policy, now)
+        except sqlite3.OperationalError as e:
+            # Файл занят другим процессом дольше busy_timeout - не блокируем цикл событий
+            self.failed_open += 1
+            logger.warning(f"Rate limit check skipped for {key}: {e}")
+            return True, 0.0
+
+    def _hit(self, key: str, policy: RatePolicy, now: float) -> Tuple[bool, float]:
+        params = {"key": key, "now": now, "interval": policy.interval, "window": policy.window}
+        with self._lock:
+            # Строка возвращается, только если TAT сдвинут (запрос пропущен)
+            row = self._conn.execute(
+                "INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval) "
+                "ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval "
+                "WHERE max(tat, :now) + :interval - :now <= :window "
+                "RETURNING tat",
+                params
+            ).fetchone()
+            if row is None:
+                tat = self._conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+                return False, max(tat, now) + policy.interval - now - policy.window
+            self._hits += 1
+            if self._hits % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+        return True, 0.0
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """Общий лимитер процесса по настройке RATE_LIMIT_BACKEND (memory | sqlite)"""
+    global _limiter
+    if _limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "sqlite":
+            _limiter = SQLiteRateLimiter(settings.RATE_LIMIT_DB_PATH)
+        else:
+            _limiter = MemoryRateLimiter()
+    return _limiter
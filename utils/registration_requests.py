@@ -0,0 +1,57 @@
+"""
+Заявки на регистрацию: события для админов и счётчик ожидающих заявок.
+
+События registration_request_created/approved/rejected/deleted уходят через
+outbox (utils/event_outbox.py) только админам - вместо опроса из Layout.js.
+
+Счётчик (GET /admin/registration-requests/count) держится в памяти процесса: первый запрос считает заявки в БД,
+дальше auth.register и approve/reject/delete в api/routers/admin.py сдвигают
+его после COMMIT. Раз в RESYNC_SECONDS счётчик пересчитывается, чтобы заявки
+из другого процесса (второй воркер API, скрипты) не терялись надолго.
+"""
+import time
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import RegistrationRequest
+from utils.event_outbox import stage_event
+
+
+def stage_registration_event(db: AsyncSession, action: str, request: RegistrationRequest) -> None:
+    """Событие registration_request_<action> админам после COMMIT"""
+    stage_event(db, {
+        "type": f"registration_request_{action}",
+        "request_id": request.id,
+        "username": request.username
+    }, user_ids=[], admins=True)
+
+
+class PendingRequestCounter:
+    RESYNC_SECONDS = 300
+
+    def __init__(self):
+        self._value: Optional[int] = None
+        self._loaded_at = 0.0
+
+    async def get(self, db: AsyncSession) -> int:
+        """Число заявок со статусом pending (запрос к БД - только при (пере)загрузке)"""
+        if self._value is None or time.monotonic() - self._loaded_at > self.RESYNC_SECONDS:
+            result = await db.execute(
+                select(func.count(RegistrationRequest.id)).where(RegistrationRequest.status == "pending")
+            )
+            self._value = result.scalar_one()
+            self._loaded_at = time.monotonic()
+        return self._value
+
+    def adjust(self, delta: int) -> None:
+        """Сдвинуть после COMMIT; до первой загрузки значение всё равно считается из БД"""
+        if self._value is not None:
+            self._value = max(self._value + delta, 0)
+
+    def reset(self) -> None:
+        self._value = None
+
+
+pending_requests = PendingRequestCounter()
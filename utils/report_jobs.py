@@ -0,0 +1,343 @@
+"""
+Фоновые отчёты (POST /api/reports/jobs).
+
+Задание сохраняется в report_jobs и ставится в ограниченную очередь. Несколько
+async-воркеров читают данные в собственной сессии (не держат сессию запроса),
+форматирование пачек строк в ndjson/csv уходит в пул процессов, результат
+пишется в файл под settings.REPORTS_DIR. Прогресс выполняющихся заданий
+держится в памяти (без записи в БД на каждую пачку), статус пишется при
+смене состояния. О завершении пользователь узнаёт через WebSocket
+(report_job_completed / report_job_failed).
+
+Задание захватывается условным UPDATE (queued -> running) с записью
+владельца "host:pid:очередь", поэтому его выполняет ровно один воркер даже
+при нескольких процессах API. При старте заново ставятся только задания,
+владелец которых остановлен: очередь этого же процесса или процесс этого
+хоста, которого уже нет. Готовые задания старше REPORT_RETENTION_DAYS
+удаляются вместе с файлами.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from config.settings import settings
+from database.models import Payment, ReportJob, ReportJobStatus, Role, User
+from utils.archive import history_session
+from utils.export_stream import format_rows, stream_rows
+from utils.timeutil import now_server
+
+logger = logging.getLogger(__name__)
+
+# Пачка строк и доля выполнения (0..1) после неё
+Batches = AsyncIterator[Tuple[List[dict], float]]
+
+
+@dataclass
+class ReportKind:
+    columns: Sequence[str]  # Колонки CSV
+    produce: Callable[[AsyncSession, User, dict, str], Batches]
+
+
+async def _count(db: AsyncSession, query) -> int:
+    return (await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))).scalar() or 0
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def _produce_payments(db: AsyncSession, user: User, params: dict, format: str) -> Batches:
+    from api.routers.payments import _filter_payments, _payment_export_query
+
+    query = _filter_payments(_payment_export_query(), user, params.get("category_id"),
+                             _parse_date(params.get("start_date")), _parse_date(params.get("end_date")))
+    query = query.order_by(Payment.payment_date.desc())
+    total = await _count(db, query)
+    done = 0
+    async for batch in stream_rows(db, query):
+        done += len(batch)
+        yield batch, done / total if total else 1.0
+
+
+async def _produce_balances_debug(db: AsyncSession, user: User, params: dict, format: str) -> Batches:
+    from api.routers.balances import _debug_export_batches, _debug_payment_batches, _debug_payments_query
+
+    worker_id = params.get("worker_id")
+    total = await _count(db, _debug_payments_query(worker_id))
+    if format == "ndjson":
+        batches = _debug_export_batches(params.get("employer_id"), worker_id, params["months"], db, user)
+    else:
+        batches = _debug_payment_batches(worker_id, db)
+    done = 0
+    async for batch in batches:
+        done += sum(1 for row in batch if row.get("section", "payments") == "payments")
+        yield batch, done / total if total else 1.0
+
+
+async def _produce_monthly(db: AsyncSession, user: User, params: dict, format: str) -> Batches:
+    from utils.balance_engines import get_active_engine
+    from utils.period_close import monthly_with_snapshots
+
+    summaries = await monthly_with_snapshots(get_active_engine(), db, user, params.get("employer_id"),
+                                             params.get("worker_id"), params["months"])
+    yield [summary.model_dump() for summary in summaries], 1.0
+
+
+def _report_kinds() -> Dict[str, ReportKind]:
+    from api.routers.balances import DEBUG_PAYMENT_COLUMNS, MonthlySummary
+    from api.routers.payments import PAYMENT_EXPORT_COLUMNS
+
+    return {
+        "payments": ReportKind(PAYMENT_EXPORT_COLUMNS, _produce_payments),
+        "balances_debug": ReportKind(DEBUG_PAYMENT_COLUMNS, _produce_balances_debug),
+        "monthly": ReportKind(tuple(MonthlySummary.model_fields), _produce_monthly),
+    }
+
+
+def result_path(reports_dir: str, job: ReportJob) -> Path:
+    return Path(reports_dir) / f"{job.id}-{job.kind}.{job.format}"
+
+
+def _owner_alive(owner: Optional[str], current: str) -> bool:
+    """Работает ли ещё очередь-владелец задания (другой хост проверить нельзя - считаем живым)"""
+    if not owner:
+        return False
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return True
+    if int(pid) == os.getpid():
+        return owner == current
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ReportJobQueue:
+    """Ограниченная очередь заданий и пул воркеров (запускается при старте приложения)"""
+
+    def __init__(self, session_factory: Optional[async_sessionmaker] = None, workers: Optional[int] = None,
+                 process_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 reports_dir: Optional[str] = None):
+        self._session_factory = session_factory
+        self.workers = settings.REPORT_WORKERS if workers is None else workers
+        self.process_workers = settings.REPORT_PROCESS_WORKERS if process_workers is None else process_workers
+        self.queue_size = settings.REPORT_QUEUE_SIZE if queue_size is None else queue_size
+        self.reports_dir = reports_dir or settings.REPORTS_DIR
+        self.progress: Dict[int, float] = {}  # job_id -> доля выполнения (только для running)
+        self.owner = ""  # "host:pid:очередь", задаётся при старте
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[Executor] = None
+        self._purged_at: Optional[datetime] = None
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        if self._session_factory is None:
+            from database.core import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        os.makedirs(self.reports_dir, exist_ok=True)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.process_workers > 0:
+            # spawn: форк процесса с работающим event loop и потоками aiosqlite небезопасен
+            self._executor = ProcessPoolExecutor(max_workers=self.process_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await self._resume_pending()
+        except Exception as e:
+            logger.error(f"Resuming report jobs failed: {e}")
+        try:
+            await self.purge_expired()
+        except Exception as e:
+            logger.error(f"Purging report jobs failed: {e}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, job_id: int) -> None:
+        """Поставить задание в очередь; asyncio.QueueFull, если очередь заполнена"""
+        if self._queue is None:
+            raise RuntimeError("Report job queue is not running")
+        self._queue.put_nowait(job_id)
+
+    async def join(self) -> None:
+        """Дождаться обработки всех поставленных заданий"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _resume_pending(self) -> None:
+        """Задания, прерванные остановкой приложения, выполняются заново.
+
+        Выполняющиеся задания живой очереди (другой воркер API) не трогаем.
+        Поставленные в очередь подхватываются всеми процессами - выполнит их тот,
+        кто первым захватит (run_job).
+        """
+        async with self.session_factory() as db:
+            jobs = (await db.execute(
+                select(ReportJob).where(ReportJob.status.in_(
+                    (ReportJobStatus.QUEUED.value, ReportJobStatus.RUNNING.value)
+                )).order_by(ReportJob.id)
+            )).scalars().all()
+            for job in jobs:
+                if job.status == ReportJobStatus.RUNNING.value:
+                    if _owner_alive(job.owner, self.owner):
+                        continue
+                    logger.warning(f"Report job {job.id} was left running by {job.owner}, requeueing")
+                    job.status = ReportJobStatus.QUEUED.value
+                    job.owner = None
+                    job.progress = 0.0
+                try:
+                    self.submit(job.id)
+                except asyncio.QueueFull:
+                    job.status = ReportJobStatus.FAILED.value
+                    job.error = "Очередь отчётов переполнена"
+                    job.finished_at = now_server()
+            await db.commit()
+
+    async def purge_expired(self) -> int:
+        """Удалить завершённые задания старше REPORT_RETENTION_DAYS и их файлы"""
+        cutoff = now_server() - timedelta(days=settings.REPORT_RETENTION_DAYS)
+        async with self.session_factory() as db:
+            jobs = (await db.execute(
+                select(ReportJob.id, ReportJob.file_path).where(and_(
+                    ReportJob.status.in_((ReportJobStatus.DONE.value, ReportJobStatus.FAILED.value)),
+                    ReportJob.finished_at < cutoff
+                ))
+            )).all()
+            for job in jobs:
+                if job.file_path:
+                    Path(job.file_path).unlink(missing_ok=True)
+            if jobs:
+                await db.execute(delete(ReportJob).where(ReportJob.id.in_([job.id for job in jobs])))
+                await db.commit()
+        self._purged_at = now_server()
+        if jobs:
+            logger.info(f"Purged {len(jobs)} expired report jobs")
+        return len(jobs)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+                # Очистка не чаще раза в час, между заданиями
+                if self._purged_at is None or now_server() - self._purged_at > timedelta(hours=1):
+                    await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Report job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _format(self, rows: List[dict], format: str, columns: Sequence[str], header: bool) -> bytes:
+        if self._executor is None:
+            return format_rows(rows, format, columns, header)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, format_rows, rows, format, columns, header)
+
+    async def run_job(self, job_id: int) -> None:
+        async with self.session_factory() as db:
+            # Захват одним условным UPDATE: задание выполняет тот, чей UPDATE изменил строку
+            claimed = await db.execute(
+                update(ReportJob)
+                .where(and_(ReportJob.id == job_id, ReportJob.status == ReportJobStatus.QUEUED.value))
+                .values(status=ReportJobStatus.RUNNING.value, owner=self.owner)
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return
+            job = await db.get(ReportJob, job_id)
+            self.progress[job_id] = 0.0
+
+            path = result_path(self.reports_dir, job)
+            partial = path.with_suffix(path.suffix + ".part")
+            try:
+                user = (await db.execute(
+                    select(User).options(selectinload(User.roles).selectinload(Role.permissions))
+                    .where(User.id == job.user_id)
+                )).scalar_one()
+                kind = _report_kinds()[job.kind]
+                params = json.loads(job.params)
+                rows = 0
+                with open(partial, "wb") as out:
+                    if job.format == "csv":
+                        out.write(await self._format([], "csv", kind.columns, True))
+                    # Отчёты читают и архив закрытых периодов, если диапазон его задевает
+                    async with history_session(db, _parse_date(params.get("start_date"))) as source:
+                        async for batch, progress in kind.produce(source, user, params, job.format):
+                            if batch:
+                                out.write(await self._format(batch, job.format, kind.columns, False))
+                                rows += len(batch)
+                            self.progress[job_id] = progress
+                os.replace(partial, path)
+                job.status = ReportJobStatus.DONE.value
+                job.progress = 1.0
+                job.rows = rows
+                job.file_path = str(path)
+            except Exception as e:
+                logger.exception(f"Report job {job_id} ({job.kind}) failed")
+                if partial.exists():
+                    partial.unlink()
+                await db.rollback()
+                job = await db.get(ReportJob, job_id)
+                job.status = ReportJobStatus.FAILED.value
+                job.error = str(e) or type(e).__name__
+            finally:
+                self.progress.pop(job_id, None)
+            job.finished_at = now_server()
+            await db.commit()
+            await self._notify(job)
+
+    async def _notify(self, job: ReportJob) -> None:
+        from api.routers.websocket import manager
+
+        done = job.status == ReportJobStatus.DONE.value
+        await manager.send_to_user(job.user_id, {
+            "type": "report_job_completed" if done else "report_job_failed",
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "rows": job.rows,
+            "download_url": f"/api/reports/jobs/{job.id}/download" if done else None,
+            "error": job.error,
+        })
+
+
+# Global queue instance
+report_queue = ReportJobQueue()
@@ -0,0 +1,90 @@
+"""
+Сериализация JSON для ответов API, WebSocket и экспортов.
+
+orjson (Rust) используется, если установлен; иначе - stdlib json с тем же
+набором поддерживаемых типов (Decimal -> float, datetime/date -> ISO 8601,
+pydantic-модели, Enum, set). Результат всегда UTF-8 без экранирования
+кириллицы.
+
+- Эндпоинты с response_model (списки платежей, смен, помесячная сводка)
+  FastAPI сериализует сразу в байты через TypeAdapter.dump_json (pydantic-core)
+  - но только пока у маршрута и приложения нет своего response_class. Поэтому
+  FastJSONResponse не ставится классом по умолчанию для всего приложения, а
+  задаётся маршрутам без response_model. dump_models() - тот же путь для
+  кода вне маршрутов.
+- dumps_text() - текстовые кадры WebSocket: событие сериализуется один раз
+  в байты и декодируется без повторного обхода структуры.
+
+Сравнение: python -m benchmarks.serialization_bench
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any, List, Sequence, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен - stdlib json
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(value: Any):
+    """Типы, которых нет в JSON (для orjson - только те, что он не знает сам)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "tolist"):  # Скаляры и массивы numpy
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+
+def dumps_text(value: Any) -> str:
+    """JSON строкой (для текстовых кадров WebSocket)"""
+    return dumps(value).decode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def dump_models(items: Sequence[BaseModel], model: Type[BaseModel]) -> bytes:
+    """Список моделей сразу в JSON-байты через pydantic-core (без промежуточных dict)"""
+    return _list_adapter(model).dump_json(list(items))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, рендерящий через orjson (или stdlib json без него)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,207 @@
+"""
+Раздача собранного React SPA (frontend/build) из памяти.
+
+- index.html читается один раз при старте и отдаётся для всех маршрутов SPA
+  с ETag и Cache-Control: no-cache (браузер ревалидирует, ответ 304 без тела).
+  У каждого варианта сжатия свой ETag (суффикс -gz/-br): кеши не подменяют
+  одно представление другим.
+- Файлы сборки грузятся в память при первом запросе. Ассеты с хешем в имени
+  (static/js/main.1a2b3c4d.js - список из asset-manifest.json) получают
+  Cache-Control: immutable на год.
+- Сжатие выбирается по Accept-Encoding: br, затем gzip. Варианты .br/.gz,
+  созданные при сборке (precompress_build, scripts/build_frontend.py),
+  берутся с диска, иначе сжимаются один раз при первом запросе. brotli -
+  необязательная зависимость (requirements-optional.txt): без неё отдаётся
+  только gzip.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - отдаётся только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Сжимаем только текстовые форматы; картинки и шрифты уже сжаты
+COMPRESSIBLE = {".html", ".js", ".css", ".map", ".json", ".svg", ".txt", ".xml", ".ico"}
+MIN_COMPRESS_SIZE = 1024
+# Хеш CRA в имени файла: main.1a2b3c4d.js, 453.8e6f2c1a.chunk.js
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.")
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoders["br"] = lambda data: brotli.compress(data, quality=11)
+    return encoders
+
+
+ENCODERS = _encoders()
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Кодировки из Accept-Encoding с q > 0"""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110): список тегов или *"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@dataclass
+class Asset:
+    body: bytes
+    media_type: str
+    etag: str
+    cache_control: str
+    compressible: bool
+    encoded: Dict[str, bytes] = field(default_factory=dict)  # gzip/br -> тело
+
+    def encoding_for(self, accept_encoding: str) -> Optional[str]:
+        if not self.compressible:
+            return None
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in ENCODERS and (encoding in accepted or "*" in accepted):
+                return encoding
+        return None
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """ETag варианта: "<хеш>" без сжатия, "<хеш>-gz" / "<хеш>-br" для сжатых"""
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}{ETAG_SUFFIXES[encoding]}"'
+
+    def encode(self, encoding: str) -> bytes:
+        if encoding not in self.encoded:
+            self.encoded[encoding] = ENCODERS[encoding](self.body)
+        return self.encoded[encoding]
+
+
+class StaticAssets:
+    """Файлы сборки SPA в памяти; load() - при старте приложения"""
+
+    def __init__(self, build_dir: str = "frontend/build"):
+        self.build_dir = Path(build_dir)
+        self.index: Optional[Asset] = None
+        self.hashed: Set[str] = set()  # Пути из asset-manifest.json относительно build_dir
+        self.files: Set[str] = set()  # Все файлы сборки (без .br/.gz) - без обращений к диску на запрос
+        self._assets: Dict[str, Asset] = {}
+
+    @property
+    def built(self) -> bool:
+        return self.index is not None
+
+    def load(self) -> None:
+        self._assets = {}
+        self.hashed = set()
+        self.files = set()
+        index_path = self.build_dir / "index.html"
+        if not index_path.is_file():
+            self.index = None
+            return
+        self.files = {
+            path.relative_to(self.build_dir).as_posix() for path in self.build_dir.rglob("*")
+            if path.is_file() and path.suffix not in (".br", ".gz")
+        }
+        manifest_path = self.build_dir / "asset-manifest.json"
+        if manifest_path.is_file():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            self.hashed = {path.lstrip("/") for path in manifest.get("files", {}).values()}
+        self.index = self._read("index.html", REVALIDATE)
+        logger.info(f"SPA loaded from {self.build_dir}: {len(self.hashed)} hashed assets")
+
+    def _read(self, relative: str, cache_control: str) -> Asset:
+        path = self.build_dir / relative
+        body = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+            media_type += "; charset=utf-8"
+        asset = Asset(body=body, media_type=media_type, etag=f'"{hashlib.sha1(body).hexdigest()[:16]}"',
+                      cache_control=cache_control,
+                      compressible=path.suffix in COMPRESSIBLE and len(body) >= MIN_COMPRESS_SIZE)
+        if asset.compressible:
+            for encoding, suffix in SUFFIXES.items():
+                variant = path.with_name(path.name + suffix)
+                if encoding in ENCODERS and variant.is_file():
+                    asset.encoded[encoding] = variant.read_bytes()
+        return asset
+
+    def _is_hashed(self, relative: str) -> bool:
+        return relative in self.hashed or (relative.startswith("static/") and bool(HASHED_NAME_RE.search(relative)))
+
+    def asset(self, relative: str) -> Optional[Asset]:
+        """Файл сборки по относительному пути (None - такого файла в сборке нет)"""
+        if relative not in self.files:
+            return None
+        asset = self._assets.get(relative)
+        if asset is None:
+            asset = self._read(relative, IMMUTABLE if self._is_hashed(relative) else REVALIDATE)
+            self._assets[relative] = asset
+        return asset
+
+    async def response(self, asset: Asset, headers: Mapping[str, str]) -> Response:
+        """Ответ с учётом Accept-Encoding и If-None-Match (сравнивается ETag отдаваемого варианта)"""
+        encoding = asset.encoding_for(headers.get("accept-encoding") or "")
+        response_headers = {"ETag": asset.etag_for(encoding), "Cache-Control": asset.cache_control,
+                            "Vary": "Accept-Encoding"}
+        if etag_matches(headers.get("if-none-match") or "", response_headers["ETag"]):
+            return Response(status_code=304, headers=response_headers)
+        body = asset.body
+        if encoding is not None:
+            # Первое сжатие большого файла (br quality=11) - не в event loop
+            body = asset.encoded.get(encoding) or await run_in_threadpool(asset.encode, encoding)
+            response_headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=response_headers)
+
+
+def precompress_build(build_dir: str = "frontend/build") -> int:
+    """Создать .gz/.br рядом с текстовыми файлами сборки; число сжатых файлов"""
+    count = 0
+    for path in Path(build_dir).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE:
+            continue
+        body = path.read_bytes()
+        if len(body) < MIN_COMPRESS_SIZE:
+            continue
+        for encoding, encode in ENCODERS.items():
+            path.with_name(path.name + SUFFIXES[encoding]).write_bytes(encode(body))
+        count += 1
+    return count
+
+
+# Global instance (загружается при старте приложения)
+static_assets = StaticAssets()
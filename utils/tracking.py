@@ -1,7 +1,23 @@
 """
-Утилита для генерации tracking_nr для платежей и смен.
-Формат: P{id} для платежей, A{id} для смен.
+Утилита для генерации tracking_nr для платежей, смен и заданий.
+Формат: P{id} для платежей, A{id} для смен, T{id} для заданий.
+
+Номер проставляет сама БД - триггер AFTER INSERT (database/models.py,
+tracking_nr_trigger) для строк, вставленных без tracking_nr. Функции
+ниже дают то же значение в Python без повторного чтения строки.
 """
+from sqlalchemy import String, cast, literal
+
+PAYMENT_PREFIX = "P"
+ASSIGNMENT_PREFIX = "A"
+TASK_PREFIX = "T"
+
+# Таблица -> префикс tracking_nr
+TRACKING_PREFIXES = {
+    "payments": PAYMENT_PREFIX,
+    "assignments": ASSIGNMENT_PREFIX,
+    "tasks": TASK_PREFIX,
+}
 
 
 def format_payment_tracking_nr(payment_id: int) -> str:
@@ -9,7 +25,7 @@ def format_payment_tracking_nr(payment_id: int) -> str:
     Форматирует tracking_nr для платежа.
     Формат: P{id}
     """
-    return f"P{payment_id}"
+    return f"{PAYMENT_PREFIX}{payment_id}"
 
 
 def format_assignment_tracking_nr(assignment_id: int) -> str:
@@ -17,5 +33,20 @@ def format_assignment_tracking_nr(assignment_id: int) -> str:
     Форматирует tracking_nr для смены.
     Формат: A{id}
     """
-    return f"A{assignment_id}"
+    return f"{ASSIGNMENT_PREFIX}{assignment_id}"
+
+
+def format_task_tracking_nr(task_id: int) -> str:
+    """
+    Форматирует tracking_nr для задания.
+    Формат: T{id}
+    """
+    return f"{TASK_PREFIX}{task_id}"
+
 
+def tracking_nr_expression(prefix: str, id_column):
+    """
+    SQL-выражение prefix || id - tracking_nr, который выдаст триггер
+    (для RETURNING: триггер AFTER INSERT срабатывает позже него).
+    """
+    return literal(prefix) + cast(id_column, String)
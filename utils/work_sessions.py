@@ -0,0 +1,270 @@
+"""
+Рабочие сессии: старт, стоп, пауза и продолжение смены.
+
+Общий слой для API (api/routers/assignments.py) и Telegram-бота
+(bot/handlers/user.py): таймер бота - та же смена, что и в веб-интерфейсе,
+с теми же платежом при остановке и WebSocket-событиями. Функции ставят
+события в outbox (utils/event_outbox.py) и сами делают COMMIT; в процессе
+бота события попадают в таблицу event_outbox, и их рассылает процесс API.
+
+Ошибки: LookupError - нет трудовых отношений (404), WorkSessionConflict -
+состояние сессии не допускает операцию (400), RuntimeError - не настроена
+категория зарплаты (500). Тексты - те же, что отдавал роутер.
+"""
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from database.models import Assignment, EmploymentRelation, Payment, PaymentCategory, Task, User
+from utils.timeutil import now_server
+
+
+class WorkSessionConflict(Exception):
+    """Операция невозможна в текущем состоянии сессии"""
+
+
+def stage_payment_created(db: AsyncSession, payment: Payment, user_id: int) -> None:
+    """Событие payment_created для оплаты смены: работнику и админам после COMMIT"""
+    from utils.event_outbox import EntityRef, stage_event
+
+    stage_event(db, {
+        "type": "payment_created",
+        "payment_id": payment.id,
+        "payer_id": payment.payer_id,
+        "recipient_id": payment.recipient_id
+    }, user_ids=[user_id], entity=EntityRef("payment", payment.id))
+
+
+async def _active_employment(db: AsyncSession, worker_id: int) -> Optional[EmploymentRelation]:
+    result = await db.execute(
+        select(EmploymentRelation).where(
+            and_(
+                EmploymentRelation.user_id == worker_id,
+                EmploymentRelation.is_active == True
+            )
+        )
+    )
+    return result.scalars().first()
+
+
+async def get_active_task(db: AsyncSession, worker_id: int) -> Optional[Task]:
+    """Незавершённое задание работника (работа или пауза) вместе со сменой и её заданиями"""
+    result = await db.execute(
+        select(Task)
+        .join(Assignment)
+        .options(joinedload(Task.assignment).selectinload(Assignment.tasks))
+        .where(
+            and_(
+                Assignment.user_id == worker_id,
+                Task.end_time == None
+            )
+        )
+    )
+    return result.scalars().first()
+
+
+async def start_session(db: AsyncSession, worker_id: int, description: Optional[str] = None,
+                        task_description: Optional[str] = None) -> Tuple[Task, Assignment, EmploymentRelation]:
+    """Начать смену с первым рабочим заданием"""
+    from database.bulk import insert_returning
+    from utils.event_outbox import EntityRef, stage_event
+
+    employment = await _active_employment(db, worker_id)
+    if not employment:
+        raise LookupError("Трудовые отношения не найдены")
+
+    # Есть ли уже активная сессия (незавершённый task)
+    result = await db.execute(
+        select(Task.id).join(Assignment).where(
+            and_(
+                Assignment.user_id == worker_id,
+                Task.end_time == None
+            )
+        ).limit(1)
+    )
+    if result.scalar_one_or_none() is not None:
+        raise WorkSessionConflict("У работника уже есть активная сессия")
+
+    now = now_server()
+
+    # Assignment одним INSERT ... RETURNING: id и tracking_nr (триггер БД) сразу
+    assignment = await insert_returning(db, Assignment, {
+        "user_id": worker_id,
+        "description": description
+    })
+
+    task = Task(
+        assignment_id=assignment.id,
+        start_time=now,
+        task_type="work",
+        description=task_description or description
+    )
+    db.add(task)
+
+    # WebSocket: работнику и админам после COMMIT
+    stage_event(db, {
+        "type": "assignment_started",
+        "assignment_id": assignment.id,
+        "user_id": worker_id
+    }, user_ids=[worker_id], entity=EntityRef("assignment", assignment.id))
+
+    await db.commit()
+    return task, assignment, employment
+
+
+async def stop_session(db: AsyncSession, task: Task
+                       ) -> Tuple[Optional[EmploymentRelation], Optional[User], Optional[Payment]]:
+    """Завершить смену по её активному заданию и создать платёж за рабочее время.
+
+    task должен быть загружен вместе с assignment. Возвращает (трудовые отношения,
+    работодатель, платёж); платежа нет, если сумма нулевая.
+    """
+    from database.bulk import insert_returning
+    from database.models import Role, PaymentCategoryGroup, PaymentGroupCode
+    from utils.event_outbox import EntityRef, stage_event
+
+    if task.end_time is not None:
+        raise WorkSessionConflict("Сессия уже завершена")
+
+    assignment = task.assignment
+    now = now_server()
+    task.end_time = now
+
+    employment = await _active_employment(db, assignment.user_id)
+    hourly_rate = employment.hourly_rate if employment else Decimal(0)
+    currency = employment.currency if employment else "UAH"
+
+    # Общая сумма по всем work-tasks
+    result = await db.execute(
+        select(Task).where(Task.assignment_id == assignment.id)
+    )
+    all_tasks = result.scalars().all()
+
+    total_amount = Decimal(0)
+    for t in all_tasks:
+        if t.task_type == "work" and t.end_time:
+            total_amount += Decimal(str(t.duration_hours)) * hourly_rate
+
+    employer = None
+    payment = None
+    # Платёж только если сумма > 0
+    if total_amount > 0:
+        # Комментарии из смены и всех заданий
+        comments: List[str] = []
+        if assignment.description:
+            comments.append(assignment.description)
+        for t in all_tasks:
+            if t.description and t.description not in comments:
+                comments.append(t.description)
+
+        full_description = f"Смена {assignment.tracking_nr}"
+        joined_comments = ", ".join(comments)
+        if joined_comments:
+            full_description += f": {joined_comments}"
+        # Ограничиваем длину до 500 символов
+        if len(full_description) > 500:
+            full_description = full_description[:497] + "..."
+
+        employer_result = await db.execute(
+            select(User).join(User.roles).where(Role.name == "employer")
+        )
+        employer = employer_result.scalars().first()
+        payer_id = employer.id if employer else assignment.user_id  # fallback
+
+        # Категория зарплаты по коду группы (надёжнее, чем по имени)
+        salary_cat_result = await db.execute(
+            select(PaymentCategory).join(PaymentCategoryGroup).where(
+                PaymentCategoryGroup.code == PaymentGroupCode.SALARY.value
+            )
+        )
+        salary_category = salary_cat_result.scalars().first()
+        if not salary_category:
+            raise RuntimeError("Категория зарплаты не найдена")
+
+        # INSERT ... RETURNING: id и tracking_nr (триггер БД) для события сразу
+        payment = await insert_returning(db, Payment, {
+            "payer_id": payer_id,
+            "recipient_id": assignment.user_id,  # Работник — получатель
+            "category_id": salary_category.id,
+            "amount": total_amount,
+            "currency": currency,
+            "description": full_description,
+            "payment_date": now,
+            "payment_status": 'unpaid',
+            "assignment_id": assignment.id
+        })
+        stage_payment_created(db, payment, assignment.user_id)
+
+    # WebSocket: работнику и админам после COMMIT
+    stage_event(db, {
+        "type": "assignment_stopped",
+        "assignment_id": assignment.id,
+        "user_id": assignment.user_id
+    }, user_ids=[assignment.user_id], entity=EntityRef("assignment", assignment.id))
+
+    await db.commit()
+    return employment, employer, payment
+
+
+async def _switch_task(db: AsyncSession, task: Task, task_type: str, description: Optional[str]) -> Task:
+    """Закрыть активное задание и открыть следующее типа task_type в той же смене"""
+    from utils.event_outbox import stage_event
+
+    now = now_server()
+    assignment = task.assignment
+
+    task.end_time = now
+    if description:
+        task.description = description
+
+    new_task = Task(
+        assignment_id=assignment.id,
+        start_time=now,
+        task_type=task_type
+    )
+    db.add(new_task)
+    await db.flush()  # Получаем ID
+
+    # WebSocket: пауза из бота видна в веб-интерфейсе и наоборот
+    stage_event(db, {
+        "type": "task_created",
+        "assignment_id": assignment.id,
+        "task_id": new_task.id,
+        "user_id": assignment.user_id
+    }, user_ids=[assignment.user_id])
+
+    await db.commit()
+    return new_task
+
+
+async def pause_session(db: AsyncSession, task: Task, description: Optional[str] = None) -> Task:
+    """Пауза: завершить рабочее задание и начать задание 'pause'"""
+    if task.end_time is not None:
+        raise WorkSessionConflict("Session is not active")
+    if task.task_type == "pause":
+        raise WorkSessionConflict("Session is already paused")
+    return await _switch_task(db, task, "pause", description)
+
+
+async def resume_session(db: AsyncSession, task: Task, description: Optional[str] = None) -> Task:
+    """Продолжить: завершить задание 'pause' и начать новое рабочее"""
+    if task.end_time is not None:
+        raise WorkSessionConflict("Session is not active")
+    if task.task_type != "pause":
+        raise WorkSessionConflict("Session is not paused - cannot resume")
+    return await _switch_task(db, task, "work", description)
+
+
+async def recent_assignments(db: AsyncSession, worker_id: int, limit: int = 5) -> List[Assignment]:
+    """Последние смены работника с заданиями (история в боте)"""
+    result = await db.execute(
+        select(Assignment)
+        .options(selectinload(Assignment.tasks))
+        .where(Assignment.user_id == worker_id)
+        .order_by(Assignment.id.desc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())